@@ -16,6 +16,7 @@ class DiscordSettings:
     """Discord 関連の設定値。"""
 
     token: str
+    known_users_snapshot: Path | None = None
 
 
 @dataclass(frozen=True, slots=True)
@@ -23,6 +24,10 @@ class FirebaseSettings:
     """Firebase 関連の設定値。"""
 
     credentials_reference: str
+    executor_workers: int | None = None
+    realtime_shared_templates: bool = False
+    user_template_layout: str = "embedded"
+    history_write_behind: bool = False
 
 
 @dataclass(frozen=True, slots=True)
@@ -86,6 +91,48 @@ def _prepare_firebase_reference(raw_reference: str | None) -> str:
     return reference
 
 
+def _prepare_executor_workers(raw_workers: str | None) -> int | None:
+    if raw_workers is None or not raw_workers.strip():
+        return None
+
+    try:
+        workers = int(raw_workers.strip())
+    except ValueError as exc:
+        raise RuntimeError("FIREBASE_EXECUTOR_WORKERS must be an integer.") from exc
+
+    if workers < 1:
+        raise RuntimeError("FIREBASE_EXECUTOR_WORKERS must be a positive integer.")
+
+    return workers
+
+
+def _prepare_flag(raw_value: str | None) -> bool:
+    if raw_value is None:
+        return False
+    return raw_value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _prepare_optional_path(raw_value: str | None) -> Path | None:
+    if raw_value is None or not raw_value.strip():
+        return None
+    return Path(raw_value.strip())
+
+
+_USER_TEMPLATE_LAYOUTS = frozenset({"embedded", "subcollection"})
+
+
+def _prepare_user_template_layout(raw_layout: str | None) -> str:
+    if raw_layout is None or not raw_layout.strip():
+        return "embedded"
+
+    layout = raw_layout.strip().lower()
+    if layout not in _USER_TEMPLATE_LAYOUTS:
+        raise RuntimeError(
+            "FIREBASE_USER_TEMPLATE_LAYOUT must be 'embedded' or 'subcollection'."
+        )
+    return layout
+
+
 def load_config(env_file: str | Path | None = Path(".env")) -> AppConfig:
     """環境変数からアプリケーション設定を読み込む。"""
 
@@ -93,10 +140,34 @@ def load_config(env_file: str | Path | None = Path(".env")) -> AppConfig:
 
     token = _prepare_client_token(os.getenv("CLIENT_TOKEN"))
     firebase_reference = _prepare_firebase_reference(os.getenv("FIREBASE_CREDENTIALS"))
+    executor_workers = _prepare_executor_workers(os.getenv("FIREBASE_EXECUTOR_WORKERS"))
+    realtime_shared_templates = _prepare_flag(
+        os.getenv("FIREBASE_REALTIME_SHARED_TEMPLATES")
+    )
+    user_template_layout = _prepare_user_template_layout(
+        os.getenv("FIREBASE_USER_TEMPLATE_LAYOUT")
+    )
+    history_write_behind = _prepare_flag(os.getenv("FIREBASE_HISTORY_WRITE_BEHIND"))
+    if history_write_behind and executor_workers is not None:
+        # スレッドプール経由の同期リポジトリには書き込みバッファを組み込めないため、
+        # 設定が黙って無視されないよう起動時に拒否する。
+        raise RuntimeError(
+            "FIREBASE_HISTORY_WRITE_BEHIND cannot be combined with "
+            "FIREBASE_EXECUTOR_WORKERS."
+        )
+    known_users_snapshot = _prepare_optional_path(os.getenv("KNOWN_USERS_SNAPSHOT"))
 
     return AppConfig(
-        discord=DiscordSettings(token=token),
-        firebase=FirebaseSettings(credentials_reference=firebase_reference),
+        discord=DiscordSettings(
+            token=token, known_users_snapshot=known_users_snapshot
+        ),
+        firebase=FirebaseSettings(
+            credentials_reference=firebase_reference,
+            executor_workers=executor_workers,
+            realtime_shared_templates=realtime_shared_templates,
+            user_template_layout=user_template_layout,
+            history_write_behind=history_write_behind,
+        ),
     )
 
 
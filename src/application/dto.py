@@ -16,6 +16,7 @@ class TemplateListDTO:
 
     templates: list[Template]
     scope: TemplateScope | None = None
+    next_cursor: str | None = None
 
 
 @dataclass(frozen=True, slots=True)
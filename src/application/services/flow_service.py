@@ -29,7 +29,7 @@ class AmidakujiFlowService:
     def __init__(self, template_service: TemplateApplicationService) -> None:
         self._template_service = template_service
 
-    def complete_template_creation(
+    async def complete_template_creation(
         self,
         *,
         user_id: int,
@@ -39,7 +39,9 @@ class AmidakujiFlowService:
     ) -> TemplateCreationResultDTO:
         """テンプレート作成完了時の処理を行う。"""
 
-        self._template_service.create_user_template(user_id=user_id, template=template)
+        await self._template_service.create_user_template(
+            user_id=user_id, template=template
+        )
 
         transition: FlowTransitionDTO | None = None
         if context.is_main_flow:
@@ -51,7 +53,7 @@ class AmidakujiFlowService:
 
         return TemplateCreationResultDTO(template=template, transition=transition)
 
-    def remove_template(
+    async def remove_template(
         self,
         *,
         user_id: int,
@@ -60,7 +62,7 @@ class AmidakujiFlowService:
     ) -> TemplateDeletionResultDTO:
         """テンプレート削除時の処理を行う。"""
 
-        self._template_service.delete_user_template(
+        await self._template_service.delete_user_template(
             user_id=user_id, template_title=template_title
         )
         transition = FlowTransitionDTO(
@@ -70,7 +72,7 @@ class AmidakujiFlowService:
         )
         return TemplateDeletionResultDTO(title=template_title, transition=transition)
 
-    def use_recent_template(
+    async def use_recent_template(
         self,
         *,
         user_id: int,
@@ -79,7 +81,7 @@ class AmidakujiFlowService:
     ) -> HistoryUsageResultDTO:
         """履歴テンプレート利用時の処理を行う。"""
 
-        template = self._template_service.get_recent_template(
+        template = await self._template_service.get_recent_template(
             user_id=user_id, guild_id=guild_id
         )
         if template is None:
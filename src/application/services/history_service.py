@@ -1,39 +1,112 @@
 """履歴・抽選設定に関するアプリケーションサービス。"""
 from __future__ import annotations
 
-from domain import AssignmentHistory, PairList, ResultEmbedMode, SelectionMode, Template
-from domain.interfaces.repositories import TemplateRepository
+from collections.abc import Sequence
+
+from domain import (
+    AssignmentHistory,
+    HistoryPage,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+)
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
+from domain.services.history_cursor import build_history_page
 from domain.services.selection_mode_service import coerce_selection_mode
+from utils import resolve_awaitable
 
 
 class HistoryApplicationService:
     """履歴参照や抽選設定のユースケースを担うサービス。"""
 
-    def __init__(self, repository: TemplateRepository) -> None:
+    def __init__(
+        self, repository: TemplateRepository | AsyncTemplateRepository
+    ) -> None:
         self._repository = repository
 
-    def get_selection_mode(self) -> SelectionMode:
+    async def get_selection_mode(self) -> SelectionMode:
         """現在設定されている抽選モードを取得する。"""
 
-        mode = self._repository.get_selection_mode()
+        mode = await resolve_awaitable(self._repository.get_selection_mode())
         return coerce_selection_mode(mode)
 
-    def get_recent_history(
+    async def get_recent_history(
         self,
         *,
         guild_id: int,
         template_title: str | None,
         limit: int,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
     ) -> list[AssignmentHistory]:
-        """抽選履歴を取得する。"""
+        """抽選履歴を新しい順に取得する。
+
+        `start_after` はページングカーソル。`fields` を指定すると該当フィールドだけを
+        読み込み、残りは既定値の `AssignmentHistory` を返す。
+        """
+
+        return await resolve_awaitable(
+            self._repository.get_recent_history(
+                guild_id=guild_id,
+                template_title=template_title,
+                limit=limit,
+                start_after=start_after,
+                fields=fields,
+            )
+        )
 
-        return self._repository.get_recent_history(
-            guild_id=guild_id,
-            template_title=template_title,
-            limit=limit,
+    async def get_history_page(
+        self,
+        *,
+        guild_id: int,
+        template_titles: Sequence[str] = (),
+        limit: int,
+        cursor: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> HistoryPage:
+        """抽選履歴を 1 ページ分だけ取得する。
+
+        `template_titles` を複数指定した場合はタイトルごとに同じカーソル以降を
+        取得し、新しい順に合成する。カーソルは全履歴で共通の並び順を指すため、
+        合成後のページ境界も一致する。
+        """
+
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+
+        titles: Sequence[str | None] = template_titles or (None,)
+        histories: list[AssignmentHistory] = []
+        for title in titles:
+            histories.extend(
+                await self.get_recent_history(
+                    guild_id=guild_id,
+                    template_title=title,
+                    limit=limit + 1,
+                    start_after=cursor,
+                    fields=fields,
+                )
+            )
+        if len(titles) > 1:
+            histories.sort(
+                key=lambda item: (item.created_at, item.history_id or ""),
+                reverse=True,
+            )
+        return build_history_page(histories, limit=limit)
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        """テンプレートごとの連続担当の集計を取得する。未作成の場合は `None`。"""
+
+        return await resolve_awaitable(
+            self._repository.get_streak_aggregate(
+                guild_id=guild_id, template_title=template_title
+            )
         )
 
-    def save_history(
+    async def save_history(
         self,
         *,
         guild_id: int,
@@ -43,27 +116,48 @@ class HistoryApplicationService:
     ) -> None:
         """抽選結果を履歴として保存する。"""
 
-        self._repository.save_history(
-            guild_id=guild_id,
-            template=template,
-            pairs=pairs,
-            selection_mode=selection_mode,
+        await resolve_awaitable(
+            self._repository.save_history(
+                guild_id=guild_id,
+                template=template,
+                pairs=pairs,
+                selection_mode=selection_mode,
+            )
+        )
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode,
+    ) -> None:
+        """複数ラウンドの抽選結果を、1 回の書き込みでまとめて履歴に保存する。"""
+
+        await resolve_awaitable(
+            self._repository.save_history_rounds(
+                guild_id=guild_id,
+                template=template,
+                rounds=rounds,
+                selection_mode=selection_mode,
+            )
         )
 
-    def get_embed_mode(self) -> str:
+    async def get_embed_mode(self) -> str:
         """抽選結果表示用の埋め込みモードを取得する。"""
 
-        return self._repository.get_embed_mode()
+        return await resolve_awaitable(self._repository.get_embed_mode())
 
-    def set_embed_mode(self, mode: ResultEmbedMode) -> None:
+    async def set_embed_mode(self, mode: ResultEmbedMode) -> None:
         """抽選結果表示用の埋め込みモードを更新する。"""
 
-        self._repository.set_embed_mode(mode)
+        await resolve_awaitable(self._repository.set_embed_mode(mode))
 
-    def set_selection_mode(self, mode: SelectionMode) -> None:
+    async def set_selection_mode(self, mode: SelectionMode) -> None:
         """抽選モードを更新する。"""
 
-        self._repository.set_selection_mode(mode)
+        await resolve_awaitable(self._repository.set_selection_mode(mode))
 
 
 __all__ = ["HistoryApplicationService"]
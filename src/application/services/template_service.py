@@ -4,9 +4,13 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from domain import Template, TemplateScope
-from domain.interfaces.repositories import TemplateRepository
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
 from domain.services.template_service import merge_templates
 from application.dto import TemplateListDTO
+from utils import resolve_awaitable
+
+# Discord のセレクトメニューに並べられる選択肢の上限。
+PRIVATE_TEMPLATE_PAGE_SIZE = 25
 
 
 @dataclass(slots=True)
@@ -19,15 +23,47 @@ class TemplateCopyResultDTO:
 class TemplateApplicationService:
     """テンプレート操作のユースケースサービス。"""
 
-    def __init__(self, repository: TemplateRepository) -> None:
+    def __init__(
+        self, repository: TemplateRepository | AsyncTemplateRepository
+    ) -> None:
         self._repository = repository
 
-    def list_private_templates(
-        self, *, user_id: int, guild_id: int | None
+    async def list_private_templates(
+        self,
+        *,
+        user_id: int,
+        guild_id: int | None,
+        limit: int | None = None,
+        cursor: str | None = None,
     ) -> TemplateListDTO:
-        """ユーザーのプライベートテンプレート一覧を取得する。"""
+        """ユーザーのプライベートテンプレート一覧を取得する。
 
-        user = self._repository.get_user(user_id, guild_id=guild_id)
+        `limit` を指定した場合は `cursor` 以降の 1 ページ分だけを読み込み、
+        続きがあれば `next_cursor` に次ページのカーソルを設定する。
+        """
+
+        if limit is not None:
+            page = await resolve_awaitable(
+                self._repository.list_custom_templates(
+                    user_id, limit=limit, cursor=cursor
+                )
+            )
+            return TemplateListDTO(
+                templates=[
+                    template
+                    for template in page.templates
+                    if template.scope is TemplateScope.PRIVATE
+                ],
+                scope=TemplateScope.PRIVATE,
+                next_cursor=page.next_cursor,
+            )
+
+        # 共有/公開テンプレートは使わないため、ユーザードキュメントのみ読み込む。
+        user = await resolve_awaitable(
+            self._repository.get_user(
+                user_id, guild_id=guild_id, include_shared=False
+            )
+        )
         templates = [
             template
             for template in getattr(user, "custom_templates", [])
@@ -35,100 +71,108 @@ class TemplateApplicationService:
         ] if user else []
         return TemplateListDTO(templates=list(templates), scope=TemplateScope.PRIVATE)
 
-    def list_shared_templates(self, *, guild_id: int) -> TemplateListDTO:
+    async def list_shared_templates(self, *, guild_id: int) -> TemplateListDTO:
         """サーバー共有テンプレートを取得する。"""
 
-        shared_templates, _ = self._repository.get_shared_templates_for_user(
-            guild_id=guild_id
+        shared_templates, _ = await resolve_awaitable(
+            self._repository.get_shared_templates_for_user(guild_id=guild_id)
         )
         return TemplateListDTO(templates=list(shared_templates), scope=TemplateScope.GUILD)
 
-    def list_public_templates(self) -> TemplateListDTO:
+    async def list_public_templates(self) -> TemplateListDTO:
         """公開テンプレートを取得する。"""
 
-        _, public_templates = self._repository.get_shared_templates_for_user(guild_id=None)
+        _, public_templates = await resolve_awaitable(
+            self._repository.get_shared_templates_for_user(guild_id=None)
+        )
         return TemplateListDTO(templates=list(public_templates), scope=TemplateScope.PUBLIC)
 
-    def get_template_overview(
+    async def get_template_overview(
         self, *, user_id: int, guild_id: int | None
     ) -> tuple[TemplateListDTO, TemplateListDTO, TemplateListDTO]:
-        """ユーザー向けのテンプレート一覧を取得する。"""
+        """ユーザー向けのテンプレート一覧を取得する。
 
-        user = self._repository.get_user(
-            user_id,
-            guild_id=guild_id,
-            include_shared=True,
-        )
+        ユーザーと既定テンプレートは `load_draw_context` でまとめて読み込む。
+        """
 
-        if user is not None:
-            private = TemplateListDTO(
-                templates=list(getattr(user, "custom_templates", [])),
-                scope=TemplateScope.PRIVATE,
-            )
-            guild_templates = TemplateListDTO(
-                templates=list(getattr(user, "shared_templates", [])),
-                scope=TemplateScope.GUILD,
-            )
-            public = TemplateListDTO(
-                templates=list(getattr(user, "public_templates", [])),
-                scope=TemplateScope.PUBLIC,
-            )
-            return private, guild_templates, public
+        context = await resolve_awaitable(
+            self._repository.load_draw_context(user_id=user_id, guild_id=guild_id)
+        )
+        guild_templates, public_shared = await resolve_awaitable(
+            self._repository.get_shared_templates_for_user(guild_id=guild_id)
+        )
 
-        guild_templates, public_shared = self._repository.get_shared_templates_for_user(
-            guild_id=guild_id
+        custom_templates = getattr(context.user, "custom_templates", None) or []
+        private = TemplateListDTO(
+            templates=list(custom_templates), scope=TemplateScope.PRIVATE
         )
-        default_templates = self._repository.get_default_templates()
-        private = TemplateListDTO(templates=[], scope=TemplateScope.PRIVATE)
         guild = TemplateListDTO(templates=list(guild_templates), scope=TemplateScope.GUILD)
         public = TemplateListDTO(
-            templates=list(merge_templates(public_shared, default_templates)),
+            templates=list(merge_templates(public_shared, context.default_templates)),
             scope=TemplateScope.PUBLIC,
         )
         return private, guild, public
 
-    def copy_shared_template(
+    async def copy_shared_template(
         self, *, user_id: int, template: Template
     ) -> TemplateCopyResultDTO:
         """共有/公開テンプレートをユーザーにコピーする。"""
 
-        copied = self._repository.copy_shared_template_to_user(user_id, template)
+        copied = await resolve_awaitable(
+            self._repository.copy_shared_template_to_user(user_id, template)
+        )
         return TemplateCopyResultDTO(template=copied)
 
-    def create_user_template(self, *, user_id: int, template: Template) -> Template:
+    async def ensure_user(self, *, user_id: int, name: str) -> bool:
+        """ユーザーが未登録なら既定テンプレート付きで初期化する。初期化した場合は `True`。"""
+
+        if await resolve_awaitable(self._repository.user_is_exist(user_id)):
+            return False
+        await resolve_awaitable(self._repository.init_user(user_id=user_id, name=name))
+        return True
+
+    async def create_user_template(self, *, user_id: int, template: Template) -> Template:
         """ユーザーのテンプレートを作成する。"""
 
-        self._repository.add_custom_template(user_id=user_id, template=template)
+        await resolve_awaitable(
+            self._repository.add_custom_template(user_id=user_id, template=template)
+        )
         return template
 
-    def delete_user_template(self, *, user_id: int, template_title: str) -> None:
+    async def delete_user_template(self, *, user_id: int, template_title: str) -> None:
         """ユーザーのテンプレートを削除する。"""
 
-        self._repository.delete_custom_template(
-            user_id=user_id,
-            template_title=template_title,
+        await resolve_awaitable(
+            self._repository.delete_custom_template(
+                user_id=user_id,
+                template_title=template_title,
+            )
         )
 
-    def delete_user_template_by_id(self, *, user_id: int, template_id: str) -> None:
+    async def delete_user_template_by_id(self, *, user_id: int, template_id: str) -> None:
         """テンプレート ID を指定してユーザーのテンプレートを削除する。"""
 
-        self._repository.delete_custom_template(
-            user_id=user_id,
-            template_id=template_id,
+        await resolve_awaitable(
+            self._repository.delete_custom_template(
+                user_id=user_id,
+                template_id=template_id,
+            )
         )
 
-    def mark_recent_template(self, *, user_id: int, template: Template) -> None:
+    async def mark_recent_template(self, *, user_id: int, template: Template) -> None:
         """最近利用したテンプレートとして保存する。"""
 
-        self._repository.set_least_template(user_id, template)
+        await resolve_awaitable(self._repository.set_least_template(user_id, template))
 
-    def update_user_template(self, *, user_id: int, template: Template) -> Template:
+    async def update_user_template(self, *, user_id: int, template: Template) -> Template:
         """ユーザーのテンプレートを更新する。"""
 
-        self._repository.update_custom_template(user_id, template)
+        await resolve_awaitable(
+            self._repository.update_custom_template(user_id, template)
+        )
         return template
 
-    def list_shared_templates_by_scope(
+    async def list_shared_templates_by_scope(
         self,
         *,
         scope: TemplateScope,
@@ -137,30 +181,46 @@ class TemplateApplicationService:
     ) -> TemplateListDTO:
         """共有/公開テンプレートをスコープ単位で取得する。"""
 
-        templates = self._repository.list_shared_templates(
-            scope=scope,
-            guild_id=guild_id,
-            created_by=created_by,
+        templates = await resolve_awaitable(
+            self._repository.list_shared_templates(
+                scope=scope,
+                guild_id=guild_id,
+                created_by=created_by,
+            )
         )
         return TemplateListDTO(templates=list(templates), scope=scope)
 
-    def create_shared_template(self, template: Template) -> Template:
+    async def create_shared_template(self, template: Template) -> Template:
         """共有テンプレートを新規作成する。"""
 
-        return self._repository.create_shared_template(template)
+        return await resolve_awaitable(
+            self._repository.create_shared_template(template)
+        )
 
-    def delete_shared_template(self, template_id: str) -> None:
+    async def delete_shared_template(self, template_id: str) -> None:
         """共有/公開テンプレートを削除する。"""
 
-        self._repository.delete_shared_template(template_id)
+        await resolve_awaitable(self._repository.delete_shared_template(template_id))
 
-    def get_recent_template(
+    async def get_recent_template(
         self, *, user_id: int, guild_id: int | None
     ) -> Template | None:
         """ユーザーが直近使用したテンプレートを取得する。"""
 
-        user = self._repository.get_user(user_id, guild_id=guild_id)
+        # 直近のテンプレートはユーザードキュメントにあるため、テンプレート一覧は読まない。
+        user = await resolve_awaitable(
+            self._repository.get_user(
+                user_id,
+                guild_id=guild_id,
+                include_shared=False,
+                include_templates=False,
+            )
+        )
         return getattr(user, "least_template", None) if user else None
 
 
-__all__ = ["TemplateApplicationService", "TemplateCopyResultDTO"]
+__all__ = [
+    "PRIVATE_TEMPLATE_PAGE_SIZE",
+    "TemplateApplicationService",
+    "TemplateCopyResultDTO",
+]
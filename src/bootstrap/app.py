@@ -10,10 +10,21 @@ from injector import Binder, Injector, Module, provider, singleton
 
 from app.config import AppConfig, load_config
 from app.logging import configure_logging
-from domain.interfaces.repositories import TemplateRepository
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
+from infrastructure.wrappers import (
+    SHARED_TEMPLATES_FAMILY,
+    CachingTemplateRepository,
+    CoalescingTemplateRepository,
+    ExecutorTemplateRepository,
+)
 from presentation.discord.client import BotClient
 from presentation.discord.services import DiscordCommandUseCases
-from services.app_context import create_template_repository
+from services.app_context import (
+    create_async_template_repository,
+    create_template_repository,
+    flush_pending_writes,
+)
+from services.user_registry import KnownUserSet, UserRegistrationQueue
 
 
 @dataclass(frozen=True, slots=True)
@@ -25,7 +36,41 @@ class BootstrapContext:
 
 
 def _default_repository_factory(config: AppConfig) -> TemplateRepository:
-    return create_template_repository(config.firebase.credentials_reference)
+    return create_template_repository(
+        config.firebase.credentials_reference,
+        template_layout=config.firebase.user_template_layout,
+    )
+
+
+def _default_async_repository_factory(config: AppConfig) -> AsyncTemplateRepository:
+    firebase = config.firebase
+    repository: AsyncTemplateRepository
+    # ワーカー数が指定された場合は同期リポジトリをスレッドプール経由で利用する。
+    if firebase.executor_workers is not None:
+        repository = ExecutorTemplateRepository(
+            create_template_repository(
+                firebase.credentials_reference,
+                realtime_shared_templates=firebase.realtime_shared_templates,
+                template_layout=firebase.user_template_layout,
+            ),
+            max_workers=firebase.executor_workers,
+        )
+    else:
+        repository = create_async_template_repository(
+            firebase.credentials_reference,
+            realtime_shared_templates=firebase.realtime_shared_templates,
+            template_layout=firebase.user_template_layout,
+            history_write_behind=firebase.history_write_behind,
+        )
+
+    ttl_seconds: dict[str, float] = {}
+    if firebase.realtime_shared_templates:
+        # 共有テンプレートはリスナーの索引が常に最新なので TTL キャッシュを通さない。
+        ttl_seconds[SHARED_TEMPLATES_FAMILY] = 0.0
+    # キャッシュミスが同時に発生しても Firestore への読み取りは 1 回にまとめる。
+    return CachingTemplateRepository(
+        CoalescingTemplateRepository(repository), ttl_seconds=ttl_seconds
+    )
 
 
 class ApplicationModule(Module):
@@ -36,9 +81,17 @@ class ApplicationModule(Module):
         config: AppConfig,
         *,
         repository_factory: Callable[[AppConfig], TemplateRepository] | None = None,
+        async_repository_factory: (
+            Callable[[AppConfig], AsyncTemplateRepository] | None
+        ) = None,
     ) -> None:
         self._config = config
         self._repository_factory = repository_factory or _default_repository_factory
+        # 同期リポジトリだけが差し替えられた場合 (テストなど) はユースケースも
+        # その同期リポジトリで組み立て、Firestore への接続を発生させない。
+        if async_repository_factory is None and repository_factory is None:
+            async_repository_factory = _default_async_repository_factory
+        self._async_repository_factory = async_repository_factory
 
     def configure(self, binder: Binder) -> None:  # pragma: no cover - 型保証のみ
         binder.bind(AppConfig, to=self._config, scope=singleton)
@@ -54,7 +107,11 @@ class ApplicationModule(Module):
         self,
         repository: TemplateRepository,
     ) -> DiscordCommandUseCases:
-        return DiscordCommandUseCases.from_repository(repository)
+        if self._async_repository_factory is None:
+            return DiscordCommandUseCases.from_repository(repository)
+        return DiscordCommandUseCases.from_repository(
+            self._async_repository_factory(self._config)
+        )
 
     @singleton
     @provider
@@ -63,7 +120,17 @@ class ApplicationModule(Module):
         repository: TemplateRepository,
         usecases: DiscordCommandUseCases,
     ) -> BotClient:
-        return BotClient(db_manager=repository, usecases=usecases)
+        known_users = KnownUserSet(
+            snapshot_path=self._config.discord.known_users_snapshot
+        )
+        return BotClient(
+            db_manager=repository,
+            usecases=usecases,
+            shutdown_callbacks=[flush_pending_writes],
+            user_registry=UserRegistrationQueue(
+                usecases.template_service, known_users=known_users
+            ),
+        )
 
 
 def bootstrap_application(
@@ -73,6 +140,9 @@ def bootstrap_application(
     log_level: int | str | None = None,
     logging_kwargs: Mapping[str, Any] | None = None,
     repository_factory: Callable[[AppConfig], TemplateRepository] | None = None,
+    async_repository_factory: (
+        Callable[[AppConfig], AsyncTemplateRepository] | None
+    ) = None,
     modules: Iterable[Module] | None = None,
 ) -> BootstrapContext:
     """設定読み込み・ロギング設定・依存解決をまとめて実行する。"""
@@ -81,7 +151,11 @@ def bootstrap_application(
 
     app_config = config or load_config(env_file)
 
-    base_module = ApplicationModule(app_config, repository_factory=repository_factory)
+    base_module = ApplicationModule(
+        app_config,
+        repository_factory=repository_factory,
+        async_repository_factory=async_repository_factory,
+    )
     module_list = [base_module, *(modules or [])]
     injector = Injector(module_list)
 
@@ -2,11 +2,18 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass
+from collections.abc import Sequence
 from typing import Callable
 
 from app.config import AppConfig, DiscordSettings, FirebaseSettings
 from app.container import build_discord_application, DiscordApplication
-from domain import ResultEmbedMode, SelectionMode, Template
+from domain import (
+    DrawContext,
+    ResultEmbedMode,
+    SelectionMode,
+    Template,
+    TemplatePage,
+)
 from domain.interfaces.repositories import TemplateRepository
 
 from .app import BootstrapContext, bootstrap_application
@@ -21,8 +28,8 @@ class InMemoryTemplateRepository(TemplateRepository):
         self.users: dict[int, object] = {}
         self.saved_histories: list[object] = []
 
-    def ensure_required_collections(self) -> None:
-        return None
+    def ensure_required_collections(self, *, force: bool = False) -> list[str]:
+        return []
 
     def ensure_default_templates(self) -> list[Template]:
         return []
@@ -75,6 +82,17 @@ class InMemoryTemplateRepository(TemplateRepository):
     ) -> None:
         self.saved_histories.append((guild_id, template, pairs, selection_mode))
 
+    def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[object],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        for pairs in rounds:
+            self.saved_histories.append((guild_id, template, pairs, selection_mode))
+
     def get_recent_history(
         self,
         *,
@@ -82,9 +100,16 @@ class InMemoryTemplateRepository(TemplateRepository):
         template_title: str | None = None,
         limit: int = 10,
         since: object | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
     ) -> list[object]:
         return []
 
+    def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> object | None:
+        return None
+
     def init_user(self, user_id: int, name: str) -> None:
         self.users[user_id] = {"name": name}
 
@@ -98,15 +123,44 @@ class InMemoryTemplateRepository(TemplateRepository):
         *,
         guild_id: int | None = None,
         include_shared: bool = True,
+        include_templates: bool = True,
     ) -> object | None:
         return self.users.get(user_id)
 
+    def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        return DrawContext(
+            guild_id=guild_id,
+            user=self.users.get(user_id),
+            selection_mode=SelectionMode(self.selection_mode),
+            embed_mode=ResultEmbedMode(self.embed_mode),
+            default_templates=self.get_default_templates(),
+        )
+
     def delete_user(self, user_id: int) -> None:
         self.users.pop(user_id, None)
 
     def user_is_exist(self, user_id: int) -> bool:
         return user_id in self.users
 
+    def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        templates = self.users.get(user_id, {}).get("custom_templates", [])
+        offset = int(cursor) if cursor else 0
+        end = offset + limit
+        return TemplatePage(
+            templates=list(templates[offset:end]),
+            next_cursor=str(end) if end < len(templates) else None,
+        )
+
+    def get_custom_template(self, user_id: int, template_id: str) -> Template | None:
+        for template in self.users.get(user_id, {}).get("custom_templates", []):
+            if getattr(template, "template_id", None) == template_id:
+                return template
+        return None
+
     def add_custom_template(self, user_id: int, template: Template) -> None:
         self.users.setdefault(user_id, {"custom_templates": []}).setdefault(
             "custom_templates", []
@@ -289,6 +289,40 @@ class BackToTemplateSelectButton(DisableViewOnCallbackMixin, discord.ui.Button):
             await self._cleanup_after_callback(interaction)
 
 
+class TemplatePageButton(DisableViewOnCallbackMixin, discord.ui.Button):
+    """プライベートテンプレート一覧の別ページを表示するボタン。
+
+    `cursor` が `None` の場合は先頭ページへ戻る。
+    """
+
+    disable_on_success = True
+
+    def __init__(
+        self,
+        context: CommandContext,
+        *,
+        state: AmidakujiState,
+        cursor: str | None,
+    ):
+        super().__init__(
+            style=discord.ButtonStyle.secondary,
+            label="次のページ" if cursor is not None else "最初のページへ",
+        )
+        self.context = context
+        self.state = state
+        self.cursor = cursor
+
+    async def callback(self, interaction: discord.Interaction):
+        flow = _get_flow(self.context)
+        self.context.template_page_cursor = self.cursor
+        try:
+            await flow.dispatch(self.state, interaction, interaction)
+        except Exception:
+            raise
+        else:
+            await self._cleanup_after_callback(interaction)
+
+
 class UseSharedTemplateButton(DisableViewOnCallbackMixin, discord.ui.Button):
     disable_on_success = True
 
@@ -1,29 +1,103 @@
 import logging
 import random
-from collections import defaultdict
+import secrets
+from collections.abc import Mapping, Sequence
 
 import discord
-
-from domain import Pair, PairList, ResultEmbedMode, SelectionMode
+import numpy as np
+
+from domain import (
+    AssignmentEntry,
+    AssignmentHistory,
+    DrawSeed,
+    Pair,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    Template,
+)
+from domain.services.assignment_engine import (
+    allocate_capacity_quotas,
+    draw_capacity_assignment,
+    draw_exponential_key_assignment,
+    draw_weighted_assignment,
+    solve_min_cost_assignment,
+)
 from domain.services.selection_mode_service import coerce_selection_mode
 from utils import WARN
 
 LOGGER = logging.getLogger(__name__)
 
+# 公平性最適化モードで、コストが同じ割当の間を乱数で選ぶための揺らぎ幅。
+TIE_BREAK_JITTER = 1e-3
+# 抽選手順の版。乱数の消費順や割当の手順を変えたら上げ、古い履歴の再現を拒否する。
+DRAW_ALGORITHM_VERSION = 1
+
+
+def new_draw_seed() -> int:
+    """抽選 1 回分の乱数の種を作る。Firestore の整数に収まるよう 63 bit にする。"""
+
+    return secrets.randbits(63)
+
+
+def _numpy_rng(rng: random.Random) -> np.random.Generator:
+    # 抽選ごとの random.Random から種を取り、NumPy 側も同じ種で再現できるようにする。
+    return np.random.default_rng(rng.getrandbits(128))
+
+
+def _sparse_overrides(
+    table: Mapping[int, Mapping[str, float]] | None,
+    users: Sequence[discord.User],
+    *,
+    default: float,
+) -> dict[int, dict[str, float]]:
+    # 履歴に残すのは参加者の既定値と異なるセルだけにする。
+    if not table:
+        return {}
+    overrides: dict[int, dict[str, float]] = {}
+    for user in users:
+        values = {
+            choice: float(value)
+            for choice, value in (table.get(user.id) or {}).items()
+            if float(value) != default
+        }
+        if values:
+            overrides[user.id] = values
+    return overrides
+
+
+def _expand_overrides(
+    overrides: Mapping[int, Mapping[str, float]],
+    users: Sequence[discord.User],
+    groupes: Sequence[str],
+    *,
+    default: float,
+) -> dict[int, dict[str, float]]:
+    return {
+        user.id: {
+            choice: overrides.get(user.id, {}).get(choice, default)
+            for choice in groupes
+        }
+        for user in users
+    }
+
 
 def _normalize_selection_mode(mode: SelectionMode | str) -> str:
     return coerce_selection_mode(mode).value
 
 
-def _build_weight_matrix(
+def _build_weight_array(
     users: list[discord.User],
     groupes: list[str],
     weights: dict[int, dict[str, float]] | None,
-) -> dict[int, dict[str, float]]:
+    *,
+    default: float = 1.0,
+    table_name: str = "重みテーブル",
+) -> np.ndarray:
     if weights is None:
-        return {user.id: {group: 1.0 for group in groupes} for user in users}
+        return np.full((len(users), len(groupes)), default, dtype=np.float64)
 
-    matrix: dict[int, dict[str, float]] = defaultdict(dict)
+    rows: list[list[float]] = []
     missing_pairs: list[tuple[int, str]] = []
     missing_users: set[int] = set()
 
@@ -32,15 +106,17 @@ def _build_weight_matrix(
         if not user_weights:
             missing_users.add(user.id)
             user_weights = {}
-        matrix[user.id] = {
-            group: _coerce_weight(user_weights, group, missing_pairs, user.id)
-            for group in groupes
-        }
+        rows.append(
+            [
+                _coerce_weight(user_weights, group, missing_pairs, user.id, default)
+                for group in groupes
+            ]
+        )
 
     if missing_pairs or missing_users:
-        _log_missing_weights(missing_pairs, missing_users)
+        _log_missing_weights(missing_pairs, missing_users, default, table_name)
 
-    return matrix
+    return np.array(rows, dtype=np.float64).reshape(len(users), len(groupes))
 
 
 def _coerce_weight(
@@ -48,15 +124,19 @@ def _coerce_weight(
     group: str,
     missing_pairs: list[tuple[int, str]],
     user_id: int,
+    default: float,
 ) -> float:
-    raw_value = user_weights.get(group, 1.0)
+    raw_value = user_weights.get(group, default)
     if group not in user_weights:
         missing_pairs.append((user_id, group))
     return max(float(raw_value), 0.0)
 
 
 def _log_missing_weights(
-    missing_pairs: list[tuple[int, str]], missing_users: set[int]
+    missing_pairs: list[tuple[int, str]],
+    missing_users: set[int],
+    default: float,
+    table_name: str,
 ) -> None:
     pair_count = len(missing_pairs)
     user_segment = ""
@@ -70,7 +150,8 @@ def _log_missing_weights(
     sample_segment = f" サンプル: {samples}" if samples else ""
 
     message = (
-        f"重みテーブルの欠損を検出しました。{pair_count} 件を既定値 1.0 で補完します。"
+        f"{table_name}の欠損を検出しました。"
+        f"{pair_count} 件を既定値 {default} で補完します。"
         f"{user_segment}{sample_segment}"
     )
     LOGGER.warning(WARN + message)
@@ -82,41 +163,391 @@ def create_pair_from_list(
     *,
     selection_mode: SelectionMode | str = SelectionMode.RANDOM,
     weights: dict[int, dict[str, float]] | None = None,
+    costs: dict[int, dict[str, float]] | None = None,
+    capacities: Sequence[int] | None = None,
+    seed: int | None = None,
 ) -> PairList:
+    """メンバーを選択肢へ割り当てる。
+
+    乱数は `seed` (省略時は新しく作る) から抽選ごとに作る `random.Random` だけを
+    使い、他の抽選と状態を共有しない。戻り値の `seed` に種と入力を残すため、
+    `replay_assignment` で同じ結果を作り直せる。
+    """
+
     if not users or not groupes:
         raise ValueError("ユーザーまたはグループが空です")
 
+    if seed is None:
+        seed = new_draw_seed()
+    rng = random.Random(seed)
+
+    if capacities is not None:
+        pairs = _create_capacity_pairs(
+            users,
+            groupes,
+            capacities,
+            rng=rng,
+            selection_mode=selection_mode,
+            weights=weights,
+            costs=costs,
+        )
+    else:
+        pairs = _create_pairs(
+            users,
+            groupes,
+            rng=rng,
+            selection_mode=selection_mode,
+            weights=weights,
+            costs=costs,
+        )
+
+    return PairList(
+        pairs=pairs,
+        seed=DrawSeed(
+            value=seed,
+            participant_ids=tuple(user.id for user in users),
+            weights=_sparse_overrides(weights, users, default=1.0),
+            costs=_sparse_overrides(costs, users, default=0.0),
+            algorithm=DRAW_ALGORITHM_VERSION,
+        ),
+    )
+
+
+def _create_pairs(
+    users: list[discord.User],
+    groupes: list[str],
+    *,
+    rng: random.Random,
+    selection_mode: SelectionMode | str,
+    weights: dict[int, dict[str, float]] | None,
+    costs: dict[int, dict[str, float]] | None,
+) -> list[Pair]:
     pairs = []
     pairs_amount = min(len(users), len(groupes))
 
     shuffled_groupes = groupes.copy()
-    random.shuffle(shuffled_groupes)
+    rng.shuffle(shuffled_groupes)
 
     normalized_mode = _normalize_selection_mode(selection_mode)
 
-    if normalized_mode != SelectionMode.BIAS_REDUCTION.value:
+    if normalized_mode == SelectionMode.RANDOM.value:
         shuffled_users = users.copy()
-        random.shuffle(shuffled_users)
+        rng.shuffle(shuffled_users)
 
         for i in range(pairs_amount):
             pairs.append(Pair(user=shuffled_users[i], choice=shuffled_groupes[i]))
-        return PairList(pairs=pairs)
-
-    weight_matrix = _build_weight_matrix(users, shuffled_groupes, weights)
-
-    available_users = users.copy()
-    for group in shuffled_groupes[:pairs_amount]:
-        user_weights = [weight_matrix[user.id][group] for user in available_users]
-        total_weight = sum(user_weights)
-        if total_weight <= 0:
-            selected_user = random.choice(available_users)
-        else:
-            selected_user = random.choices(available_users, weights=user_weights, k=1)[0]
+        return pairs
+
+    if normalized_mode == SelectionMode.OPTIMAL_FAIRNESS.value:
+        cost_array = _build_weight_array(
+            users, shuffled_groupes, costs, default=0.0, table_name="コストテーブル"
+        )
+        user_indices, group_indices = solve_min_cost_assignment(
+            cost_array, rng=_numpy_rng(rng), jitter=TIE_BREAK_JITTER
+        )
+        for user_index, group_index in zip(user_indices, group_indices):
+            pairs.append(
+                Pair(user=users[user_index], choice=shuffled_groupes[group_index])
+            )
+        return pairs
+
+    weight_array = _build_weight_array(users, shuffled_groupes, weights)
+    if normalized_mode == SelectionMode.EXPONENTIAL_KEYS.value:
+        assigned = draw_exponential_key_assignment(weight_array, rng=_numpy_rng(rng))
+    else:
+        assigned = draw_weighted_assignment(weight_array, rng=_numpy_rng(rng))
+    for group, user_index in zip(shuffled_groupes, assigned):
+        pairs.append(Pair(user=users[user_index], choice=group))
+
+    return pairs
+
+
+def _create_capacity_pairs(
+    users: list[discord.User],
+    groupes: list[str],
+    capacities: Sequence[int],
+    *,
+    rng: random.Random,
+    selection_mode: SelectionMode | str,
+    weights: dict[int, dict[str, float]] | None,
+    costs: dict[int, dict[str, float]] | None,
+) -> list[Pair]:
+    # 定員付きの選択肢へ全員を振り分ける。人数は定員に比例させて均等にする。
+    if len(capacities) != len(groupes):
+        raise ValueError("定員の数が選択肢の数と一致しません")
+
+    order = list(range(len(groupes)))
+    rng.shuffle(order)
+    shuffled_groupes = [groupes[index] for index in order]
+    quotas = allocate_capacity_quotas(
+        np.array([capacities[index] for index in order]), len(users)
+    )
 
-        pairs.append(Pair(user=selected_user, choice=group))
-        available_users.remove(selected_user)
+    normalized_mode = _normalize_selection_mode(selection_mode)
+    if normalized_mode == SelectionMode.OPTIMAL_FAIRNESS.value:
+        # 定員の数だけ列を複製し、席単位の割当問題として解く。
+        cost_array = _build_weight_array(
+            users, shuffled_groupes, costs, default=0.0, table_name="コストテーブル"
+        )
+        seat_groups = np.repeat(np.arange(len(shuffled_groupes)), quotas)
+        user_indices, seat_indices = solve_min_cost_assignment(
+            cost_array[:, seat_groups], rng=_numpy_rng(rng), jitter=TIE_BREAK_JITTER
+        )
+        assigned = np.full(len(users), -1, dtype=np.intp)
+        assigned[user_indices] = seat_groups[seat_indices]
+    else:
+        weight_array = _build_weight_array(users, shuffled_groupes, weights)
+        assigned = draw_capacity_assignment(weight_array, quotas, rng=_numpy_rng(rng))
+
+    # 選択肢の順に並べ、同じ選択肢の中では元のユーザー順を保つ。
+    members = np.flatnonzero(assigned >= 0)
+    members = members[np.argsort(assigned[members], kind="stable")]
+    return [
+        Pair(user=users[index], choice=shuffled_groupes[assigned[index]])
+        for index in members.tolist()
+    ]
+
+
+def create_schedule_from_list(
+    users: list[discord.User],
+    groupes: list[str],
+    *,
+    rounds: int,
+    seed: int | None = None,
+    capacities: Sequence[int] | None = None,
+) -> list[PairList]:
+    """`rounds` 回分の割当を巡回ラテン方陣でまとめて作る。
+
+    ユーザーと選択肢をそれぞれシャッフルし、大きい方の人数 `L` を一辺とする
+    巡回ラテン方陣 `(i + shift) mod L` の行を 1 ラウンドとして使う。ラウンドごとの
+    `shift` は重複なく選ぶため、`L` ラウンド以内なら同じユーザーに同じ選択肢が
+    二度割り当てられることはなく、`L` ラウンドで全員が全ての選択肢を一度ずつ
+    担当する (ユーザーが多い場合は休みも均等に回る)。`L` を超える分は新しい
+    順列で巡回をやり直し、境目でも同じ担当が続かないようにする。
+
+    `capacities` を渡すと、席ではなく定員付きの選択肢 (チーム) 単位で巡回させる
+    (`_capacity_schedule_rounds`)。
+
+    全ラウンドで同じ種を使い、各ラウンドの `seed.round_index` に順番を残す。
+    ラウンド数を増やしても先頭のラウンドは変わらない。
+    """
 
-    return PairList(pairs=pairs)
+    if not users or not groupes:
+        raise ValueError("ユーザーまたはグループが空です")
+    if rounds < 1:
+        raise ValueError("ラウンド数は 1 以上である必要があります")
+
+    if seed is None:
+        seed = new_draw_seed()
+    rng = random.Random(seed)
+    participant_ids = tuple(user.id for user in users)
+
+    if capacities is not None:
+        round_pairs = _capacity_schedule_rounds(
+            users, groupes, capacities, rounds=rounds, rng=rng
+        )
+    else:
+        round_pairs = _latin_square_rounds(users, groupes, rounds=rounds, rng=rng)
+
+    return [
+        PairList(
+            pairs=pairs,
+            seed=DrawSeed(
+                value=seed,
+                participant_ids=participant_ids,
+                round_index=round_index,
+                algorithm=DRAW_ALGORITHM_VERSION,
+            ),
+        )
+        for round_index, pairs in enumerate(round_pairs)
+    ]
+
+
+def _latin_square_rounds(
+    users: list[discord.User],
+    groupes: list[str],
+    *,
+    rounds: int,
+    rng: random.Random,
+) -> list[list[Pair]]:
+    shuffled_users = users.copy()
+    rng.shuffle(shuffled_users)
+    shuffled_groupes = groupes.copy()
+    rng.shuffle(shuffled_groupes)
+
+    size = max(len(users), len(groupes))
+    shifts: list[int] = []
+    while len(shifts) < rounds:
+        cycle = rng.sample(range(size), size)
+        if shifts and size > 1 and cycle[0] == shifts[-1]:
+            cycle[0], cycle[-1] = cycle[-1], cycle[0]
+        shifts.extend(cycle)
+
+    # square[r, i] がラウンド r でユーザー i が受け持つ選択肢の番号。
+    square = (
+        np.asarray(shifts[:rounds])[:, np.newaxis] + np.arange(len(users))
+    ) % size
+    round_pairs: list[list[Pair]] = []
+    for row in square.tolist():
+        assigned = dict(zip(row, shuffled_users))
+        round_pairs.append(
+            [
+                Pair(user=assigned[group_index], choice=group)
+                for group_index, group in enumerate(shuffled_groupes)
+                if group_index in assigned
+            ]
+        )
+    return round_pairs
+
+
+def _capacity_schedule_rounds(
+    users: list[discord.User],
+    groupes: list[str],
+    capacities: Sequence[int],
+    *,
+    rounds: int,
+    rng: random.Random,
+) -> list[list[Pair]]:
+    """定員付きの選択肢を、ラウンドごとの最小費用割当でチーム単位に巡回させる。
+
+    席を並べて巡回させると同じチームの席が隣り合い、1 つずれても同じチームに
+    残ってしまう。そこで各ラウンドを「直前と同じチーム」を最も重いコスト、
+    「これまでにそのチームへ入った回数」を次のコストとする割当問題として解く。
+    席が足りないユーザーは休みの列に入れ、休みも同じように回す。各選択肢の
+    人数は単発の抽選と同じく `allocate_capacity_quotas` で決める。
+    """
+
+    if len(capacities) != len(groupes):
+        raise ValueError("定員の数が選択肢の数と一致しません")
+
+    quotas = allocate_capacity_quotas(np.asarray(capacities), len(users))
+    rest_index = len(groupes)
+    # 列番号 `rest_index` は休み。ユーザー数と同じ数の席を用意する。
+    seat_teams = np.repeat(
+        np.arange(len(groupes) + 1), [*quotas.tolist(), len(users) - int(quotas.sum())]
+    )
+    # 入った回数の差より、同じチームが続かないことを常に優先する。
+    repeat_penalty = float(rounds * len(users) + 1)
+    generator = _numpy_rng(rng)
+    rows = np.arange(len(users))
+    counts = np.zeros((len(users), len(groupes) + 1), dtype=np.float64)
+    previous: np.ndarray | None = None
+
+    round_pairs: list[list[Pair]] = []
+    for _ in range(rounds):
+        costs = counts.copy()
+        if previous is not None:
+            costs[rows, previous] += repeat_penalty
+        user_indices, seat_indices = solve_min_cost_assignment(
+            costs[:, seat_teams], rng=generator, jitter=TIE_BREAK_JITTER
+        )
+        teams = np.empty(len(users), dtype=np.intp)
+        teams[user_indices] = seat_teams[seat_indices]
+        counts[rows, teams] += 1
+        previous = teams
+
+        # 選択肢の順に並べ、同じ選択肢の中では元のユーザー順を保つ。
+        members = np.flatnonzero(teams != rest_index)
+        members = members[np.argsort(teams[members], kind="stable")]
+        round_pairs.append(
+            [
+                Pair(user=users[index], choice=groupes[teams[index]])
+                for index in members.tolist()
+            ]
+        )
+    return round_pairs
+
+
+def replay_assignment(
+    history: AssignmentHistory,
+    members: Sequence[discord.User],
+) -> AssignmentHistory:
+    """履歴に残した種と入力から抽選をやり直し、同じ内容の履歴を返す。
+
+    `members` は抽選時の参加者を含んでいればよく、順序は履歴の
+    `participant_ids` に揃える。選択肢と定員は履歴の `choices` から復元する。
+    記録どおりに再現できれば戻り値は `history` と等しくなる。
+    """
+
+    draw_seed = history.seed
+    if draw_seed is None:
+        raise ValueError("乱数の種が記録されていない履歴は再現できません")
+    if draw_seed.algorithm != DRAW_ALGORITHM_VERSION:
+        raise ValueError(
+            f"抽選手順の版 {draw_seed.algorithm} の履歴は再現できません"
+            f" (現在は {DRAW_ALGORITHM_VERSION})"
+        )
+
+    members_by_id = {member.id: member for member in members}
+    missing = [
+        user_id for user_id in draw_seed.participant_ids if user_id not in members_by_id
+    ]
+    if missing:
+        raise ValueError(f"抽選時の参加者が不足しています: {missing}")
+    participants = [members_by_id[user_id] for user_id in draw_seed.participant_ids]
+
+    template = Template(title=history.template_title, choices=list(history.choices))
+    choice_slots = template.choice_capacities
+    names = [name for name, _ in choice_slots]
+
+    if draw_seed.round_index is not None:
+        pairs = create_schedule_from_list(
+            participants,
+            names,
+            rounds=draw_seed.round_index + 1,
+            seed=draw_seed.value,
+            capacities=(
+                [capacity for _, capacity in choice_slots]
+                if template.has_capacities
+                else None
+            ),
+        )[draw_seed.round_index]
+    else:
+        # 記録した入力をそのまま渡す。既定値だけの表は省略時と同じ配列になる。
+        pairs = create_pair_from_list(
+            participants,
+            names,
+            selection_mode=history.selection_mode,
+            weights=(
+                _expand_overrides(draw_seed.weights, participants, names, default=1.0)
+                if draw_seed.weights
+                else None
+            ),
+            costs=(
+                _expand_overrides(draw_seed.costs, participants, names, default=0.0)
+                if draw_seed.costs
+                else None
+            ),
+            capacities=(
+                [capacity for _, capacity in choice_slots]
+                if template.has_capacities
+                else None
+            ),
+            seed=draw_seed.value,
+        )
+
+    # 表示名は抽選後に変わりうるため、記録済みの名前を優先する。
+    recorded_names = {entry.user_id: entry.user_name for entry in history.entries}
+    entries = [
+        AssignmentEntry(
+            user_id=pair.user.id,
+            user_name=recorded_names.get(
+                pair.user.id, getattr(pair.user, "display_name", "")
+            ),
+            choice=pair.choice,
+        )
+        for pair in pairs.pairs
+    ]
+    return AssignmentHistory(
+        guild_id=history.guild_id,
+        template_title=history.template_title,
+        created_at=history.created_at,
+        entries=entries,
+        choices=list(history.choices),
+        selection_mode=history.selection_mode,
+        history_id=history.history_id,
+        seed=draw_seed,
+    )
 
 
 # TODO: 将来的に、utils.pyで定義されているlolの絵文字を使って、レーンごとに絵文字も併せて表示するように変更する
@@ -164,5 +595,40 @@ def create_embeds_from_pairs(
     return [builder(pair) for pair in pair_list]
 
 
+UNASSIGNED_TEAM_LABEL = "割り当てなし"
+
+
+def create_team_embeds_from_pairs(
+    pairs: PairList,
+    *,
+    members: Sequence[discord.User] = (),
+) -> list[discord.Embed]:
+    """同じ選択肢に複数人が入る結果を、選択肢ごとに 1 件の埋め込みへまとめる。
+
+    `members` を渡すと、定員が埋まってどの選択肢にも入らなかったメンバーを
+    最後に「割り当てなし」としてまとめる。
+    """
+
+    teams: dict[str, list[str]] = {}
+    for pair in pairs.pairs:
+        teams.setdefault(pair.choice, []).append(pair.user.display_name)
+
+    embeds: list[discord.Embed] = []
+    for choice, names in teams.items():
+        embed = discord.Embed()
+        embed.title = f"> {choice} ({len(names)}人)"
+        embed.description = "\n".join(names)
+        embeds.append(embed)
+
+    assigned_ids = {pair.user.id for pair in pairs.pairs}
+    unassigned = [member.display_name for member in members if member.id not in assigned_ids]
+    if unassigned:
+        embed = discord.Embed()
+        embed.title = f"> {UNASSIGNED_TEAM_LABEL} ({len(unassigned)}人)"
+        embed.description = "\n".join(unassigned)
+        embeds.append(embed)
+    return embeds
+
+
 if __name__ == "__main__":
     pass
@@ -3,9 +3,12 @@ from .constants import COLLECTION_SENTINEL_DOCUMENT_ID, REQUIRED_COLLECTIONS
 from .serializers import (
     deserialize_assignment_history,
     deserialize_template,
+    deserialize_user,
     ensure_datetime,
     normalize_template_for_user,
+    serialize_assignment_history,
     serialize_template,
+    serialize_user,
 )
 
 __all__ = [
@@ -13,7 +16,10 @@ __all__ = [
     "REQUIRED_COLLECTIONS",
     "deserialize_assignment_history",
     "deserialize_template",
+    "deserialize_user",
     "ensure_datetime",
     "normalize_template_for_user",
+    "serialize_assignment_history",
     "serialize_template",
+    "serialize_user",
 ]
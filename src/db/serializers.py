@@ -1,16 +1,21 @@
 """Firestoreのドキュメントとアプリ内部モデル間の変換処理。"""
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import replace
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from typing import Any, Mapping
 
 from domain import (
     AssignmentEntry,
     AssignmentHistory,
+    DrawSeed,
+    PairList,
     SelectionMode,
+    StreakAggregate,
     Template,
     TemplateScope,
+    UserInfo,
 )
 from domain.services.selection_mode_service import coerce_selection_mode
 from utils import generate_template_id
@@ -98,8 +103,170 @@ def normalize_template_for_user(template: Template, user_id: int) -> Template:
     )
 
 
+def serialize_user(user: UserInfo) -> dict[str, Any]:
+    """ユーザー情報を `users` ドキュメント形式へ変換する。"""
+
+    least_template = (
+        serialize_template(user.least_template)
+        if user.least_template is not None
+        else None
+    )
+    return {
+        "name": user.name,
+        "id": user.id,
+        "least_template": least_template,
+        "custom_templates": [
+            serialize_template(template) for template in user.custom_templates
+        ],
+    }
+
+
+def deserialize_user(data: Mapping[str, Any]) -> UserInfo:
+    """`users` ドキュメントを共有テンプレートを含まない `UserInfo` に変換する。"""
+
+    least_template = None
+    if data.get("least_template"):
+        least_payload = data["least_template"]
+        if not isinstance(least_payload, Mapping):
+            raise ValueError("Invalid template data")
+        least_template = deserialize_template(least_payload)
+
+    custom_templates: list[Template] = []
+    for template_data in data.get("custom_templates") or []:
+        if not isinstance(template_data, Mapping):
+            raise ValueError("Invalid template data")
+        custom_templates.append(deserialize_template(template_data))
+
+    user_info = UserInfo(
+        id=data["id"],
+        name=data["name"],
+        least_template=least_template,
+        custom_templates=custom_templates,
+    )
+
+    if data["id"] is None or data["name"] is None:
+        raise ValueError("Invalid user data")
+
+    return user_info
+
+
+def serialize_assignment_history(
+    *,
+    guild_id: int,
+    template: Template,
+    pairs: PairList,
+    selection_mode: SelectionMode | str,
+    created_at: datetime,
+) -> dict[str, Any]:
+    """抽選結果を `history` ドキュメント形式へ変換する。"""
+
+    entries = [
+        {
+            "user_id": pair.user.id,
+            "user_name": getattr(pair.user, "display_name", pair.user.name),
+            "choice": pair.choice,
+        }
+        for pair in pairs.pairs
+    ]
+    data: dict[str, Any] = {
+        "guild_id": guild_id,
+        "template_title": template.title,
+        "choices": list(template.choices),
+        "selection_mode": coerce_selection_mode(selection_mode).value,
+        "created_at": created_at,
+        "entries": entries,
+    }
+    if pairs.seed is not None:
+        data.update(serialize_draw_seed(pairs.seed))
+    return data
+
+
+def serialize_draw_seed(seed: DrawSeed) -> dict[str, Any]:
+    """抽選の種を `history` ドキュメントに埋め込むフィールドへ変換する。
+
+    重みとコストは既定値と異なるセルだけを、ユーザー ID を文字列キーにして保存する。
+    """
+
+    data: dict[str, Any] = {
+        "seed": seed.value,
+        "seed_algorithm": seed.algorithm,
+        "participant_ids": list(seed.participant_ids),
+    }
+    if seed.round_index is not None:
+        data["round_index"] = seed.round_index
+    if seed.weights:
+        data["seed_weights"] = _serialize_user_table(seed.weights)
+    if seed.costs:
+        data["seed_costs"] = _serialize_user_table(seed.costs)
+    return data
+
+
+def _serialize_user_table(
+    table: Mapping[int, Mapping[str, float]],
+) -> dict[str, dict[str, float]]:
+    return {str(user_id): dict(values) for user_id, values in table.items()}
+
+
+def _deserialize_user_table(data: Any) -> dict[int, dict[str, float]]:
+    table: dict[int, dict[str, float]] = {}
+    for user_id, values in (data or {}).items():
+        if not isinstance(values, Mapping):
+            raise ValueError("Invalid seed table data")
+        table[int(user_id)] = {
+            str(choice): float(value) for choice, value in values.items()
+        }
+    return table
+
+
+def deserialize_draw_seed(data: Mapping[str, Any]) -> DrawSeed | None:
+    """`history` ドキュメントから抽選の種を取り出す。記録が無ければ `None`。"""
+
+    if data.get("seed") is None:
+        return None
+    round_index = data.get("round_index")
+    return DrawSeed(
+        value=int(data["seed"]),
+        participant_ids=tuple(int(user_id) for user_id in data.get("participant_ids", [])),
+        round_index=int(round_index) if round_index is not None else None,
+        weights=_deserialize_user_table(data.get("seed_weights")),
+        costs=_deserialize_user_table(data.get("seed_costs")),
+        algorithm=int(data.get("seed_algorithm", 1)),
+    )
+
+
+def serialize_history_rounds(
+    *,
+    guild_id: int,
+    template: Template,
+    rounds: Sequence[PairList],
+    selection_mode: SelectionMode | str,
+    started_at: datetime,
+) -> list[dict[str, Any]]:
+    """複数ラウンドの抽選結果を、ラウンド順の `history` ドキュメントへ変換する。
+
+    作成日時を 1 マイクロ秒ずつずらし、履歴一覧や連続担当の集計でもラウンドの
+    順序が保たれるようにする。
+    """
+
+    return [
+        serialize_assignment_history(
+            guild_id=guild_id,
+            template=template,
+            pairs=pairs,
+            selection_mode=selection_mode,
+            created_at=started_at + timedelta(microseconds=index),
+        )
+        for index, pairs in enumerate(rounds)
+    ]
+
+
 def deserialize_assignment_history(data: Mapping[str, Any]) -> AssignmentHistory:
-    """Firestoreの履歴ドキュメントを `AssignmentHistory` に変換する。"""
+    """Firestoreの履歴ドキュメントを `AssignmentHistory` に変換する。
+
+    `select` で射影したドキュメントも受け付け、読み込まなかったフィールドは
+    既定値 (`choices` は空、`selection_mode` は RANDOM、`entries` は空、`seed` は
+    `None`) とする。
+    """
 
     selection_mode_value = data.get("selection_mode", SelectionMode.RANDOM.value)
     selection_mode = coerce_selection_mode(selection_mode_value)
@@ -109,7 +276,7 @@ def deserialize_assignment_history(data: Mapping[str, Any]) -> AssignmentHistory
     if created_at is None:
         raise ValueError("Invalid history timestamp")
 
-    entries_raw = data.get("entries")
+    entries_raw = data.get("entries", [])
     if not isinstance(entries_raw, list):
         raise ValueError("Invalid history entries")
 
@@ -130,6 +297,69 @@ def deserialize_assignment_history(data: Mapping[str, Any]) -> AssignmentHistory
         entries=entries,
         choices=list(data.get("choices", [])),
         selection_mode=selection_mode,
+        history_id=data.get("history_id"),
+        seed=deserialize_draw_seed(data),
+    )
+
+
+def serialize_streak_aggregate(aggregate: StreakAggregate) -> dict[str, Any]:
+    """連続担当の集計を `history_streaks` ドキュメント形式へ変換する。
+
+    Firestore のマップキーは文字列のみのため、ユーザー ID は文字列で保存する。
+    """
+
+    return {
+        "guild_id": aggregate.guild_id,
+        "template_title": aggregate.template_title,
+        "updated_at": aggregate.updated_at,
+        "draw_count": aggregate.draw_count,
+        "streaks": {
+            str(user_id): {
+                "choice": choice,
+                "count": count,
+                "draw": aggregate.last_drawn.get(user_id, aggregate.draw_count),
+            }
+            for user_id, (choice, count) in aggregate.streaks.items()
+        },
+        "frequencies": {
+            str(user_id): dict(counts)
+            for user_id, counts in aggregate.frequencies.items()
+        },
+    }
+
+
+def deserialize_streak_aggregate(data: Mapping[str, Any]) -> StreakAggregate:
+    """`history_streaks` ドキュメントを `StreakAggregate` に変換する。
+
+    抽選の通し番号を持たない古いドキュメントは、全員が直前の抽選で担当した
+    ものとして扱う。
+    """
+
+    draw_count = int(data.get("draw_count", 0))
+    streaks: dict[int, tuple[str, int]] = {}
+    last_drawn: dict[int, int] = {}
+    for user_id, streak in (data.get("streaks") or {}).items():
+        if not isinstance(streak, Mapping):
+            raise ValueError("Invalid streak data")
+        streaks[int(user_id)] = (str(streak["choice"]), int(streak["count"]))
+        last_drawn[int(user_id)] = int(streak.get("draw", draw_count))
+
+    frequencies: dict[int, dict[str, int]] = {}
+    for user_id, counts in (data.get("frequencies") or {}).items():
+        if not isinstance(counts, Mapping):
+            raise ValueError("Invalid frequency data")
+        frequencies[int(user_id)] = {
+            str(choice): int(count) for choice, count in counts.items()
+        }
+
+    return StreakAggregate(
+        guild_id=data["guild_id"],
+        template_title=data["template_title"],
+        streaks=streaks,
+        frequencies=frequencies,
+        updated_at=ensure_datetime(data.get("updated_at")),
+        draw_count=draw_count,
+        last_drawn=last_drawn,
     )
 
 
@@ -138,5 +368,13 @@ __all__ = [
     "serialize_template",
     "deserialize_template",
     "normalize_template_for_user",
+    "serialize_user",
+    "deserialize_user",
+    "serialize_assignment_history",
+    "serialize_history_rounds",
     "deserialize_assignment_history",
+    "serialize_draw_seed",
+    "deserialize_draw_seed",
+    "serialize_streak_aggregate",
+    "deserialize_streak_aggregate",
 ]
@@ -1,19 +1,36 @@
 """ドメイン層の公開インタフェース。"""
 
-from .entities.history import AssignmentEntry, AssignmentHistory, SelectionMode
+from .entities.draw import DrawContext
+from .entities.history import (
+    HISTORY_LIST_FIELDS,
+    HISTORY_STREAK_FIELDS,
+    AssignmentEntry,
+    AssignmentHistory,
+    DrawSeed,
+    HistoryPage,
+    SelectionMode,
+    StreakAggregate,
+)
 from .entities.pair import Pair, PairList
-from .entities.template import Template, TemplateScope
+from .entities.template import Template, TemplatePage, TemplateScope
 from .entities.user import UserInfo
 from .value_objects import ResultEmbedMode
 
 __all__ = [
     "AssignmentEntry",
     "AssignmentHistory",
+    "DrawContext",
+    "DrawSeed",
+    "HISTORY_LIST_FIELDS",
+    "HISTORY_STREAK_FIELDS",
+    "HistoryPage",
     "Pair",
     "PairList",
     "ResultEmbedMode",
     "SelectionMode",
+    "StreakAggregate",
     "Template",
+    "TemplatePage",
     "TemplateScope",
     "UserInfo",
 ]
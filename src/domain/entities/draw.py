@@ -0,0 +1,27 @@
+"""抽選の開始時に読み込む設定群のエンティティ。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from ..value_objects import ResultEmbedMode
+from .history import SelectionMode
+from .template import Template
+from .user import UserInfo
+
+
+@dataclass(slots=True)
+class DrawContext:
+    """抽選に必要なユーザー情報と全体設定をまとめたもの。
+
+    `user` には共有テンプレートを含めない。ユーザーが未登録の場合は `None`。
+    """
+
+    guild_id: int | None
+    user: UserInfo | None
+    selection_mode: SelectionMode
+    embed_mode: ResultEmbedMode
+    default_templates: list[Template] = field(default_factory=list)
+
+
+__all__ = ["DrawContext"]
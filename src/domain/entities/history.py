@@ -12,6 +12,10 @@ class SelectionMode(Enum):
 
     RANDOM = "random"
     BIAS_REDUCTION = "bias_reduction"
+    # 偏り軽減と同じ重みを、指数キーによる抽出で割り当てる。
+    EXPONENTIAL_KEYS = "exponential_keys"
+    # 通算の担当回数と連続担当からコストを組み、総コスト最小の割当を求める。
+    OPTIMAL_FAIRNESS = "optimal_fairness"
 
 
 @dataclass(slots=True)
@@ -23,6 +27,24 @@ class AssignmentEntry:
     choice: str
 
 
+@dataclass(frozen=True, slots=True)
+class DrawSeed:
+    """抽選を再現するために履歴へ残す乱数の種と入力。
+
+    `participant_ids` は抽選に渡したメンバーの順序、`round_index` は複数ラウンド
+    抽選の何ラウンド目か (単発の抽選では `None`)。`weights` / `costs` には
+    既定値 (重み 1 / コスト 0) と異なる値だけを保持する。`algorithm` は抽選
+    手順の版で、手順が変わった後の再現を拒否するために使う。
+    """
+
+    value: int
+    participant_ids: tuple[int, ...]
+    round_index: int | None = None
+    weights: dict[int, dict[str, float]] = field(default_factory=dict)
+    costs: dict[int, dict[str, float]] = field(default_factory=dict)
+    algorithm: int = 1
+
+
 @dataclass(slots=True)
 class AssignmentHistory:
     """割当結果の履歴。"""
@@ -33,6 +55,62 @@ class AssignmentHistory:
     entries: list[AssignmentEntry]
     choices: list[str] = field(default_factory=list)
     selection_mode: SelectionMode = SelectionMode.RANDOM
+    history_id: str | None = None
+    seed: DrawSeed | None = None
+
+
+# 履歴クエリで読み込むフィールドの組。`choices` など表示に使わない配列を省く。
+# 一覧表示に必要なフィールド。
+HISTORY_LIST_FIELDS: tuple[str, ...] = (
+    "guild_id",
+    "template_title",
+    "created_at",
+    "selection_mode",
+    "entries",
+)
+# 連続担当の集計に必要なフィールド。
+HISTORY_STREAK_FIELDS: tuple[str, ...] = (
+    "guild_id",
+    "template_title",
+    "created_at",
+    "entries",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryPage:
+    """抽選履歴の 1 ページ分。`next_cursor` が `None` なら最終ページ。"""
+
+    histories: list[AssignmentHistory]
+    next_cursor: str | None = None
+
+
+@dataclass(slots=True)
+class StreakAggregate:
+    """ギルド・テンプレート単位で逐次更新される担当状況の集計。
+
+    `streaks` はユーザーごとの直近の担当と連続回数、`frequencies` は
+    選択肢ごとの通算担当回数を保持する。`draw_count` は反映した抽選の回数、
+    `last_drawn` はユーザーが最後に担当した抽選の通し番号で、直近の抽選に
+    出ていないユーザーの連続担当を取り除くために使う。
+    """
+
+    guild_id: int
+    template_title: str
+    streaks: dict[int, tuple[str, int]] = field(default_factory=dict)
+    frequencies: dict[int, dict[str, int]] = field(default_factory=dict)
+    updated_at: datetime | None = None
+    draw_count: int = 0
+    last_drawn: dict[int, int] = field(default_factory=dict)
 
 
-__all__ = ["AssignmentEntry", "AssignmentHistory", "SelectionMode"]
+__all__ = [
+    "AssignmentEntry",
+    "AssignmentHistory",
+    "DrawSeed",
+    "HISTORY_LIST_FIELDS",
+    "HISTORY_STREAK_FIELDS",
+    "HistoryPage",
+    "SelectionMode",
+    "StreakAggregate",
+]
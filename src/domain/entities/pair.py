@@ -6,6 +6,8 @@ from dataclasses import dataclass
 
 import discord
 
+from .history import DrawSeed
+
 
 @dataclass(slots=True)
 class Pair:
@@ -17,9 +19,10 @@ class Pair:
 
 @dataclass(slots=True)
 class PairList:
-    """ペアのコレクション。"""
+    """ペアのコレクション。`seed` は抽選を再現するための種 (手動で組んだ場合は `None`)。"""
 
     pairs: list[Pair]
+    seed: DrawSeed | None = None
 
 
 __all__ = ["Pair", "PairList"]
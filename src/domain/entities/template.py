@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
 from utils import generate_template_id
 
+# 選択肢の末尾に `×5` (空白の後なら `x5`, `*5` も可) と書くと、その選択肢の定員になる。
+_CAPACITY_PATTERN = re.compile(
+    r"^(?P<name>.*\S)(?:\s*×|\s+[xX*])\s*(?P<capacity>\d+)$"
+)
+MAX_CHOICE_CAPACITY = 100
+
 
 class TemplateScope(Enum):
     """テンプレートの共有範囲を示す列挙体。"""
@@ -29,5 +36,45 @@ class Template:
     template_id: str = field(default_factory=generate_template_id)
     updated_at: datetime | None = None
 
+    @property
+    def choice_capacities(self) -> list[tuple[str, int]]:
+        """選択肢ごとの `(名前, 定員)`。定員の指定が無い選択肢は 1 人。"""
+
+        return [parse_choice_capacity(choice) for choice in self.choices]
+
+    @property
+    def has_capacities(self) -> bool:
+        return any(capacity > 1 for _, capacity in self.choice_capacities)
+
+
+@dataclass(frozen=True, slots=True)
+class TemplatePage:
+    """テンプレート一覧の 1 ページ分。`next_cursor` が `None` なら最終ページ。"""
+
+    templates: list[Template]
+    next_cursor: str | None = None
+
+
+def parse_choice_capacity(choice: str) -> tuple[str, int]:
+    """`"Team A ×5"` のような選択肢の表記を名前と定員に分ける。
+
+    定員は 1 以上 `MAX_CHOICE_CAPACITY` 以下のみ受け付け、それ以外は表記全体を
+    名前として定員 1 を返す。
+    """
+
+    match = _CAPACITY_PATTERN.match(choice.strip())
+    if match is None:
+        return choice, 1
+    capacity = int(match.group("capacity"))
+    if not 1 <= capacity <= MAX_CHOICE_CAPACITY:
+        return choice, 1
+    return match.group("name"), capacity
+
 
-__all__ = ["Template", "TemplateScope"]
+__all__ = [
+    "MAX_CHOICE_CAPACITY",
+    "Template",
+    "TemplatePage",
+    "TemplateScope",
+    "parse_choice_capacity",
+]
@@ -1,15 +1,19 @@
 """ドメイン層で利用するリポジトリインタフェース。"""
 from __future__ import annotations
 
+from collections.abc import Sequence
 from datetime import datetime
 from typing import Protocol
 
 from .. import (
     AssignmentHistory,
+    DrawContext,
     PairList,
     ResultEmbedMode,
     SelectionMode,
+    StreakAggregate,
     Template,
+    TemplatePage,
     TemplateScope,
     UserInfo,
 )
@@ -18,7 +22,7 @@ from .. import (
 class TemplateRepository(Protocol):
     """テンプレートおよびユーザーデータを扱うリポジトリ。"""
 
-    def ensure_required_collections(self) -> None:
+    def ensure_required_collections(self, *, force: bool = False) -> list[str]:
         ...
 
     def ensure_default_templates(self) -> list[Template]:
@@ -66,6 +70,16 @@ class TemplateRepository(Protocol):
     ) -> None:
         ...
 
+    def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        ...
+
     def get_recent_history(
         self,
         *,
@@ -73,9 +87,16 @@ class TemplateRepository(Protocol):
         template_title: str | None = None,
         limit: int = 10,
         since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
     ) -> list[AssignmentHistory]:
         ...
 
+    def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        ...
+
     def init_user(self, user_id: int, name: str) -> None:
         ...
 
@@ -88,15 +109,31 @@ class TemplateRepository(Protocol):
         *,
         guild_id: int | None = None,
         include_shared: bool = True,
+        include_templates: bool = True,
     ) -> UserInfo | None:
         ...
 
+    def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        ...
+
     def delete_user(self, user_id: int) -> None:
         ...
 
     def user_is_exist(self, user_id: int) -> bool:
         ...
 
+    def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        ...
+
+    def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        ...
+
     def add_custom_template(self, user_id: int, template: Template) -> None:
         ...
 
@@ -125,4 +162,144 @@ class TemplateRepository(Protocol):
         ...
 
 
-__all__ = ["TemplateRepository"]
+class AsyncTemplateRepository(Protocol):
+    """`TemplateRepository` と同じ操作をコルーチンとして提供するリポジトリ。"""
+
+    async def ensure_default_templates(self) -> list[Template]:
+        ...
+
+    async def get_default_templates(self) -> list[Template]:
+        ...
+
+    async def list_shared_templates(
+        self,
+        *,
+        scope: TemplateScope | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Template]:
+        ...
+
+    async def get_shared_templates_for_user(
+        self, *, guild_id: int | None
+    ) -> tuple[list[Template], list[Template]]:
+        ...
+
+    async def toggle_embed_mode(self) -> None:
+        ...
+
+    async def get_embed_mode(self) -> str:
+        ...
+
+    async def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
+        ...
+
+    async def set_selection_mode(self, mode: SelectionMode | str) -> None:
+        ...
+
+    async def get_selection_mode(self) -> str:
+        ...
+
+    async def save_history(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        pairs: PairList,
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        ...
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        ...
+
+    async def get_recent_history(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> list[AssignmentHistory]:
+        ...
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        ...
+
+    async def init_user(self, user_id: int, name: str) -> None:
+        ...
+
+    async def set_user(self, user: UserInfo) -> None:
+        ...
+
+    async def get_user(
+        self,
+        user_id: int,
+        *,
+        guild_id: int | None = None,
+        include_shared: bool = True,
+        include_templates: bool = True,
+    ) -> UserInfo | None:
+        ...
+
+    async def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        ...
+
+    async def delete_user(self, user_id: int) -> None:
+        ...
+
+    async def user_is_exist(self, user_id: int) -> bool:
+        ...
+
+    async def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        ...
+
+    async def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        ...
+
+    async def add_custom_template(self, user_id: int, template: Template) -> None:
+        ...
+
+    async def update_custom_template(self, user_id: int, template: Template) -> None:
+        ...
+
+    async def delete_custom_template(
+        self,
+        user_id: int,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        ...
+
+    async def set_least_template(self, user_id: int, template: Template) -> None:
+        ...
+
+    async def create_shared_template(self, template: Template) -> Template:
+        ...
+
+    async def delete_shared_template(self, template_id: str) -> None:
+        ...
+
+    async def copy_shared_template_to_user(self, user_id: int, template: Template) -> Template:
+        ...
+
+
+__all__ = ["AsyncTemplateRepository", "TemplateRepository"]
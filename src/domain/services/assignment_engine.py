@@ -0,0 +1,274 @@
+"""重み付き割当を NumPy 配列上で行うドメインサービス。
+
+ユーザー × 選択肢の重みを密な行列として保持し、選択済みのユーザーは除外する。
+どちらの抽出方式も選択肢ごとに数回のベクトル演算しか行わないため、Python
+レベルのループは選択肢の数だけで済む。
+
+- `draw_weighted_assignment`: 0/1 マスク・累積和・二分探索による逐次抽出。
+- `draw_exponential_key_assignment`: Efraimidis–Spirakis の指数キーを全セルに
+  一度に振り、列ごとに未選択ユーザーの最小キーを取る。
+
+コスト行列の総和を最小にする割当は `solve_min_cost_assignment` で求める。
+選択肢に定員がある場合は `allocate_capacity_quotas` で各選択肢の人数を決め、
+`draw_capacity_assignment` でユーザーを振り分ける。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def draw_weighted_assignment(
+    weights: np.ndarray,
+    *,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """列の順に担当ユーザーを 1 人ずつ非復元抽出し、行番号を返す。
+
+    各列では未選択ユーザーの重みに比例した確率で 1 人を選ぶ。未選択ユーザーの
+    重みが全て 0 の列は、未選択ユーザーから一様に選ぶ。`random.choices` と
+    `list.remove` を列ごとに繰り返す従来の実装と同じ分布になる。
+
+    戻り値の長さは `min(行数, 列数)` で、`result[j]` が列 `j` の担当行。
+    """
+
+    matrix = _validate_weights(weights)
+    generator = rng if rng is not None else np.random.default_rng()
+    user_count, choice_count = matrix.shape
+    steps = min(user_count, choice_count)
+
+    # 列ごとに連続した領域を読むよう、転置したコピーを作っておく。
+    columns = np.ascontiguousarray(matrix[:, :steps].T)
+    available = np.ones(user_count, dtype=np.float64)
+    masked = np.empty(user_count, dtype=np.float64)
+    cumulative = np.empty(user_count, dtype=np.float64)
+    assigned = np.empty(steps, dtype=np.intp)
+    uniforms = generator.random(steps)
+
+    for column in range(steps):
+        np.multiply(columns[column], available, out=masked)
+        np.cumsum(masked, out=cumulative)
+        total = cumulative[-1]
+        if total <= 0:
+            np.cumsum(available, out=cumulative)
+            total = cumulative[-1]
+        # 末尾を除いて探索するのは random.choices の bisect(hi=n-1) と同じ扱い。
+        index = int(
+            cumulative[:-1].searchsorted(uniforms[column] * total, side="right")
+        )
+        assigned[column] = index
+        available[index] = 0.0
+
+    return assigned
+
+
+def draw_exponential_key_assignment(
+    weights: np.ndarray,
+    *,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """指数キー (Efraimidis–Spirakis) で列ごとの担当ユーザーを選び、行番号を返す。
+
+    セル `(i, j)` に `E / w[i, j]` (`E` は標準指数分布) のキーを振ると、列 `j` で
+    キーが最小になるのは重み比例の確率で選ばれたユーザーになる。キーは全セル
+    独立なので、選択済みユーザーを除いた最小キーを取れば
+    `draw_weighted_assignment` と同じ分布になる。戻り値の形式も同じ。
+    """
+
+    matrix = _validate_weights(weights)
+    generator = rng if rng is not None else np.random.default_rng()
+    user_count, choice_count = matrix.shape
+    steps = min(user_count, choice_count)
+
+    # keys[j, i] が列 j におけるユーザー i のキー。重み 0 のセルは無限大になる。
+    keys = generator.standard_exponential((steps, user_count))
+    with np.errstate(divide="ignore"):
+        np.divide(keys, matrix[:, :steps].T, out=keys)
+    # 選択済みユーザーのキーに足して除外するためのペナルティ。
+    penalty = np.zeros(user_count, dtype=np.float64)
+    candidates = np.empty(user_count, dtype=np.float64)
+    assigned = np.empty(steps, dtype=np.intp)
+
+    for column in range(steps):
+        np.add(keys[column], penalty, out=candidates)
+        index = int(candidates.argmin())
+        if not np.isfinite(candidates[index]):
+            # 未選択ユーザーの重みが全て 0 なら一様に選ぶ。
+            remaining = np.flatnonzero(penalty == 0)
+            index = int(remaining[generator.integers(remaining.size)])
+        assigned[column] = index
+        penalty[index] = np.inf
+
+    return assigned
+
+
+def solve_min_cost_assignment(
+    costs: np.ndarray,
+    *,
+    rng: np.random.Generator | None = None,
+    jitter: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """コストの総和が最小になる行と列の組を求め、`(行番号, 列番号)` を返す。
+
+    Jonker–Volgenant と同じく、行を 1 つずつ追加しながら双対変数で縮約した
+    コスト上の最短増加路を探す。1 回の探索は列方向のベクトル演算で行うため、
+    全体で O(n²m) の計算量になる。長方形の行列では `min(行数, 列数)` 組を返し、
+    結果は列番号の昇順に並ぶ。
+
+    `jitter` が正なら `[0, jitter)` の一様乱数を各セルに足してから解く。
+    コストが同じ候補の間では、どの割当が選ばれるかが乱数で決まる。
+    """
+
+    matrix = np.asarray(costs, dtype=np.float64)
+    if matrix.ndim != 2:
+        raise ValueError("コスト行列は 2 次元である必要があります")
+    if not np.all(np.isfinite(matrix)):
+        raise ValueError("コストは有限値である必要があります")
+    if jitter > 0:
+        generator = rng if rng is not None else np.random.default_rng()
+        matrix = matrix + generator.random(matrix.shape) * jitter
+
+    # 行数が列数以下になるよう向きを揃え、行ごとに増加路を探す。
+    transposed = matrix.shape[0] > matrix.shape[1]
+    if transposed:
+        matrix = matrix.T
+    row_count, column_count = matrix.shape
+
+    row_potential = np.zeros(row_count, dtype=np.float64)
+    column_potential = np.zeros(column_count, dtype=np.float64)
+    row_of_column = np.full(column_count, -1, dtype=np.intp)
+    column_of_row = np.full(row_count, -1, dtype=np.intp)
+    shortest = np.empty(column_count, dtype=np.float64)
+    predecessor = np.empty(column_count, dtype=np.intp)
+    scanned = np.empty(column_count, dtype=bool)
+    reduced = np.empty(column_count, dtype=np.float64)
+
+    for start in range(row_count):
+        shortest.fill(np.inf)
+        scanned.fill(False)
+        visited_rows = [start]
+        row = start
+        distance = 0.0
+        while True:
+            # 現在の行から未確定の列への距離を縮約コストで更新する。
+            np.subtract(matrix[row], column_potential, out=reduced)
+            reduced += distance - row_potential[row]
+            improved = (reduced < shortest) & ~scanned
+            shortest[improved] = reduced[improved]
+            predecessor[improved] = row
+            candidates = np.where(scanned, np.inf, shortest)
+            column = int(candidates.argmin())
+            distance = float(candidates[column])
+            scanned[column] = True
+            if row_of_column[column] < 0:
+                break
+            row = int(row_of_column[column])
+            visited_rows.append(row)
+
+        # 縮約コストが負にならないよう双対変数を更新する。
+        row_potential[start] += distance
+        matched_rows = np.array(visited_rows[1:], dtype=np.intp)
+        row_potential[matched_rows] += distance - shortest[column_of_row[matched_rows]]
+        column_potential[scanned] -= distance - shortest[scanned]
+
+        # 見つけた増加路に沿って割当を入れ替える。
+        while True:
+            row = int(predecessor[column])
+            row_of_column[column] = row
+            column, column_of_row[row] = int(column_of_row[row]), column
+            if row == start:
+                break
+
+    if transposed:
+        # 元の行列では行と列が入れ替わる。列番号の昇順はそのまま保たれる。
+        return column_of_row, np.arange(row_count, dtype=np.intp)
+    columns = np.flatnonzero(row_of_column >= 0)
+    return row_of_column[columns], columns
+
+
+def allocate_capacity_quotas(capacities: np.ndarray, participants: int) -> np.ndarray:
+    """参加者を定員に比例して配分したときの、選択肢ごとの人数を返す。
+
+    参加者が定員の合計以上なら定員どおり。足りない場合は最大剰余法で定員に
+    比例した人数にし、どの選択肢も定員を超えないようにする。
+    """
+
+    limits = np.asarray(capacities, dtype=np.intp)
+    if limits.ndim != 1 or np.any(limits < 0):
+        raise ValueError("定員は 0 以上の 1 次元配列である必要があります")
+    total = int(limits.sum())
+    seats = min(max(participants, 0), total)
+    if seats == total:
+        return limits.copy()
+
+    exact = limits * (seats / total)
+    quotas = np.floor(exact).astype(np.intp)
+    shortage = seats - int(quotas.sum())
+    if shortage > 0:
+        # 端数の大きい順に 1 人ずつ足す。同じ端数なら先の選択肢を優先する。
+        order = np.argsort(-(exact - quotas), kind="stable")
+        quotas[order[:shortage]] += 1
+    return quotas
+
+
+def draw_capacity_assignment(
+    weights: np.ndarray,
+    quotas: np.ndarray,
+    *,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """ユーザーを定員付きの選択肢へ振り分け、ユーザーごとの列番号を返す。
+
+    ユーザーを乱数順に 1 人ずつ処理し、`重み × 残りの人数` に比例した確率で
+    選択肢を選ぶ。重みが全て 1 なら席をランダムに配るのと同じ分布になり、
+    各選択肢の人数は必ず `quotas` と一致する。未選択ユーザーの重みが全て 0 の
+    選択肢しか残っていない場合は残りの人数に比例して選ぶ。処理はユーザー
+    1 人あたり選択肢数の長さのベクトル演算だけなので、人数に対して線形。
+
+    席が足りずに割り当てられなかったユーザーは `-1` になる。
+    """
+
+    matrix = _validate_weights(weights)
+    user_count, choice_count = matrix.shape
+    remaining = np.asarray(quotas, dtype=np.float64).copy()
+    if remaining.shape != (choice_count,) or np.any(remaining < 0):
+        raise ValueError("定員は選択肢の数と同じ長さの 0 以上の配列である必要があります")
+    generator = rng if rng is not None else np.random.default_rng()
+
+    seats = int(remaining.sum())
+    assigned = np.full(user_count, -1, dtype=np.intp)
+    order = generator.permutation(user_count)[:seats]
+    uniforms = generator.random(order.size)
+    scores = np.empty(choice_count, dtype=np.float64)
+    cumulative = np.empty(choice_count, dtype=np.float64)
+
+    for step, user in enumerate(order):
+        np.multiply(matrix[user], remaining, out=scores)
+        np.cumsum(scores, out=cumulative)
+        total = cumulative[-1]
+        if total <= 0:
+            np.cumsum(remaining, out=cumulative)
+            total = cumulative[-1]
+        index = int(cumulative[:-1].searchsorted(uniforms[step] * total, side="right"))
+        assigned[user] = index
+        remaining[index] -= 1
+
+    return assigned
+
+
+def _validate_weights(weights: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(weights, dtype=np.float64)
+    if matrix.ndim != 2:
+        raise ValueError("重み行列は 2 次元である必要があります")
+    if not np.all((matrix >= 0) & np.isfinite(matrix)):
+        raise ValueError("重みは 0 以上の有限値である必要があります")
+    return matrix
+
+
+__all__ = [
+    "allocate_capacity_quotas",
+    "draw_capacity_assignment",
+    "draw_exponential_key_assignment",
+    "draw_weighted_assignment",
+    "solve_min_cost_assignment",
+]
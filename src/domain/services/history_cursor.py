@@ -0,0 +1,49 @@
+"""抽選履歴のページングカーソルに関するドメインサービス。"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime
+
+from ..entities.history import AssignmentHistory, HistoryPage
+
+_CURSOR_SEPARATOR = "|"
+
+
+def encode_history_cursor(history: AssignmentHistory) -> str:
+    """履歴の `created_at` とドキュメント ID からカーソル文字列を作る。"""
+
+    return (
+        f"{history.created_at.isoformat()}{_CURSOR_SEPARATOR}{history.history_id or ''}"
+    )
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, str]:
+    """カーソル文字列を `(created_at, history_id)` に戻す。
+
+    書き込み待ちの履歴から作ったカーソルは ID が空文字になる。
+    """
+
+    created_at_text, separator, history_id = cursor.partition(_CURSOR_SEPARATOR)
+    try:
+        created_at = datetime.fromisoformat(created_at_text)
+    except ValueError as exc:
+        raise ValueError("Invalid history cursor") from exc
+    if not separator:
+        raise ValueError("Invalid history cursor")
+    return created_at, history_id
+
+
+def build_history_page(
+    histories: Sequence[AssignmentHistory], *, limit: int
+) -> HistoryPage:
+    """`limit + 1` 件取得した履歴からページを組み立てる。"""
+
+    page = list(histories[:limit])
+    next_cursor = None
+    if len(histories) > limit and page:
+        next_cursor = encode_history_cursor(page[-1])
+    return HistoryPage(histories=page, next_cursor=next_cursor)
+
+
+__all__ = ["build_history_page", "decode_history_cursor", "encode_history_cursor"]
@@ -4,6 +4,15 @@ from __future__ import annotations
 
 from ..entities.history import SelectionMode
 
+# 直近の連続担当から重みを組み立てて割り当てるモード。
+STREAK_WEIGHTED_MODES = frozenset(
+    {SelectionMode.BIAS_REDUCTION, SelectionMode.EXPONENTIAL_KEYS}
+)
+
+
+# 担当履歴からコスト行列を組み立てて割り当てるモード。
+FAIRNESS_COST_MODES = frozenset({SelectionMode.OPTIMAL_FAIRNESS})
+
 
 def coerce_selection_mode(value: SelectionMode | str) -> SelectionMode:
     """入力値を `SelectionMode` に正規化する。"""
@@ -17,4 +26,22 @@ def coerce_selection_mode(value: SelectionMode | str) -> SelectionMode:
         raise ValueError("Invalid selection mode") from exc
 
 
-__all__ = ["coerce_selection_mode"]
+def uses_streak_weights(value: SelectionMode | str) -> bool:
+    """連続担当に応じた重みを使うモードかどうかを返す。"""
+
+    return coerce_selection_mode(value) in STREAK_WEIGHTED_MODES
+
+
+def uses_fairness_costs(value: SelectionMode | str) -> bool:
+    """担当履歴に応じたコストを使うモードかどうかを返す。"""
+
+    return coerce_selection_mode(value) in FAIRNESS_COST_MODES
+
+
+__all__ = [
+    "FAIRNESS_COST_MODES",
+    "STREAK_WEIGHTED_MODES",
+    "coerce_selection_mode",
+    "uses_fairness_costs",
+    "uses_streak_weights",
+]
@@ -0,0 +1,64 @@
+"""連続担当の集計に関するドメインサービス。"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from ..entities.history import AssignmentHistory, StreakAggregate
+
+# 連続担当を数える直近の抽選回数。集計導入前に遡っていた履歴の件数と同じ。
+STREAK_LOOKBACK = 10
+
+
+def apply_assignments(
+    aggregate: StreakAggregate,
+    assignments: Iterable[tuple[int, str]],
+    *,
+    lookback: int = STREAK_LOOKBACK,
+) -> StreakAggregate:
+    """1 回分の割当 `(user_id, choice)` を集計へ反映する。
+
+    連続回数は `lookback` で頭打ちにし、直近 `lookback` 回の抽選で担当の無い
+    ユーザーの連続担当は取り除く。直近 `lookback` 件の履歴から数え直した値と
+    一致する (途中で抽選を休んだユーザーは多めに数えることがある)。
+    """
+
+    aggregate.draw_count += 1
+    draw = aggregate.draw_count
+    for user_id, choice in assignments:
+        last_choice, count = aggregate.streaks.get(user_id, (None, 0))
+        count = count + 1 if choice == last_choice else 1
+        aggregate.streaks[user_id] = (choice, min(count, lookback))
+        aggregate.last_drawn[user_id] = draw
+        frequencies = aggregate.frequencies.setdefault(user_id, {})
+        frequencies[choice] = frequencies.get(choice, 0) + 1
+
+    expired = [
+        user_id
+        for user_id in aggregate.streaks
+        if draw - aggregate.last_drawn.get(user_id, draw) >= lookback
+    ]
+    for user_id in expired:
+        del aggregate.streaks[user_id]
+        aggregate.last_drawn.pop(user_id, None)
+    return aggregate
+
+
+def build_streak_aggregate(
+    histories: Iterable[AssignmentHistory],
+    *,
+    guild_id: int,
+    template_title: str,
+) -> StreakAggregate:
+    """履歴を古い順に適用して集計を組み立てる。"""
+
+    aggregate = StreakAggregate(guild_id=guild_id, template_title=template_title)
+    for history in sorted(histories, key=lambda item: item.created_at):
+        apply_assignments(
+            aggregate, ((entry.user_id, entry.choice) for entry in history.entries)
+        )
+        aggregate.updated_at = history.created_at
+    return aggregate
+
+
+__all__ = ["STREAK_LOOKBACK", "apply_assignments", "build_streak_aggregate"]
@@ -7,31 +7,57 @@ from typing import Any
 import discord
 
 import data_process
-from domain import AssignmentHistory, PairList, SelectionMode, Template
+from domain import (
+    HISTORY_STREAK_FIELDS,
+    AssignmentHistory,
+    PairList,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+)
+from domain.services.selection_mode_service import (
+    uses_fairness_costs,
+    uses_streak_weights,
+)
+from domain.services.streak_service import STREAK_LOOKBACK, build_streak_aggregate
 from flow.actions import FlowAction, SendMessageAction
 from flow.handlers.base import BaseStateHandler, resolve_history_service
 from models.context_model import CommandContext
 from models.state_model import AmidakujiState
+from presentation.discord.views.schedule_result import ScheduleResultView
 
 
 class MemberSelectedHandler(BaseStateHandler):
-    HISTORY_LOOKBACK = 10
+    HISTORY_LOOKBACK = STREAK_LOOKBACK
     CONSECUTIVE_THRESHOLD = 3
+    # 公平性最適化モードで、直前と同じ担当が続く 1 回あたりのコスト。
+    REPEAT_COST = 1.0
 
-    @classmethod
-    def _build_streaks(
-        cls,
-        histories: list[AssignmentHistory],
-    ) -> dict[int, tuple[str | None, int]]:
-        streaks: dict[int, tuple[str | None, int]] = {}
-        for history in sorted(histories, key=lambda item: item.created_at):
-            for entry in history.entries:
-                last_choice, count = streaks.get(entry.user_id, (None, 0))
-                if entry.choice == last_choice:
-                    streaks[entry.user_id] = (entry.choice, count + 1)
-                else:
-                    streaks[entry.user_id] = (entry.choice, 1)
-        return streaks
+    async def _load_aggregate(
+        self,
+        history_service: Any,
+        *,
+        guild_id: int,
+        template_title: str,
+    ) -> StreakAggregate:
+        # 集計ドキュメントがあれば 1 回の読み込みで済む。無ければ履歴から組み立てる。
+        aggregate = await history_service.get_streak_aggregate(
+            guild_id=guild_id, template_title=template_title
+        )
+        if aggregate is not None:
+            return aggregate
+
+        history_records: list[AssignmentHistory] = (
+            await history_service.get_recent_history(
+                guild_id=guild_id,
+                template_title=template_title,
+                limit=self.HISTORY_LOOKBACK,
+                fields=HISTORY_STREAK_FIELDS,
+            )
+        )
+        return build_streak_aggregate(
+            history_records, guild_id=guild_id, template_title=template_title
+        )
 
     @classmethod
     def _build_weight_map(
@@ -53,6 +79,32 @@ class MemberSelectedHandler(BaseStateHandler):
             weight_map[member.id] = member_weights
         return weight_map
 
+    @classmethod
+    def _build_cost_map(
+        cls,
+        *,
+        members: list[discord.User],
+        choices: list[str],
+        aggregate: StreakAggregate,
+    ) -> dict[int, dict[str, float]]:
+        # 連続担当の回数と、通算で均等な割合を超えて担当した分をコストにする。
+        fair_share = 1.0 / len(choices) if choices else 0.0
+        cost_map: dict[int, dict[str, float]] = {}
+        for member in members:
+            last_choice, count = aggregate.streaks.get(member.id, (None, 0))
+            frequencies = aggregate.frequencies.get(member.id, {})
+            total = sum(frequencies.values())
+            member_costs: dict[str, float] = {}
+            for choice in choices:
+                cost = 0.0
+                if choice == last_choice and count > 0:
+                    cost += cls.REPEAT_COST * count
+                if total > 0:
+                    cost += max(frequencies.get(choice, 0) / total - fair_share, 0.0)
+                member_costs[choice] = cost
+            cost_map[member.id] = member_costs
+        return cost_map
+
     @classmethod
     def _update_streaks_with_pairs(
         cls,
@@ -76,17 +128,79 @@ class MemberSelectedHandler(BaseStateHandler):
         threshold: int,
         members: list[discord.User],
     ) -> list[tuple[str, str, int]]:
-        member_map = {member.id: member for member in members}
+        # 集計には過去に抽選したユーザー全員が残るため、今回のメンバーだけを見る。
         warnings: list[tuple[str, str, int]] = []
-        for user_id, (choice, count) in streaks.items():
+        for member in members:
+            choice, count = streaks.get(member.id, (None, 0))
             if choice is None:
                 continue
             if count > threshold:
-                member = member_map.get(user_id)
-                display_name = getattr(member, "display_name", str(user_id))
+                display_name = getattr(member, "display_name", str(member.id))
                 warnings.append((display_name, choice, count))
         return warnings
 
+    @staticmethod
+    def _create_result_embeds(
+        pairs: PairList,
+        *,
+        mode: Any,
+        teams: bool,
+        members: Sequence[discord.User] = (),
+    ) -> list[discord.Embed]:
+        if teams:
+            # 定員を超えたメンバーは黙って落とさず「割り当てなし」として表示する。
+            return data_process.create_team_embeds_from_pairs(pairs, members=members)
+        return data_process.create_embeds_from_pairs(pairs=pairs, mode=mode)
+
+    async def _handle_schedule(
+        self,
+        history_service: Any,
+        *,
+        members: list[discord.User],
+        template: Template,
+        guild_id: int,
+        rounds: int,
+        selection_mode: SelectionMode,
+    ) -> FlowAction:
+        # 巡回で担当が入れ替わるため、連続担当の集計は読まずに済む。
+        # 定員付きの選択肢は席ではなくチーム単位で巡回させる。
+        choice_slots = template.choice_capacities
+        schedule = data_process.create_schedule_from_list(
+            members,
+            [name for name, _ in choice_slots],
+            rounds=rounds,
+            capacities=(
+                [capacity for _, capacity in choice_slots]
+                if template.has_capacities
+                else None
+            ),
+        )
+        embed_mode = await history_service.get_embed_mode()
+        pages = [
+            self._create_result_embeds(
+                pairs,
+                mode=embed_mode,
+                teams=template.has_capacities,
+                members=members,
+            )
+            for pairs in schedule
+        ]
+
+        await history_service.save_history_rounds(
+            guild_id=guild_id,
+            template=template,
+            rounds=schedule,
+            selection_mode=selection_mode,
+        )
+
+        view = ScheduleResultView(template_title=template.title, pages=pages)
+        return SendMessageAction(
+            content=view.create_content(),
+            embeds=view.create_embeds(),
+            view=view,
+            ephemeral=False,
+        )
+
     async def handle(
         self,
         context: CommandContext,
@@ -101,42 +215,68 @@ class MemberSelectedHandler(BaseStateHandler):
             raise ValueError("Template is not selected")
 
         history_service = resolve_history_service(services)
-        selection_mode = history_service.get_selection_mode()
+        selection_mode = await history_service.get_selection_mode()
 
-        choices = selected_template.choices
+        choice_slots = selected_template.choice_capacities
+        choices = [name for name, _ in choice_slots]
+        capacities = None
+        if selected_template.has_capacities:
+            capacities = [capacity for _, capacity in choice_slots]
         current_guild = context.interaction.guild
         guild_id = getattr(current_guild, "id", None) or getattr(
             context.interaction, "guild_id", 0
         )
 
-        history_records = history_service.get_recent_history(
+        if context.schedule_rounds > 1:
+            return await self._handle_schedule(
+                history_service,
+                members=selected_members,
+                template=selected_template,
+                guild_id=guild_id,
+                rounds=context.schedule_rounds,
+                selection_mode=selection_mode,
+            )
+
+        aggregate = await self._load_aggregate(
+            history_service,
             guild_id=guild_id,
             template_title=selected_template.title,
-            limit=self.HISTORY_LOOKBACK,
         )
-        streaks_before = self._build_streaks(history_records)
+        streaks_before: dict[int, tuple[str | None, int]] = dict(aggregate.streaks)
 
         weights = None
-        if selection_mode is SelectionMode.BIAS_REDUCTION:
+        if uses_streak_weights(selection_mode):
             weights = self._build_weight_map(
                 members=selected_members,
                 choices=choices,
                 streaks=streaks_before,
             )
 
+        costs = None
+        if uses_fairness_costs(selection_mode):
+            costs = self._build_cost_map(
+                members=selected_members,
+                choices=choices,
+                aggregate=aggregate,
+            )
+
         pairs = data_process.create_pair_from_list(
             selected_members,
             choices,
             selection_mode=selection_mode,
             weights=weights,
+            costs=costs,
+            capacities=capacities,
         )
 
-        embeds = data_process.create_embeds_from_pairs(
-            pairs=pairs,
-            mode=history_service.get_embed_mode(),
+        embeds = self._create_result_embeds(
+            pairs,
+            mode=await history_service.get_embed_mode(),
+            teams=capacities is not None,
+            members=selected_members,
         )
 
-        history_service.save_history(
+        await history_service.save_history(
             guild_id=guild_id,
             template=selected_template,
             pairs=pairs,
@@ -9,6 +9,7 @@ import discord
 
 from application.dto import HistoryUsageResultDTO, TemplateCreationResultDTO
 from application.services.flow_service import FlowContext
+from application.services.template_service import PRIVATE_TEMPLATE_PAGE_SIZE
 from components.modal import TitleEnterModal
 from domain import Template, TemplateScope
 from flow.actions import (
@@ -42,6 +43,7 @@ class _TemplateListScenario:
     empty_title: str
     empty_description: str
     color: discord.Color
+    paginated: bool = False
 
 
 _PRIVATE_TEMPLATE_SCENARIO = _TemplateListScenario(
@@ -52,6 +54,7 @@ _PRIVATE_TEMPLATE_SCENARIO = _TemplateListScenario(
         "共有/公開テンプレートを利用してください。"
     ),
     color=discord.Color.orange(),
+    paginated=True,
 )
 
 _DELETE_TEMPLATE_SCENARIO = _TemplateListScenario(
@@ -59,6 +62,7 @@ _DELETE_TEMPLATE_SCENARIO = _TemplateListScenario(
     empty_title="エラーが発生しました",
     empty_description="削除できるテンプレートが見つかりませんでした。",
     color=discord.Color.red(),
+    paginated=True,
 )
 
 _SHARED_TEMPLATE_SCENARIO = _TemplateListScenario(
@@ -83,6 +87,9 @@ def _render_template_list(
     context: CommandContext,
     templates: list[Template],
     scenario: _TemplateListScenario,
+    *,
+    next_cursor: str | None = None,
+    has_previous: bool = False,
 ) -> FlowAction:
     if not templates:
         return build_ephemeral_embed_action(
@@ -91,25 +98,51 @@ def _render_template_list(
             color=scenario.color,
         )
 
-    view = scenario.view_factory(context=context, templates=templates)
+    if scenario.paginated:
+        view = scenario.view_factory(
+            context=context,
+            templates=templates,
+            next_cursor=next_cursor,
+            has_previous=has_previous,
+        )
+    else:
+        view = scenario.view_factory(context=context, templates=templates)
     return SendViewAction(view=view)
 
 
+async def _render_private_template_page(
+    context: CommandContext,
+    services: Any,
+    scenario: _TemplateListScenario,
+) -> FlowAction:
+    template_service = resolve_template_service(services)
+    # ページ送りボタンが設定したカーソルは一度だけ使い、次回は先頭ページから表示する。
+    cursor = context.template_page_cursor
+    context.template_page_cursor = None
+    page = await template_service.list_private_templates(
+        user_id=context.interaction.user.id,
+        guild_id=getattr(context.interaction, "guild_id", None),
+        limit=PRIVATE_TEMPLATE_PAGE_SIZE,
+        cursor=cursor,
+    )
+    return _render_template_list(
+        context,
+        page.templates,
+        scenario,
+        next_cursor=page.next_cursor,
+        has_previous=cursor is not None,
+    )
+
+
 class UseExistingHandler(BaseStateHandler):
     async def handle(
         self,
         context: CommandContext,
         services: Any,
     ) -> FlowAction | Sequence[FlowAction]:
-        template_service = resolve_template_service(services)
-        user_id = context.interaction.user.id
-        guild_id = getattr(context.interaction, "guild_id", None)
-        templates = template_service.list_private_templates(
-            user_id=user_id,
-            guild_id=guild_id,
-        ).templates
-
-        return _render_template_list(context, templates, _PRIVATE_TEMPLATE_SCENARIO)
+        return await _render_private_template_page(
+            context, services, _PRIVATE_TEMPLATE_SCENARIO
+        )
 
 
 class DeleteTemplateModeHandler(BaseStateHandler):
@@ -118,15 +151,9 @@ class DeleteTemplateModeHandler(BaseStateHandler):
         context: CommandContext,
         services: Any,
     ) -> FlowAction | Sequence[FlowAction]:
-        template_service = resolve_template_service(services)
-        user_id = context.interaction.user.id
-        guild_id = getattr(context.interaction, "guild_id", None)
-        templates = template_service.list_private_templates(
-            user_id=user_id,
-            guild_id=guild_id,
-        ).templates
-
-        return _render_template_list(context, templates, _DELETE_TEMPLATE_SCENARIO)
+        return await _render_private_template_page(
+            context, services, _DELETE_TEMPLATE_SCENARIO
+        )
 
 
 class UseSharedTemplatesHandler(BaseStateHandler):
@@ -145,7 +172,9 @@ class UseSharedTemplatesHandler(BaseStateHandler):
                 color=discord.Color.red(),
             )
 
-        templates = template_service.list_shared_templates(guild_id=guild_id).templates
+        templates = (
+            await template_service.list_shared_templates(guild_id=guild_id)
+        ).templates
 
         return _render_template_list(context, templates, _SHARED_TEMPLATE_SCENARIO)
 
@@ -157,7 +186,7 @@ class UsePublicTemplatesHandler(BaseStateHandler):
         services: Any,
     ) -> FlowAction | Sequence[FlowAction]:
         template_service = resolve_template_service(services)
-        templates = template_service.list_public_templates().templates
+        templates = (await template_service.list_public_templates()).templates
 
         return _render_template_list(context, templates, _PUBLIC_TEMPLATE_SCENARIO)
 
@@ -221,9 +250,11 @@ class SharedTemplateCopyHandler(BaseStateHandler):
 
         template_service = resolve_template_service(services)
         user_id = context.interaction.user.id
-        copied_template = template_service.copy_shared_template(
-            user_id=user_id,
-            template=template,
+        copied_template = (
+            await template_service.copy_shared_template(
+                user_id=user_id,
+                template=template,
+            )
         ).template
 
         embed = discord.Embed(
@@ -255,13 +286,15 @@ class TemplateCreatedHandler(BaseStateHandler):
 
         user_id = context.interaction.user.id
         flow_service = resolve_flow_service(services)
-        creation_result: TemplateCreationResultDTO = flow_service.complete_template_creation(
-            user_id=user_id,
-            template=template,
-            context=FlowContext(
-                is_main_flow=AmidakujiState.COMMAND_EXECUTED in context.history
-            ),
-            interaction=context.interaction,
+        creation_result: TemplateCreationResultDTO = (
+            await flow_service.complete_template_creation(
+                user_id=user_id,
+                template=template,
+                context=FlowContext(
+                    is_main_flow=AmidakujiState.COMMAND_EXECUTED in context.history
+                ),
+                interaction=context.interaction,
+            )
         )
 
         if creation_result.transition is not None:
@@ -296,7 +329,7 @@ class TemplateDeletedHandler(BaseStateHandler):
 
         user_id = context.interaction.user.id
         flow_service = resolve_flow_service(services)
-        deletion_result = flow_service.remove_template(
+        deletion_result = await flow_service.remove_template(
             user_id=user_id,
             template_title=template_title,
             interaction=context.interaction,
@@ -332,7 +365,7 @@ class UseHistoryHandler(BaseStateHandler):
         guild_id = getattr(context.interaction, "guild_id", None)
 
         try:
-            result: HistoryUsageResultDTO = flow_service.use_recent_template(
+            result: HistoryUsageResultDTO = await flow_service.use_recent_template(
                 user_id=user_id,
                 guild_id=guild_id,
                 interaction=context.interaction,
@@ -380,7 +413,7 @@ class TemplateDeterminedHandler(BaseStateHandler):
 
         template_service = resolve_template_service(services)
         user_id = context.interaction.user.id
-        template_service.mark_recent_template(user_id=user_id, template=template)
+        await template_service.mark_recent_template(user_id=user_id, template=template)
 
         view = MemberSelectView(context=context)
         return SendViewAction(view=view)
@@ -1,20 +1,55 @@
 """Firestore関連インフラストラクチャ。"""
+from .async_repositories import (
+    AsyncFirestoreRepository,
+    AsyncHistoryRepository,
+    AsyncInfoRepository,
+    AsyncSharedTemplateRepository,
+    AsyncUserRepository,
+    AsyncUserTemplateRepository,
+)
+from .async_template_repository import AsyncFirestoreTemplateRepository
+from .fake_client import FakeFirestoreClient, FirestoreOperationStats
+from .indexes import REQUIRED_INDEXES, MissingIndexError, build_index_manifest
 from .repositories import (
     FirestoreRepository,
     HistoryRepository,
     InfoRepository,
     SharedTemplateRepository,
     UserRepository,
+    UserTemplateRepository,
+)
+from .shared_template_index import (
+    FakeListenerSource,
+    FirestoreListenerSource,
+    SharedTemplateIndex,
 )
 from .template_repository import FirestoreTemplateRepository
 from .unit_of_work import FirestoreUnitOfWork
+from .user_templates import UserTemplateLayout
 
 __all__ = [
+    "AsyncFirestoreRepository",
+    "AsyncFirestoreTemplateRepository",
+    "AsyncHistoryRepository",
+    "AsyncInfoRepository",
+    "AsyncSharedTemplateRepository",
+    "AsyncUserRepository",
+    "AsyncUserTemplateRepository",
+    "FakeFirestoreClient",
+    "FakeListenerSource",
+    "FirestoreListenerSource",
+    "FirestoreOperationStats",
     "FirestoreRepository",
     "FirestoreTemplateRepository",
     "FirestoreUnitOfWork",
     "HistoryRepository",
     "InfoRepository",
+    "MissingIndexError",
+    "REQUIRED_INDEXES",
+    "SharedTemplateIndex",
     "SharedTemplateRepository",
     "UserRepository",
+    "UserTemplateLayout",
+    "UserTemplateRepository",
+    "build_index_manifest",
 ]
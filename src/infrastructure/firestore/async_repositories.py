@@ -0,0 +1,530 @@
+"""Firestore の非同期クライアント向けリポジトリクラス群。"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timezone
+from typing import Any, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore as google_firestore
+from google.cloud.firestore_v1 import FieldFilter
+
+from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID
+from domain import HISTORY_STREAK_FIELDS
+
+from .history_aggregates import (
+    AGGREGATE_SEED_LOOKBACK,
+    STREAK_AGGREGATES_COLLECTION,
+    AggregateKey,
+    history_aggregate_key,
+    plan_streak_aggregate_writes,
+    restore_streak_aggregate,
+    streak_aggregate_document_id,
+)
+from .history_buffer import HistoryWriteBuffer
+from .indexes import HistoryQueryPlan, MissingIndexError
+from .repositories import (
+    HISTORY_ID_FIELD,
+    MAX_BATCH_WRITES,
+    MAX_HISTORY_ENTRIES_PER_COMMIT,
+    UserDocumentMutation,
+    UserTemplatePlan,
+    filter_recent_history,
+    has_history_ids,
+    normalize_history_cursor,
+    split_history_id,
+)
+from .shared_template_index import IndexedSnapshot, SharedTemplateIndex
+from .user_templates import USER_TEMPLATES_SUBCOLLECTION
+
+AsyncFirestoreClient = google_firestore.AsyncClient
+AsyncCollectionReference = google_firestore.AsyncCollectionReference
+AsyncDocumentReference = google_firestore.AsyncDocumentReference
+AsyncQuery = google_firestore.AsyncQuery
+
+_T = TypeVar("_T")
+
+
+async def read_documents_async(
+    client: AsyncFirestoreClient, references: Sequence[AsyncDocumentReference]
+) -> list[dict | None]:
+    """`read_documents` の非同期版。結果は `references` と同じ順序で返す。"""
+
+    if not references:
+        return []
+
+    found: dict[str, dict | None] = {}
+    async for snapshot in client.get_all(list(references)):
+        if getattr(snapshot, "exists", False):
+            found[snapshot.reference.path] = snapshot.to_dict()
+    return [found.get(reference.path) for reference in references]
+
+
+class AsyncFirestoreRepository:
+    """Firestoreの単一コレクションに対する非同期の基本操作を提供する。"""
+
+    def __init__(self, client: AsyncFirestoreClient, collection_name: str) -> None:
+        self._client = client
+        self.ref: AsyncCollectionReference = client.collection(collection_name)
+
+    def document(self, document_id: str) -> AsyncDocumentReference:
+        return self.ref.document(str(document_id))
+
+    async def read_many(self, doc_ids: Iterable[int | str]) -> dict[str, dict | None]:
+        """複数のドキュメントを 1 回の `get_all` で読み込み、ID ごとに返す。"""
+
+        ids = list(dict.fromkeys(str(doc_id) for doc_id in doc_ids))
+        documents = await read_documents_async(
+            self._client, [self.document(doc_id) for doc_id in ids]
+        )
+        return dict(zip(ids, documents))
+
+    async def read_document(self, doc_id: int | str) -> dict | None:
+        snapshot = await self.document(str(doc_id)).get()
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    async def create_document(self, doc_id: int | str, data: dict) -> None:
+        await self.document(str(doc_id)).set(data)
+
+
+class AsyncUserRepository(AsyncFirestoreRepository):
+    """`users` コレクションを非同期に操作するリポジトリ。"""
+
+    def __init__(self, client: AsyncFirestoreClient) -> None:
+        super().__init__(client, "users")
+
+    async def delete_document(self, doc_id: int | str) -> None:
+        await self.document(str(doc_id)).delete()
+
+    async def update_fields(self, doc_id: int | str, fields: dict[str, Any]) -> None:
+        """指定フィールドのみを更新する。ドキュメントが無い場合は `NotFound`。"""
+
+        await self.document(str(doc_id)).update(fields)
+
+    async def run_transaction(
+        self, doc_id: int | str, mutation: UserDocumentMutation[_T]
+    ) -> _T:
+        """ドキュメントを読み込み、`mutation` が返すフィールド更新を原子的に適用する。"""
+
+        document_ref = self.document(str(doc_id))
+
+        @google_firestore.async_transactional
+        async def execute(transaction: Any) -> _T:
+            snapshot = await document_ref.get(transaction=transaction)
+            data = snapshot.to_dict() if snapshot.exists else None
+            fields, result = mutation(data)
+            if fields:
+                transaction.update(document_ref, fields)
+            return result
+
+        return await execute(self._client.transaction())
+
+
+class AsyncUserTemplateRepository:
+    """`users/{id}/templates` サブコレクションを非同期に操作するリポジトリ。"""
+
+    def __init__(self, client: AsyncFirestoreClient) -> None:
+        self._client = client
+        self.users_ref: AsyncCollectionReference = client.collection("users")
+
+    def collection(self, user_id: int | str) -> AsyncCollectionReference:
+        return self.users_ref.document(str(user_id)).collection(
+            USER_TEMPLATES_SUBCOLLECTION
+        )
+
+    def _ordered(self, user_id: int | str) -> AsyncQuery:
+        return self.collection(user_id).order_by("created_at").order_by("template_id")
+
+    async def list_page(
+        self,
+        user_id: int | str,
+        *,
+        limit: int,
+        start_after: tuple[datetime, str] | None = None,
+    ) -> list[dict]:
+        query = self._ordered(user_id)
+        if start_after is not None:
+            created_at, template_id = start_after
+            query = query.start_after(
+                {"created_at": created_at, "template_id": template_id}
+            )
+        return await _to_dicts(query.limit(limit).stream())
+
+    async def list_all(self, user_id: int | str) -> list[dict]:
+        return await _to_dicts(self._ordered(user_id).stream())
+
+    async def add_template_with_titles(
+        self, user_id: int | str, plan: UserTemplatePlan[_T]
+    ) -> _T:
+        """タイトル一覧を読み、`plan` が返すテンプレートを同じトランザクションで追加する。
+
+        ユーザーが存在しない場合は `NotFound`。
+        """
+
+        user_ref = self.users_ref.document(str(user_id))
+        titles_query = self.collection(user_id).select(["title"])
+
+        @google_firestore.async_transactional
+        async def execute(transaction: Any) -> _T:
+            if not (await user_ref.get(transaction=transaction)).exists:
+                raise google_exceptions.NotFound(f"User {user_id} not found")
+            titles = [
+                data["title"]
+                for data in await _to_dicts(titles_query.stream(transaction=transaction))
+                if isinstance(data.get("title"), str)
+            ]
+            data, result = plan(titles)
+            transaction.update(
+                user_ref, {"templates_updated_at": google_firestore.SERVER_TIMESTAMP}
+            )
+            transaction.set(self.collection(user_id).document(data["template_id"]), data)
+            return result
+
+        return await execute(self._client.transaction())
+
+    async def read_template(self, user_id: int | str, template_id: str) -> dict | None:
+        snapshot = await self.collection(user_id).document(template_id).get()
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    async def add_template(self, user_id: int | str, data: dict[str, Any]) -> None:
+        """テンプレートを追加する。ユーザーが存在しない場合は `NotFound`。"""
+
+        batch = self._client.batch()
+        batch.update(
+            self.users_ref.document(str(user_id)),
+            {"templates_updated_at": google_firestore.SERVER_TIMESTAMP},
+        )
+        batch.set(self.collection(user_id).document(data["template_id"]), data)
+        await batch.commit()
+
+    async def update_template(
+        self, user_id: int | str, template_id: str, data: dict[str, Any]
+    ) -> None:
+        await self.collection(user_id).document(template_id).update(data)
+
+    async def delete_templates(
+        self,
+        user_id: int | str,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        collection = self.collection(user_id)
+        references: dict[str, AsyncDocumentReference] = {}
+        if template_id is not None:
+            references[template_id] = collection.document(template_id)
+        if template_title is not None:
+            query = collection.where(filter=FieldFilter("title", "==", template_title))
+            async for snapshot in query.stream():
+                references[snapshot.id] = snapshot.reference
+        await self._commit(
+            [("delete", reference, None) for reference in references.values()]
+        )
+
+    async def replace_all(
+        self,
+        user_id: int | str,
+        user_data: dict[str, Any],
+        templates: list[dict[str, Any]],
+    ) -> None:
+        collection = self.collection(user_id)
+        keep_ids = {data["template_id"] for data in templates}
+        stale = [
+            snapshot.reference
+            async for snapshot in collection.select([]).stream()
+            if snapshot.id not in keep_ids
+        ]
+
+        writes: list[tuple[str, AsyncDocumentReference, dict | None]] = [
+            ("set", self.users_ref.document(str(user_id)), user_data)
+        ]
+        writes.extend(
+            ("set", collection.document(data["template_id"]), data) for data in templates
+        )
+        writes.extend(("delete", reference, None) for reference in stale)
+        await self._commit(writes)
+
+    async def delete_all(self, user_id: int | str) -> None:
+        references = [
+            snapshot.reference
+            async for snapshot in self.collection(user_id).select([]).stream()
+        ]
+        references.append(self.users_ref.document(str(user_id)))
+        await self._commit([("delete", reference, None) for reference in references])
+
+    async def _commit(
+        self, writes: list[tuple[str, AsyncDocumentReference, dict | None]]
+    ) -> None:
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self._client.batch()
+            for operation, reference, data in writes[start : start + MAX_BATCH_WRITES]:
+                if operation == "set":
+                    batch.set(reference, data)
+                else:
+                    batch.delete(reference)
+            await batch.commit()
+
+
+class AsyncInfoRepository(AsyncFirestoreRepository):
+    """`info` コレクションを非同期に操作するリポジトリ。"""
+
+    def __init__(self, client: AsyncFirestoreClient) -> None:
+        super().__init__(client, "info")
+
+
+class AsyncSharedTemplateRepository(AsyncFirestoreRepository):
+    """`shared_templates` コレクションを非同期に操作するリポジトリ。"""
+
+    def __init__(self, client: AsyncFirestoreClient) -> None:
+        super().__init__(client, "shared_templates")
+        self.index: SharedTemplateIndex | None = None
+
+    async def add_template(self, data: dict[str, Any]) -> str:
+        template_id = str(data.get("template_id") or "").strip()
+        document_ref: AsyncDocumentReference
+        if template_id:
+            document_ref = self.ref.document(template_id)
+        else:
+            document_ref = self.ref.document()
+            template_id = document_ref.id
+            data["template_id"] = template_id
+
+        await document_ref.set(data)
+        if self.index is not None:
+            self.index.apply_write(template_id, data)
+        return template_id
+
+    async def delete_template(self, template_id: str) -> None:
+        await self.document(template_id).delete()
+        if self.index is not None:
+            self.index.apply_delete(template_id)
+
+    async def list_templates(
+        self,
+        *,
+        scope: str | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Any]:
+        if self.index is not None:
+            indexed = self.index.lookup(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            )
+            if indexed is not None:
+                return list(indexed)
+
+        query: AsyncQuery | AsyncCollectionReference = self.ref
+        if scope is not None:
+            query = query.where(filter=FieldFilter("scope", "==", scope))
+        if guild_id is not None:
+            query = query.where(filter=FieldFilter("guild_id", "==", guild_id))
+        if created_by is not None:
+            query = query.where(filter=FieldFilter("created_by", "==", created_by))
+
+        documents: list[Any] = []
+        async for document in query.stream():
+            if getattr(document, "id", None) == COLLECTION_SENTINEL_DOCUMENT_ID:
+                continue
+            documents.append(document)
+        return documents
+
+
+class AsyncHistoryRepository(AsyncFirestoreRepository):
+    """`history` コレクションを非同期に操作するリポジトリ。"""
+
+    def __init__(self, client: AsyncFirestoreClient) -> None:
+        super().__init__(client, "history")
+        self.aggregates_ref: AsyncCollectionReference = client.collection(
+            STREAK_AGGREGATES_COLLECTION
+        )
+        self.buffer: HistoryWriteBuffer | None = None
+
+    def aggregate_document(
+        self, guild_id: int, template_title: str
+    ) -> AsyncDocumentReference:
+        return self.aggregates_ref.document(
+            streak_aggregate_document_id(guild_id, template_title)
+        )
+
+    async def add_entry(self, data: dict) -> None:
+        await self.submit_entries([data])
+
+    async def submit_entries(self, entries: list[dict]) -> None:
+        """ライトビハインドバッファがあれば溜め、無ければそのまま書き込む。
+
+        バッファが満杯または終了済みのときは、滞留分を先に書き込んでからその場で書き込む。
+        古い抽選より先に新しい抽選が集計へ反映されないようにするため。
+        """
+
+        buffer = self.buffer
+        if buffer is None:
+            await self.add_entries(entries)
+        elif not buffer.closed and buffer.has_capacity(len(entries)):
+            for data in entries:
+                buffer.enqueue(data)
+        else:
+            await buffer.write_through(entries)
+
+    async def add_entries(self, entries: list[dict]) -> None:
+        """履歴を書き込み、同じトランザクションで連続担当の集計を更新する。
+
+        `history_id` を持つ履歴はその ID で作成する。チャンク単位で書き込み済み
+        (`AlreadyExists`) なら再送とみなして読み飛ばす。
+        """
+
+        for start in range(0, len(entries), MAX_HISTORY_ENTRIES_PER_COMMIT):
+            chunk = entries[start : start + MAX_HISTORY_ENTRIES_PER_COMMIT]
+            try:
+                await self._commit_entries(chunk)
+            except google_exceptions.AlreadyExists:
+                if not has_history_ids(chunk):
+                    raise
+
+    async def read_aggregate(self, guild_id: int, template_title: str) -> dict | None:
+        snapshot = await self.aggregate_document(guild_id, template_title).get()
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    def pending_entries(self, *, guild_id: int, template_title: str) -> list[dict]:
+        """書き込み待ちの履歴のうち、指定したテンプレートのものを返す。"""
+
+        if self.buffer is None:
+            return []
+        return [
+            data
+            for data in self.buffer.pending(guild_id=guild_id)
+            if data.get("template_title") == template_title
+        ]
+
+    async def _commit_entries(self, entries: list[dict]) -> None:
+        references = {
+            key: self.aggregate_document(*key)
+            for key in dict.fromkeys(history_aggregate_key(data) for data in entries)
+        }
+
+        @google_firestore.async_transactional
+        async def execute(transaction: Any) -> None:
+            aggregates = {}
+            for key, reference in references.items():
+                snapshot = await reference.get(transaction=transaction)
+                stored = snapshot.to_dict() if snapshot.exists else None
+                # 集計が無ければ、同じトランザクション内で直近の履歴から初期値を作る。
+                aggregates[key] = restore_streak_aggregate(
+                    stored,
+                    key=key,
+                    seed_documents=(
+                        await self._seed_documents(key, transaction=transaction)
+                        if stored is None
+                        else ()
+                    ),
+                )
+            for key, payload in plan_streak_aggregate_writes(aggregates, entries).items():
+                transaction.set(references[key], payload)
+            for data in entries:
+                history_id, payload = split_history_id(data)
+                if history_id is None:
+                    transaction.set(self.ref.document(), payload)
+                else:
+                    transaction.create(self.ref.document(history_id), payload)
+
+        await execute(self._client.transaction())
+
+    async def _seed_documents(
+        self, key: AggregateKey, *, transaction: Any
+    ) -> list[dict]:
+        guild_id, template_title = key
+        # 書き込み中の履歴は集計へ別途反映されるため、保存済みの履歴だけを使う。
+        return await self.fetch_recent(
+            guild_id=guild_id,
+            template_title=template_title,
+            limit=AGGREGATE_SEED_LOOKBACK,
+            fields=HISTORY_STREAK_FIELDS,
+            include_pending=False,
+            transaction=transaction,
+        )
+
+    async def fetch_recent(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: tuple[datetime, str] | None = None,
+        fields: Sequence[str] | None = None,
+        include_pending: bool = True,
+        transaction: Any | None = None,
+    ) -> list[dict]:
+        """新しい順に履歴を返す。`start_after` には前ページ末尾の `(created_at, ID)` を渡す。
+
+        `transaction` を渡すと、そのトランザクションの読み取りとして実行する。
+
+        必要な複合インデックスが無い場合は `MissingIndexError` を送出する。
+        """
+
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        start_after = normalize_history_cursor(start_after)
+
+        plan = HistoryQueryPlan(
+            guild_id=guild_id,
+            template_title=template_title,
+            since=since,
+            start_after=start_after,
+            limit=limit,
+            fields=fields,
+        )
+        try:
+            snapshots = [
+                snapshot
+                async for snapshot in plan.build(self.ref).stream(transaction=transaction)
+            ]
+        except google_exceptions.FailedPrecondition as exc:
+            raise MissingIndexError(plan.index, str(exc)) from exc
+
+        if self.buffer is not None and include_pending and start_after is None:
+            # 書き込み待ちの履歴も直前の抽選結果として扱う。
+            # 最も新しい履歴のため、先頭ページにだけ合成する。
+            # 射影を指定された場合は保存済みの履歴と同じ形に揃える。
+            projection = plan.projection
+            snapshots.extend(
+                IndexedSnapshot(
+                    id=data.get(HISTORY_ID_FIELD, ""),
+                    data=data
+                    if projection is None
+                    else {key: data[key] for key in projection if key in data},
+                )
+                for data in self.buffer.pending(guild_id=guild_id)
+            )
+
+        return filter_recent_history(
+            snapshots,
+            template_title=template_title,
+            limit=limit,
+            since=since,
+            start_after=start_after,
+        )
+
+
+async def _to_dicts(snapshots: Any) -> list[dict]:
+    documents: list[dict] = []
+    async for snapshot in snapshots:
+        data = snapshot.to_dict()
+        if isinstance(data, dict):
+            documents.append(data)
+    return documents
+
+
+__all__ = [
+    "AsyncFirestoreRepository",
+    "AsyncHistoryRepository",
+    "AsyncInfoRepository",
+    "AsyncSharedTemplateRepository",
+    "AsyncUserRepository",
+    "AsyncUserTemplateRepository",
+]
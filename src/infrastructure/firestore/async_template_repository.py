@@ -0,0 +1,565 @@
+"""Firestore 非同期クライアントを利用したテンプレートリポジトリ。"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any
+
+from google.api_core import exceptions as google_exceptions
+
+from domain import (
+    AssignmentHistory,
+    DrawContext,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+    TemplatePage,
+    TemplateScope,
+    UserInfo,
+)
+from domain.interfaces.repositories import AsyncTemplateRepository
+from domain.services.history_cursor import decode_history_cursor
+from domain.services.selection_mode_service import coerce_selection_mode
+
+from db.serializers import (
+    normalize_template_for_user,
+    serialize_assignment_history,
+    serialize_history_rounds,
+    serialize_template,
+    serialize_user,
+)
+
+from .async_repositories import (
+    AsyncHistoryRepository,
+    AsyncInfoRepository,
+    AsyncSharedTemplateRepository,
+    AsyncUserRepository,
+    AsyncUserTemplateRepository,
+    read_documents_async,
+)
+from .history_aggregates import apply_history_documents, restore_streak_aggregate
+from .template_repository import (
+    assemble_user,
+    attach_shared_templates,
+    build_custom_template_append,
+    build_default_templates_document,
+    build_draw_context,
+    build_shared_template_query,
+    build_user_profile_document,
+    coerce_embed_mode,
+    deserialize_default_templates,
+    deserialize_history_documents,
+    deserialize_shared_templates,
+    deserialize_user_template,
+    find_template,
+    has_default_templates,
+    plan_custom_template_removal,
+    plan_custom_template_replacement,
+    plan_shared_template_copy,
+    plan_subcollection_template_copy,
+    resolve_setting_document,
+    sanitize_custom_template,
+    toggle_embed_mode_document,
+    validate_copyable_template,
+    validate_page_limit,
+    validate_shared_template,
+    validate_template_identifier,
+)
+from .unit_of_work import FirestoreUnitOfWork
+from .user_templates import (
+    build_subcollection_page,
+    build_user_template_document,
+    build_user_template_documents,
+    decode_template_cursor,
+    paginate_embedded_templates,
+)
+
+
+class AsyncFirestoreTemplateRepository(AsyncTemplateRepository):
+    """Firestore の AsyncClient を用いる AsyncTemplateRepository 実装。
+
+    イベントループをブロックしないよう、全ての Firestore 呼び出しを await する。
+    接続は `FirestoreUnitOfWork` を同期版リポジトリと共有する。
+    """
+
+    def __init__(self, unit_of_work: FirestoreUnitOfWork) -> None:
+        self._unit_of_work = unit_of_work
+
+    # region プロパティ/設定系 -------------------------------------------------
+    @property
+    def unit_of_work(self) -> FirestoreUnitOfWork:
+        return self._unit_of_work
+
+    @property
+    def is_configured(self) -> bool:
+        return self._unit_of_work.is_async_configured
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部ヘルパー -----------------------------------------------------
+    def _get_user_repository(self) -> AsyncUserRepository:
+        self._unit_of_work.ensure_async_configured()
+        repository = self._unit_of_work.async_user_repository
+        assert repository is not None
+        return repository
+
+    def _get_info_repository(self) -> AsyncInfoRepository:
+        self._unit_of_work.ensure_async_configured()
+        repository = self._unit_of_work.async_info_repository
+        assert repository is not None
+        return repository
+
+    def _get_shared_template_repository(self) -> AsyncSharedTemplateRepository:
+        self._unit_of_work.ensure_async_configured()
+        repository = self._unit_of_work.async_shared_template_repository
+        assert repository is not None
+        return repository
+
+    def _get_history_repository(self) -> AsyncHistoryRepository:
+        self._unit_of_work.ensure_async_configured()
+        repository = self._unit_of_work.async_history_repository
+        assert repository is not None
+        return repository
+
+    def _get_user_template_repository(self) -> AsyncUserTemplateRepository:
+        self._unit_of_work.ensure_async_configured()
+        repository = self._unit_of_work.async_user_template_repository
+        assert repository is not None
+        return repository
+
+    @property
+    def _uses_template_subcollection(self) -> bool:
+        return self._unit_of_work.uses_template_subcollection
+
+    async def _read_or_initialize_setting(
+        self, info_repository: AsyncInfoRepository, key: str
+    ) -> dict[str, str]:
+        data, should_initialize = resolve_setting_document(
+            key, await info_repository.read_document(key)
+        )
+        if should_initialize:
+            await info_repository.create_document(key, data)
+        return data
+
+    async def _load_custom_templates(
+        self, user_id: int, *, include_templates: bool = True
+    ) -> list[Any] | None:
+        """サブコレクション利用時のみテンプレートを読み込む。"""
+
+        if not include_templates:
+            # テンプレート一覧を使わない呼び出しでは、サブコレクションを読まない。
+            return []
+        if self._uses_template_subcollection:
+            return await self._get_user_template_repository().list_all(user_id)
+        return None
+
+    # endregion ----------------------------------------------------------------
+
+    # region 公開API -----------------------------------------------------------
+    async def ensure_default_templates(self) -> list[Template]:
+        """既定のテンプレートを初期化し、一覧を返す。"""
+
+        return await self.get_default_templates()
+
+    async def get_default_templates(self) -> list[Template]:
+        info_repository = self._get_info_repository()
+        templates = await info_repository.read_document("default_templates")
+        if not has_default_templates(templates):
+            await info_repository.create_document(
+                "default_templates", build_default_templates_document()
+            )
+            templates = await info_repository.read_document("default_templates")
+        return deserialize_default_templates(templates)
+
+    async def list_shared_templates(
+        self,
+        *,
+        scope: TemplateScope | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Template]:
+        repository = self._get_shared_template_repository()
+        raw_templates = await repository.list_templates(
+            **build_shared_template_query(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            )
+        )
+        return deserialize_shared_templates(raw_templates, scope=scope)
+
+    async def get_shared_templates_for_user(
+        self, *, guild_id: int | None
+    ) -> tuple[list[Template], list[Template]]:
+        guild_templates: list[Template] = []
+        if guild_id is not None:
+            guild_templates = await self.list_shared_templates(
+                scope=TemplateScope.GUILD, guild_id=guild_id
+            )
+        public_templates = await self.list_shared_templates(scope=TemplateScope.PUBLIC)
+        return guild_templates, public_templates
+
+    async def toggle_embed_mode(self) -> None:
+        info_repository = self._get_info_repository()
+        data = await self._read_or_initialize_setting(info_repository, "embed_mode")
+        await info_repository.create_document(
+            "embed_mode", toggle_embed_mode_document(data)
+        )
+
+    async def get_embed_mode(self) -> str:
+        info_repository = self._get_info_repository()
+        data = await self._read_or_initialize_setting(info_repository, "embed_mode")
+        return data["embed_mode"]
+
+    async def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
+        embed_mode = coerce_embed_mode(mode)
+        info_repository = self._get_info_repository()
+        data = await self._read_or_initialize_setting(info_repository, "embed_mode")
+        await info_repository.create_document(
+            "embed_mode", {**data, "embed_mode": embed_mode.value}
+        )
+
+    async def set_selection_mode(self, mode: SelectionMode | str) -> None:
+        selection_mode = coerce_selection_mode(mode)
+        info_repository = self._get_info_repository()
+        data = await self._read_or_initialize_setting(info_repository, "selection_mode")
+        await info_repository.create_document(
+            "selection_mode", {**data, "selection_mode": selection_mode.value}
+        )
+
+    async def get_selection_mode(self) -> str:
+        info_repository = self._get_info_repository()
+        data = await self._read_or_initialize_setting(info_repository, "selection_mode")
+        return data["selection_mode"]
+
+    async def save_history(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        pairs: PairList,
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        history_repository = self._get_history_repository()
+        data = serialize_assignment_history(
+            guild_id=guild_id,
+            template=template,
+            pairs=pairs,
+            selection_mode=selection_mode,
+            created_at=datetime.now(timezone.utc),
+        )
+        await history_repository.add_entry(data)
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        history_repository = self._get_history_repository()
+        entries = serialize_history_rounds(
+            guild_id=guild_id,
+            template=template,
+            rounds=rounds,
+            selection_mode=selection_mode,
+            started_at=datetime.now(timezone.utc),
+        )
+        await history_repository.submit_entries(entries)
+
+    async def get_recent_history(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> list[AssignmentHistory]:
+        history_repository = self._get_history_repository()
+        documents = await history_repository.fetch_recent(
+            guild_id=guild_id,
+            template_title=template_title,
+            limit=limit,
+            since=since,
+            start_after=decode_history_cursor(start_after) if start_after else None,
+            fields=fields,
+        )
+        return deserialize_history_documents(documents)
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        history_repository = self._get_history_repository()
+        data = await history_repository.read_aggregate(guild_id, template_title)
+        pending = history_repository.pending_entries(
+            guild_id=guild_id, template_title=template_title
+        )
+        if data is None:
+            return None
+        aggregate = restore_streak_aggregate(data, key=(guild_id, template_title))
+        # 書き込み待ちの履歴は集計にまだ反映されていないため、ここで重ねる。
+        return apply_history_documents(aggregate, pending)
+
+    async def init_user(self, user_id: int, name: str) -> None:
+        default_templates = await self.get_default_templates()
+        await self.set_user(
+            UserInfo(id=user_id, name=name, custom_templates=default_templates)
+        )
+
+    async def set_user(self, user: UserInfo) -> None:
+        if self._uses_template_subcollection:
+            await self._get_user_template_repository().replace_all(
+                user.id,
+                build_user_profile_document(user),
+                build_user_template_documents(user.custom_templates),
+            )
+            return
+
+        user_repository = self._get_user_repository()
+        await user_repository.create_document(user.id, serialize_user(user))
+
+    async def get_user(
+        self,
+        user_id: int,
+        *,
+        guild_id: int | None = None,
+        include_shared: bool = True,
+        include_templates: bool = True,
+    ) -> UserInfo | None:
+        user_repository = self._get_user_repository()
+        data = await user_repository.read_document(user_id)
+        if data is None:
+            return None
+
+        user_info = assemble_user(
+            data,
+            custom_templates=await self._load_custom_templates(
+                user_id, include_templates=include_templates
+            ),
+        )
+        if include_shared:
+            default_templates = await self.get_default_templates()
+            shared_templates, public_templates = await self.get_shared_templates_for_user(
+                guild_id=guild_id
+            )
+            attach_shared_templates(
+                user_info,
+                default_templates=default_templates,
+                shared_templates=shared_templates,
+                public_templates=public_templates,
+            )
+        return user_info
+
+    async def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        """ユーザーと `info` の設定ドキュメントを 1 回の `get_all` で読み込む。"""
+
+        user_repository = self._get_user_repository()
+        info_repository = self._get_info_repository()
+        user_data, embed_data, selection_data, templates_data = await read_documents_async(
+            self._unit_of_work.async_client,
+            [
+                user_repository.document(user_id),
+                info_repository.document("embed_mode"),
+                info_repository.document("selection_mode"),
+                info_repository.document("default_templates"),
+            ],
+        )
+
+        if resolve_setting_document("embed_mode", embed_data)[1]:
+            embed_data = await self._read_or_initialize_setting(
+                info_repository, "embed_mode"
+            )
+        if resolve_setting_document("selection_mode", selection_data)[1]:
+            selection_data = await self._read_or_initialize_setting(
+                info_repository, "selection_mode"
+            )
+        if has_default_templates(templates_data):
+            default_templates = deserialize_default_templates(templates_data)
+        else:
+            default_templates = await self.get_default_templates()
+
+        user_info: UserInfo | None = None
+        if user_data is not None:
+            user_info = assemble_user(
+                user_data, custom_templates=await self._load_custom_templates(user_id)
+            )
+
+        return build_draw_context(
+            guild_id=guild_id,
+            user=user_info,
+            embed_data=embed_data,
+            selection_data=selection_data,
+            default_templates=default_templates,
+        )
+
+    async def delete_user(self, user_id: int) -> None:
+        if self._uses_template_subcollection:
+            await self._get_user_template_repository().delete_all(user_id)
+            return
+
+        user_repository = self._get_user_repository()
+        await user_repository.delete_document(user_id)
+
+    async def user_is_exist(self, user_id: int) -> bool:
+        try:
+            repository = self._get_user_repository()
+        except RuntimeError:
+            return False
+
+        try:
+            return await repository.read_document(user_id) is not None
+        except Exception:
+            return False
+
+    async def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        validate_page_limit(limit)
+
+        if self._uses_template_subcollection:
+            documents = await self._get_user_template_repository().list_page(
+                user_id,
+                limit=limit + 1,
+                start_after=decode_template_cursor(cursor) if cursor else None,
+            )
+            return build_subcollection_page(documents, limit=limit)
+
+        user = await self.get_user(user_id, include_shared=False)
+        if user is None:
+            return TemplatePage(templates=[])
+        return paginate_embedded_templates(
+            user.custom_templates, limit=limit, cursor=cursor
+        )
+
+    async def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        if self._uses_template_subcollection:
+            return deserialize_user_template(
+                await self._get_user_template_repository().read_template(
+                    user_id, template_id
+                )
+            )
+
+        user = await self.get_user(user_id, include_shared=False)
+        if user is None:
+            return None
+        return find_template(user.custom_templates, template_id)
+
+    async def add_custom_template(self, user_id: int, template: Template) -> None:
+        if self._uses_template_subcollection:
+            await self._add_template_document(
+                user_id, normalize_template_for_user(template, user_id)
+            )
+            return
+
+        user_repository = self._get_user_repository()
+        fields, _ = build_custom_template_append(user_id, template)
+        try:
+            await user_repository.update_fields(user_id, fields)
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
+
+    async def _add_template_document(self, user_id: int, template: Template) -> None:
+        data = build_user_template_document(
+            template, created_at=datetime.now(timezone.utc)
+        )
+        try:
+            await self._get_user_template_repository().add_template(user_id, data)
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
+
+    async def update_custom_template(self, user_id: int, template: Template) -> None:
+        if not template.template_id:
+            raise ValueError("Template id is required")
+
+        if self._uses_template_subcollection:
+            sanitized = sanitize_custom_template(template, user_id)
+            try:
+                await self._get_user_template_repository().update_template(
+                    user_id, sanitized.template_id, serialize_template(sanitized)
+                )
+            except google_exceptions.NotFound as exc:
+                raise ValueError("Template not found") from exc
+            return
+
+        user_repository = self._get_user_repository()
+        await user_repository.run_transaction(
+            user_id,
+            lambda data: plan_custom_template_replacement(data, user_id, template),
+        )
+
+    async def delete_custom_template(
+        self,
+        user_id: int,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        validate_template_identifier(template_id, template_title)
+
+        if self._uses_template_subcollection:
+            await self._get_user_template_repository().delete_templates(
+                user_id, template_id=template_id, template_title=template_title
+            )
+            return
+
+        user_repository = self._get_user_repository()
+        await user_repository.run_transaction(
+            user_id,
+            lambda data: plan_custom_template_removal(
+                data, template_id=template_id, template_title=template_title
+            ),
+        )
+
+    async def set_least_template(self, user_id: int, template: Template) -> None:
+        user_repository = self._get_user_repository()
+        try:
+            await user_repository.update_fields(
+                user_id, {"least_template": serialize_template(template)}
+            )
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
+
+    async def create_shared_template(self, template: Template) -> Template:
+        validate_shared_template(template)
+        repository = self._get_shared_template_repository()
+        template_id = await repository.add_template(serialize_template(template))
+        return replace(template, template_id=template_id)
+
+    async def delete_shared_template(self, template_id: str) -> None:
+        repository = self._get_shared_template_repository()
+        await repository.delete_template(template_id)
+
+    async def copy_shared_template_to_user(
+        self, user_id: int, template: Template
+    ) -> Template:
+        validate_copyable_template(template)
+
+        if self._uses_template_subcollection:
+            created_at = datetime.now(timezone.utc)
+            try:
+                return await self._get_user_template_repository().add_template_with_titles(
+                    user_id,
+                    lambda titles: plan_subcollection_template_copy(
+                        titles, user_id, template, created_at=created_at
+                    ),
+                )
+            except google_exceptions.NotFound as exc:
+                raise ValueError("User not found") from exc
+
+        user_repository = self._get_user_repository()
+        return await user_repository.run_transaction(
+            user_id, lambda data: plan_shared_template_copy(data, user_id, template)
+        )
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = ["AsyncFirestoreTemplateRepository"]
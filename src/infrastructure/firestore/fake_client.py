@@ -0,0 +1,872 @@
+"""オフラインでの計測に使うインメモリの Firestore 互換クライアント。
+
+`repositories.py` が利用する範囲 (コレクション/ドキュメント、`where` /
+`order_by` / `start_after` / `select` / `limit` / `stream`、`get_all`、
+`WriteBatch`、トランザクション) を同期クライアントと同じ呼び出し方で提供する。
+RPC ごとに遅延を挿入でき、課金単位に合わせた読み取り・書き込み・削除件数と
+往復回数、ドキュメントサイズを `stats()` で確認できる。
+"""
+from __future__ import annotations
+
+import copy
+import itertools
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from functools import cmp_to_key
+from typing import Any
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1 import (
+    DELETE_FIELD,
+    SERVER_TIMESTAMP,
+    ArrayRemove,
+    ArrayUnion,
+    Increment,
+)
+
+from .indexes import ASCENDING, DESCENDING, CompositeIndex, IndexField
+
+DOCUMENT_ID_FIELD = "__name__"
+# WriteBatch / トランザクション 1 回あたりの書き込み上限。
+MAX_WRITES_PER_COMMIT = 500
+
+_EQUALITY_OPERATORS = frozenset({"==", "in", "array_contains", "array_contains_any"})
+_RANGE_OPERATORS = frozenset({"<", "<=", ">", ">="})
+
+
+@dataclass(slots=True)
+class FirestoreOperationStats:
+    """課金単位に合わせた操作回数とドキュメントサイズの累計。
+
+    クエリは結果が 0 件でも 1 読み取りとして数える。`bytes_*` は Firestore の
+    ストレージサイズ計算に従ったドキュメントサイズの合計。
+    """
+
+    reads: int = 0
+    writes: int = 0
+    deletes: int = 0
+    round_trips: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    round_trips_by_operation: dict[str, int] = field(default_factory=dict)
+
+
+# region サイズ計算 -------------------------------------------------------------
+def _string_size(value: str) -> int:
+    return len(value.encode("utf-8")) + 1
+
+
+def document_name_size(path: str) -> int:
+    """ドキュメント名のストレージサイズ。"""
+
+    return sum(_string_size(segment) for segment in path.split("/")) + 16
+
+
+def field_value_size(value: Any) -> int:
+    """フィールド値のストレージサイズ。Firestore に保存できない型は `TypeError`。"""
+
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return _string_size(value)
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, FakeDocumentReference):
+        return document_name_size(value.path)
+    if isinstance(value, (list, tuple)):
+        return sum(field_value_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(
+            _string_size(str(key)) + field_value_size(item) for key, item in value.items()
+        )
+    raise TypeError(f"Cannot convert to a Firestore Value: {value!r}")
+
+
+def document_size(path: str, data: Mapping[str, Any]) -> int:
+    """ドキュメント全体のストレージサイズ。"""
+
+    return document_name_size(path) + field_value_size(dict(data)) + 32
+
+
+# endregion ---------------------------------------------------------------------
+
+
+# region 値の比較 ---------------------------------------------------------------
+def _type_rank(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, FakeDocumentReference):
+        return 6
+    if isinstance(value, (list, tuple)):
+        return 8
+    return 9
+
+
+def compare_values(left: Any, right: Any) -> int:
+    """Firestore の型順序に従って 2 つの値を比較する。"""
+
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 6:
+        left, right = left.path, right.path
+    elif left_rank == 8:
+        for left_item, right_item in zip(left, right):
+            result = compare_values(left_item, right_item)
+            if result:
+                return result
+        left, right = len(left), len(right)
+    elif left_rank == 9:
+        return compare_values(
+            [[key, left[key]] for key in sorted(left)],
+            [[key, right[key]] for key in sorted(right)],
+        )
+    if left == right:
+        return 0
+    return -1 if left < right else 1
+
+
+def _normalize_value(value: Any) -> Any:
+    """保存時の正規化。タイムゾーンの無い日時は UTC として扱う。"""
+
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    if isinstance(value, tuple):
+        return [_normalize_value(item) for item in value]
+    if isinstance(value, list):
+        return [_normalize_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize_value(item) for key, item in value.items()}
+    return value
+
+
+_MISSING = object()
+
+
+def _lookup(data: Mapping[str, Any], field_path: str) -> Any:
+    value: Any = data
+    for part in field_path.split("."):
+        if not isinstance(value, Mapping) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(value: Any, operator: str, expected: Any) -> bool:
+    if value is _MISSING:
+        return False
+    if operator == "==":
+        return compare_values(value, expected) == 0
+    if operator == "!=":
+        return compare_values(value, expected) != 0
+    if operator in _RANGE_OPERATORS:
+        if _type_rank(value) != _type_rank(expected):
+            return False
+        result = compare_values(value, expected)
+        return {
+            "<": result < 0,
+            "<=": result <= 0,
+            ">": result > 0,
+            ">=": result >= 0,
+        }[operator]
+    if operator == "in":
+        return any(compare_values(value, item) == 0 for item in expected)
+    if operator == "not-in":
+        return all(compare_values(value, item) != 0 for item in expected)
+    if operator == "array_contains":
+        return isinstance(value, list) and any(
+            compare_values(item, expected) == 0 for item in value
+        )
+    if operator == "array_contains_any":
+        return isinstance(value, list) and any(
+            compare_values(item, candidate) == 0
+            for item in value
+            for candidate in expected
+        )
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+# endregion ---------------------------------------------------------------------
+
+
+# region 書き込み変換 -----------------------------------------------------------
+def _apply_transform(current: Any, value: Any, now: datetime) -> Any:
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        for item in value.values:
+            if not any(compare_values(existing, item) == 0 for existing in result):
+                result.append(_normalize_value(copy.deepcopy(item)))
+        return result
+    if isinstance(value, ArrayRemove):
+        if not isinstance(current, list):
+            return []
+        return [
+            existing
+            for existing in current
+            if not any(compare_values(existing, item) == 0 for item in value.values)
+        ]
+    if isinstance(value, Increment):
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            return current + value.value
+        return value.value
+    return _normalize_value(copy.deepcopy(value))
+
+
+def _set_field(target: dict[str, Any], key: str, value: Any, now: datetime) -> None:
+    if value is DELETE_FIELD:
+        target.pop(key, None)
+    elif isinstance(value, Mapping):
+        child = target.get(key)
+        if not isinstance(child, dict):
+            child = {}
+            target[key] = child
+        _merge(child, value, now)
+    else:
+        target[key] = _apply_transform(target.get(key), value, now)
+
+
+def _set_path(data: dict[str, Any], field_path: str, value: Any, now: datetime) -> None:
+    """`update` と同様にドット区切りのパスへ値を書き込む。マップは置き換える。"""
+
+    parts = field_path.split(".")
+    target = data
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = {}
+            target[part] = child
+        target = child
+    if isinstance(value, Mapping):
+        target.pop(parts[-1], None)
+    _set_field(target, parts[-1], value, now)
+
+
+def _merge(target: dict[str, Any], data: Mapping[str, Any], now: datetime) -> None:
+    """`set` と同様にキーをそのままフィールド名として書き込み、マップは再帰的に統合する。"""
+
+    for key, value in data.items():
+        _set_field(target, str(key), value, now)
+
+
+# endregion ---------------------------------------------------------------------
+
+
+class FakeDocumentSnapshot:
+    """`DocumentSnapshot` と同じ形で読めるスナップショット。"""
+
+    def __init__(
+        self, reference: FakeDocumentReference, data: dict[str, Any] | None
+    ) -> None:
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        if self._data is None:
+            return None
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        if self._data is None:
+            return None
+        value = _lookup(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class FakeDocumentReference:
+    """`DocumentReference` 互換の参照。"""
+
+    def __init__(self, client: FakeFirestoreClient, path: str) -> None:
+        self._client = client
+        self.path = path
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    def __repr__(self) -> str:
+        return f"FakeDocumentReference({self.path!r})"
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> FakeCollectionReference:
+        return FakeCollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(
+        self,
+        field_paths: Iterable[str] | None = None,
+        *,
+        transaction: FakeTransaction | None = None,
+    ) -> FakeDocumentSnapshot:
+        return self._client._read_documents(
+            [self], field_paths=field_paths, operation="get"
+        )[0]
+
+    def create(self, document_data: Mapping[str, Any]) -> None:
+        self._client._commit_writes([("create", self, dict(document_data))])
+
+    def set(self, document_data: Mapping[str, Any], merge: bool = False) -> None:
+        operation = "merge" if merge else "set"
+        self._client._commit_writes([(operation, self, dict(document_data))])
+
+    def update(self, field_updates: Mapping[str, Any]) -> None:
+        self._client._commit_writes([("update", self, dict(field_updates))])
+
+    def delete(self) -> None:
+        self._client._commit_writes([("delete", self, None)])
+
+
+class FakeQuery:
+    """`Query` 互換の不変クエリ。各メソッドは新しいクエリを返す。"""
+
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(
+        self,
+        client: FakeFirestoreClient,
+        collection_path: str,
+        *,
+        filters: tuple[tuple[str, str, Any], ...] = (),
+        orders: tuple[tuple[str, str], ...] = (),
+        cursor: tuple[Any, ...] | None = None,
+        projection: tuple[str, ...] | None = None,
+        limit: int | None = None,
+    ) -> None:
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = filters
+        self._orders = orders
+        self._cursor = cursor
+        self._projection = projection
+        self._limit = limit
+
+    def _copy(self, **changes: Any) -> FakeQuery:
+        values = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "cursor": self._cursor,
+            "projection": self._projection,
+            "limit": self._limit,
+        }
+        values.update(changes)
+        return FakeQuery(self._client, self._collection_path, **values)
+
+    def where(
+        self,
+        field_path: str | None = None,
+        op_string: str | None = None,
+        value: Any = None,
+        *,
+        filter: Any = None,
+    ) -> FakeQuery:
+        if filter is not None:
+            field_path, op_string, value = (
+                filter.field_path,
+                filter.op_string,
+                filter.value,
+            )
+        if field_path is None or op_string is None:
+            raise ValueError("where() requires a field path and an operator")
+        return self._copy(filters=self._filters + ((str(field_path), op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> FakeQuery:
+        normalized = str(direction).upper()
+        if normalized not in (ASCENDING, DESCENDING):
+            raise ValueError(f"Invalid direction: {direction}")
+        return self._copy(orders=self._orders + ((str(field_path), normalized),))
+
+    def start_after(self, document_fields_or_snapshot: Any) -> FakeQuery:
+        if not self._orders:
+            raise ValueError("start_after() requires order_by()")
+        source = document_fields_or_snapshot
+        if isinstance(source, FakeDocumentSnapshot):
+            data = source.to_dict() or {}
+            values = [
+                source.id if path == DOCUMENT_ID_FIELD else _lookup(data, path)
+                for path, _ in self._orders
+            ]
+        elif isinstance(source, Mapping):
+            values = [source[path] for path, _ in self._orders if path in source]
+        else:
+            values = list(source)
+        return self._copy(cursor=tuple(values))
+
+    def select(self, field_paths: Iterable[str]) -> FakeQuery:
+        return self._copy(projection=tuple(field_paths))
+
+    def limit(self, count: int) -> FakeQuery:
+        return self._copy(limit=count)
+
+    def stream(self, transaction: FakeTransaction | None = None) -> Iterator[FakeDocumentSnapshot]:
+        return iter(self._client._run_query(self))
+
+    def get(self, transaction: FakeTransaction | None = None) -> list[FakeDocumentSnapshot]:
+        return self._client._run_query(self)
+
+    # region 評価 -------------------------------------------------------------
+    def _effective_orders(self) -> list[tuple[str, str]]:
+        orders = list(self._orders)
+        ordered_paths = {path for path, _ in orders}
+        for path, operator, _ in self._filters:
+            if operator in _RANGE_OPERATORS or operator in ("!=", "not-in"):
+                if path not in ordered_paths:
+                    orders.insert(0, (path, ASCENDING))
+                    ordered_paths.add(path)
+                break
+        if DOCUMENT_ID_FIELD not in ordered_paths:
+            direction = orders[-1][1] if orders else ASCENDING
+            orders.append((DOCUMENT_ID_FIELD, direction))
+        return orders
+
+    def _required_index(self) -> tuple[tuple[str, ...], tuple[IndexField, ...]] | None:
+        """単一フィールドの自動インデックスで足りない場合に必要な構成を返す。"""
+
+        equality = tuple(
+            dict.fromkeys(
+                path
+                for path, operator, _ in self._filters
+                if operator in _EQUALITY_OPERATORS and path != DOCUMENT_ID_FIELD
+            )
+        )
+        ordered = tuple(
+            IndexField(path, direction)
+            for path, direction in self._effective_orders()
+            if path != DOCUMENT_ID_FIELD and path not in equality
+        )
+        if not ordered or (not equality and len(ordered) == 1):
+            return None
+        return equality, ordered
+
+    def _evaluate(
+        self, documents: Iterable[tuple[FakeDocumentReference, dict[str, Any]]]
+    ) -> list[tuple[FakeDocumentReference, dict[str, Any]]]:
+        def value_of(reference: FakeDocumentReference, data: dict, path: str) -> Any:
+            return reference.id if path == DOCUMENT_ID_FIELD else _lookup(data, path)
+
+        orders = self._effective_orders()
+        matched = [
+            (reference, data)
+            for reference, data in documents
+            if all(
+                _matches(value_of(reference, data, path), operator, expected)
+                for path, operator, expected in self._filters
+            )
+            and all(
+                value_of(reference, data, path) is not _MISSING for path, _ in orders
+            )
+        ]
+
+        def compare(values: Sequence[Any], other: Sequence[Any]) -> int:
+            for (_, direction), left, right in zip(orders, values, other):
+                result = compare_values(left, right)
+                if result:
+                    return -result if direction == DESCENDING else result
+            return 0
+
+        keyed = [
+            ([value_of(reference, data, path) for path, _ in orders], reference, data)
+            for reference, data in matched
+        ]
+        keyed.sort(key=cmp_to_key(lambda left, right: compare(left[0], right[0])))
+        if self._cursor is not None:
+            cursor = list(self._cursor)
+            keyed = [
+                item for item in keyed if compare(item[0][: len(cursor)], cursor) > 0
+            ]
+        if self._limit is not None:
+            keyed = keyed[: self._limit]
+        return [(reference, data) for _, reference, data in keyed]
+
+    # endregion ----------------------------------------------------------------
+
+
+class FakeCollectionReference(FakeQuery):
+    """`CollectionReference` 互換の参照。"""
+
+    def __init__(self, client: FakeFirestoreClient, path: str) -> None:
+        super().__init__(client, path)
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str | None = None) -> FakeDocumentReference:
+        if document_id is None:
+            document_id = uuid.uuid4().hex[:20]
+        return FakeDocumentReference(self._client, f"{self.path}/{document_id}")
+
+    def add(
+        self, document_data: Mapping[str, Any], document_id: str | None = None
+    ) -> tuple[datetime, FakeDocumentReference]:
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return self._client._clock(), reference
+
+    def list_documents(self) -> list[FakeDocumentReference]:
+        return [
+            FakeDocumentReference(self._client, path)
+            for path in self._client._paths_in(self.path)
+        ]
+
+
+class FakeWriteBatch:
+    """`WriteBatch` 互換。`commit()` で全ての書き込みを原子的に適用する。"""
+
+    def __init__(self, client: FakeFirestoreClient) -> None:
+        self._client = client
+        self._writes: list[tuple[str, FakeDocumentReference, dict | None]] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def create(self, reference: FakeDocumentReference, document_data: Mapping[str, Any]) -> None:
+        self._writes.append(("create", reference, dict(document_data)))
+
+    def set(
+        self,
+        reference: FakeDocumentReference,
+        document_data: Mapping[str, Any],
+        merge: bool = False,
+    ) -> None:
+        self._writes.append(("merge" if merge else "set", reference, dict(document_data)))
+
+    def update(self, reference: FakeDocumentReference, field_updates: Mapping[str, Any]) -> None:
+        self._writes.append(("update", reference, dict(field_updates)))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._writes.append(("delete", reference, None))
+
+    def commit(self) -> list[Any]:
+        writes, self._writes = self._writes, []
+        self._client._commit_writes(writes)
+        return []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """`Transaction` 互換。
+
+    `firestore.transactional` が呼び出す `_begin` / `_commit` / `_rollback` /
+    `_clean_up` を実装し、読み取りは通常の RPC として、書き込みはコミット時に
+    まとめて適用する。
+    """
+
+    def __init__(self, client: FakeFirestoreClient, *, max_attempts: int = 5) -> None:
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = False
+        self._id: bytes | None = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    @property
+    def id(self) -> bytes | None:
+        return self._id
+
+    def get(self, ref_or_query: Any) -> Any:
+        if isinstance(ref_or_query, FakeDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+    def get_all(self, references: Iterable[FakeDocumentReference]) -> Iterator[FakeDocumentSnapshot]:
+        return self._client.get_all(references, transaction=self)
+
+    def _clean_up(self) -> None:
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id: bytes | None = None) -> None:
+        if self.in_progress:
+            raise ValueError("Transaction already in progress")
+        self._client._round_trip("begin_transaction")
+        self._id = self._client._next_transaction_id()
+
+    def _rollback(self) -> None:
+        if not self.in_progress:
+            raise ValueError("Transaction not in progress")
+        self._client._round_trip("rollback")
+        self._clean_up()
+
+    def _commit(self) -> list[Any]:
+        if not self.in_progress:
+            raise ValueError("Transaction not in progress")
+        # 本物と同じく、コミットに失敗したらロールバックできるよう成功後に片付ける。
+        self._client._commit_writes(self._writes)
+        self._clean_up()
+        return []
+
+    def commit(self) -> list[Any]:
+        return self._commit()
+
+
+class FakeFirestoreClient:
+    """`firestore.Client` の代わりに使うインメモリクライアント。
+
+    `latency` には全 RPC 共通の秒数か、操作名 (`get` / `get_all` / `query` /
+    `commit` / `begin_transaction` / `rollback`) ごとの秒数を渡す。`indexes`
+    を渡すと、複合インデックスが必要なクエリのうち定義に無いものは本番と同様に
+    `FailedPrecondition` で失敗する。
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float | Mapping[str, float] = 0.0,
+        indexes: Iterable[CompositeIndex] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ) -> None:
+        self._latency = latency
+        self._indexes = tuple(indexes) if indexes is not None else None
+        self._sleep = sleep
+        self._clock = clock
+        self._documents: dict[str, dict[str, Any]] = {}
+        self._stats = FirestoreOperationStats()
+        self._lock = threading.RLock()
+        self._transaction_ids = itertools.count(1)
+
+    # region 公開API -----------------------------------------------------------
+    def collection(self, collection_path: str) -> FakeCollectionReference:
+        if collection_path.count("/") % 2:
+            raise ValueError(f"Not a collection path: {collection_path}")
+        return FakeCollectionReference(self, collection_path)
+
+    def document(self, document_path: str) -> FakeDocumentReference:
+        if not document_path.count("/") % 2:
+            raise ValueError(f"Not a document path: {document_path}")
+        return FakeDocumentReference(self, document_path)
+
+    def get_all(
+        self,
+        references: Iterable[FakeDocumentReference],
+        field_paths: Iterable[str] | None = None,
+        transaction: FakeTransaction | None = None,
+    ) -> Iterator[FakeDocumentSnapshot]:
+        unique = list(dict.fromkeys(references))
+        return iter(
+            self._read_documents(unique, field_paths=field_paths, operation="get_all")
+        )
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> FakeTransaction:
+        transaction = FakeTransaction(self, max_attempts=max_attempts)
+        transaction._read_only = read_only
+        return transaction
+
+    def stats(self) -> FirestoreOperationStats:
+        """累計のスナップショットを返す。"""
+
+        with self._lock:
+            return replace(
+                self._stats,
+                round_trips_by_operation=dict(self._stats.round_trips_by_operation),
+            )
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = FirestoreOperationStats()
+
+    def dump(self) -> dict[str, dict[str, Any]]:
+        """保存中の全ドキュメントをパスごとに返す。"""
+
+        with self._lock:
+            return copy.deepcopy(self._documents)
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部処理 ---------------------------------------------------------
+    def _round_trip(self, operation: str) -> None:
+        if isinstance(self._latency, Mapping):
+            delay = self._latency.get(operation, 0.0)
+        else:
+            delay = self._latency
+        if delay > 0:
+            self._sleep(delay)
+        with self._lock:
+            self._stats.round_trips += 1
+            counts = self._stats.round_trips_by_operation
+            counts[operation] = counts.get(operation, 0) + 1
+
+    def _next_transaction_id(self) -> bytes:
+        return str(next(self._transaction_ids)).encode("ascii")
+
+    def _paths_in(self, collection_path: str) -> list[str]:
+        prefix = f"{collection_path}/"
+        return [
+            path
+            for path in self._documents
+            if path.startswith(prefix) and "/" not in path[len(prefix) :]
+        ]
+
+    @staticmethod
+    def _project(data: dict[str, Any], field_paths: Iterable[str] | None) -> dict[str, Any]:
+        if field_paths is None:
+            return copy.deepcopy(data)
+        projected: dict[str, Any] = {}
+        for field_path in field_paths:
+            value = _lookup(data, field_path)
+            if value is not _MISSING:
+                _set_path(projected, field_path, copy.deepcopy(value), datetime.min)
+        return projected
+
+    def _read_documents(
+        self,
+        references: Sequence[FakeDocumentReference],
+        *,
+        field_paths: Iterable[str] | None,
+        operation: str,
+    ) -> list[FakeDocumentSnapshot]:
+        self._round_trip(operation)
+        fields = list(field_paths) if field_paths is not None else None
+        with self._lock:
+            snapshots: list[FakeDocumentSnapshot] = []
+            for reference in references:
+                stored = self._documents.get(reference.path)
+                data = self._project(stored, fields) if stored is not None else None
+                if data is not None:
+                    self._stats.bytes_read += document_size(reference.path, data)
+                snapshots.append(FakeDocumentSnapshot(reference, data))
+            self._stats.reads += len(references)
+        return snapshots
+
+    def _check_index(self, query: FakeQuery) -> None:
+        if self._indexes is None:
+            return
+        required = query._required_index()
+        if required is None:
+            return
+        equality, ordered = required
+        collection_group = query._collection_path.rsplit("/", 1)[-1]
+        for index in self._indexes:
+            if index.collection_group != collection_group:
+                continue
+            prefix, suffix = index.fields[: len(equality)], index.fields[len(equality) :]
+            if {index_field.field_path for index_field in prefix} != set(equality):
+                continue
+            if suffix == ordered:
+                return
+        fields = [*equality, *(f"{f.field_path} {f.order}" for f in ordered)]
+        raise google_exceptions.FailedPrecondition(
+            f"The query requires an index on {collection_group}: {', '.join(fields)}"
+        )
+
+    def _run_query(self, query: FakeQuery) -> list[FakeDocumentSnapshot]:
+        self._round_trip("query")
+        self._check_index(query)
+        with self._lock:
+            documents = [
+                (FakeDocumentReference(self, path), self._documents[path])
+                for path in self._paths_in(query._collection_path)
+            ]
+            results = [
+                FakeDocumentSnapshot(reference, self._project(data, query._projection))
+                for reference, data in query._evaluate(documents)
+            ]
+            self._stats.reads += max(1, len(results))
+            self._stats.bytes_read += sum(
+                document_size(snapshot.reference.path, snapshot._data or {})
+                for snapshot in results
+            )
+        return results
+
+    def _commit_writes(
+        self, writes: Sequence[tuple[str, FakeDocumentReference, dict | None]]
+    ) -> None:
+        if len(writes) > MAX_WRITES_PER_COMMIT:
+            raise google_exceptions.InvalidArgument(
+                f"maximum {MAX_WRITES_PER_COMMIT} writes allowed per request"
+            )
+        self._round_trip("commit")
+        now = self._clock()
+        with self._lock:
+            # 検証と適用を分け、途中で失敗した場合は何も書き込まない。
+            staged = dict(self._documents)
+            written: list[str] = []
+            deleted = 0
+            for operation, reference, data in writes:
+                path = reference.path
+                current = staged.get(path)
+                if operation == "delete":
+                    staged.pop(path, None)
+                    deleted += 1
+                    continue
+                if operation == "create" and current is not None:
+                    raise google_exceptions.AlreadyExists(f"Document already exists: {path}")
+                if operation == "update" and current is None:
+                    raise google_exceptions.NotFound(f"No document to update: {path}")
+                document: dict[str, Any] = (
+                    copy.deepcopy(current)
+                    if operation in ("update", "merge") and current is not None
+                    else {}
+                )
+                if operation == "update":
+                    for field_path, value in (data or {}).items():
+                        _set_path(document, field_path, value, now)
+                else:
+                    _merge(document, data or {}, now)
+                field_value_size(document)
+                staged[path] = document
+                written.append(path)
+
+            self._documents = staged
+            self._stats.writes += len(written)
+            self._stats.deletes += deleted
+            self._stats.bytes_written += sum(
+                document_size(path, staged[path]) for path in written if path in staged
+            )
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = [
+    "FakeCollectionReference",
+    "FakeDocumentReference",
+    "FakeDocumentSnapshot",
+    "FakeFirestoreClient",
+    "FakeQuery",
+    "FakeTransaction",
+    "FakeWriteBatch",
+    "FirestoreOperationStats",
+    "compare_values",
+    "document_size",
+]
@@ -0,0 +1,113 @@
+"""履歴の書き込みと同時に更新する連続担当集計の補助処理。"""
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timezone
+from typing import Any
+
+from domain import StreakAggregate
+from domain.services.streak_service import STREAK_LOOKBACK, apply_assignments
+
+from db.serializers import (
+    deserialize_streak_aggregate,
+    ensure_datetime,
+    serialize_streak_aggregate,
+)
+
+STREAK_AGGREGATES_COLLECTION = "history_streaks"
+# 集計ドキュメントが無いときに、既存の履歴を遡って初期値を作る件数。
+AGGREGATE_SEED_LOOKBACK = STREAK_LOOKBACK
+
+AggregateKey = tuple[int, str]
+
+
+def streak_aggregate_document_id(guild_id: int, template_title: str) -> str:
+    """集計ドキュメントの ID を返す。
+
+    タイトルには `/` など ID に使えない文字が含まれ得るため、ハッシュ化する。
+    """
+
+    digest = hashlib.sha256(template_title.encode("utf-8")).hexdigest()[:32]
+    return f"{guild_id}_{digest}"
+
+
+def history_aggregate_key(data: Mapping[str, Any]) -> AggregateKey:
+    return data["guild_id"], data["template_title"]
+
+
+def _history_assignments(data: Mapping[str, Any]) -> list[tuple[int, str]]:
+    return [
+        (entry["user_id"], entry["choice"])
+        for entry in data.get("entries") or []
+        if isinstance(entry, Mapping)
+    ]
+
+
+def _created_at(data: Mapping[str, Any]) -> datetime:
+    created_at = ensure_datetime(data.get("created_at"))
+    if created_at is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if created_at.tzinfo is None:
+        return created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+def apply_history_documents(
+    aggregate: StreakAggregate, documents: Iterable[Mapping[str, Any]]
+) -> StreakAggregate:
+    """履歴ドキュメントを古い順に集計へ反映する。"""
+
+    for data in sorted(documents, key=_created_at):
+        apply_assignments(aggregate, _history_assignments(data))
+        created_at = ensure_datetime(data.get("created_at"))
+        if created_at is not None:
+            aggregate.updated_at = created_at
+    return aggregate
+
+
+def restore_streak_aggregate(
+    stored: Mapping[str, Any] | None,
+    *,
+    key: AggregateKey,
+    seed_documents: Iterable[Mapping[str, Any]] = (),
+) -> StreakAggregate:
+    """保存済みの集計を復元する。無い (壊れている) 場合は履歴から組み立てる。"""
+
+    if stored is not None:
+        try:
+            return deserialize_streak_aggregate(stored)
+        except (KeyError, TypeError, ValueError):
+            pass
+    guild_id, template_title = key
+    aggregate = StreakAggregate(guild_id=guild_id, template_title=template_title)
+    return apply_history_documents(aggregate, seed_documents)
+
+
+def plan_streak_aggregate_writes(
+    aggregates: Mapping[AggregateKey, StreakAggregate],
+    entries: Iterable[Mapping[str, Any]],
+) -> dict[AggregateKey, dict[str, Any]]:
+    """書き込む履歴を反映した集計ドキュメントをキーごとに組み立てる。"""
+
+    grouped: dict[AggregateKey, list[Mapping[str, Any]]] = {}
+    for data in entries:
+        grouped.setdefault(history_aggregate_key(data), []).append(data)
+    return {
+        key: serialize_streak_aggregate(
+            apply_history_documents(aggregates[key], documents)
+        )
+        for key, documents in grouped.items()
+    }
+
+
+__all__ = [
+    "AGGREGATE_SEED_LOOKBACK",
+    "AggregateKey",
+    "STREAK_AGGREGATES_COLLECTION",
+    "apply_history_documents",
+    "history_aggregate_key",
+    "plan_streak_aggregate_writes",
+    "restore_streak_aggregate",
+    "streak_aggregate_document_id",
+]
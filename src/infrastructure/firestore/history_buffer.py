@@ -0,0 +1,292 @@
+"""抽選履歴を溜めてまとめて書き込むライトビハインドバッファ。"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+import string
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+from typing import Any
+
+from utils import ERROR, INFO
+
+from .repositories import HISTORY_ID_FIELD, MAX_HISTORY_ENTRIES_PER_COMMIT
+
+HistoryBatchSink = Callable[[list[dict[str, Any]]], Awaitable[None]]
+
+DEFAULT_MAX_BATCH_SIZE = 20
+DEFAULT_FLUSH_INTERVAL_SECONDS = 2.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_MAX_BACKLOG = 1000
+
+_HISTORY_ID_ALPHABET = string.ascii_letters + string.digits
+_HISTORY_ID_LENGTH = 20
+
+
+def new_history_id() -> str:
+    """Firestore の自動 ID と同じ形式 (英数字 20 文字) の履歴 ID を返す。"""
+
+    return "".join(
+        secrets.choice(_HISTORY_ID_ALPHABET) for _ in range(_HISTORY_ID_LENGTH)
+    )
+
+
+@dataclass(slots=True)
+class HistoryBufferStats:
+    """書き込みバッファの利用状況。"""
+
+    enqueued: int = 0
+    flushed: int = 0
+    batches: int = 0
+    failed_flushes: int = 0
+    dead_lettered: int = 0
+    backlog: int = 0
+    max_backlog: int = 0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    total_flush_seconds: float = 0.0
+
+    @property
+    def average_flush_seconds(self) -> float:
+        if self.batches == 0:
+            return 0.0
+        return self.total_flush_seconds / self.batches
+
+
+class HistoryWriteBuffer:
+    """履歴ドキュメントをキューに溜め、件数または経過時間で一括書き込みする。
+
+    `enqueue` は待たずに戻り、`max_batch_size` 件に達するか最初の追加から
+    `flush_interval` 秒が経過した時点で `sink` へまとめて渡す。履歴 ID
+    (`history_id`) は追加時に採番し、書き込みに失敗したバッチは同じ ID・
+    同じ組み合わせのまま次の周期で再送する。`max_attempts` 回失敗したバッチは
+    ログへ退避して破棄し、滞留が `max_backlog` 件に達すると追加を拒否する。
+    イベントループ上でのみ利用する想定のため、スレッド間の排他は行わない。
+    """
+
+    def __init__(
+        self,
+        sink: HistoryBatchSink,
+        *,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        # 1 バッチを 1 回のトランザクションに収め、再送時に一部だけ書き込み済み
+        # という状態が起きないようにする。
+        if not 1 <= max_batch_size <= MAX_HISTORY_ENTRIES_PER_COMMIT:
+            raise ValueError(
+                "max_batch_size must be between 1 and "
+                f"{MAX_HISTORY_ENTRIES_PER_COMMIT}"
+            )
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be positive")
+        if max_backlog < max_batch_size:
+            raise ValueError("max_backlog must be at least max_batch_size")
+
+        self._sink = sink
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._max_attempts = max_attempts
+        self._max_backlog = max_backlog
+        self._clock = clock
+        self._pending: list[dict[str, Any]] = []
+        self._retry: list[dict[str, Any]] = []
+        self._attempts = 0
+        self._in_flight: list[dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[int]] = set()
+        self._stats = HistoryBufferStats()
+        self._closed = False
+
+    # region プロパティ/設定系 -------------------------------------------------
+    @property
+    def backlog(self) -> int:
+        return len(self._retry) + len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def stats(self) -> HistoryBufferStats:
+        """書き込み件数・滞留件数・書き込み所要時間のスナップショットを返す。"""
+
+        return replace(self._stats, backlog=self.backlog)
+
+    def has_capacity(self, count: int = 1) -> bool:
+        """`count` 件を追加しても滞留の上限を超えなければ True を返す。"""
+
+        return len(self._in_flight) + self.backlog + count <= self._max_backlog
+
+    # endregion ----------------------------------------------------------------
+
+    # region 公開API -----------------------------------------------------------
+    def enqueue(self, data: dict[str, Any]) -> None:
+        """履歴をキューへ追加する。書き込みはバックグラウンドで行われる。
+
+        `history_id` が無ければここで採番し、再送しても同じドキュメントへ書き込む。
+        """
+
+        if self._closed:
+            raise RuntimeError("HistoryWriteBuffer is closed")
+        if not self.has_capacity():
+            raise RuntimeError("HistoryWriteBuffer is full")
+
+        entry = dict(data)
+        entry.setdefault(HISTORY_ID_FIELD, new_history_id())
+        self._pending.append(entry)
+        self._stats.enqueued += 1
+        self._stats.max_backlog = max(self._stats.max_backlog, self.backlog)
+
+        if len(self._pending) >= self._max_batch_size:
+            self._schedule_flush()
+        else:
+            self._arm_timer()
+
+    def pending(self, *, guild_id: int | None = None) -> list[dict[str, Any]]:
+        """未書き込み (書き込み中を含む) の履歴を返す。読み込み結果へ合成する。"""
+
+        return [
+            dict(data)
+            for data in (*self._in_flight, *self._retry, *self._pending)
+            if guild_id is None or data.get("guild_id") == guild_id
+        ]
+
+    async def flush(self) -> int:
+        """溜まっている履歴を全て書き込み、書き込んだ件数を返す。"""
+
+        async with self._flush_lock:
+            return await self._drain()
+
+    async def write_through(self, entries: list[dict[str, Any]]) -> None:
+        """滞留分を書き込んでから、`entries` をキューを経由せずに書き込む。
+
+        滞留が上限に達したときに使う。書き込みの順序を保つため、滞留分を
+        書き込めなかった場合は `entries` を書き込まずに `RuntimeError` を送出する。
+        """
+
+        batch = [dict(data) for data in entries]
+        for data in batch:
+            data.setdefault(HISTORY_ID_FIELD, new_history_id())
+
+        async with self._flush_lock:
+            await self._drain()
+            if self.backlog:
+                raise RuntimeError("HistoryWriteBuffer could not flush its backlog")
+            self._in_flight = batch
+            try:
+                await self._sink(batch)
+            finally:
+                self._in_flight = []
+
+    async def close(self) -> None:
+        """新規追加を止め、実行中の書き込みを待ってから残りを書き込む。"""
+
+        self._closed = True
+        self._cancel_timer()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+        if self.backlog:
+            logging.error(
+                ERROR
+                + f"{self.backlog} history entries could not be written on shutdown."
+            )
+        else:
+            logging.info(INFO + "History write buffer flushed.")
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部ヘルパー -----------------------------------------------------
+    async def _drain(self) -> int:
+        """`_flush_lock` を保持した状態で、滞留分を古い順に書き込む。"""
+
+        self._cancel_timer()
+        written = 0
+        while self._retry or self._pending:
+            if self._retry:
+                # 失敗したバッチは組み合わせを変えずに再送する。
+                batch, self._retry = self._retry, []
+            else:
+                batch = self._pending[: self._max_batch_size]
+                del self._pending[: len(batch)]
+            self._in_flight = batch
+            started_at = self._clock()
+            try:
+                await self._sink(batch)
+            except Exception:
+                self._stats.failed_flushes += 1
+                self._attempts += 1
+                if self._attempts >= self._max_attempts:
+                    logging.exception(
+                        ERROR
+                        + f"Dropping {len(batch)} history entries after "
+                        + f"{self._attempts} failed attempts."
+                    )
+                    self._dead_letter(batch)
+                else:
+                    self._retry = batch
+                    logging.exception(
+                        ERROR
+                        + f"Failed to flush {len(batch)} history entries; will retry."
+                    )
+                if not self._closed:
+                    self._arm_timer()
+                break
+            finally:
+                self._in_flight = []
+
+            self._attempts = 0
+
+            elapsed = self._clock() - started_at
+            self._stats.batches += 1
+            self._stats.flushed += len(batch)
+            self._stats.last_flush_seconds = elapsed
+            self._stats.max_flush_seconds = max(self._stats.max_flush_seconds, elapsed)
+            self._stats.total_flush_seconds += elapsed
+            written += len(batch)
+        return written
+
+    def _dead_letter(self, batch: list[dict[str, Any]]) -> None:
+        self._attempts = 0
+        self._stats.dead_lettered += len(batch)
+        for data in batch:
+            logging.error(ERROR + f"Dead-lettered history entry: {data!r}")
+
+    def _arm_timer(self) -> None:
+        if self._timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(self._flush_interval, self._schedule_flush)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule_flush(self) -> None:
+        self._cancel_timer()
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = [
+    "DEFAULT_FLUSH_INTERVAL_SECONDS",
+    "DEFAULT_MAX_ATTEMPTS",
+    "DEFAULT_MAX_BACKLOG",
+    "DEFAULT_MAX_BATCH_SIZE",
+    "HistoryBatchSink",
+    "HistoryBufferStats",
+    "HistoryWriteBuffer",
+    "new_history_id",
+]
@@ -0,0 +1,215 @@
+"""Firestore の複合インデックス定義と、それに沿った履歴クエリの組み立て。
+
+履歴の取得条件 (ギルド・テンプレート名・期間・カーソル・件数) は全てサーバー
+側で評価する。必要なインデックスが無い場合はクエリを全件走査に切り替えず
+`MissingIndexError` を送出し、`firestore.indexes.json` の作成を促す。
+"""
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID
+
+from .user_templates import USER_TEMPLATES_SUBCOLLECTION
+
+# 取得後の絞り込み・並び替え・カーソル計算で参照するため、射影時も必ず読むフィールド。
+HISTORY_QUERY_FIELDS: tuple[str, ...] = ("guild_id", "template_title", "created_at")
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+INDEX_MANIFEST_FILENAME = "firestore.indexes.json"
+
+
+@dataclass(frozen=True, slots=True)
+class IndexField:
+    field_path: str
+    order: str = ASCENDING
+
+
+@dataclass(frozen=True, slots=True)
+class CompositeIndex:
+    """`firestore.indexes.json` の 1 エントリーに対応する複合インデックス。"""
+
+    collection_group: str
+    fields: tuple[IndexField, ...]
+    query_scope: str = "COLLECTION"
+
+    def describe(self) -> str:
+        fields = ", ".join(f"{field.field_path} {field.order}" for field in self.fields)
+        return f"{self.collection_group} ({fields})"
+
+    def to_manifest(self) -> dict[str, Any]:
+        return {
+            "collectionGroup": self.collection_group,
+            "queryScope": self.query_scope,
+            "fields": [
+                {"fieldPath": field.field_path, "order": field.order}
+                for field in self.fields
+            ],
+        }
+
+
+HISTORY_BY_GUILD_INDEX = CompositeIndex(
+    "history",
+    (IndexField("guild_id"), IndexField("created_at", DESCENDING)),
+)
+HISTORY_BY_TEMPLATE_INDEX = CompositeIndex(
+    "history",
+    (
+        IndexField("guild_id"),
+        IndexField("template_title"),
+        IndexField("created_at", DESCENDING),
+    ),
+)
+USER_TEMPLATES_INDEX = CompositeIndex(
+    USER_TEMPLATES_SUBCOLLECTION,
+    (IndexField("created_at"), IndexField("template_id")),
+)
+
+REQUIRED_INDEXES: tuple[CompositeIndex, ...] = (
+    HISTORY_BY_GUILD_INDEX,
+    HISTORY_BY_TEMPLATE_INDEX,
+    USER_TEMPLATES_INDEX,
+)
+
+
+class MissingIndexError(RuntimeError):
+    """クエリに必要な複合インデックスが作成されていない。"""
+
+    def __init__(self, index: CompositeIndex, detail: str = "") -> None:
+        message = (
+            f"Missing Firestore composite index: {index.describe()}. "
+            f"Deploy {INDEX_MANIFEST_FILENAME} "
+            "(firebase deploy --only firestore:indexes)."
+        )
+        if detail:
+            message += f" {detail}"
+        super().__init__(message)
+        self.index = index
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryQueryPlan:
+    """履歴の取得条件と、それを満たすインデックスの組。
+
+    同時刻の履歴でもページ境界がずれないよう、ドキュメント ID を第 2 キーにする。
+    Firestore は最後の並び順と同じ向きで ID を暗黙に並べるため、インデックス
+    定義に ID を含める必要はない。
+    """
+
+    guild_id: int
+    template_title: str | None = None
+    since: datetime | None = None
+    start_after: tuple[datetime, str] | None = None
+    limit: int = 0
+    fields: Sequence[str] | None = None
+
+    @property
+    def projection(self) -> list[str] | None:
+        """`select` に渡すフィールド。`None` はドキュメント全体を読む。"""
+
+        if self.fields is None:
+            return None
+        projection = list(HISTORY_QUERY_FIELDS)
+        projection.extend(field for field in self.fields if field not in projection)
+        return projection
+
+    @property
+    def index(self) -> CompositeIndex:
+        if self.template_title is not None:
+            return HISTORY_BY_TEMPLATE_INDEX
+        return HISTORY_BY_GUILD_INDEX
+
+    def build(self, collection: Any) -> Any:
+        """`history` コレクション (同期・非同期どちらも可) にクエリを組み立てる。"""
+
+        query = collection.where(filter=FieldFilter("guild_id", "==", self.guild_id))
+        if self.template_title is not None:
+            query = query.where(
+                filter=FieldFilter("template_title", "==", self.template_title)
+            )
+        if self.since is not None:
+            query = query.where(filter=FieldFilter("created_at", ">=", self.since))
+        if self.start_after is not None and not self.start_after[1]:
+            # 書き込み待ちの履歴から作ったカーソルには ID が無いため、時刻だけで区切る。
+            query = query.where(
+                filter=FieldFilter("created_at", "<", self.start_after[0])
+            )
+        query = query.order_by("created_at", direction=DESCENDING).order_by(
+            FieldPath.document_id(), direction=DESCENDING
+        )
+        if self.start_after is not None and self.start_after[1]:
+            created_at, history_id = self.start_after
+            query = query.start_after(
+                {"created_at": created_at, FieldPath.document_id(): history_id}
+            )
+        projection = self.projection
+        if projection is not None:
+            query = query.select(projection)
+        if self.limit:
+            query = query.limit(self.limit)
+        return query
+
+
+def build_index_probe(client: Any, index: CompositeIndex) -> Any:
+    """インデックスの有無を確かめるための 1 件だけのクエリを返す。"""
+
+    if index is HISTORY_BY_GUILD_INDEX:
+        return HistoryQueryPlan(guild_id=0, limit=1).build(client.collection("history"))
+    if index is HISTORY_BY_TEMPLATE_INDEX:
+        return HistoryQueryPlan(guild_id=0, template_title="", limit=1).build(
+            client.collection("history")
+        )
+    if index is USER_TEMPLATES_INDEX:
+        return (
+            client.collection("users")
+            .document(COLLECTION_SENTINEL_DOCUMENT_ID)
+            .collection(USER_TEMPLATES_SUBCOLLECTION)
+            .order_by("created_at")
+            .order_by("template_id")
+            .limit(1)
+        )
+    raise ValueError(f"No probe query for index: {index.describe()}")
+
+
+def build_index_manifest(
+    indexes: tuple[CompositeIndex, ...] = REQUIRED_INDEXES,
+) -> dict[str, Any]:
+    """Firebase CLI が読み込む `firestore.indexes.json` の内容を返す。"""
+
+    return {
+        "indexes": [index.to_manifest() for index in indexes],
+        "fieldOverrides": [],
+    }
+
+
+def write_index_manifest(path: Path) -> None:
+    path.write_text(
+        json.dumps(build_index_manifest(), indent=2, ensure_ascii=False) + "\n",
+        encoding="utf-8",
+    )
+
+
+__all__ = [
+    "CompositeIndex",
+    "HISTORY_BY_GUILD_INDEX",
+    "HISTORY_BY_TEMPLATE_INDEX",
+    "HISTORY_QUERY_FIELDS",
+    "HistoryQueryPlan",
+    "INDEX_MANIFEST_FILENAME",
+    "IndexField",
+    "MissingIndexError",
+    "REQUIRED_INDEXES",
+    "USER_TEMPLATES_INDEX",
+    "build_index_manifest",
+    "build_index_probe",
+    "write_index_manifest",
+]
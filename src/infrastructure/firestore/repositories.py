@@ -1,8 +1,9 @@
 """Firestore向けのリポジトリクラス群。"""
 from __future__ import annotations
 
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 from firebase_admin import firestore
 from google.api_core import exceptions as google_exceptions
@@ -10,12 +11,61 @@ from google.cloud.firestore_v1 import FieldFilter
 
 from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID
 from db.serializers import ensure_datetime
+from domain import HISTORY_STREAK_FIELDS
+
+from .history_aggregates import (
+    AGGREGATE_SEED_LOOKBACK,
+    STREAK_AGGREGATES_COLLECTION,
+    AggregateKey,
+    history_aggregate_key,
+    plan_streak_aggregate_writes,
+    restore_streak_aggregate,
+    streak_aggregate_document_id,
+)
+from .indexes import HistoryQueryPlan, MissingIndexError
+from .shared_template_index import SharedTemplateIndex
+from .user_templates import USER_TEMPLATES_SUBCOLLECTION
 
 FirestoreClient = firestore.firestore.Client
 CollectionReference = firestore.CollectionReference
 DocumentReference = firestore.DocumentReference
 Query = firestore.Query
 
+# WriteBatch 1 回あたりの書き込み上限。
+MAX_BATCH_WRITES = 500
+# 履歴 1 件につき集計ドキュメントを最大 1 件書き込むため、その半分を上限とする。
+MAX_HISTORY_ENTRIES_PER_COMMIT = MAX_BATCH_WRITES // 2
+# 履歴の辞書でドキュメント ID を表すキー。保存時はフィールドに含めない。
+HISTORY_ID_FIELD = "history_id"
+
+_T = TypeVar("_T")
+
+# トランザクション内で読み込んだユーザードキュメントから、
+# 書き込むフィールドと呼び出し元へ返す値を組み立てる関数。
+UserDocumentMutation = Callable[[dict | None], tuple[dict[str, Any], _T]]
+# トランザクション内で読み込んだテンプレートのタイトル一覧から、
+# 追加するテンプレートドキュメントと呼び出し元へ返す値を組み立てる関数。
+UserTemplatePlan = Callable[[list[str]], tuple[dict[str, Any], _T]]
+
+
+def read_documents(
+    client: FirestoreClient, references: Sequence[DocumentReference]
+) -> list[dict | None]:
+    """複数のドキュメントを `get_all` の 1 回の往復でまとめて読み込む。
+
+    `get_all` は要求順に結果を返す保証がないため、パスで突き合わせて
+    `references` と同じ順序に並べ直す。存在しないドキュメントは `None`。
+    """
+
+    if not references:
+        return []
+
+    found: dict[str, dict | None] = {}
+    for snapshot in client.get_all(list(references)):
+        if getattr(snapshot, "exists", False):
+            found[snapshot.reference.path] = snapshot.to_dict()
+    return [found.get(reference.path) for reference in references]
+
 
 class FirestoreRepository:
     """Firestoreの単一コレクションに対する基本的な操作を提供する。"""
@@ -27,6 +77,15 @@ class FirestoreRepository:
     def document(self, document_id: str) -> DocumentReference:
         return self.ref.document(str(document_id))
 
+    def read_many(self, doc_ids: Iterable[int | str]) -> dict[str, dict | None]:
+        """複数のドキュメントを 1 回の `get_all` で読み込み、ID ごとに返す。"""
+
+        ids = list(dict.fromkeys(str(doc_id) for doc_id in doc_ids))
+        documents = read_documents(
+            self._client, [self.document(doc_id) for doc_id in ids]
+        )
+        return dict(zip(ids, documents))
+
 
 class UserRepository(FirestoreRepository):
     """`users` コレクションを操作するリポジトリ。"""
@@ -47,6 +106,229 @@ class UserRepository(FirestoreRepository):
     def delete_document(self, doc_id: int | str) -> None:
         self.document(str(doc_id)).delete()
 
+    def update_fields(self, doc_id: int | str, fields: dict[str, Any]) -> None:
+        """指定フィールドのみを更新する。ドキュメントが無い場合は `NotFound`。"""
+
+        self.document(str(doc_id)).update(fields)
+
+    def run_transaction(
+        self, doc_id: int | str, mutation: UserDocumentMutation[_T]
+    ) -> _T:
+        """ドキュメントを読み込み、`mutation` が返すフィールド更新を原子的に適用する。
+
+        競合時は Firestore が `mutation` を再実行するため、副作用を持たせないこと。
+        """
+
+        document_ref = self.document(str(doc_id))
+
+        @firestore.transactional
+        def execute(transaction: Any) -> _T:
+            snapshot = document_ref.get(transaction=transaction)
+            data = snapshot.to_dict() if snapshot.exists else None
+            fields, result = mutation(data)
+            if fields:
+                transaction.update(document_ref, fields)
+            return result
+
+        return execute(self._client.transaction())
+
+
+class UserTemplateRepository:
+    """`users/{id}/templates` サブコレクションを操作するリポジトリ。"""
+
+    def __init__(self, client: FirestoreClient) -> None:
+        self._client = client
+        self.users_ref: CollectionReference = client.collection("users")
+
+    def collection(self, user_id: int | str) -> CollectionReference:
+        return self.users_ref.document(str(user_id)).collection(
+            USER_TEMPLATES_SUBCOLLECTION
+        )
+
+    def _ordered(self, user_id: int | str) -> Query:
+        return self.collection(user_id).order_by("created_at").order_by("template_id")
+
+    def list_page(
+        self,
+        user_id: int | str,
+        *,
+        limit: int,
+        start_after: tuple[datetime, str] | None = None,
+    ) -> list[dict]:
+        query = self._ordered(user_id)
+        if start_after is not None:
+            created_at, template_id = start_after
+            query = query.start_after(
+                {"created_at": created_at, "template_id": template_id}
+            )
+        return _to_dicts(query.limit(limit).stream())
+
+    def list_all(self, user_id: int | str) -> list[dict]:
+        return _to_dicts(self._ordered(user_id).stream())
+
+    def add_template_with_titles(
+        self, user_id: int | str, plan: UserTemplatePlan[_T]
+    ) -> _T:
+        """タイトル一覧を読み、`plan` が返すテンプレートを同じトランザクションで追加する。
+
+        ユーザードキュメントも読み込んで更新するため、同じユーザーへの同時追加は
+        競合して再実行され、重複したタイトルで追加されることはない。ユーザーが
+        存在しない場合は `NotFound`。
+        """
+
+        user_ref = self.users_ref.document(str(user_id))
+        titles_query = self.collection(user_id).select(["title"])
+
+        @firestore.transactional
+        def execute(transaction: Any) -> _T:
+            if not user_ref.get(transaction=transaction).exists:
+                raise google_exceptions.NotFound(f"User {user_id} not found")
+            titles = [
+                data["title"]
+                for data in _to_dicts(titles_query.stream(transaction=transaction))
+                if isinstance(data.get("title"), str)
+            ]
+            data, result = plan(titles)
+            transaction.update(
+                user_ref, {"templates_updated_at": firestore.SERVER_TIMESTAMP}
+            )
+            transaction.set(self.collection(user_id).document(data["template_id"]), data)
+            return result
+
+        return execute(self._client.transaction())
+
+    def read_template(self, user_id: int | str, template_id: str) -> dict | None:
+        snapshot = self.collection(user_id).document(template_id).get()
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    def add_template(self, user_id: int | str, data: dict[str, Any]) -> None:
+        """テンプレートを追加する。ユーザーが存在しない場合は `NotFound`。"""
+
+        batch = self._client.batch()
+        # ユーザードキュメントを更新対象に含め、存在しない場合は書き込みごと失敗させる。
+        batch.update(
+            self.users_ref.document(str(user_id)),
+            {"templates_updated_at": firestore.SERVER_TIMESTAMP},
+        )
+        batch.set(self.collection(user_id).document(data["template_id"]), data)
+        batch.commit()
+
+    def update_template(
+        self, user_id: int | str, template_id: str, data: dict[str, Any]
+    ) -> None:
+        """既存テンプレートのフィールドを更新する。存在しない場合は `NotFound`。"""
+
+        self.collection(user_id).document(template_id).update(data)
+
+    def delete_templates(
+        self,
+        user_id: int | str,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        collection = self.collection(user_id)
+        references: dict[str, DocumentReference] = {}
+        if template_id is not None:
+            references[template_id] = collection.document(template_id)
+        if template_title is not None:
+            query = collection.where(filter=FieldFilter("title", "==", template_title))
+            for snapshot in query.stream():
+                references[snapshot.id] = snapshot.reference
+        self._commit_deletes(references.values())
+
+    def replace_all(
+        self,
+        user_id: int | str,
+        user_data: dict[str, Any],
+        templates: list[dict[str, Any]],
+    ) -> None:
+        """ユーザードキュメントとテンプレート一式を置き換える。"""
+
+        collection = self.collection(user_id)
+        keep_ids = {data["template_id"] for data in templates}
+        stale = [
+            snapshot.reference
+            for snapshot in collection.select([]).stream()
+            if snapshot.id not in keep_ids
+        ]
+
+        writes: list[tuple[str, DocumentReference, dict | None]] = [
+            ("set", self.users_ref.document(str(user_id)), user_data)
+        ]
+        writes.extend(
+            ("set", collection.document(data["template_id"]), data) for data in templates
+        )
+        writes.extend(("delete", reference, None) for reference in stale)
+        self._commit(writes)
+
+    def delete_all(self, user_id: int | str) -> None:
+        """テンプレート一式とユーザードキュメントを削除する。"""
+
+        references = [
+            snapshot.reference
+            for snapshot in self.collection(user_id).select([]).stream()
+        ]
+        references.append(self.users_ref.document(str(user_id)))
+        self._commit_deletes(references)
+
+    def list_embedded_users(self) -> Iterator[tuple[str, Any]]:
+        """`custom_templates` 配列を持つユーザーの ID と配列を列挙する。"""
+
+        for snapshot in self.users_ref.select(["custom_templates"]).stream():
+            if snapshot.id == COLLECTION_SENTINEL_DOCUMENT_ID:
+                continue
+            data = snapshot.to_dict() or {}
+            if "custom_templates" in data:
+                yield snapshot.id, data["custom_templates"]
+
+    def import_embedded(
+        self,
+        user_id: int | str,
+        templates: list[dict[str, Any]],
+        *,
+        remaining: list[Any] | None = None,
+    ) -> None:
+        """配列に埋め込まれていたテンプレートをサブコレクションへ移す。
+
+        配列の更新は最後のバッチで行うため、途中で失敗しても再実行できる。
+        `remaining` を渡した場合は、配列を削除せずにその要素だけを残す。
+        """
+
+        collection = self.collection(user_id)
+        writes: list[tuple[str, DocumentReference, dict | None]] = [
+            ("set", collection.document(data["template_id"]), data)
+            for data in templates
+        ]
+        writes.append(
+            (
+                "update",
+                self.users_ref.document(str(user_id)),
+                {
+                    "custom_templates": remaining or firestore.DELETE_FIELD,
+                    "templates_updated_at": firestore.SERVER_TIMESTAMP,
+                },
+            )
+        )
+        self._commit(writes)
+
+    def _commit_deletes(self, references: Iterable[DocumentReference]) -> None:
+        self._commit([("delete", reference, None) for reference in references])
+
+    def _commit(self, writes: list[tuple[str, DocumentReference, dict | None]]) -> None:
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self._client.batch()
+            for operation, reference, data in writes[start : start + MAX_BATCH_WRITES]:
+                if operation == "set":
+                    batch.set(reference, data)
+                elif operation == "update":
+                    batch.update(reference, data)
+                else:
+                    batch.delete(reference)
+            batch.commit()
+
 
 class InfoRepository(FirestoreRepository):
     """`info` コレクションを操作するリポジトリ。"""
@@ -70,6 +352,7 @@ class SharedTemplateRepository(FirestoreRepository):
 
     def __init__(self, client: FirestoreClient) -> None:
         super().__init__(client, "shared_templates")
+        self.index: SharedTemplateIndex | None = None
 
     def add_template(self, data: dict[str, Any]) -> str:
         template_id = str(data.get("template_id") or "").strip()
@@ -82,10 +365,14 @@ class SharedTemplateRepository(FirestoreRepository):
             data["template_id"] = template_id
 
         document_ref.set(data)
+        if self.index is not None:
+            self.index.apply_write(template_id, data)
         return template_id
 
     def delete_template(self, template_id: str) -> None:
         self.document(template_id).delete()
+        if self.index is not None:
+            self.index.apply_delete(template_id)
 
     def list_templates(
         self,
@@ -94,6 +381,13 @@ class SharedTemplateRepository(FirestoreRepository):
         guild_id: int | None = None,
         created_by: int | None = None,
     ) -> list[Any]:
+        if self.index is not None:
+            indexed = self.index.lookup(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            )
+            if indexed is not None:
+                return list(indexed)
+
         query: Query | CollectionReference = self.ref
         if scope is not None:
             query = query.where(filter=FieldFilter("scope", "==", scope))
@@ -121,10 +415,81 @@ class HistoryRepository(FirestoreRepository):
 
     def __init__(self, client: FirestoreClient) -> None:
         super().__init__(client, "history")
+        self.aggregates_ref: CollectionReference = client.collection(
+            STREAK_AGGREGATES_COLLECTION
+        )
+
+    def aggregate_document(self, guild_id: int, template_title: str) -> DocumentReference:
+        return self.aggregates_ref.document(
+            streak_aggregate_document_id(guild_id, template_title)
+        )
 
     def add_entry(self, data: dict) -> None:
-        document = self.ref.document()
-        document.set(data)
+        self.add_entries([data])
+
+    def add_entries(self, entries: list[dict]) -> None:
+        """履歴を書き込み、同じトランザクションで連続担当の集計を更新する。
+
+        `history_id` を持つ履歴はその ID で作成する。チャンク単位で書き込み済み
+        (`AlreadyExists`) なら再送とみなして読み飛ばす。
+        """
+
+        for start in range(0, len(entries), MAX_HISTORY_ENTRIES_PER_COMMIT):
+            chunk = entries[start : start + MAX_HISTORY_ENTRIES_PER_COMMIT]
+            try:
+                self._commit_entries(chunk)
+            except google_exceptions.AlreadyExists:
+                if not has_history_ids(chunk):
+                    raise
+
+    def read_aggregate(self, guild_id: int, template_title: str) -> dict | None:
+        snapshot = self.aggregate_document(guild_id, template_title).get()
+        if not snapshot.exists:
+            return None
+        return snapshot.to_dict()
+
+    def _commit_entries(self, entries: list[dict]) -> None:
+        references = {
+            key: self.aggregate_document(*key)
+            for key in dict.fromkeys(history_aggregate_key(data) for data in entries)
+        }
+
+        @firestore.transactional
+        def execute(transaction: Any) -> None:
+            aggregates = {}
+            for key, reference in references.items():
+                snapshot = reference.get(transaction=transaction)
+                stored = snapshot.to_dict() if snapshot.exists else None
+                # 集計が無ければ、同じトランザクション内で直近の履歴から初期値を作る。
+                aggregates[key] = restore_streak_aggregate(
+                    stored,
+                    key=key,
+                    seed_documents=(
+                        self._seed_documents(key, transaction=transaction)
+                        if stored is None
+                        else ()
+                    ),
+                )
+            for key, payload in plan_streak_aggregate_writes(aggregates, entries).items():
+                transaction.set(references[key], payload)
+            for data in entries:
+                history_id, payload = split_history_id(data)
+                if history_id is None:
+                    transaction.set(self.ref.document(), payload)
+                else:
+                    transaction.create(self.ref.document(history_id), payload)
+
+        execute(self._client.transaction())
+
+    def _seed_documents(self, key: AggregateKey, *, transaction: Any) -> list[dict]:
+        guild_id, template_title = key
+        return self.fetch_recent(
+            guild_id=guild_id,
+            template_title=template_title,
+            limit=AGGREGATE_SEED_LOOKBACK,
+            fields=HISTORY_STREAK_FIELDS,
+            transaction=transaction,
+        )
 
     def fetch_recent(
         self,
@@ -133,60 +498,154 @@ class HistoryRepository(FirestoreRepository):
         template_title: str | None = None,
         limit: int = 10,
         since: datetime | None = None,
+        start_after: tuple[datetime, str] | None = None,
+        fields: Sequence[str] | None = None,
+        transaction: Any | None = None,
     ) -> list[dict]:
+        """新しい順に履歴を返す。`start_after` には前ページ末尾の `(created_at, ID)` を渡す。
+
+        `fields` を指定すると、そのフィールドと絞り込みに使うフィールドだけを読み込む。
+        `transaction` を渡すと、そのトランザクションの読み取りとして実行する。
+        絞り込み・並び替え・件数制限は全てサーバー側で行う。
+        必要な複合インデックスが無い場合は `MissingIndexError` を送出する。
+        """
+
         if since is not None and since.tzinfo is None:
             since = since.replace(tzinfo=timezone.utc)
+        start_after = normalize_history_cursor(start_after)
+
+        plan = HistoryQueryPlan(
+            guild_id=guild_id,
+            template_title=template_title,
+            since=since,
+            start_after=start_after,
+            limit=limit,
+            fields=fields,
+        )
+        try:
+            snapshots = list(plan.build(self.ref).stream(transaction=transaction))
+        except google_exceptions.FailedPrecondition as exc:
+            raise MissingIndexError(plan.index, str(exc)) from exc
+
+        return filter_recent_history(
+            snapshots,
+            template_title=template_title,
+            limit=limit,
+            since=since,
+            start_after=start_after,
+        )
 
-        base_query: Query = self.ref.where(filter=FieldFilter("guild_id", "==", guild_id))
 
-        query: Query = base_query
-        if since is not None:
-            query = query.where(filter=FieldFilter("created_at", ">=", since))
-        query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
-        if template_title is None and limit:
-            query = query.limit(limit)
+def _to_dicts(snapshots: Iterable[Any]) -> list[dict]:
+    documents: list[dict] = []
+    for snapshot in snapshots:
+        data = snapshot.to_dict()
+        if isinstance(data, dict):
+            documents.append(data)
+    return documents
 
-        try:
-            snapshots = list(query.stream())
-        except google_exceptions.FailedPrecondition:
-            snapshots = list(base_query.stream())
-
-        def _normalize_created_at(value: Any) -> datetime | None:
-            normalized = ensure_datetime(value)
-            if normalized is None:
-                return None
-            if normalized.tzinfo is None:
-                return normalized.replace(tzinfo=timezone.utc)
-            return normalized
-
-        filtered: list[tuple[datetime | None, dict]] = []
-        for snapshot in snapshots:
-            data = snapshot.to_dict()
-            if not isinstance(data, dict):
-                continue
-            created_at_value = data.get("created_at")
-            created_at_dt = _normalize_created_at(created_at_value)
-            if since is not None and created_at_dt is not None and created_at_dt < since:
-                continue
-            if template_title is not None and data.get("template_title") != template_title:
-                continue
-            filtered.append((created_at_dt, data))
 
-        filtered.sort(
-            key=lambda item: item[0] or datetime.min.replace(tzinfo=timezone.utc),
-            reverse=True,
-        )
+def _normalize_created_at(value: Any) -> datetime | None:
+    normalized = ensure_datetime(value)
+    if normalized is None:
+        return None
+    if normalized.tzinfo is None:
+        return normalized.replace(tzinfo=timezone.utc)
+    return normalized
+
+
+def normalize_history_cursor(
+    start_after: tuple[datetime, str] | None,
+) -> tuple[datetime, str] | None:
+    if start_after is None:
+        return None
+    created_at, history_id = start_after
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at, history_id
+
+
+def split_history_id(data: dict) -> tuple[str | None, dict]:
+    """履歴の辞書からドキュメント ID を取り出し、保存するフィールドと分けて返す。"""
+
+    payload = dict(data)
+    history_id = payload.pop(HISTORY_ID_FIELD, None)
+    return (str(history_id) if history_id else None), payload
+
+
+def has_history_ids(entries: Iterable[dict]) -> bool:
+    """全ての履歴にドキュメント ID が採番済みなら True を返す。
+
+    採番済みの履歴は 1 回のトランザクションでまとめて作成するため、
+    `AlreadyExists` で失敗した場合は同じ組み合わせが既に書き込まれている。
+    """
+
+    return all(data.get(HISTORY_ID_FIELD) for data in entries)
+
+
+def filter_recent_history(
+    snapshots: Iterable[Any],
+    *,
+    template_title: str | None,
+    limit: int,
+    since: datetime | None,
+    start_after: tuple[datetime, str] | None = None,
+) -> list[dict]:
+    """履歴スナップショットを条件で絞り込み、新しい順に並べ替える。
+
+    返す辞書には `history_id` としてドキュメント ID を含める。
+    """
+
+    minimum = datetime.min.replace(tzinfo=timezone.utc)
+    filtered: list[tuple[datetime, str, dict]] = []
+    for snapshot in snapshots:
+        data = snapshot.to_dict()
+        if not isinstance(data, dict):
+            continue
+        created_at_dt = _normalize_created_at(data.get("created_at"))
+        if since is not None and created_at_dt is not None and created_at_dt < since:
+            continue
+        if template_title is not None and data.get("template_title") != template_title:
+            continue
+        history_id = str(getattr(snapshot, "id", "") or "")
+        sort_key = (created_at_dt or minimum, history_id)
+        if start_after is not None and not _is_before_cursor(sort_key, start_after):
+            continue
+        if history_id:
+            data = {**data, HISTORY_ID_FIELD: history_id}
+        filtered.append((*sort_key, data))
+
+    filtered.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+    if limit:
+        filtered = filtered[:limit]
+
+    return [data for _, _, data in filtered]
 
-        if limit:
-            filtered = filtered[:limit]
 
-        return [data for _, data in filtered]
+def _is_before_cursor(
+    sort_key: tuple[datetime, str], start_after: tuple[datetime, str]
+) -> bool:
+    created_at, history_id = start_after
+    if not history_id:
+        return sort_key[0] < created_at
+    return sort_key < (created_at, history_id)
 
 
 __all__ = [
     "FirestoreRepository",
     "UserRepository",
+    "UserTemplateRepository",
     "InfoRepository",
     "SharedTemplateRepository",
     "HistoryRepository",
+    "UserDocumentMutation",
+    "UserTemplatePlan",
+    "HISTORY_ID_FIELD",
+    "MAX_BATCH_WRITES",
+    "MAX_HISTORY_ENTRIES_PER_COMMIT",
+    "filter_recent_history",
+    "has_history_ids",
+    "normalize_history_cursor",
+    "split_history_id",
 ]
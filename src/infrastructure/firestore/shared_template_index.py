@@ -0,0 +1,365 @@
+"""スナップショットリスナーで維持する共有テンプレートのインメモリ索引。"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from google.cloud.firestore_v1 import FieldFilter
+
+from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID
+
+SnapshotCallback = Callable[[Iterable[Any]], None]
+Unsubscribe = Callable[[], None]
+
+PUBLIC_SCOPE = "public"
+GUILD_SCOPE = "guild"
+
+# 同時に購読し続けるギルド数の上限と、参照が無いギルドの購読を解除するまでの秒数。
+DEFAULT_MAX_WATCHED_GUILDS = 100
+DEFAULT_GUILD_IDLE_SECONDS = 3600.0
+
+
+class SharedTemplateListenerSource(Protocol):
+    """共有テンプレートの変更を購読するための抽象。
+
+    `callback` には購読条件に一致する全ドキュメントのスナップショットが渡される。
+    """
+
+    def listen(
+        self, *, scope: str, guild_id: int | None, callback: SnapshotCallback
+    ) -> Unsubscribe:
+        ...
+
+
+class FirestoreListenerSource:
+    """Firestore の `on_snapshot` を利用するリスナーソース。"""
+
+    def __init__(self, collection_ref: Any) -> None:
+        self._collection_ref = collection_ref
+
+    def listen(
+        self, *, scope: str, guild_id: int | None, callback: SnapshotCallback
+    ) -> Unsubscribe:
+        query = self._collection_ref.where(filter=FieldFilter("scope", "==", scope))
+        if guild_id is not None:
+            query = query.where(filter=FieldFilter("guild_id", "==", guild_id))
+
+        def on_snapshot(documents: Iterable[Any], _changes: Any, _read_time: Any) -> None:
+            callback(documents)
+
+        watch = query.on_snapshot(on_snapshot)
+        return watch.unsubscribe
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedSnapshot:
+    """索引に保持するドキュメントの写し。`DocumentSnapshot` と同じ形で読める。"""
+
+    id: str
+    data: dict[str, Any]
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.data)
+
+
+class FakeListenerSource:
+    """ローカルで共有テンプレートの変更を発火するテスト用リスナーソース。"""
+
+    def __init__(self, documents: dict[str, dict[str, Any]] | None = None) -> None:
+        self._documents: dict[str, dict[str, Any]] = dict(documents or {})
+        self._listeners: dict[int, tuple[str, int | None, SnapshotCallback]] = {}
+        self._next_token = 0
+
+    @property
+    def listener_count(self) -> int:
+        return len(self._listeners)
+
+    def listen(
+        self, *, scope: str, guild_id: int | None, callback: SnapshotCallback
+    ) -> Unsubscribe:
+        token = self._next_token
+        self._next_token += 1
+        self._listeners[token] = (scope, guild_id, callback)
+        callback(self._matching(scope, guild_id))
+
+        def unsubscribe() -> None:
+            self._listeners.pop(token, None)
+
+        return unsubscribe
+
+    def set_document(self, document_id: str, data: dict[str, Any]) -> None:
+        self._documents[document_id] = dict(data)
+        self._emit()
+
+    def delete_document(self, document_id: str) -> None:
+        self._documents.pop(document_id, None)
+        self._emit()
+
+    def _matching(self, scope: str, guild_id: int | None) -> list[IndexedSnapshot]:
+        return [
+            IndexedSnapshot(id=document_id, data=dict(data))
+            for document_id, data in self._documents.items()
+            if data.get("scope") == scope
+            and (guild_id is None or data.get("guild_id") == guild_id)
+        ]
+
+    def _emit(self) -> None:
+        for scope, guild_id, callback in list(self._listeners.values()):
+            callback(self._matching(scope, guild_id))
+
+
+class SharedTemplateIndex:
+    """PUBLIC スコープとギルドごとの GUILD スコープを購読し続ける索引。
+
+    リスナーのコールバックは Firestore の内部スレッドから呼ばれるため、
+    索引の更新と参照はロックで保護する。初回スナップショットの受信前は
+    `snapshots()` が `None` を返し、呼び出し側はクエリへフォールバックする。
+
+    ギルドの購読は最後に参照された順に並べ、`max_guilds` を超えた分と
+    `idle_seconds` 秒以上参照の無いものを解除する。参照が途絶えても購読が
+    残り続けないよう、ギルドを購読している間は `sweep_interval` 秒ごとに
+    バックグラウンドのタイマーで期限切れを確認する。PUBLIC スコープは解除しない。
+    """
+
+    def __init__(
+        self,
+        source: SharedTemplateListenerSource,
+        *,
+        max_guilds: int = DEFAULT_MAX_WATCHED_GUILDS,
+        idle_seconds: float = DEFAULT_GUILD_IDLE_SECONDS,
+        sweep_interval: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_guilds < 1:
+            raise ValueError("max_guilds must be a positive integer")
+        if idle_seconds <= 0:
+            raise ValueError("idle_seconds must be positive")
+        if sweep_interval is None:
+            sweep_interval = idle_seconds / 2
+        if sweep_interval <= 0:
+            raise ValueError("sweep_interval must be positive")
+        self._source = source
+        self._max_guilds = max_guilds
+        self._idle_seconds = idle_seconds
+        self._sweep_interval = sweep_interval
+        self._clock = clock
+        self._sweep_timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        self._documents: dict[tuple[str, int | None], dict[str, IndexedSnapshot]] = {}
+        self._unsubscribers: dict[tuple[str, int | None], Unsubscribe] = {}
+        # ギルドごとの最終参照時刻。古い順に並ぶ。
+        self._guild_last_used: OrderedDict[int, float] = OrderedDict()
+
+    # region 購読管理 ---------------------------------------------------------
+    def watch_public(self) -> None:
+        self._watch(PUBLIC_SCOPE, None)
+
+    def watch_guild(self, guild_id: int) -> None:
+        self._touch_guild(guild_id)
+        self._watch(GUILD_SCOPE, guild_id)
+
+    def is_watching(self, scope: str, guild_id: int | None = None) -> bool:
+        with self._lock:
+            return (scope, guild_id) in self._unsubscribers
+
+    def close(self) -> None:
+        """全てのリスナーを解除し、索引を破棄する。"""
+
+        with self._lock:
+            unsubscribers = list(self._unsubscribers.values())
+            self._unsubscribers.clear()
+            self._documents.clear()
+            self._guild_last_used.clear()
+            self._cancel_sweep()
+        for unsubscribe in unsubscribers:
+            unsubscribe()
+
+    def expire_idle_guilds(self) -> int:
+        """`idle_seconds` 秒以上参照の無いギルドの購読を解除し、その数を返す。"""
+
+        with self._lock:
+            expired = self._expire_guilds(self._clock())
+            if not self._guild_last_used:
+                self._cancel_sweep()
+        for unsubscribe in expired:
+            unsubscribe()
+        return len(expired)
+
+    def _touch_guild(self, guild_id: int) -> None:
+        # 参照時刻を更新し、上限を超えた分と参照の無くなったギルドの購読を解除する。
+        now = self._clock()
+        with self._lock:
+            self._guild_last_used[guild_id] = now
+            self._guild_last_used.move_to_end(guild_id)
+            expired = self._expire_guilds(now)
+            self._schedule_sweep()
+        for unsubscribe in expired:
+            unsubscribe()
+
+    def _expire_guilds(self, now: float) -> list[Unsubscribe]:
+        # ロックを保持した状態で呼ぶ。解除処理はロックの外で実行させる。
+        expired: list[Unsubscribe] = []
+        while self._guild_last_used:
+            oldest, last_used = next(iter(self._guild_last_used.items()))
+            if (
+                len(self._guild_last_used) <= self._max_guilds
+                and now - last_used < self._idle_seconds
+            ):
+                break
+            del self._guild_last_used[oldest]
+            key = (GUILD_SCOPE, oldest)
+            self._documents.pop(key, None)
+            unsubscribe = self._unsubscribers.pop(key, None)
+            if unsubscribe is not None:
+                expired.append(unsubscribe)
+        return expired
+
+    def _schedule_sweep(self) -> None:
+        # ロックを保持した状態で呼ぶ。ギルドを購読している間だけタイマーを動かす。
+        if self._sweep_timer is not None or not self._guild_last_used:
+            return
+        timer = threading.Timer(self._sweep_interval, self._sweep)
+        timer.daemon = True
+        self._sweep_timer = timer
+        timer.start()
+
+    def _cancel_sweep(self) -> None:
+        if self._sweep_timer is not None:
+            self._sweep_timer.cancel()
+            self._sweep_timer = None
+
+    def _sweep(self) -> None:
+        with self._lock:
+            self._sweep_timer = None
+        self.expire_idle_guilds()
+        with self._lock:
+            self._schedule_sweep()
+
+    def _watch(self, scope: str, guild_id: int | None) -> None:
+        key = (scope, guild_id)
+
+        def placeholder() -> None:
+            return None
+
+        with self._lock:
+            if key in self._unsubscribers:
+                return
+            # 購読開始前に登録し、同時に呼ばれても二重に購読しないようにする。
+            self._unsubscribers[key] = placeholder
+
+        try:
+            unsubscribe = self._source.listen(
+                scope=scope,
+                guild_id=guild_id,
+                callback=lambda documents: self._replace(key, documents),
+            )
+        except Exception:
+            # 仮の登録を残すと購読中と扱われ続けるため、取り除いて次回に再試行する。
+            with self._lock:
+                if self._unsubscribers.get(key) is placeholder:
+                    del self._unsubscribers[key]
+            raise
+        with self._lock:
+            if key in self._unsubscribers:
+                self._unsubscribers[key] = unsubscribe
+                return
+        # close() と競合した場合は購読を残さない。
+        unsubscribe()
+
+    def _replace(self, key: tuple[str, int | None], documents: Iterable[Any]) -> None:
+        materialized: dict[str, IndexedSnapshot] = {}
+        for document in documents:
+            document_id = getattr(document, "id", None)
+            if document_id is None or document_id == COLLECTION_SENTINEL_DOCUMENT_ID:
+                continue
+            data = document.to_dict()
+            if not isinstance(data, dict):
+                continue
+            materialized[document_id] = IndexedSnapshot(id=document_id, data=data)
+
+        with self._lock:
+            if key in self._unsubscribers:
+                self._documents[key] = materialized
+
+    # endregion ----------------------------------------------------------------
+
+    # region 参照/書き込み反映 ------------------------------------------------
+    def lookup(
+        self,
+        *,
+        scope: str | None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[IndexedSnapshot] | None:
+        """索引で応答できる条件ならドキュメントを返し、必要に応じて購読を始める。
+
+        索引の対象外の条件や初回スナップショット未受信の場合は `None` を返す。
+        """
+
+        if scope == PUBLIC_SCOPE and guild_id is None:
+            self.watch_public()
+        elif scope == GUILD_SCOPE and guild_id is not None:
+            self.watch_guild(guild_id)
+        else:
+            return None
+        return self.snapshots(scope=scope, guild_id=guild_id, created_by=created_by)
+
+    def snapshots(
+        self,
+        *,
+        scope: str,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[IndexedSnapshot] | None:
+        """索引済みのドキュメントを返す。未受信の場合は `None`。"""
+
+        with self._lock:
+            documents = self._documents.get((scope, guild_id))
+            if documents is None:
+                return None
+            snapshots = list(documents.values())
+
+        if created_by is not None:
+            snapshots = [
+                snapshot
+                for snapshot in snapshots
+                if snapshot.data.get("created_by") == created_by
+            ]
+        return snapshots
+
+    def apply_write(self, document_id: str, data: dict[str, Any]) -> None:
+        """自プロセスの書き込みをリスナー通知より先に索引へ反映する。"""
+
+        snapshot = IndexedSnapshot(id=document_id, data=dict(data))
+        key = (
+            data.get("scope"),
+            data.get("guild_id") if data.get("scope") == GUILD_SCOPE else None,
+        )
+        with self._lock:
+            for documents in self._documents.values():
+                documents.pop(document_id, None)
+            documents = self._documents.get(key)
+            if documents is not None:
+                documents[document_id] = snapshot
+
+    def apply_delete(self, document_id: str) -> None:
+        with self._lock:
+            for documents in self._documents.values():
+                documents.pop(document_id, None)
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = [
+    "DEFAULT_GUILD_IDLE_SECONDS",
+    "DEFAULT_MAX_WATCHED_GUILDS",
+    "FakeListenerSource",
+    "FirestoreListenerSource",
+    "IndexedSnapshot",
+    "SharedTemplateIndex",
+    "SharedTemplateListenerSource",
+]
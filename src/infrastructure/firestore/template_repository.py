@@ -1,38 +1,386 @@
 """Firestore実装のテンプレートリポジトリ。"""
 from __future__ import annotations
 
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
 from dataclasses import replace
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion
+
 from domain import (
     AssignmentHistory,
+    DrawContext,
     ResultEmbedMode,
     SelectionMode,
+    StreakAggregate,
     Template,
+    TemplatePage,
     TemplateScope,
     UserInfo,
 )
 from domain.interfaces.repositories import TemplateRepository
+from domain.services.history_cursor import decode_history_cursor
 from domain.services.selection_mode_service import coerce_selection_mode
 from domain.services.template_service import merge_templates
 
 from db.serializers import (
     deserialize_assignment_history,
     deserialize_template,
+    deserialize_user,
     normalize_template_for_user,
+    serialize_assignment_history,
+    serialize_history_rounds,
     serialize_template,
+    serialize_user,
 )
 
+from .history_aggregates import restore_streak_aggregate
 from .repositories import (
     HistoryRepository,
     InfoRepository,
     SharedTemplateRepository,
     UserRepository,
+    UserTemplateRepository,
+    read_documents,
 )
 from .unit_of_work import FirestoreUnitOfWork
+from .user_templates import (
+    build_subcollection_page,
+    build_user_template_document,
+    build_user_template_documents,
+    decode_template_cursor,
+    deserialize_user_templates,
+    paginate_embedded_templates,
+    resolve_unique_title,
+)
+
+
+def build_default_templates_document() -> dict[str, list[dict[str, Any]]]:
+    """`info/default_templates` に保存する既定テンプレートのドキュメントを生成する。"""
+
+    default_templates = [
+        Template(
+            title="League of Legends",
+            choices=["Top", "Jungle", "Mid", "ADC", "Support"],
+            scope=TemplateScope.PUBLIC,
+        ),
+        Template(
+            title="Valorant",
+            choices=["Duelist", "Initiator", "Controller", "Sentinel"],
+            scope=TemplateScope.PUBLIC,
+        ),
+    ]
+    return {
+        "default_templates": [
+            serialize_template(template) for template in default_templates
+        ]
+    }
+
+
+def deserialize_default_templates(document: object) -> list[Template]:
+    """`info/default_templates` ドキュメントをテンプレート一覧へ変換する。"""
+
+    template_items = (
+        document.get("default_templates") if isinstance(document, dict) else None
+    )
+    if not isinstance(template_items, list):
+        raise ValueError("Invalid default template data")
+
+    deserialized: list[Template] = []
+    for item in template_items:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid default template data")
+        deserialized.append(deserialize_template(item))
+    return deserialized
+
+
+def deserialize_shared_templates(
+    snapshots: Iterable[Any], *, scope: TemplateScope | None
+) -> list[Template]:
+    """共有テンプレートのスナップショットを変換し、不正なものは読み飛ばす。"""
+
+    templates: list[Template] = []
+    for item in snapshots:
+        if not hasattr(item, "to_dict"):
+            continue
+        data = item.to_dict()
+        if not isinstance(data, dict):
+            continue
+        data.setdefault("template_id", getattr(item, "id", None))
+        if scope is not None:
+            data.setdefault("scope", scope.value)
+        try:
+            templates.append(deserialize_template(data))
+        except ValueError:
+            continue
+    return templates
+
+
+def sanitize_custom_template(template: Template, user_id: int) -> Template:
+    """ID を保ったままユーザーのプライベートテンプレートとして扱える形へ調整する。"""
+
+    return replace(
+        template,
+        scope=TemplateScope.PRIVATE,
+        created_by=user_id,
+        guild_id=None,
+    )
+
+
+def build_user_profile_document(user: UserInfo) -> dict[str, Any]:
+    """サブコレクション利用時の `users/{id}` ドキュメントを組み立てる。"""
+
+    data = serialize_user(user)
+    data.pop("custom_templates", None)
+    return data
+
+
+def build_custom_template_append(
+    user_id: int, template: Template
+) -> tuple[dict[str, Any], Template]:
+    """テンプレートを `custom_templates` へ追記するフィールド更新を組み立てる。"""
+
+    normalized = normalize_template_for_user(template, user_id)
+    return {"custom_templates": ArrayUnion([serialize_template(normalized)])}, normalized
+
+
+def plan_custom_template_replacement(
+    data: dict | None, user_id: int, template: Template
+) -> tuple[dict[str, Any], None]:
+    """同じ ID のテンプレートを置き換えた `custom_templates` を組み立てる。
+
+    並び順を保つため配列全体を書き込む。トランザクション内で利用する。
+    """
+
+    if data is None:
+        raise ValueError("User not found")
+
+    sanitized = sanitize_custom_template(template, user_id)
+    raw_templates = list(data.get("custom_templates") or [])
+    for index, item in enumerate(raw_templates):
+        if isinstance(item, dict) and item.get("template_id") == sanitized.template_id:
+            raw_templates[index] = serialize_template(sanitized)
+            break
+    else:
+        raise ValueError("Template not found")
+
+    return {"custom_templates": raw_templates}, None
+
+
+def plan_custom_template_removal(
+    data: dict | None,
+    *,
+    template_id: str | None,
+    template_title: str | None,
+) -> tuple[dict[str, Any], None]:
+    """一致するテンプレートを `ArrayRemove` で取り除く更新を組み立てる。"""
+
+    if data is None:
+        raise ValueError("User not found")
+
+    removed = [
+        item
+        for item in data.get("custom_templates") or []
+        if isinstance(item, dict)
+        and (
+            (template_id is not None and item.get("template_id") == template_id)
+            or (template_title is not None and item.get("title") == template_title)
+        )
+    ]
+    if not removed:
+        return {}, None
+    return {"custom_templates": ArrayRemove(removed)}, None
+
+
+def plan_shared_template_copy(
+    data: dict | None, user_id: int, template: Template
+) -> tuple[dict[str, Any], Template]:
+    """重複しないタイトルで共有テンプレートを追記する更新を組み立てる。"""
+
+    if data is None:
+        raise ValueError("User not found")
+
+    existing_titles = [
+        item.get("title")
+        for item in data.get("custom_templates") or []
+        if isinstance(item, dict)
+    ]
+    new_title = resolve_unique_title(template.title, existing_titles)
+    return build_custom_template_append(user_id, replace(template, title=new_title))
+
+
+def plan_subcollection_template_copy(
+    titles: list[str], user_id: int, template: Template, *, created_at: datetime
+) -> tuple[dict[str, Any], Template]:
+    """重複しないタイトルでサブコレクションへ追加するテンプレートを組み立てる。"""
+
+    new_template = normalize_template_for_user(
+        replace(template, title=resolve_unique_title(template.title, titles)),
+        user_id,
+    )
+    return build_user_template_document(new_template, created_at=created_at), new_template
+
+
+SETTING_DEFAULTS: dict[str, str] = {
+    "embed_mode": ResultEmbedMode.COMPACT.value,
+    "selection_mode": SelectionMode.RANDOM.value,
+}
+
+
+def resolve_setting_document(key: str, data: object) -> tuple[dict[str, str], bool]:
+    """`info/{key}` の設定ドキュメントを検証する。
+
+    未作成または不正な場合は既定値のドキュメントと、書き込みが必要かどうかを返す。
+    """
+
+    if isinstance(data, dict) and key in data:
+        return data, False
+    return {key: SETTING_DEFAULTS[key]}, True
+
+
+def has_default_templates(document: object) -> bool:
+    """`info/default_templates` が初期化済みかどうかを返す。"""
+
+    return isinstance(document, dict) and "default_templates" in document
+
+
+def coerce_embed_mode(value: ResultEmbedMode | str) -> ResultEmbedMode:
+    """文字列または列挙値を `ResultEmbedMode` へ変換する。"""
+
+    if isinstance(value, ResultEmbedMode):
+        return value
+    normalized = str(value).lower()
+    try:
+        return ResultEmbedMode(normalized)
+    except ValueError as exc:  # pragma: no cover - defensive guard
+        raise ValueError("Invalid embed mode") from exc
+
+
+def toggle_embed_mode_document(data: dict[str, str]) -> dict[str, str]:
+    """compact と detailed を入れ替えた設定ドキュメントを返す。"""
+
+    if data["embed_mode"] == ResultEmbedMode.COMPACT.value:
+        return {**data, "embed_mode": ResultEmbedMode.DETAILED.value}
+    return {**data, "embed_mode": ResultEmbedMode.COMPACT.value}
+
+
+def build_shared_template_query(
+    *,
+    scope: TemplateScope | None,
+    guild_id: int | None,
+    created_by: int | None,
+) -> dict[str, object | None]:
+    """共有テンプレート一覧の検索条件を組み立てる。"""
+
+    query: dict[str, object | None] = {
+        "scope": scope.value if scope else None,
+        "guild_id": guild_id,
+    }
+    if created_by is not None:
+        query["created_by"] = created_by
+    return query
+
+
+def deserialize_history_documents(documents: Iterable[object]) -> list[AssignmentHistory]:
+    """履歴ドキュメントを変換し、不正なものは読み飛ばす。"""
+
+    histories: list[AssignmentHistory] = []
+    for document in documents:
+        if not isinstance(document, dict):
+            continue
+        try:
+            histories.append(deserialize_assignment_history(document))
+        except ValueError:
+            continue
+    return histories
+
+
+def assemble_user(
+    data: dict[str, Any], *, custom_templates: list[Any] | None = None
+) -> UserInfo:
+    """ユーザードキュメントを `UserInfo` へ変換し、テンプレートの重複を除く。
+
+    `custom_templates` を渡した場合は、埋め込み配列の代わりにその一覧を使う。
+    """
+
+    if custom_templates is not None:
+        data = {**data, "custom_templates": custom_templates}
+    user = deserialize_user(data)
+    user.custom_templates = merge_templates(user.custom_templates)
+    return user
+
+
+def attach_shared_templates(
+    user: UserInfo,
+    *,
+    default_templates: Sequence[Template],
+    shared_templates: list[Template],
+    public_templates: Sequence[Template],
+) -> None:
+    """サーバー共有テンプレートと、既定テンプレートを含む公開テンプレートを設定する。"""
+
+    user.shared_templates = shared_templates
+    user.public_templates = merge_templates(public_templates, default_templates)
+
+
+def build_draw_context(
+    *,
+    guild_id: int | None,
+    user: UserInfo | None,
+    embed_data: dict[str, str],
+    selection_data: dict[str, str],
+    default_templates: list[Template],
+) -> DrawContext:
+    """読み込んだドキュメントから `DrawContext` を組み立てる。"""
+
+    return DrawContext(
+        guild_id=guild_id,
+        user=user,
+        selection_mode=coerce_selection_mode(selection_data["selection_mode"]),
+        embed_mode=coerce_embed_mode(embed_data["embed_mode"]),
+        default_templates=default_templates,
+    )
+
+
+def find_template(templates: Iterable[Template], template_id: str) -> Template | None:
+    """ID が一致するテンプレートを返す。"""
+
+    for template in templates:
+        if template.template_id == template_id:
+            return template
+    return None
+
+
+def deserialize_user_template(data: dict[str, Any] | None) -> Template | None:
+    """サブコレクションのテンプレートドキュメントを 1 件変換する。"""
+
+    templates = deserialize_user_templates([data])
+    return templates[0] if templates else None
+
+
+def validate_page_limit(limit: int) -> None:
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+
+
+def validate_template_identifier(
+    template_id: str | None, template_title: str | None
+) -> None:
+    if template_id is None and template_title is None:
+        raise ValueError("Template identifier is required")
+
+
+def validate_shared_template(template: Template) -> None:
+    if template.scope not in (TemplateScope.GUILD, TemplateScope.PUBLIC):
+        raise ValueError("Shared templates must have a guild or public scope")
+
+
+def validate_copyable_template(template: Template) -> None:
+    if template.scope == TemplateScope.PRIVATE:
+        raise ValueError("Cannot copy private template as shared")
 
 
 class FirestoreTemplateRepository(TemplateRepository):
@@ -101,8 +449,8 @@ class FirestoreTemplateRepository(TemplateRepository):
     def with_client(self, client) -> None:
         self._unit_of_work.with_client(client)
 
-    def ensure_required_collections(self) -> None:
-        self._unit_of_work.ensure_required_collections()
+    def ensure_required_collections(self, *, force: bool = False) -> list[str]:
+        return self._unit_of_work.ensure_required_collections(force=force)
 
     # endregion ----------------------------------------------------------------
 
@@ -118,6 +466,18 @@ class FirestoreTemplateRepository(TemplateRepository):
         assert repository is not None
         return repository
 
+    def _get_user_template_repository(self) -> UserTemplateRepository:
+        repository = self._unit_of_work.user_template_repository
+        if repository is None:
+            self._ensure_configured()
+            repository = self._unit_of_work.user_template_repository
+        assert repository is not None
+        return repository
+
+    @property
+    def _uses_template_subcollection(self) -> bool:
+        return self._unit_of_work.uses_template_subcollection
+
     def _get_info_repository(self) -> InfoRepository:
         repository = self._unit_of_work.info_repository
         if repository is None:
@@ -142,66 +502,27 @@ class FirestoreTemplateRepository(TemplateRepository):
         assert repository is not None
         return repository
 
-    @staticmethod
-    def _merge_template_lists(*template_lists: Iterable[Template]) -> list[Template]:
-        return merge_templates(*template_lists)
-
-    @staticmethod
-    def _coerce_selection_mode(value: SelectionMode | str) -> SelectionMode:
-        return coerce_selection_mode(value)
-
-    @staticmethod
-    def _coerce_embed_mode(value: ResultEmbedMode | str) -> ResultEmbedMode:
-        if isinstance(value, ResultEmbedMode):
-            return value
-        normalized = str(value).lower()
-        try:
-            return ResultEmbedMode(normalized)
-        except ValueError as exc:  # pragma: no cover - defensive guard
-            raise ValueError("Invalid embed mode") from exc
-
-    def _validate_user(self, data: dict) -> bool:
-        return data["id"] is not None and data["name"] is not None
-
-    def _read_or_initialize_embed_mode(
-        self, info_repository: InfoRepository
-    ) -> tuple[dict[str, str], bool]:
-        data = info_repository.read_document("embed_mode")
-        should_initialize = not isinstance(data, dict) or "embed_mode" not in data
-        if should_initialize:
-            data = {"embed_mode": "compact"}
-            info_repository.create_document("embed_mode", data)
-        return data, should_initialize
-
-    def _read_or_initialize_selection_mode(
-        self, info_repository: InfoRepository
-    ) -> tuple[dict[str, str], bool]:
-        data = info_repository.read_document("selection_mode")
-        should_initialize = not isinstance(data, dict) or "selection_mode" not in data
+    def _read_or_initialize_setting(
+        self, info_repository: InfoRepository, key: str
+    ) -> dict[str, str]:
+        data, should_initialize = resolve_setting_document(
+            key, info_repository.read_document(key)
+        )
         if should_initialize:
-            data = {"selection_mode": SelectionMode.RANDOM.value}
-            info_repository.create_document("selection_mode", data)
-        return data, should_initialize
+            info_repository.create_document(key, data)
+        return data
 
-    def _init_default_templates(self) -> None:
-        info_repository = self._get_info_repository()
-        default_templates = [
-            Template(
-                title="League of Legends",
-                choices=["Top", "Jungle", "Mid", "ADC", "Support"],
-                scope=TemplateScope.PUBLIC,
-            ),
-            Template(
-                title="Valorant",
-                choices=["Duelist", "Initiator", "Controller", "Sentinel"],
-                scope=TemplateScope.PUBLIC,
-            ),
-        ]
-        default_templates = [
-            serialize_template(template) for template in default_templates
-        ]
-        default_templates = {"default_templates": default_templates}
-        info_repository.create_document("default_templates", default_templates)
+    def _load_custom_templates(
+        self, user_id: int, *, include_templates: bool = True
+    ) -> list[Any] | None:
+        """サブコレクション利用時のみテンプレートを読み込む。"""
+
+        if not include_templates:
+            # テンプレート一覧を使わない呼び出しでは、サブコレクションを読まない。
+            return []
+        if self._uses_template_subcollection:
+            return self._get_user_template_repository().list_all(user_id)
+        return None
 
     # endregion ----------------------------------------------------------------
 
@@ -214,22 +535,13 @@ class FirestoreTemplateRepository(TemplateRepository):
     def get_default_templates(self) -> list[Template]:
         info_repository = self._get_info_repository()
         templates = info_repository.read_document("default_templates")
-        if not isinstance(templates, dict) or "default_templates" not in templates:
-            self._init_default_templates()
+        if not has_default_templates(templates):
+            info_repository.create_document(
+                "default_templates", build_default_templates_document()
+            )
             templates = info_repository.read_document("default_templates")
 
-        template_items = (
-            templates.get("default_templates") if isinstance(templates, dict) else None
-        )
-        if not isinstance(template_items, list):
-            raise ValueError("Invalid default template data")
-
-        deserialized: list[Template] = []
-        for item in template_items:
-            if not isinstance(item, dict):
-                raise ValueError("Invalid default template data")
-            deserialized.append(deserialize_template(item))
-        return deserialized
+        return deserialize_default_templates(templates)
 
     def list_shared_templates(
         self,
@@ -239,29 +551,12 @@ class FirestoreTemplateRepository(TemplateRepository):
         created_by: int | None = None,
     ) -> list[Template]:
         repository = self._get_shared_template_repository()
-        query_kwargs: dict[str, object | None] = {
-            "scope": scope.value if scope else None,
-            "guild_id": guild_id,
-        }
-        if created_by is not None:
-            query_kwargs["created_by"] = created_by
-
-        raw_templates = repository.list_templates(**query_kwargs)
-        templates: list[Template] = []
-        for item in raw_templates:
-            if not hasattr(item, "to_dict"):
-                continue
-            data = item.to_dict()
-            if not isinstance(data, dict):
-                continue
-            data.setdefault("template_id", getattr(item, "id", None))
-            if scope is not None:
-                data.setdefault("scope", scope.value)
-            try:
-                templates.append(deserialize_template(data))
-            except ValueError:
-                continue
-        return templates
+        raw_templates = repository.list_templates(
+            **build_shared_template_query(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            )
+        )
+        return deserialize_shared_templates(raw_templates, scope=scope)
 
     def get_shared_templates_for_user(
         self, *, guild_id: int | None
@@ -276,36 +571,36 @@ class FirestoreTemplateRepository(TemplateRepository):
 
     def toggle_embed_mode(self) -> None:
         info_repository = self._get_info_repository()
-        data, _ = self._read_or_initialize_embed_mode(info_repository)
-        if data["embed_mode"] == "compact":
-            data["embed_mode"] = "detailed"
-        else:
-            data["embed_mode"] = "compact"
-        info_repository.create_document("embed_mode", data)
+        data = self._read_or_initialize_setting(info_repository, "embed_mode")
+        info_repository.create_document("embed_mode", toggle_embed_mode_document(data))
 
     def get_embed_mode(self) -> str:
         info_repository = self._get_info_repository()
-        data, _ = self._read_or_initialize_embed_mode(info_repository)
-        return data["embed_mode"]
+        return self._read_or_initialize_setting(info_repository, "embed_mode")[
+            "embed_mode"
+        ]
 
     def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
-        embed_mode = self._coerce_embed_mode(mode)
+        embed_mode = coerce_embed_mode(mode)
         info_repository = self._get_info_repository()
-        data, _ = self._read_or_initialize_embed_mode(info_repository)
-        data["embed_mode"] = embed_mode.value
-        info_repository.create_document("embed_mode", data)
+        data = self._read_or_initialize_setting(info_repository, "embed_mode")
+        info_repository.create_document(
+            "embed_mode", {**data, "embed_mode": embed_mode.value}
+        )
 
     def set_selection_mode(self, mode: SelectionMode | str) -> None:
-        selection_mode = self._coerce_selection_mode(mode)
+        selection_mode = coerce_selection_mode(mode)
         info_repository = self._get_info_repository()
-        data, _ = self._read_or_initialize_selection_mode(info_repository)
-        data["selection_mode"] = selection_mode.value
-        info_repository.create_document("selection_mode", data)
+        data = self._read_or_initialize_setting(info_repository, "selection_mode")
+        info_repository.create_document(
+            "selection_mode", {**data, "selection_mode": selection_mode.value}
+        )
 
     def get_selection_mode(self) -> str:
         info_repository = self._get_info_repository()
-        data, _ = self._read_or_initialize_selection_mode(info_repository)
-        return data["selection_mode"]
+        return self._read_or_initialize_setting(info_repository, "selection_mode")[
+            "selection_mode"
+        ]
 
     def save_history(
         self,
@@ -316,26 +611,33 @@ class FirestoreTemplateRepository(TemplateRepository):
         selection_mode: SelectionMode | str,
     ) -> None:
         history_repository = self._get_history_repository()
-        mode_enum = self._coerce_selection_mode(selection_mode)
-        timestamp = datetime.now(timezone.utc)
-        entries = [
-            {
-                "user_id": pair.user.id,
-                "user_name": getattr(pair.user, "display_name", pair.user.name),
-                "choice": pair.choice,
-            }
-            for pair in pairs.pairs
-        ]
-        data = {
-            "guild_id": guild_id,
-            "template_title": template.title,
-            "choices": list(template.choices),
-            "selection_mode": mode_enum.value,
-            "created_at": timestamp,
-            "entries": entries,
-        }
+        data = serialize_assignment_history(
+            guild_id=guild_id,
+            template=template,
+            pairs=pairs,
+            selection_mode=selection_mode,
+            created_at=datetime.now(timezone.utc),
+        )
         history_repository.add_entry(data)
 
+    def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence["PairList"],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        history_repository = self._get_history_repository()
+        entries = serialize_history_rounds(
+            guild_id=guild_id,
+            template=template,
+            rounds=rounds,
+            selection_mode=selection_mode,
+            started_at=datetime.now(timezone.utc),
+        )
+        history_repository.add_entries(entries)
+
     def get_recent_history(
         self,
         *,
@@ -343,57 +645,46 @@ class FirestoreTemplateRepository(TemplateRepository):
         template_title: str | None = None,
         limit: int = 10,
         since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
     ) -> list[AssignmentHistory]:
         history_repository = self._get_history_repository()
         documents = history_repository.fetch_recent(
-            guild_id=guild_id, template_title=template_title, limit=limit, since=since
+            guild_id=guild_id,
+            template_title=template_title,
+            limit=limit,
+            since=since,
+            start_after=decode_history_cursor(start_after) if start_after else None,
+            fields=fields,
         )
+        return deserialize_history_documents(documents or [])
 
-        if not documents:
-            return []
-
-        histories: list[AssignmentHistory] = []
-        for document in documents:
-            if not isinstance(document, dict):
-                continue
-            try:
-                histories.append(deserialize_assignment_history(document))
-            except ValueError:
-                continue
-        return histories
+    def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        history_repository = self._get_history_repository()
+        data = history_repository.read_aggregate(guild_id, template_title)
+        if data is None:
+            return None
+        return restore_streak_aggregate(data, key=(guild_id, template_title))
 
     def init_user(self, user_id: int, name: str) -> None:
-        user_repository = self._get_user_repository()
         default_templates = self.get_default_templates()
-        default_templates = [
-            serialize_template(template) for template in default_templates
-        ]
-
-        data = {
-            "name": name,
-            "id": user_id,
-            "least_template": None,
-            "custom_templates": default_templates,
-        }
-        user_repository.create_document(user_id, data)
+        self.set_user(
+            UserInfo(id=user_id, name=name, custom_templates=default_templates)
+        )
 
     def set_user(self, user: UserInfo) -> None:
+        if self._uses_template_subcollection:
+            self._get_user_template_repository().replace_all(
+                user.id,
+                build_user_profile_document(user),
+                build_user_template_documents(user.custom_templates),
+            )
+            return
+
         user_repository = self._get_user_repository()
-        least_template = (
-            serialize_template(user.least_template)
-            if user.least_template is not None
-            else None
-        )
-        custom_templates = [
-            serialize_template(template) for template in user.custom_templates
-        ]
-        data = {
-            "name": user.name,
-            "id": user.id,
-            "least_template": least_template,
-            "custom_templates": custom_templates,
-        }
-        user_repository.create_document(user.id, data)
+        user_repository.create_document(user.id, serialize_user(user))
 
     def get_user(
         self,
@@ -401,55 +692,82 @@ class FirestoreTemplateRepository(TemplateRepository):
         *,
         guild_id: int | None = None,
         include_shared: bool = True,
+        include_templates: bool = True,
     ) -> UserInfo | None:
         user_repository = self._get_user_repository()
         data = user_repository.read_document(user_id)
         if data is None:
             return None
 
-        least_template = None
-        if data.get("least_template"):
-            least_payload = data["least_template"]
-            if not isinstance(least_payload, dict):
-                raise ValueError("Invalid template data")
-            least_template = deserialize_template(least_payload)
-
-        custom_templates: list[Template] = []
-        for template_data in data.get("custom_templates") or []:
-            if not isinstance(template_data, dict):
-                raise ValueError("Invalid template data")
-            custom_templates.append(deserialize_template(template_data))
-
-        shared_templates: list[Template] = []
-        public_templates: list[Template] = []
+        user_info = assemble_user(
+            data,
+            custom_templates=self._load_custom_templates(
+                user_id, include_templates=include_templates
+            ),
+        )
         if include_shared:
             default_templates = self.get_default_templates()
             shared_templates, public_templates = self.get_shared_templates_for_user(
                 guild_id=guild_id
             )
-            public_templates = self._merge_template_lists(
-                public_templates, default_templates
+            attach_shared_templates(
+                user_info,
+                default_templates=default_templates,
+                shared_templates=shared_templates,
+                public_templates=public_templates,
             )
+        return user_info
 
-        user_info = UserInfo(
-            id=data["id"],
-            name=data["name"],
-            least_template=least_template,
-            custom_templates=custom_templates,
-            shared_templates=shared_templates,
-            public_templates=public_templates,
-        )
+    def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        """ユーザーと `info` の設定ドキュメントを 1 回の `get_all` で読み込む。
 
-        if not self._validate_user(data):
-            raise ValueError("Invalid user data")
+        設定ドキュメントが未作成の場合のみ、個別の初期化処理へフォールバックする。
+        """
 
-        user_info.custom_templates = self._merge_template_lists(
-            user_info.custom_templates
+        user_repository = self._get_user_repository()
+        info_repository = self._get_info_repository()
+        user_data, embed_data, selection_data, templates_data = read_documents(
+            self.db,
+            [
+                user_repository.document(user_id),
+                info_repository.document("embed_mode"),
+                info_repository.document("selection_mode"),
+                info_repository.document("default_templates"),
+            ],
         )
 
-        return user_info
+        if resolve_setting_document("embed_mode", embed_data)[1]:
+            embed_data = self._read_or_initialize_setting(info_repository, "embed_mode")
+        if resolve_setting_document("selection_mode", selection_data)[1]:
+            selection_data = self._read_or_initialize_setting(
+                info_repository, "selection_mode"
+            )
+        if has_default_templates(templates_data):
+            default_templates = deserialize_default_templates(templates_data)
+        else:
+            default_templates = self.get_default_templates()
+
+        user_info: UserInfo | None = None
+        if user_data is not None:
+            user_info = assemble_user(
+                user_data, custom_templates=self._load_custom_templates(user_id)
+            )
+
+        return build_draw_context(
+            guild_id=guild_id,
+            user=user_info,
+            embed_data=embed_data,
+            selection_data=selection_data,
+            default_templates=default_templates,
+        )
 
     def delete_user(self, user_id: int) -> None:
+        if self._uses_template_subcollection:
+            self._get_user_template_repository().delete_all(user_id)
+            return
+
         user_repository = self._get_user_repository()
         user_repository.delete_document(user_id)
 
@@ -464,37 +782,79 @@ class FirestoreTemplateRepository(TemplateRepository):
         except Exception:
             return False
 
-    def add_custom_template(self, user_id: int, template: Template) -> None:
+    def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        validate_page_limit(limit)
+
+        if self._uses_template_subcollection:
+            documents = self._get_user_template_repository().list_page(
+                user_id,
+                limit=limit + 1,
+                start_after=decode_template_cursor(cursor) if cursor else None,
+            )
+            return build_subcollection_page(documents, limit=limit)
+
         user = self.get_user(user_id, include_shared=False)
         if user is None:
-            raise ValueError("User not found")
-        updated_template = normalize_template_for_user(template, user_id)
-        user.custom_templates.append(updated_template)
-        self.set_user(user)
+            return TemplatePage(templates=[])
+        return paginate_embedded_templates(
+            user.custom_templates, limit=limit, cursor=cursor
+        )
 
-    def update_custom_template(self, user_id: int, template: Template) -> None:
-        if not template.template_id:
-            raise ValueError("Template id is required")
+    def get_custom_template(self, user_id: int, template_id: str) -> Template | None:
+        if self._uses_template_subcollection:
+            return deserialize_user_template(
+                self._get_user_template_repository().read_template(user_id, template_id)
+            )
 
         user = self.get_user(user_id, include_shared=False)
         if user is None:
-            raise ValueError("User not found")
+            return None
+        return find_template(user.custom_templates, template_id)
 
-        sanitized = replace(
-            template,
-            scope=TemplateScope.PRIVATE,
-            created_by=user_id,
-            guild_id=None,
+    def add_custom_template(self, user_id: int, template: Template) -> None:
+        if self._uses_template_subcollection:
+            self._add_template_document(
+                user_id, normalize_template_for_user(template, user_id)
+            )
+            return
+
+        user_repository = self._get_user_repository()
+        fields, _ = build_custom_template_append(user_id, template)
+        try:
+            user_repository.update_fields(user_id, fields)
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
+
+    def _add_template_document(self, user_id: int, template: Template) -> None:
+        data = build_user_template_document(
+            template, created_at=datetime.now(timezone.utc)
         )
+        try:
+            self._get_user_template_repository().add_template(user_id, data)
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
 
-        for index, existing in enumerate(user.custom_templates):
-            if existing.template_id == sanitized.template_id:
-                user.custom_templates[index] = sanitized
-                break
-        else:
-            raise ValueError("Template not found")
+    def update_custom_template(self, user_id: int, template: Template) -> None:
+        if not template.template_id:
+            raise ValueError("Template id is required")
 
-        self.set_user(user)
+        if self._uses_template_subcollection:
+            sanitized = sanitize_custom_template(template, user_id)
+            try:
+                self._get_user_template_repository().update_template(
+                    user_id, sanitized.template_id, serialize_template(sanitized)
+                )
+            except google_exceptions.NotFound as exc:
+                raise ValueError("Template not found") from exc
+            return
+
+        user_repository = self._get_user_repository()
+        user_repository.run_transaction(
+            user_id,
+            lambda data: plan_custom_template_replacement(data, user_id, template),
+        )
 
     def delete_custom_template(
         self,
@@ -503,37 +863,35 @@ class FirestoreTemplateRepository(TemplateRepository):
         template_id: str | None = None,
         template_title: str | None = None,
     ) -> None:
-        user = self.get_user(user_id, include_shared=False)
-        if user is None:
-            raise ValueError("User not found")
-        if template_id is None and template_title is None:
-            raise ValueError("Template identifier is required")
-
-        def should_keep(template: Template) -> bool:
-            if template_id is not None and template.template_id == template_id:
-                return False
-            if template_title is not None and template.title == template_title:
-                return False
-            return True
-
-        user.custom_templates = [
-            template for template in user.custom_templates if should_keep(template)
-        ]
-        self.set_user(user)
+        validate_template_identifier(template_id, template_title)
+
+        if self._uses_template_subcollection:
+            self._get_user_template_repository().delete_templates(
+                user_id, template_id=template_id, template_title=template_title
+            )
+            return
+
+        user_repository = self._get_user_repository()
+        user_repository.run_transaction(
+            user_id,
+            lambda data: plan_custom_template_removal(
+                data, template_id=template_id, template_title=template_title
+            ),
+        )
 
     def set_least_template(self, user_id: int, template: Template) -> None:
-        user = self.get_user(user_id, include_shared=False)
-        if user is None:
-            raise ValueError("User not found")
-        user.least_template = template
-        self.set_user(user)
+        user_repository = self._get_user_repository()
+        try:
+            user_repository.update_fields(
+                user_id, {"least_template": serialize_template(template)}
+            )
+        except google_exceptions.NotFound as exc:
+            raise ValueError("User not found") from exc
 
     def create_shared_template(self, template: Template) -> Template:
-        if template.scope not in (TemplateScope.GUILD, TemplateScope.PUBLIC):
-            raise ValueError("Shared templates must have a guild or public scope")
+        validate_shared_template(template)
         repository = self._get_shared_template_repository()
-        data = serialize_template(template)
-        template_id = repository.add_template(data)
+        template_id = repository.add_template(serialize_template(template))
         return replace(template, template_id=template_id)
 
     def delete_shared_template(self, template_id: str) -> None:
@@ -541,27 +899,54 @@ class FirestoreTemplateRepository(TemplateRepository):
         repository.delete_template(template_id)
 
     def copy_shared_template_to_user(self, user_id: int, template: Template) -> Template:
-        if template.scope == TemplateScope.PRIVATE:
-            raise ValueError("Cannot copy private template as shared")
-        user = self.get_user(user_id, include_shared=False)
-        if user is None:
-            raise ValueError("User not found")
-
-        existing_titles = {t.title for t in user.custom_templates}
-        base_title = template.title
-        new_title = base_title
-        counter = 1
-        while new_title in existing_titles:
-            counter += 1
-            new_title = f"{base_title} ({counter})"
-
-        template_with_title = replace(template, title=new_title)
-        new_template = normalize_template_for_user(template_with_title, user_id)
-        user.custom_templates.append(new_template)
-        self.set_user(user)
-        return new_template
+        validate_copyable_template(template)
+
+        if self._uses_template_subcollection:
+            created_at = datetime.now(timezone.utc)
+            try:
+                return self._get_user_template_repository().add_template_with_titles(
+                    user_id,
+                    lambda titles: plan_subcollection_template_copy(
+                        titles, user_id, template, created_at=created_at
+                    ),
+                )
+            except google_exceptions.NotFound as exc:
+                raise ValueError("User not found") from exc
+
+        user_repository = self._get_user_repository()
+        return user_repository.run_transaction(
+            user_id, lambda data: plan_shared_template_copy(data, user_id, template)
+        )
 
     # endregion ----------------------------------------------------------------
 
 
-__all__ = ["FirestoreTemplateRepository"]
+__all__ = [
+    "FirestoreTemplateRepository",
+    "SETTING_DEFAULTS",
+    "assemble_user",
+    "attach_shared_templates",
+    "build_custom_template_append",
+    "build_default_templates_document",
+    "build_draw_context",
+    "build_shared_template_query",
+    "build_user_profile_document",
+    "coerce_embed_mode",
+    "deserialize_default_templates",
+    "deserialize_history_documents",
+    "deserialize_shared_templates",
+    "deserialize_user_template",
+    "find_template",
+    "has_default_templates",
+    "plan_custom_template_removal",
+    "plan_custom_template_replacement",
+    "plan_shared_template_copy",
+    "plan_subcollection_template_copy",
+    "resolve_setting_document",
+    "sanitize_custom_template",
+    "toggle_embed_mode_document",
+    "validate_copyable_template",
+    "validate_page_limit",
+    "validate_shared_template",
+    "validate_template_identifier",
+]
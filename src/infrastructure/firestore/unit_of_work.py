@@ -7,16 +7,36 @@ from pathlib import Path
 from typing import Any
 
 import firebase_admin
-from firebase_admin import App, credentials, firestore
+from firebase_admin import App, credentials, firestore, firestore_async
 
 from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID, REQUIRED_COLLECTIONS
 
+from .async_repositories import (
+    AsyncFirestoreClient,
+    AsyncHistoryRepository,
+    AsyncInfoRepository,
+    AsyncSharedTemplateRepository,
+    AsyncUserRepository,
+    AsyncUserTemplateRepository,
+)
+from .history_buffer import (
+    DEFAULT_FLUSH_INTERVAL_SECONDS,
+    DEFAULT_MAX_BATCH_SIZE,
+    HistoryWriteBuffer,
+)
 from .repositories import (
     HistoryRepository,
     InfoRepository,
     SharedTemplateRepository,
     UserRepository,
+    UserTemplateRepository,
+)
+from .shared_template_index import (
+    FirestoreListenerSource,
+    SharedTemplateIndex,
+    SharedTemplateListenerSource,
 )
+from .user_templates import UserTemplateLayout
 
 FirestoreClient = firestore.firestore.Client
 
@@ -28,9 +48,22 @@ class FirestoreUnitOfWork:
         self._app: App | None = None
         self._client: FirestoreClient | None = None
         self.user_repository: UserRepository | None = None
+        self.user_template_repository: UserTemplateRepository | None = None
         self.info_repository: InfoRepository | None = None
         self.shared_template_repository: SharedTemplateRepository | None = None
         self.history_repository: HistoryRepository | None = None
+        self._async_client: AsyncFirestoreClient | None = None
+        self.async_user_repository: AsyncUserRepository | None = None
+        self.async_user_template_repository: AsyncUserTemplateRepository | None = None
+        self.async_info_repository: AsyncInfoRepository | None = None
+        self.async_shared_template_repository: AsyncSharedTemplateRepository | None = None
+        self.async_history_repository: AsyncHistoryRepository | None = None
+        self.shared_template_index: SharedTemplateIndex | None = None
+        self.history_write_buffer: HistoryWriteBuffer | None = None
+        # 同期版・非同期版のリポジトリで共有する、ユーザーテンプレートの保存先。
+        self.template_layout = UserTemplateLayout.EMBEDDED
+        # 現在のクライアントで必須コレクションを確認済みかどうか。
+        self._collections_ready = False
 
     @property
     def app(self) -> App | None:
@@ -42,8 +75,14 @@ class FirestoreUnitOfWork:
 
     @client.setter
     def client(self, value: FirestoreClient | None) -> None:
+        if value is not self._client:
+            self._collections_ready = False
         self._client = value
 
+    @property
+    def async_client(self) -> AsyncFirestoreClient | None:
+        return self._async_client
+
     def initialize(self, credentials_source: dict[str, Any] | Path) -> None:
         if self._app is not None:
             raise RuntimeError("FirestoreUnitOfWork is already initialized")
@@ -66,6 +105,7 @@ class FirestoreUnitOfWork:
         self._app = app
         client = firestore.client(app=app)
         self._attach_client(client)
+        self._attach_async_client(firestore_async.client(app=app))
 
     def with_client(self, client: FirestoreClient) -> None:
         if self._client is not None and self._client is not client:
@@ -74,14 +114,114 @@ class FirestoreUnitOfWork:
             )
         self._attach_client(client)
 
+    def with_async_client(self, client: AsyncFirestoreClient) -> None:
+        if self._async_client is not None and self._async_client is not client:
+            raise RuntimeError(
+                "FirestoreUnitOfWork is already initialized with a different async Firestore client"
+            )
+        self._attach_async_client(client)
+
+    def _attach_async_client(self, client: AsyncFirestoreClient) -> None:
+        self._async_client = client
+        self.async_user_repository = AsyncUserRepository(client)
+        self.async_user_template_repository = AsyncUserTemplateRepository(client)
+        self.async_info_repository = AsyncInfoRepository(client)
+        self.async_shared_template_repository = AsyncSharedTemplateRepository(client)
+        self.async_shared_template_repository.index = self.shared_template_index
+        self.async_history_repository = AsyncHistoryRepository(client)
+        self.async_history_repository.buffer = self.history_write_buffer
+
     def _attach_client(self, client: FirestoreClient) -> None:
-        self._client = client
+        self.client = client
         self.user_repository = UserRepository(client)
+        self.user_template_repository = UserTemplateRepository(client)
         self.info_repository = InfoRepository(client)
         self.shared_template_repository = SharedTemplateRepository(client)
+        self.shared_template_repository.index = self.shared_template_index
         self.history_repository = HistoryRepository(client)
         self.ensure_required_collections()
 
+    def enable_shared_template_index(
+        self, source: SharedTemplateListenerSource | None = None
+    ) -> SharedTemplateIndex:
+        """共有テンプレートをスナップショットリスナーの索引から返すようにする。
+
+        `source` を省略した場合は同期クライアントの `on_snapshot` を利用する。
+        """
+
+        if self.shared_template_index is not None:
+            return self.shared_template_index
+
+        if source is None:
+            if self._client is None:
+                raise RuntimeError(
+                    "FirestoreUnitOfWork is not configured. Call initialize() or with_app() before use."
+                )
+            source = FirestoreListenerSource(self._client.collection("shared_templates"))
+
+        index = SharedTemplateIndex(source)
+        self.shared_template_index = index
+        for repository in (
+            self.shared_template_repository,
+            self.async_shared_template_repository,
+        ):
+            if repository is not None:
+                repository.index = index
+        return index
+
+    def disable_shared_template_index(self) -> None:
+        """リスナーを解除し、共有テンプレートの取得をクエリに戻す。"""
+
+        index = self.shared_template_index
+        if index is None:
+            return
+        self.shared_template_index = None
+        for repository in (
+            self.shared_template_repository,
+            self.async_shared_template_repository,
+        ):
+            if repository is not None:
+                repository.index = None
+        index.close()
+
+    def enable_history_write_buffer(
+        self,
+        *,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+    ) -> HistoryWriteBuffer:
+        """非同期リポジトリの履歴保存をライトビハインドバッファ経由にする。"""
+
+        if self.history_write_buffer is None:
+            self.history_write_buffer = HistoryWriteBuffer(
+                self._write_history_batch,
+                max_batch_size=max_batch_size,
+                flush_interval=flush_interval,
+            )
+        if self.async_history_repository is not None:
+            self.async_history_repository.buffer = self.history_write_buffer
+        return self.history_write_buffer
+
+    async def close_history_write_buffer(self) -> None:
+        """溜まっている履歴を書き込み、バッファを取り外す。"""
+
+        buffer = self.history_write_buffer
+        if buffer is None:
+            return
+        await buffer.close()
+        self.history_write_buffer = None
+        if self.async_history_repository is not None:
+            self.async_history_repository.buffer = None
+
+    async def _write_history_batch(self, entries: list[dict[str, Any]]) -> None:
+        self.ensure_async_configured()
+        assert self.async_history_repository is not None
+        await self.async_history_repository.add_entries(entries)
+
+    @property
+    def uses_template_subcollection(self) -> bool:
+        return self.template_layout is UserTemplateLayout.SUBCOLLECTION
+
     @property
     def is_configured(self) -> bool:
         return all(
@@ -99,24 +239,69 @@ class FirestoreUnitOfWork:
                 "FirestoreUnitOfWork is not configured. Call initialize() or with_app() before use."
             )
 
-    def ensure_required_collections(self) -> None:
+    @property
+    def is_async_configured(self) -> bool:
+        return all(
+            (
+                self._async_client,
+                self.async_user_repository,
+                self.async_info_repository,
+                self.async_shared_template_repository,
+                self.async_history_repository,
+            )
+        )
+
+    def ensure_async_configured(self) -> None:
+        if not self.is_async_configured:
+            raise RuntimeError(
+                "FirestoreUnitOfWork has no async client. Call with_app() or with_async_client() before use."
+            )
+
+    def ensure_required_collections(self, *, force: bool = False) -> list[str]:
+        """必須コレクションのセンチネルを確認し、無いものを作成する。
+
+        センチネルは `get_all` の 1 回の読み込みでまとめて確認し、無いものは
+        1 つの `WriteBatch` で作成する。同じクライアントで確認済みの場合は
+        `force` を指定しない限り何もしない。作成したコレクション名を返す。
+        """
+
         if self._client is None:
             raise RuntimeError(
                 "FirestoreUnitOfWork is not configured. Call initialize() or with_app() before use."
             )
+        if self._collections_ready and not force:
+            return []
 
-        sentinel_payload = {
-            "_system": True,
-            "_purpose": "collection_sentinel",
-            "created_at": datetime.now(timezone.utc),
+        references = {
+            collection_name: self._client.collection(collection_name).document(
+                COLLECTION_SENTINEL_DOCUMENT_ID
+            )
+            for collection_name in REQUIRED_COLLECTIONS
         }
+        existing_paths = {
+            snapshot.reference.path
+            for snapshot in self._client.get_all(list(references.values()))
+            if getattr(snapshot, "exists", False)
+        }
+        missing = [
+            collection_name
+            for collection_name, reference in references.items()
+            if reference.path not in existing_paths
+        ]
+
+        if missing:
+            sentinel_payload = {
+                "_system": True,
+                "_purpose": "collection_sentinel",
+                "created_at": datetime.now(timezone.utc),
+            }
+            batch = self._client.batch()
+            for collection_name in missing:
+                batch.set(references[collection_name], sentinel_payload)
+            batch.commit()
 
-        for collection_name in REQUIRED_COLLECTIONS:
-            collection_ref = self._client.collection(collection_name)
-            document_ref = collection_ref.document(COLLECTION_SENTINEL_DOCUMENT_ID)
-            snapshot = document_ref.get()
-            if not getattr(snapshot, "exists", False):
-                document_ref.set(sentinel_payload)
+        self._collections_ready = True
+        return missing
 
 
 __all__ = ["FirestoreUnitOfWork"]
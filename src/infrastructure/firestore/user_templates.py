@@ -0,0 +1,154 @@
+"""ユーザーテンプレートの保存レイアウトとページングに関する補助処理。"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any
+
+from domain import Template, TemplatePage
+from domain.services.template_service import merge_templates
+
+from db.serializers import deserialize_template, ensure_datetime, serialize_template
+
+USER_TEMPLATES_SUBCOLLECTION = "templates"
+_CURSOR_SEPARATOR = "|"
+
+
+class UserTemplateLayout(Enum):
+    """ユーザーテンプレートの保存先。
+
+    `EMBEDDED` は `users/{id}.custom_templates` 配列、`SUBCOLLECTION` は
+    `users/{id}/templates/{template_id}` ドキュメントに保存する。
+    """
+
+    EMBEDDED = "embedded"
+    SUBCOLLECTION = "subcollection"
+
+
+def coerce_user_template_layout(
+    value: UserTemplateLayout | str | None,
+) -> UserTemplateLayout:
+    if isinstance(value, UserTemplateLayout):
+        return value
+    if value is None or not str(value).strip():
+        return UserTemplateLayout.EMBEDDED
+    try:
+        return UserTemplateLayout(str(value).strip().lower())
+    except ValueError as exc:
+        raise ValueError(f"Unknown user template layout: {value}") from exc
+
+
+def build_user_template_document(
+    template: Template, *, created_at: datetime
+) -> dict[str, Any]:
+    """サブコレクションに保存するテンプレートドキュメントを組み立てる。
+
+    `created_at` は一覧の並び順とページングのカーソルに利用する。
+    """
+
+    data = serialize_template(template)
+    data["created_at"] = created_at
+    return data
+
+
+def build_user_template_documents(
+    templates: Iterable[Template], *, base_time: datetime | None = None
+) -> list[dict[str, Any]]:
+    """配列の並び順を `created_at` の昇順として保つよう時刻をずらして変換する。"""
+
+    start = base_time or datetime.now(timezone.utc)
+    return [
+        build_user_template_document(
+            template, created_at=start + timedelta(microseconds=index)
+        )
+        for index, template in enumerate(templates)
+    ]
+
+
+def encode_template_cursor(document: dict[str, Any]) -> str:
+    created_at = ensure_datetime(document.get("created_at"))
+    if created_at is None:
+        raise ValueError("Template document has no created_at")
+    return f"{created_at.isoformat()}{_CURSOR_SEPARATOR}{document['template_id']}"
+
+
+def decode_template_cursor(cursor: str) -> tuple[datetime, str]:
+    created_at_text, separator, template_id = cursor.partition(_CURSOR_SEPARATOR)
+    created_at = ensure_datetime(created_at_text)
+    if not separator or created_at is None or not template_id:
+        raise ValueError("Invalid template cursor")
+    return created_at, template_id
+
+
+def deserialize_user_templates(documents: Iterable[Any]) -> list[Template]:
+    """テンプレートドキュメントを変換し、不正なものは読み飛ばす。"""
+
+    templates: list[Template] = []
+    for data in documents:
+        if not isinstance(data, dict):
+            continue
+        try:
+            templates.append(deserialize_template(data))
+        except ValueError:
+            continue
+    return templates
+
+
+def build_subcollection_page(
+    documents: list[dict[str, Any]], *, limit: int
+) -> TemplatePage:
+    """`limit + 1` 件取得したドキュメントからページを組み立てる。"""
+
+    has_more = len(documents) > limit
+    page_documents = documents[:limit]
+    next_cursor = None
+    if has_more and page_documents:
+        next_cursor = encode_template_cursor(page_documents[-1])
+    return TemplatePage(
+        templates=deserialize_user_templates(page_documents),
+        next_cursor=next_cursor,
+    )
+
+
+def paginate_embedded_templates(
+    templates: list[Template], *, limit: int, cursor: str | None
+) -> TemplatePage:
+    """`custom_templates` 配列をオフセットのカーソルでページングする。"""
+
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError as exc:
+        raise ValueError("Invalid template cursor") from exc
+
+    merged = merge_templates(templates)
+    end = offset + limit
+    next_cursor = str(end) if end < len(merged) else None
+    return TemplatePage(templates=merged[offset:end], next_cursor=next_cursor)
+
+
+def resolve_unique_title(base_title: str, existing_titles: Iterable[str]) -> str:
+    """既存タイトルと重複しないよう ` (n)` を付与したタイトルを返す。"""
+
+    titles = set(existing_titles)
+    new_title = base_title
+    counter = 1
+    while new_title in titles:
+        counter += 1
+        new_title = f"{base_title} ({counter})"
+    return new_title
+
+
+__all__ = [
+    "USER_TEMPLATES_SUBCOLLECTION",
+    "UserTemplateLayout",
+    "build_subcollection_page",
+    "build_user_template_document",
+    "build_user_template_documents",
+    "coerce_user_template_layout",
+    "decode_template_cursor",
+    "deserialize_user_templates",
+    "encode_template_cursor",
+    "paginate_embedded_templates",
+    "resolve_unique_title",
+]
@@ -0,0 +1,35 @@
+"""`TemplateRepository` を包んで振る舞いを付け加えるラッパー群。"""
+from .cache import (
+    DEFAULT_MAX_ITEMS,
+    DEFAULT_TEMPLATES_FAMILY,
+    DEFAULT_TTL_SECONDS,
+    EMBED_MODE_FAMILY,
+    SELECTION_MODE_FAMILY,
+    SHARED_TEMPLATES_FAMILY,
+    CacheStats,
+    CachingTemplateRepository,
+    TTLCache,
+)
+from .coalesce import (
+    USER_EXISTS_FAMILY,
+    CoalescingStats,
+    CoalescingTemplateRepository,
+)
+from .executor import ExecutorMethodStats, ExecutorTemplateRepository
+
+__all__ = [
+    "CacheStats",
+    "CachingTemplateRepository",
+    "CoalescingStats",
+    "CoalescingTemplateRepository",
+    "DEFAULT_MAX_ITEMS",
+    "DEFAULT_TEMPLATES_FAMILY",
+    "DEFAULT_TTL_SECONDS",
+    "EMBED_MODE_FAMILY",
+    "ExecutorMethodStats",
+    "ExecutorTemplateRepository",
+    "SELECTION_MODE_FAMILY",
+    "SHARED_TEMPLATES_FAMILY",
+    "TTLCache",
+    "USER_EXISTS_FAMILY",
+]
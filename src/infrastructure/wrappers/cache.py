@@ -0,0 +1,551 @@
+"""頻繁に読まれる設定値やテンプレート一覧をキャッシュするラッパー。"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Mapping, Sequence
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any
+
+from domain import (
+    AssignmentHistory,
+    DrawContext,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+    TemplatePage,
+    TemplateScope,
+    UserInfo,
+)
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
+from domain.services.selection_mode_service import coerce_selection_mode
+from domain.services.template_service import merge_templates
+from utils import resolve_awaitable
+
+DEFAULT_TEMPLATES_FAMILY = "default_templates"
+EMBED_MODE_FAMILY = "embed_mode"
+SELECTION_MODE_FAMILY = "selection_mode"
+SHARED_TEMPLATES_FAMILY = "shared_templates"
+
+DEFAULT_TTL_SECONDS: dict[str, float] = {
+    DEFAULT_TEMPLATES_FAMILY: 600.0,
+    EMBED_MODE_FAMILY: 60.0,
+    SELECTION_MODE_FAMILY: 60.0,
+    SHARED_TEMPLATES_FAMILY: 60.0,
+}
+
+# 保持する要素数の既定の上限。テンプレート一覧はテンプレート数で数える。
+DEFAULT_MAX_ITEMS = 4096
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """キーファミリー単位のキャッシュ利用状況。"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+
+class TTLCache:
+    """キーファミリーごとの TTL と LRU による容量上限を持つキャッシュ。
+
+    容量はエントリー数ではなく保持する要素数 (`max_items`) で数える。
+    テンプレート一覧のようなリストはその長さ、それ以外の値は 1 とするため、
+    大きな一覧が多数残ってメモリを使い続けることはない。1 件で上限を超える
+    値は保存しない。
+
+    `invalidate` のたびにファミリーの世代番号を進める。読み込み前に
+    `generation` で取得した番号を `set` に渡すと、読み込み中に破棄された
+    ファミリーへ古い値が書き戻されることはない。
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: Mapping[str, float],
+        max_items: int = DEFAULT_MAX_ITEMS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_items < 1:
+            raise ValueError("max_items must be a positive integer")
+        self._ttl_seconds = dict(ttl_seconds)
+        self._max_items = max_items
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, Hashable], tuple[float, Any, int]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._generations: dict[str, int] = {}
+        self._stats: dict[str, CacheStats] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """保持している要素数の合計。"""
+
+        return self._size
+
+    def _stats_for(self, family: str) -> CacheStats:
+        return self._stats.setdefault(family, CacheStats())
+
+    def generation(self, family: str) -> int:
+        """ファミリーの世代番号を返す。`invalidate` のたびに増える。"""
+
+        return self._generations.get(family, 0)
+
+    def get(self, family: str, key: Hashable = None) -> Any:
+        """値を返す。未登録または期限切れの場合は `_MISSING` を返す。"""
+
+        stats = self._stats_for(family)
+        entry_key = (family, key)
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            stats.misses += 1
+            return _MISSING
+
+        expires_at, value, _ = entry
+        if expires_at <= self._clock():
+            self._discard(entry_key)
+            stats.misses += 1
+            return _MISSING
+
+        self._entries.move_to_end(entry_key)
+        stats.hits += 1
+        return value
+
+    def record_miss(self, family: str) -> None:
+        """`peek` で見つからず内側から読み込んだ値をミスとして数える。"""
+
+        self._stats_for(family).misses += 1
+
+    def peek(self, family: str, key: Hashable = None) -> Any:
+        """`get` と同じ値を返すが、ヒット/ミス数と LRU の順序は変えない。"""
+
+        entry = self._entries.get((family, key))
+        if entry is None or entry[0] <= self._clock():
+            return _MISSING
+        return entry[1]
+
+    def set(
+        self,
+        family: str,
+        value: Any,
+        key: Hashable = None,
+        *,
+        generation: int | None = None,
+    ) -> None:
+        """値を保存する。`generation` が現在の世代と異なれば何もしない。"""
+
+        ttl = self._ttl_seconds.get(family, 0.0)
+        if ttl <= 0:
+            return
+        if generation is not None and generation != self.generation(family):
+            return
+
+        entry_key = (family, key)
+        self._discard(entry_key)
+        weight = _weigh(value)
+        if weight > self._max_items:
+            return
+        self._entries[entry_key] = (self._clock() + ttl, value, weight)
+        self._size += weight
+        while self._size > self._max_items:
+            evicted_key = next(iter(self._entries))
+            self._discard(evicted_key)
+            self._stats_for(evicted_key[0]).evictions += 1
+
+    def invalidate(self, family: str) -> None:
+        """指定したファミリーのエントリーを全て破棄し、世代番号を進める。"""
+
+        stale_keys = [entry_key for entry_key in self._entries if entry_key[0] == family]
+        for entry_key in stale_keys:
+            self._discard(entry_key)
+        self._generations[family] = self.generation(family) + 1
+        self._stats_for(family).invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> dict[str, CacheStats]:
+        return {family: replace(stats) for family, stats in self._stats.items()}
+
+    def _discard(self, entry_key: tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+
+def _weigh(value: Any) -> int:
+    # 一覧は要素数、それ以外の値は 1 件として数える。
+    if isinstance(value, (list, tuple)):
+        return max(len(value), 1)
+    return 1
+
+
+class CachingTemplateRepository(AsyncTemplateRepository):
+    """`TemplateRepository` の読み取りをキャッシュ経由にするラッパー。
+
+    既定テンプレート・表示/抽選モード・共有テンプレート一覧をキャッシュし、
+    それらを変更する操作ではキャッシュを書き込み時に破棄する。内側には同期・
+    非同期どちらのリポジトリも渡せる。
+    """
+
+    def __init__(
+        self,
+        repository: TemplateRepository | AsyncTemplateRepository,
+        *,
+        ttl_seconds: Mapping[str, float] | None = None,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._repository = repository
+        self._cache = TTLCache(
+            ttl_seconds={**DEFAULT_TTL_SECONDS, **(ttl_seconds or {})},
+            max_items=max_items,
+            clock=clock,
+        )
+
+    # region プロパティ/設定系 -------------------------------------------------
+    @property
+    def repository(self) -> TemplateRepository | AsyncTemplateRepository:
+        return self._repository
+
+    @property
+    def cache(self) -> TTLCache:
+        return self._cache
+
+    def stats(self) -> dict[str, CacheStats]:
+        """キーファミリーごとのヒット/ミス数のスナップショットを返す。"""
+
+        return self._cache.stats()
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部ヘルパー -----------------------------------------------------
+    async def _cached(
+        self,
+        family: str,
+        key: Hashable,
+        loader: Callable[[], Any],
+    ) -> Any:
+        value = self._cache.get(family, key)
+        if value is _MISSING:
+            # 読み込み中に変更系の操作で破棄された場合は、古い値を書き戻さない。
+            generation = self._cache.generation(family)
+            value = await resolve_awaitable(loader())
+            self._cache.set(family, value, key, generation=generation)
+        if isinstance(value, list):
+            # 呼び出し側でのリスト操作がキャッシュへ波及しないよう複製して返す。
+            return list(value)
+        return value
+
+    # endregion ----------------------------------------------------------------
+
+    # region 公開API -----------------------------------------------------------
+    async def ensure_default_templates(self) -> list[Template]:
+        generation = self._cache.generation(DEFAULT_TEMPLATES_FAMILY)
+        templates = await resolve_awaitable(
+            self._repository.ensure_default_templates()
+        )
+        self._cache.set(DEFAULT_TEMPLATES_FAMILY, templates, generation=generation)
+        return list(templates)
+
+    async def get_default_templates(self) -> list[Template]:
+        return await self._cached(
+            DEFAULT_TEMPLATES_FAMILY, None, self._repository.get_default_templates
+        )
+
+    async def list_shared_templates(
+        self,
+        *,
+        scope: TemplateScope | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Template]:
+        return await self._cached(
+            SHARED_TEMPLATES_FAMILY,
+            (scope, guild_id, created_by),
+            lambda: self._repository.list_shared_templates(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            ),
+        )
+
+    async def get_shared_templates_for_user(
+        self, *, guild_id: int | None
+    ) -> tuple[list[Template], list[Template]]:
+        guild_templates: list[Template] = []
+        if guild_id is not None:
+            guild_templates = await self.list_shared_templates(
+                scope=TemplateScope.GUILD, guild_id=guild_id
+            )
+        public_templates = await self.list_shared_templates(scope=TemplateScope.PUBLIC)
+        return guild_templates, public_templates
+
+    async def toggle_embed_mode(self) -> None:
+        try:
+            await resolve_awaitable(self._repository.toggle_embed_mode())
+        finally:
+            # 例外でも書き込み済みの可能性があるため、必ず破棄する。
+            self._cache.invalidate(EMBED_MODE_FAMILY)
+
+    async def get_embed_mode(self) -> str:
+        return await self._cached(
+            EMBED_MODE_FAMILY, None, self._repository.get_embed_mode
+        )
+
+    async def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
+        try:
+            await resolve_awaitable(self._repository.set_embed_mode(mode))
+        finally:
+            # 例外でも書き込み済みの可能性があるため、必ず破棄する。
+            self._cache.invalidate(EMBED_MODE_FAMILY)
+
+    async def set_selection_mode(self, mode: SelectionMode | str) -> None:
+        try:
+            await resolve_awaitable(self._repository.set_selection_mode(mode))
+        finally:
+            # 例外でも書き込み済みの可能性があるため、必ず破棄する。
+            self._cache.invalidate(SELECTION_MODE_FAMILY)
+
+    async def get_selection_mode(self) -> str:
+        return await self._cached(
+            SELECTION_MODE_FAMILY, None, self._repository.get_selection_mode
+        )
+
+    async def save_history(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        pairs: PairList,
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.save_history(
+                guild_id=guild_id,
+                template=template,
+                pairs=pairs,
+                selection_mode=selection_mode,
+            )
+        )
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.save_history_rounds(
+                guild_id=guild_id,
+                template=template,
+                rounds=rounds,
+                selection_mode=selection_mode,
+            )
+        )
+
+    async def get_recent_history(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> list[AssignmentHistory]:
+        return await resolve_awaitable(
+            self._repository.get_recent_history(
+                guild_id=guild_id,
+                template_title=template_title,
+                limit=limit,
+                since=since,
+                start_after=start_after,
+                fields=fields,
+            )
+        )
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        return await resolve_awaitable(
+            self._repository.get_streak_aggregate(
+                guild_id=guild_id, template_title=template_title
+            )
+        )
+
+    async def init_user(self, user_id: int, name: str) -> None:
+        await resolve_awaitable(self._repository.init_user(user_id, name))
+
+    async def set_user(self, user: UserInfo) -> None:
+        await resolve_awaitable(self._repository.set_user(user))
+
+    async def get_user(
+        self,
+        user_id: int,
+        *,
+        guild_id: int | None = None,
+        include_shared: bool = True,
+        include_templates: bool = True,
+    ) -> UserInfo | None:
+        # 共有テンプレートはキャッシュから組み立て、ユーザードキュメントのみ読み込む。
+        user = await resolve_awaitable(
+            self._repository.get_user(
+                user_id,
+                guild_id=guild_id,
+                include_shared=False,
+                include_templates=include_templates,
+            )
+        )
+        if user is None or not include_shared:
+            return user
+
+        default_templates = await self.get_default_templates()
+        shared_templates, public_templates = await self.get_shared_templates_for_user(
+            guild_id=guild_id
+        )
+        user.shared_templates = shared_templates
+        user.public_templates = merge_templates(public_templates, default_templates)
+        return user
+
+    async def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        families = (EMBED_MODE_FAMILY, SELECTION_MODE_FAMILY, DEFAULT_TEMPLATES_FAMILY)
+        # 揃っているかの確認ではヒット/ミス数を数えず、使う値だけを数える。
+        missing = [
+            family for family in families if self._cache.peek(family) is _MISSING
+        ]
+        if not missing:
+            # 設定値が揃っていればユーザードキュメントのみ読み込む。
+            embed_mode, selection_mode, default_templates = (
+                self._cache.get(family) for family in families
+            )
+            user = await resolve_awaitable(
+                self._repository.get_user(
+                    user_id, guild_id=guild_id, include_shared=False
+                )
+            )
+            return DrawContext(
+                guild_id=guild_id,
+                user=user,
+                selection_mode=coerce_selection_mode(selection_mode),
+                embed_mode=ResultEmbedMode(embed_mode),
+                default_templates=list(default_templates),
+            )
+
+        # 内側からまとめて読み直すため、欠けていたファミリーをミスとして数える。
+        for family in missing:
+            self._cache.record_miss(family)
+        generations = {family: self._cache.generation(family) for family in families}
+        context = await resolve_awaitable(
+            self._repository.load_draw_context(user_id=user_id, guild_id=guild_id)
+        )
+        for family, value in (
+            (EMBED_MODE_FAMILY, context.embed_mode.value),
+            (SELECTION_MODE_FAMILY, context.selection_mode.value),
+            (DEFAULT_TEMPLATES_FAMILY, list(context.default_templates)),
+        ):
+            self._cache.set(family, value, generation=generations[family])
+        return context
+
+    async def delete_user(self, user_id: int) -> None:
+        await resolve_awaitable(self._repository.delete_user(user_id))
+
+    async def user_is_exist(self, user_id: int) -> bool:
+        return await resolve_awaitable(self._repository.user_is_exist(user_id))
+
+    async def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        return await resolve_awaitable(
+            self._repository.list_custom_templates(
+                user_id, limit=limit, cursor=cursor
+            )
+        )
+
+    async def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        return await resolve_awaitable(
+            self._repository.get_custom_template(user_id, template_id)
+        )
+
+    async def add_custom_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(self._repository.add_custom_template(user_id, template))
+
+    async def update_custom_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(
+            self._repository.update_custom_template(user_id, template)
+        )
+
+    async def delete_custom_template(
+        self,
+        user_id: int,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.delete_custom_template(
+                user_id, template_id=template_id, template_title=template_title
+            )
+        )
+
+    async def set_least_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(self._repository.set_least_template(user_id, template))
+
+    async def create_shared_template(self, template: Template) -> Template:
+        try:
+            return await resolve_awaitable(
+                self._repository.create_shared_template(template)
+            )
+        finally:
+            self._cache.invalidate(SHARED_TEMPLATES_FAMILY)
+
+    async def delete_shared_template(self, template_id: str) -> None:
+        try:
+            await resolve_awaitable(self._repository.delete_shared_template(template_id))
+        finally:
+            self._cache.invalidate(SHARED_TEMPLATES_FAMILY)
+
+    async def copy_shared_template_to_user(
+        self, user_id: int, template: Template
+    ) -> Template:
+        return await resolve_awaitable(
+            self._repository.copy_shared_template_to_user(user_id, template)
+        )
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = [
+    "CacheStats",
+    "CachingTemplateRepository",
+    "DEFAULT_MAX_ITEMS",
+    "DEFAULT_TEMPLATES_FAMILY",
+    "DEFAULT_TTL_SECONDS",
+    "EMBED_MODE_FAMILY",
+    "SELECTION_MODE_FAMILY",
+    "SHARED_TEMPLATES_FAMILY",
+    "TTLCache",
+]
@@ -0,0 +1,380 @@
+"""同じ引数で同時に発生した読み取りを 1 回の呼び出しにまとめるラッパー。"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Hashable, Sequence
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any
+
+from domain import (
+    AssignmentHistory,
+    DrawContext,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+    TemplatePage,
+    TemplateScope,
+    UserInfo,
+)
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
+from utils import resolve_awaitable
+
+from .cache import (
+    DEFAULT_TEMPLATES_FAMILY,
+    EMBED_MODE_FAMILY,
+    SELECTION_MODE_FAMILY,
+    SHARED_TEMPLATES_FAMILY,
+)
+
+USER_EXISTS_FAMILY = "user_exists"
+
+
+@dataclass(slots=True)
+class CoalescingStats:
+    """キーファミリー単位の呼び出し件数。
+
+    `calls` は受け付けた呼び出し、`coalesced` はそのうち実行中の呼び出しに
+    相乗りして内側のリポジトリを呼ばずに済んだ件数。
+    """
+
+    calls: int = 0
+    coalesced: int = 0
+
+    @property
+    def coalesced_ratio(self) -> float:
+        if self.calls == 0:
+            return 0.0
+        return self.coalesced / self.calls
+
+
+class CoalescingTemplateRepository(AsyncTemplateRepository):
+    """実行中の同一読み取りに後続の呼び出しを相乗りさせるラッパー (singleflight)。
+
+    結果は呼び出しが完了した時点で破棄するため、キャッシュとは異なり古い値を
+    返し続けることはない。変更系メソッドを実行すると該当ファミリーの実行中の
+    読み取りを切り離し、以降の呼び出しは新たに読み込む。
+    """
+
+    def __init__(self, repository: TemplateRepository | AsyncTemplateRepository) -> None:
+        self._repository = repository
+        self._inflight: dict[tuple[str, Hashable], asyncio.Future[Any]] = {}
+        self._stats: dict[str, CoalescingStats] = {}
+
+    # region プロパティ/設定系 -------------------------------------------------
+    @property
+    def repository(self) -> TemplateRepository | AsyncTemplateRepository:
+        return self._repository
+
+    @property
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict[str, CoalescingStats]:
+        """キーファミリーごとの呼び出し件数のスナップショットを返す。"""
+
+        return {family: replace(stats) for family, stats in self._stats.items()}
+
+    def coalesced_ratio(self) -> float:
+        """全ファミリーを通した相乗り率。"""
+
+        calls = sum(stats.calls for stats in self._stats.values())
+        if calls == 0:
+            return 0.0
+        return sum(stats.coalesced for stats in self._stats.values()) / calls
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部ヘルパー -----------------------------------------------------
+    async def _coalesced(
+        self,
+        family: str,
+        key: Hashable,
+        loader: Callable[[], Any],
+    ) -> Any:
+        stats = self._stats.setdefault(family, CoalescingStats())
+        stats.calls += 1
+
+        entry_key = (family, key)
+        future = self._inflight.get(entry_key)
+        if future is None:
+            future = asyncio.ensure_future(resolve_awaitable(loader()))
+            self._inflight[entry_key] = future
+            future.add_done_callback(
+                lambda done, entry_key=entry_key: self._release(entry_key, done)
+            )
+        else:
+            stats.coalesced += 1
+
+        # 呼び出し元の 1 つがキャンセルされても、共有中の読み取りは止めない。
+        value = await asyncio.shield(future)
+        if isinstance(value, list):
+            # 呼び出し側でのリスト操作が他の呼び出し元へ波及しないよう複製して返す。
+            return list(value)
+        if isinstance(value, tuple):
+            return tuple(list(item) if isinstance(item, list) else item for item in value)
+        return value
+
+    def _release(self, entry_key: tuple[str, Hashable], future: asyncio.Future[Any]) -> None:
+        if self._inflight.get(entry_key) is future:
+            del self._inflight[entry_key]
+        if not future.cancelled():
+            # 待機者がいないまま失敗した場合の警告を抑止する。
+            future.exception()
+
+    def _forget(self, family: str) -> None:
+        """実行中の読み取りを切り離し、以降の呼び出しで読み直させる。"""
+
+        for entry_key in [key for key in self._inflight if key[0] == family]:
+            del self._inflight[entry_key]
+
+    # endregion ----------------------------------------------------------------
+
+    # region 公開API -----------------------------------------------------------
+    async def ensure_default_templates(self) -> list[Template]:
+        try:
+            return await resolve_awaitable(self._repository.ensure_default_templates())
+        finally:
+            self._forget(DEFAULT_TEMPLATES_FAMILY)
+
+    async def get_default_templates(self) -> list[Template]:
+        return await self._coalesced(
+            DEFAULT_TEMPLATES_FAMILY, None, self._repository.get_default_templates
+        )
+
+    async def list_shared_templates(
+        self,
+        *,
+        scope: TemplateScope | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Template]:
+        return await self._coalesced(
+            SHARED_TEMPLATES_FAMILY,
+            ("list", scope, guild_id, created_by),
+            lambda: self._repository.list_shared_templates(
+                scope=scope, guild_id=guild_id, created_by=created_by
+            ),
+        )
+
+    async def get_shared_templates_for_user(
+        self, *, guild_id: int | None
+    ) -> tuple[list[Template], list[Template]]:
+        return await self._coalesced(
+            SHARED_TEMPLATES_FAMILY,
+            ("for_user", guild_id),
+            lambda: self._repository.get_shared_templates_for_user(guild_id=guild_id),
+        )
+
+    async def toggle_embed_mode(self) -> None:
+        try:
+            await resolve_awaitable(self._repository.toggle_embed_mode())
+        finally:
+            self._forget(EMBED_MODE_FAMILY)
+
+    async def get_embed_mode(self) -> str:
+        return await self._coalesced(
+            EMBED_MODE_FAMILY, None, self._repository.get_embed_mode
+        )
+
+    async def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
+        try:
+            await resolve_awaitable(self._repository.set_embed_mode(mode))
+        finally:
+            self._forget(EMBED_MODE_FAMILY)
+
+    async def set_selection_mode(self, mode: SelectionMode | str) -> None:
+        try:
+            await resolve_awaitable(self._repository.set_selection_mode(mode))
+        finally:
+            self._forget(SELECTION_MODE_FAMILY)
+
+    async def get_selection_mode(self) -> str:
+        return await self._coalesced(
+            SELECTION_MODE_FAMILY, None, self._repository.get_selection_mode
+        )
+
+    async def save_history(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        pairs: PairList,
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.save_history(
+                guild_id=guild_id,
+                template=template,
+                pairs=pairs,
+                selection_mode=selection_mode,
+            )
+        )
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.save_history_rounds(
+                guild_id=guild_id,
+                template=template,
+                rounds=rounds,
+                selection_mode=selection_mode,
+            )
+        )
+
+    async def get_recent_history(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> list[AssignmentHistory]:
+        return await resolve_awaitable(
+            self._repository.get_recent_history(
+                guild_id=guild_id,
+                template_title=template_title,
+                limit=limit,
+                since=since,
+                start_after=start_after,
+                fields=fields,
+            )
+        )
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        return await resolve_awaitable(
+            self._repository.get_streak_aggregate(
+                guild_id=guild_id, template_title=template_title
+            )
+        )
+
+    async def init_user(self, user_id: int, name: str) -> None:
+        try:
+            await resolve_awaitable(self._repository.init_user(user_id, name))
+        finally:
+            self._forget(USER_EXISTS_FAMILY)
+
+    async def set_user(self, user: UserInfo) -> None:
+        try:
+            await resolve_awaitable(self._repository.set_user(user))
+        finally:
+            self._forget(USER_EXISTS_FAMILY)
+
+    async def get_user(
+        self,
+        user_id: int,
+        *,
+        guild_id: int | None = None,
+        include_shared: bool = True,
+        include_templates: bool = True,
+    ) -> UserInfo | None:
+        return await resolve_awaitable(
+            self._repository.get_user(
+                user_id,
+                guild_id=guild_id,
+                include_shared=include_shared,
+                include_templates=include_templates,
+            )
+        )
+
+    async def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        return await resolve_awaitable(
+            self._repository.load_draw_context(user_id=user_id, guild_id=guild_id)
+        )
+
+    async def delete_user(self, user_id: int) -> None:
+        try:
+            await resolve_awaitable(self._repository.delete_user(user_id))
+        finally:
+            self._forget(USER_EXISTS_FAMILY)
+
+    async def user_is_exist(self, user_id: int) -> bool:
+        return await self._coalesced(
+            USER_EXISTS_FAMILY,
+            user_id,
+            lambda: self._repository.user_is_exist(user_id),
+        )
+
+    async def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        return await resolve_awaitable(
+            self._repository.list_custom_templates(
+                user_id, limit=limit, cursor=cursor
+            )
+        )
+
+    async def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        return await resolve_awaitable(
+            self._repository.get_custom_template(user_id, template_id)
+        )
+
+    async def add_custom_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(self._repository.add_custom_template(user_id, template))
+
+    async def update_custom_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(
+            self._repository.update_custom_template(user_id, template)
+        )
+
+    async def delete_custom_template(
+        self,
+        user_id: int,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        await resolve_awaitable(
+            self._repository.delete_custom_template(
+                user_id, template_id=template_id, template_title=template_title
+            )
+        )
+
+    async def set_least_template(self, user_id: int, template: Template) -> None:
+        await resolve_awaitable(self._repository.set_least_template(user_id, template))
+
+    async def create_shared_template(self, template: Template) -> Template:
+        try:
+            return await resolve_awaitable(
+                self._repository.create_shared_template(template)
+            )
+        finally:
+            self._forget(SHARED_TEMPLATES_FAMILY)
+
+    async def delete_shared_template(self, template_id: str) -> None:
+        try:
+            await resolve_awaitable(self._repository.delete_shared_template(template_id))
+        finally:
+            self._forget(SHARED_TEMPLATES_FAMILY)
+
+    async def copy_shared_template_to_user(
+        self, user_id: int, template: Template
+    ) -> Template:
+        return await resolve_awaitable(
+            self._repository.copy_shared_template_to_user(user_id, template)
+        )
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = [
+    "CoalescingStats",
+    "CoalescingTemplateRepository",
+    "USER_EXISTS_FAMILY",
+]
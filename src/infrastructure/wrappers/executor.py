@@ -0,0 +1,317 @@
+"""同期リポジトリの呼び出しを専用スレッドプールへ退避するラッパー。"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime
+from collections.abc import Sequence
+from typing import Any, Callable
+
+from domain import (
+    AssignmentHistory,
+    DrawContext,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    StreakAggregate,
+    Template,
+    TemplatePage,
+    TemplateScope,
+    UserInfo,
+)
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
+
+
+@dataclass(slots=True)
+class ExecutorMethodStats:
+    """メソッド単位のスレッドプール利用状況。"""
+
+    calls: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    @property
+    def average_wait_seconds(self) -> float:
+        if self.calls == 0:
+            return 0.0
+        return self.total_wait_seconds / self.calls
+
+
+class ExecutorTemplateRepository(AsyncTemplateRepository):
+    """`TemplateRepository` の各呼び出しを `run_in_executor` で実行する。
+
+    呼び出しはワーカー数を制限した専用プールで処理されるため、Firestore の
+    同期 I/O がイベントループを止めずに並行して進む。プールが飽和すると
+    待ち行列が伸びるので、`stats()` の `queue_depth` と待ち時間で検知できる。
+    """
+
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(
+        self,
+        repository: TemplateRepository,
+        *,
+        max_workers: int | None = None,
+        executor: ThreadPoolExecutor | None = None,
+    ) -> None:
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be a positive integer")
+        self._repository = repository
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers or self.DEFAULT_MAX_WORKERS,
+            thread_name_prefix="template-repository",
+        )
+        self._stats: dict[str, ExecutorMethodStats] = {}
+        self._stats_lock = threading.Lock()
+
+    # region プロパティ/設定系 -------------------------------------------------
+    @property
+    def repository(self) -> TemplateRepository:
+        return self._repository
+
+    def stats(self) -> dict[str, ExecutorMethodStats]:
+        """メソッド名ごとの利用状況のスナップショットを返す。"""
+
+        with self._stats_lock:
+            return {name: replace(stats) for name, stats in self._stats.items()}
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        """自前で生成したスレッドプールを停止する。"""
+
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+    # endregion ----------------------------------------------------------------
+
+    # region 内部ヘルパー -----------------------------------------------------
+    def _enqueue(self, method_name: str) -> ExecutorMethodStats:
+        with self._stats_lock:
+            stats = self._stats.setdefault(method_name, ExecutorMethodStats())
+            stats.calls += 1
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+            return stats
+
+    def _dequeue(self, stats: ExecutorMethodStats, waited: float | None) -> None:
+        # 実行前に取り消された呼び出しは待ち時間を記録しない。
+        with self._stats_lock:
+            stats.queue_depth -= 1
+            if waited is not None:
+                stats.total_wait_seconds += waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+    async def _run(self, method_name: str, *args: Any, **kwargs: Any) -> Any:
+        method: Callable[..., Any] = getattr(self._repository, method_name)
+        stats = self._enqueue(method_name)
+        submitted_at = time.perf_counter()
+
+        def invoke() -> Any:
+            self._dequeue(stats, time.perf_counter() - submitted_at)
+            return method(*args, **kwargs)
+
+        def on_done(future: Future[Any]) -> None:
+            # ワーカーが拾う前に取り消されると `invoke` が呼ばれないため、ここで戻す。
+            if future.cancelled():
+                self._dequeue(stats, None)
+
+        try:
+            future = self._executor.submit(invoke)
+        except BaseException:
+            self._dequeue(stats, None)
+            raise
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    # endregion ----------------------------------------------------------------
+
+    # region 公開API -----------------------------------------------------------
+    async def ensure_default_templates(self) -> list[Template]:
+        return await self._run("ensure_default_templates")
+
+    async def get_default_templates(self) -> list[Template]:
+        return await self._run("get_default_templates")
+
+    async def list_shared_templates(
+        self,
+        *,
+        scope: TemplateScope | None = None,
+        guild_id: int | None = None,
+        created_by: int | None = None,
+    ) -> list[Template]:
+        return await self._run(
+            "list_shared_templates",
+            scope=scope,
+            guild_id=guild_id,
+            created_by=created_by,
+        )
+
+    async def get_shared_templates_for_user(
+        self, *, guild_id: int | None
+    ) -> tuple[list[Template], list[Template]]:
+        return await self._run("get_shared_templates_for_user", guild_id=guild_id)
+
+    async def toggle_embed_mode(self) -> None:
+        await self._run("toggle_embed_mode")
+
+    async def get_embed_mode(self) -> str:
+        return await self._run("get_embed_mode")
+
+    async def set_embed_mode(self, mode: ResultEmbedMode | str) -> None:
+        await self._run("set_embed_mode", mode)
+
+    async def set_selection_mode(self, mode: SelectionMode | str) -> None:
+        await self._run("set_selection_mode", mode)
+
+    async def get_selection_mode(self) -> str:
+        return await self._run("get_selection_mode")
+
+    async def save_history(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        pairs: PairList,
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await self._run(
+            "save_history",
+            guild_id=guild_id,
+            template=template,
+            pairs=pairs,
+            selection_mode=selection_mode,
+        )
+
+    async def save_history_rounds(
+        self,
+        *,
+        guild_id: int,
+        template: Template,
+        rounds: Sequence[PairList],
+        selection_mode: SelectionMode | str,
+    ) -> None:
+        await self._run(
+            "save_history_rounds",
+            guild_id=guild_id,
+            template=template,
+            rounds=rounds,
+            selection_mode=selection_mode,
+        )
+
+    async def get_recent_history(
+        self,
+        *,
+        guild_id: int,
+        template_title: str | None = None,
+        limit: int = 10,
+        since: datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
+    ) -> list[AssignmentHistory]:
+        return await self._run(
+            "get_recent_history",
+            guild_id=guild_id,
+            template_title=template_title,
+            limit=limit,
+            since=since,
+            start_after=start_after,
+            fields=fields,
+        )
+
+    async def get_streak_aggregate(
+        self, *, guild_id: int, template_title: str
+    ) -> StreakAggregate | None:
+        return await self._run(
+            "get_streak_aggregate", guild_id=guild_id, template_title=template_title
+        )
+
+    async def init_user(self, user_id: int, name: str) -> None:
+        await self._run("init_user", user_id, name)
+
+    async def set_user(self, user: UserInfo) -> None:
+        await self._run("set_user", user)
+
+    async def get_user(
+        self,
+        user_id: int,
+        *,
+        guild_id: int | None = None,
+        include_shared: bool = True,
+        include_templates: bool = True,
+    ) -> UserInfo | None:
+        return await self._run(
+            "get_user",
+            user_id,
+            guild_id=guild_id,
+            include_shared=include_shared,
+            include_templates=include_templates,
+        )
+
+    async def load_draw_context(
+        self, *, user_id: int, guild_id: int | None = None
+    ) -> DrawContext:
+        return await self._run(
+            "load_draw_context", user_id=user_id, guild_id=guild_id
+        )
+
+    async def delete_user(self, user_id: int) -> None:
+        await self._run("delete_user", user_id)
+
+    async def user_is_exist(self, user_id: int) -> bool:
+        return await self._run("user_is_exist", user_id)
+
+    async def list_custom_templates(
+        self, user_id: int, *, limit: int = 25, cursor: str | None = None
+    ) -> TemplatePage:
+        return await self._run(
+            "list_custom_templates", user_id, limit=limit, cursor=cursor
+        )
+
+    async def get_custom_template(
+        self, user_id: int, template_id: str
+    ) -> Template | None:
+        return await self._run("get_custom_template", user_id, template_id)
+
+    async def add_custom_template(self, user_id: int, template: Template) -> None:
+        await self._run("add_custom_template", user_id, template)
+
+    async def update_custom_template(self, user_id: int, template: Template) -> None:
+        await self._run("update_custom_template", user_id, template)
+
+    async def delete_custom_template(
+        self,
+        user_id: int,
+        *,
+        template_id: str | None = None,
+        template_title: str | None = None,
+    ) -> None:
+        await self._run(
+            "delete_custom_template",
+            user_id,
+            template_id=template_id,
+            template_title=template_title,
+        )
+
+    async def set_least_template(self, user_id: int, template: Template) -> None:
+        await self._run("set_least_template", user_id, template)
+
+    async def create_shared_template(self, template: Template) -> Template:
+        return await self._run("create_shared_template", template)
+
+    async def delete_shared_template(self, template_id: str) -> None:
+        await self._run("delete_shared_template", template_id)
+
+    async def copy_shared_template_to_user(
+        self, user_id: int, template: Template
+    ) -> Template:
+        return await self._run("copy_shared_template_to_user", user_id, template)
+
+    # endregion ----------------------------------------------------------------
+
+
+__all__ = ["ExecutorMethodStats", "ExecutorTemplateRepository"]
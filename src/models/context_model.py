@@ -24,6 +24,8 @@ class CommandContext:
     )
     options_snapshot: list[str] = field(default_factory=list)
     option_edit_index: int | None = None
+    template_page_cursor: str | None = None
+    schedule_rounds: int = 1
 
     @property
     def result(self) -> AmidakujiStateTypes.EXPECTED_TYPES:
@@ -1,8 +1,10 @@
 """Discordクライアント本体を定義するモジュール。"""
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
+from collections.abc import Awaitable, Callable, Sequence
 from typing import Any
 
 import discord
@@ -10,6 +12,7 @@ import discord
 from domain.interfaces.repositories import TemplateRepository
 from presentation.discord.services import DiscordCommandUseCases
 from services.startup_check import StartupSelfCheck
+from services.user_registry import UserRegistrationQueue
 from utils import (
     ERROR,
     INFO,
@@ -33,6 +36,8 @@ class BotClient(discord.Client):
         translator: discord.app_commands.Translator | None = None,
         auto_sync_tree: bool = True,
         usecases: DiscordCommandUseCases | None = None,
+        shutdown_callbacks: Sequence[Callable[[], Awaitable[None]]] = (),
+        user_registry: UserRegistrationQueue | None = None,
     ) -> None:
         if db_manager is None:
             raise ValueError("db_manager must not be None")
@@ -44,18 +49,39 @@ class BotClient(discord.Client):
         self._translator = translator or CommandsTranslator()
         self._auto_sync_tree = auto_sync_tree
         self._usecases = usecases or DiscordCommandUseCases.from_repository(db_manager)
+        self._shutdown_callbacks = list(shutdown_callbacks)
+        self._user_registry = user_registry or UserRegistrationQueue(
+            self._usecases.template_service
+        )
 
     async def setup_hook(self) -> None:
+        self._user_registry.start()
         await self.tree.set_translator(self._translator)
         if self._auto_sync_tree:
             await self.tree.sync()
             logging.info(INFO + "Application commands synchronized.")
 
+    async def close(self) -> None:
+        # 書き込み待ちのデータを失わないよう、切断前に終了処理を実行する。
+        try:
+            await self._user_registry.close()
+        except Exception:
+            logging.exception(ERROR + "Failed to flush pending user registrations.")
+        callbacks, self._shutdown_callbacks = self._shutdown_callbacks, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception:
+                logging.exception(ERROR + "Shutdown callback failed.")
+        await super().close()
+
     async def on_ready(self) -> None:
-        self.db.ensure_default_templates()
+        # 同期リポジトリの初期化とインデックス確認はブロッキングI/Oを伴うため、
+        # イベントループを止めないようワーカースレッドで実行する。
+        await asyncio.to_thread(self.db.ensure_default_templates)
 
         checker = StartupSelfCheck(self.db)
-        if not checker.run(discord_client=self):
+        if not await asyncio.to_thread(checker.run, discord_client=self):
             logging.error(ERROR + "Critical startup check failed. Shutting down client.")
             await self.close()
             return
@@ -73,15 +99,19 @@ class BotClient(discord.Client):
 
         return self._usecases
 
+    @property
+    def user_registry(self) -> UserRegistrationQueue:
+        return self._user_registry
+
     async def on_app_command_completion(
         self,
         interaction: discord.Interaction,
         command: discord.app_commands.Command | discord.app_commands.ContextMenu,
     ) -> None:
         exec_user = interaction.user
-        user_id = exec_user.id
-        if not self.db.user_is_exist(user_id):
-            self.db.init_user(user_id=user_id, name=exec_user.name)
+        # 確認済みのユーザーはメモリ上で判定し、未確認のユーザーだけを
+        # バックグラウンドで登録する。
+        self._user_registry.observe(exec_user.id, exec_user.name)
 
         exec_guild = yellow(interaction.guild) if interaction.guild else "DM"
         exec_channel = magenta(interaction.channel) if interaction.channel else "(DM)"
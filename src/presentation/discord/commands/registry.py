@@ -7,9 +7,11 @@ from typing import TYPE_CHECKING
 
 import discord
 import psutil
+from discord import app_commands
 from discord.app_commands import locale_str
 
 from application.dto import SharedTemplateSetDTO
+from application.services.template_service import PRIVATE_TEMPLATE_PAGE_SIZE
 from data_interface import FlowController
 from domain import ResultEmbedMode, SelectionMode, TemplateScope
 from models.context_model import CommandContext
@@ -38,6 +40,9 @@ from presentation.discord.views.view import ModeSelectionView
 if TYPE_CHECKING:  # pragma: no cover - 型チェック専用
     from presentation.discord.client import BotClient as BotClientProtocol
 
+# `/amidakuji` の `rounds` で一度に抽選できるラウンド数の上限。
+MAX_SCHEDULE_ROUNDS = 10
+
 
 def _resolve_client(interaction: discord.Interaction) -> BotClient:
     client = interaction.client
@@ -139,7 +144,12 @@ def register_commands(client: "BotClientProtocol") -> None:
         name=locale_str("amidakuji"),
         description=locale_str("amidakuji.description"),
     )
-    async def command_amidakuji(interaction: discord.Interaction) -> None:
+    @app_commands.rename(rounds=locale_str("rounds"))
+    @app_commands.describe(rounds=locale_str("amidakuji.rounds.description"))
+    async def command_amidakuji(
+        interaction: discord.Interaction,
+        rounds: app_commands.Range[int, 1, MAX_SCHEDULE_ROUNDS] = 1,
+    ) -> None:
         await interaction.response.defer(thinking=True, ephemeral=True)
 
         services = _build_runtime_services(interaction)
@@ -147,6 +157,7 @@ def register_commands(client: "BotClientProtocol") -> None:
             interaction=interaction,
             state=AmidakujiState.COMMAND_EXECUTED,
             services=services,
+            schedule_rounds=rounds,
         )
 
         flow = FlowController(context=context, services=services)
@@ -191,10 +202,12 @@ def register_commands(client: "BotClientProtocol") -> None:
         user_id = interaction.user.id
         guild_id = interaction.guild_id
 
-        private_templates = template_service.list_private_templates(
+        private_page = await template_service.list_private_templates(
             user_id=user_id,
             guild_id=guild_id,
-        ).templates
+            limit=PRIVATE_TEMPLATE_PAGE_SIZE,
+        )
+        private_templates = private_page.templates
 
         if not private_templates:
             embed = discord.Embed(
@@ -205,7 +218,11 @@ def register_commands(client: "BotClientProtocol") -> None:
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        state = TemplateManagementState(user_id=user_id, templates=private_templates)
+        state = TemplateManagementState(
+            user_id=user_id,
+            templates=private_templates,
+            next_cursor=private_page.next_cursor,
+        )
         view = TemplateManagementView(state=state, template_service=template_service)
 
         await interaction.followup.send(
@@ -224,7 +241,7 @@ def register_commands(client: "BotClientProtocol") -> None:
         services = _build_runtime_services(interaction)
         history_service = services.history_service
 
-        raw_mode = history_service.get_embed_mode()
+        raw_mode = await history_service.get_embed_mode()
         try:
             current_mode = ResultEmbedMode(str(raw_mode))
         except ValueError:  # pragma: no cover - 不正値は初期値へフォールバック
@@ -252,7 +269,7 @@ def register_commands(client: "BotClientProtocol") -> None:
         user_id = interaction.user.id
         guild_id = interaction.guild_id
 
-        private_dto, guild_dto, public_dto = template_service.get_template_overview(
+        private_dto, guild_dto, public_dto = await template_service.get_template_overview(
             user_id=user_id,
             guild_id=guild_id,
         )
@@ -278,7 +295,7 @@ def register_commands(client: "BotClientProtocol") -> None:
         services = _build_runtime_services(interaction)
         history_service = services.history_service
 
-        current_mode = history_service.get_selection_mode()
+        current_mode = await history_service.get_selection_mode()
 
         state = SelectionModeState(
             current_mode=current_mode,
@@ -304,7 +321,7 @@ def register_commands(client: "BotClientProtocol") -> None:
 
         services = _build_runtime_services(interaction)
 
-        view = HistoryListView(
+        view = await HistoryListView.create(
             history_service=services.history_service,
             guild_id=interaction.guild_id or 0,
             page_size=5,
@@ -331,16 +348,16 @@ def register_commands(client: "BotClientProtocol") -> None:
         user_id = interaction.user.id
         guild_id = interaction.guild_id
 
-        private_templates = template_service.list_private_templates(
+        private_templates = await template_service.list_private_templates(
             user_id=user_id,
             guild_id=guild_id,
         )
-        guild_templates = template_service.list_shared_templates_by_scope(
+        guild_templates = await template_service.list_shared_templates_by_scope(
             scope=TemplateScope.GUILD,
             guild_id=guild_id,
             created_by=user_id,
         )
-        public_templates = template_service.list_shared_templates_by_scope(
+        public_templates = await template_service.list_shared_templates_by_scope(
             scope=TemplateScope.PUBLIC,
             created_by=user_id,
         )
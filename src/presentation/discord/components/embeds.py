@@ -49,6 +49,8 @@ def _selection_mode_label(mode: SelectionMode) -> str:
     mapping = {
         SelectionMode.RANDOM: "完全ランダム",
         SelectionMode.BIAS_REDUCTION: "偏り軽減",
+        SelectionMode.EXPONENTIAL_KEYS: "偏り軽減 (指数キー)",
+        SelectionMode.OPTIMAL_FAIRNESS: "公平性最適化",
     }
     return mapping.get(mode, mode.value)
 
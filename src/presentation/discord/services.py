@@ -7,7 +7,7 @@ from typing import TYPE_CHECKING
 from application.services.flow_service import AmidakujiFlowService
 from application.services.history_service import HistoryApplicationService
 from application.services.template_service import TemplateApplicationService
-from domain.interfaces.repositories import TemplateRepository
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
 
 if TYPE_CHECKING:  # pragma: no cover - 循環依存回避
     from data_interface import FlowController
@@ -23,7 +23,7 @@ class DiscordCommandUseCases:
 
     @classmethod
     def from_repository(
-        cls, repository: TemplateRepository
+        cls, repository: TemplateRepository | AsyncTemplateRepository
     ) -> "DiscordCommandUseCases":
         """永続化リポジトリからユースケースサービスを組み立てる。"""
 
@@ -59,7 +59,7 @@ class _EmbedModeChangeButton(discord.ui.Button):
         view = self.view
         assert isinstance(view, EmbedModeView)
         new_mode = view._toggle_mode()
-        view._history_service.set_embed_mode(new_mode)
+        await view._history_service.set_embed_mode(new_mode)
         view.state = EmbedModeState(current_mode=new_mode, user_id=view.state.user_id)
         view.disable_all_items()
         view.stop()
@@ -1,25 +1,28 @@
 from __future__ import annotations
 
 import datetime
-from math import ceil
 from typing import Iterable, Sequence
 
 import discord
 
 from application.services.history_service import HistoryApplicationService
-from domain import AssignmentHistory, SelectionMode, Template
+from domain import HISTORY_LIST_FIELDS, AssignmentHistory, SelectionMode, Template
 from presentation.discord.views.search_utils import search_templates
 
 
 class HistoryListView(discord.ui.View):
-    """抽選履歴をページングして閲覧するためのビュー。"""
+    """抽選履歴をページングして閲覧するためのビュー。
+
+    表示中のページだけを保持し、ページ移動のたびにカーソルで続きを取得する。
+    「前へ」は訪れたページの開始カーソルを積んだスタックから戻す。
+    """
 
     PAGE_SIZE_MIN = 1
     PAGE_SIZE_MAX = 10
-    MAX_FETCH_LIMIT = 50
-    PAGE_WINDOW = 5
     TEMPLATE_OPTION_LIMIT = 50
     MAX_MATCHED_TITLES = 5
+    # テンプレート候補の検索にはタイトルと選択肢だけを使う。
+    TEMPLATE_OPTION_FIELDS = ("template_title", "choices")
 
     def __init__(
         self,
@@ -37,12 +40,11 @@ class HistoryListView(discord.ui.View):
         self.strict_filter: bool = False
         self.strict_template_title: str | None = None
         self.matched_titles: list[str] = []
-        self.current_page: int = 0
         self.histories: list[AssignmentHistory] = []
+        self.next_cursor: str | None = None
+        self._page_cursors: list[str | None] = [None]
         self.available_templates: list[str] = []
 
-        self.reload_data()
-
         self.prev_button = _HistoryPageButton(self, label="前へ", delta=-1)
         self.prev_button.row = 0
         self.add_item(self.prev_button)
@@ -77,6 +79,27 @@ class HistoryListView(discord.ui.View):
 
         self._update_components()
 
+    @classmethod
+    async def create(
+        cls,
+        *,
+        history_service: HistoryApplicationService,
+        guild_id: int,
+        page_size: int = 5,
+        template_title: str | None = None,
+    ) -> "HistoryListView":
+        """履歴を読み込んだ状態のビューを生成する。"""
+
+        view = cls(
+            history_service=history_service,
+            guild_id=guild_id,
+            page_size=page_size,
+            template_title=template_title,
+        )
+        await view.reload_data()
+        view._update_components()
+        return view
+
     @staticmethod
     def _normalize_page_size(value: int) -> int:
         return max(
@@ -91,22 +114,29 @@ class HistoryListView(discord.ui.View):
         normalized = value.strip()
         return normalized or None
 
-    def reload_data(self) -> None:
-        fetch_limit = max(self.page_size * self.PAGE_WINDOW, self.TEMPLATE_OPTION_LIMIT)
-        fetch_limit = min(fetch_limit, self.MAX_FETCH_LIMIT)
+    @property
+    def current_page(self) -> int:
+        return len(self._page_cursors) - 1
+
+    def _reset_pages(self) -> None:
+        self._page_cursors = [None]
+        self.next_cursor = None
 
-        base_histories = self._history_service.get_recent_history(
+    async def reload_data(self) -> None:
+        """テンプレート候補を取り直し、表示中のページを再取得する。"""
+
+        recent_histories = await self._history_service.get_recent_history(
             guild_id=self.guild_id,
             template_title=None,
-            limit=fetch_limit,
+            limit=self.TEMPLATE_OPTION_LIMIT,
+            fields=self.TEMPLATE_OPTION_FIELDS,
         )
 
-        self.available_templates = self._collect_template_titles(base_histories)
+        self.available_templates = self._collect_template_titles(recent_histories)
 
-        candidate_templates = self._build_search_templates(base_histories)
+        candidate_templates = self._build_search_templates(recent_histories)
 
         matched_titles: list[str] = []
-        histories: list[AssignmentHistory]
 
         if self.template_query:
             entries = search_templates(candidate_templates, self.template_query)
@@ -120,20 +150,6 @@ class HistoryListView(discord.ui.View):
             if not matched_titles and entries:
                 matched_titles = [entries[0].template.title]
 
-            aggregated: list[AssignmentHistory] = []
-            for title in matched_titles:
-                dedicated = self._history_service.get_recent_history(
-                    guild_id=self.guild_id,
-                    template_title=title,
-                    limit=self.MAX_FETCH_LIMIT,
-                )
-                aggregated.extend(dedicated)
-            aggregated.sort(key=lambda item: item.created_at, reverse=True)
-            histories = aggregated[: self.MAX_FETCH_LIMIT]
-        else:
-            histories = base_histories
-
-        self.histories = histories
         self.matched_titles = matched_titles
 
         for title in reversed(matched_titles):
@@ -141,11 +157,28 @@ class HistoryListView(discord.ui.View):
                 self.available_templates.insert(0, title)
         self.available_templates = self.available_templates[:25]
 
-        total_pages = self._total_pages()
-        if total_pages == 0:
-            self.current_page = 0
-        elif self.current_page >= total_pages:
-            self.current_page = total_pages - 1
+        await self._load_page()
+
+    async def _load_page(self) -> None:
+        if self.template_query and not self.matched_titles:
+            self.histories = []
+            self.next_cursor = None
+            return
+
+        page = await self._history_service.get_history_page(
+            guild_id=self.guild_id,
+            template_titles=self.matched_titles,
+            limit=self.page_size,
+            cursor=self._page_cursors[-1],
+            fields=HISTORY_LIST_FIELDS,
+        )
+        if not page.histories and self.current_page > 0:
+            # 履歴が削除されるなどして空になった場合は先頭ページからやり直す。
+            self._reset_pages()
+            await self._load_page()
+            return
+        self.histories = page.histories
+        self.next_cursor = page.next_cursor
 
     def _collect_template_titles(
         self, histories: Iterable[AssignmentHistory]
@@ -178,54 +211,52 @@ class HistoryListView(discord.ui.View):
             )
         return templates
 
-    def _total_pages(self) -> int:
-        if not self.histories:
-            return 0
-        return ceil(len(self.histories) / self.page_size)
-
     def _current_histories(self) -> Sequence[AssignmentHistory]:
-        if not self.histories:
-            return []
-        start = self.current_page * self.page_size
-        end = start + self.page_size
-        return self.histories[start:end]
-
-    def turn_page(self, delta: int) -> None:
-        if not self.histories:
-            self.current_page = 0
+        return self.histories
+
+    async def turn_page(self, delta: int) -> None:
+        if delta > 0:
+            if self.next_cursor is None:
+                return
+            self._page_cursors.append(self.next_cursor)
+        elif delta < 0:
+            if len(self._page_cursors) <= 1:
+                return
+            self._page_cursors.pop()
+        else:
             return
-        total_pages = self._total_pages()
-        target = max(0, min(self.current_page + delta, total_pages - 1))
-        self.current_page = target
+        await self._load_page()
 
-    def change_page_size(self, page_size: int) -> None:
+    async def change_page_size(self, page_size: int) -> None:
         normalized = self._normalize_page_size(page_size)
         if self.page_size == normalized:
             return
         self.page_size = normalized
-        self.current_page = 0
-        self.reload_data()
+        self._reset_pages()
+        await self._load_page()
 
-    def apply_template_filter(self, template_title: str | None, *, strict: bool = False) -> None:
+    async def apply_template_filter(
+        self, template_title: str | None, *, strict: bool = False
+    ) -> None:
         normalized = self._normalize_query(template_title)
         if normalized is None:
-            self.reset_template_filter()
+            await self.reset_template_filter()
             return
         self.template_query = normalized
         self.strict_filter = strict
         self.strict_template_title = normalized if strict else None
-        self.current_page = 0
-        self.reload_data()
+        self._reset_pages()
+        await self.reload_data()
 
-    def reset_template_filter(self) -> None:
+    async def reset_template_filter(self) -> None:
         if self.template_query is None and not self.strict_filter:
             return
         self.template_query = None
         self.strict_filter = False
         self.strict_template_title = None
         self.matched_titles = []
-        self.current_page = 0
-        self.reload_data()
+        self._reset_pages()
+        await self.reload_data()
 
     def create_embed(self) -> discord.Embed:
         embed = discord.Embed(
@@ -265,11 +296,11 @@ class HistoryListView(discord.ui.View):
                     inline=False,
                 )
 
-        total_pages = max(self._total_pages(), 1)
-        total_entries = len(self.histories)
+        page_label = f"ページ {self.current_page + 1}"
+        if self.next_cursor is None:
+            page_label += " (最終)"
         footer_parts = [
-            f"ページ {self.current_page + 1}/{total_pages}",
-            f"読込済み {total_entries}件",
+            page_label,
             f"1ページ {self.page_size}件",
         ]
         embed.set_footer(text=" | ".join(footer_parts))
@@ -280,6 +311,8 @@ class HistoryListView(discord.ui.View):
         selection_mode_label = {
             SelectionMode.RANDOM: "完全ランダム",
             SelectionMode.BIAS_REDUCTION: "偏り軽減",
+            SelectionMode.EXPONENTIAL_KEYS: "偏り軽減 (指数キー)",
+            SelectionMode.OPTIMAL_FAIRNESS: "公平性最適化",
         }.get(history.selection_mode, history.selection_mode.value)
 
         timestamp_text = history.created_at.astimezone(
@@ -319,13 +352,8 @@ class HistoryListView(discord.ui.View):
         await editor(view=None)
 
     def _update_components(self) -> None:
-        total_pages = self._total_pages()
-        has_histories = bool(self.histories)
-
-        self.prev_button.disabled = not has_histories or self.current_page <= 0
-        self.next_button.disabled = (
-            not has_histories or total_pages <= 1 or self.current_page >= total_pages - 1
-        )
+        self.prev_button.disabled = self.current_page <= 0
+        self.next_button.disabled = self.next_cursor is None
         self.reset_filter_button.disabled = self.template_query is None and not self.strict_filter
         self.template_select.refresh_options()
         self.page_size_select.refresh_options()
@@ -347,7 +375,7 @@ class _HistoryPageButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction) -> None:
         history_view = self._history_view
-        history_view.turn_page(self.delta)
+        await history_view.turn_page(self.delta)
         await history_view.render(interaction)
 
 
@@ -358,7 +386,7 @@ class _HistoryReloadButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction) -> None:
         history_view = self._history_view
-        history_view.reload_data()
+        await history_view.reload_data()
         await history_view.render(interaction)
 
 
@@ -406,7 +434,7 @@ class _TemplateFilterSelect(discord.ui.Select):
             await interaction.response.defer(ephemeral=True)
             return
         history_view = self._history_view
-        history_view.apply_template_filter(value, strict=True)
+        await history_view.apply_template_filter(value, strict=True)
         await history_view.render(interaction)
 
 
@@ -436,7 +464,7 @@ class _TemplateFilterModal(discord.ui.Modal):
     async def on_submit(self, interaction: discord.Interaction) -> None:
         raw_value = str(self.template_input.value or "")
         history_view = self._history_view
-        history_view.apply_template_filter(raw_value, strict=False)
+        await history_view.apply_template_filter(raw_value, strict=False)
         await history_view.render(interaction)
 
 
@@ -469,7 +497,7 @@ class _HistoryPageSizeSelect(discord.ui.Select):
     async def callback(self, interaction: discord.Interaction) -> None:
         new_size = int(self.values[0])
         history_view = self._history_view
-        history_view.change_page_size(new_size)
+        await history_view.change_page_size(new_size)
         await history_view.render(interaction)
 
 
@@ -480,7 +508,7 @@ class _ResetHistoryFilterButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction) -> None:
         history_view = self._history_view
-        history_view.reset_template_filter()
+        await history_view.reset_template_filter()
         await history_view.render(interaction)
 
 
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import discord
+
+
+class ScheduleResultView(discord.ui.View):
+    """複数ラウンドの抽選結果を 1 ラウンドずつ切り替えて表示するビュー。
+
+    各ラウンドの埋め込みは生成済みのものを受け取り、ページ移動では
+    メッセージの本文と埋め込みを差し替えるだけで Firestore は読まない。
+    """
+
+    def __init__(
+        self,
+        *,
+        template_title: str,
+        pages: Sequence[Sequence[discord.Embed]],
+    ) -> None:
+        if not pages:
+            raise ValueError("pages must not be empty")
+        super().__init__(timeout=900)
+        self.template_title = template_title
+        self.pages = [list(embeds) for embeds in pages]
+        self.current_round = 0
+
+        self.prev_button = _ScheduleRoundButton(self, label="前のラウンド", delta=-1)
+        self.add_item(self.prev_button)
+
+        self.next_button = _ScheduleRoundButton(self, label="次のラウンド", delta=1)
+        self.add_item(self.next_button)
+
+        self._update_components()
+
+    @property
+    def round_count(self) -> int:
+        return len(self.pages)
+
+    def create_content(self) -> str:
+        return (
+            f"📅 **{self.template_title}** "
+            f"ラウンド {self.current_round + 1} / {self.round_count}"
+        )
+
+    def create_embeds(self) -> list[discord.Embed]:
+        return self.pages[self.current_round]
+
+    def turn_page(self, delta: int) -> None:
+        self.current_round = max(
+            0, min(self.round_count - 1, self.current_round + delta)
+        )
+        self._update_components()
+
+    async def render(self, interaction: discord.Interaction) -> None:
+        editor = (
+            interaction.edit_original_response
+            if interaction.response.is_done()
+            else interaction.response.edit_message
+        )
+        await editor(
+            content=self.create_content(),
+            embeds=self.create_embeds(),
+            view=self,
+        )
+
+    def _update_components(self) -> None:
+        self.prev_button.disabled = self.current_round <= 0
+        self.next_button.disabled = self.current_round >= self.round_count - 1
+
+    async def on_timeout(self) -> None:  # pragma: no cover - UI timeout
+        for child in self.children:
+            child.disabled = True
+
+
+class _ScheduleRoundButton(discord.ui.Button):
+    def __init__(self, view: ScheduleResultView, *, label: str, delta: int) -> None:
+        super().__init__(style=discord.ButtonStyle.secondary, label=label)
+        self._schedule_view = view
+        self.delta = delta
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        schedule_view = self._schedule_view
+        schedule_view.turn_page(self.delta)
+        await schedule_view.render(interaction)
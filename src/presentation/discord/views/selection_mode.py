@@ -43,9 +43,10 @@ class SelectionModeView(discord.ui.View):
         return True
 
     def _toggle_mode(self) -> SelectionMode:
-        if self.state.current_mode is SelectionMode.RANDOM:
-            return SelectionMode.BIAS_REDUCTION
-        return SelectionMode.RANDOM
+        # 定義順に次のモードへ切り替え、末尾の次は先頭に戻る。
+        modes = list(SelectionMode)
+        index = modes.index(self.state.current_mode)
+        return modes[(index + 1) % len(modes)]
 
     async def on_timeout(self) -> None:  # pragma: no cover - Discord依存
         self.disable_all_items()
@@ -64,7 +65,7 @@ class _SelectionModeChangeButton(discord.ui.Button):
     async def callback(self, interaction: discord.Interaction) -> None:
         view = self._selection_view()
         new_mode = view._toggle_mode()
-        view._history_service.set_selection_mode(new_mode)
+        await view._history_service.set_selection_mode(new_mode)
         view.state = SelectionModeState(current_mode=new_mode, user_id=view.state.user_id)
         view.disable_all_items()
         view.stop()
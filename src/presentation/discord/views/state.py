@@ -41,6 +41,7 @@ class TemplateListViewState:
 class TemplateManagementState:
     user_id: int
     templates: list[Template]
+    next_cursor: str | None = None
 
 
 @dataclass(slots=True)
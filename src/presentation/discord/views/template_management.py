@@ -5,7 +5,10 @@ from typing import Dict, Iterable, List, Optional
 
 import discord
 
-from application.services.template_service import TemplateApplicationService
+from application.services.template_service import (
+    PRIVATE_TEMPLATE_PAGE_SIZE,
+    TemplateApplicationService,
+)
 from domain import Template, TemplateScope
 from presentation.discord.views.state import TemplateManagementState
 
@@ -100,6 +103,9 @@ class TemplateManagementView(discord.ui.View):
             template.template_id: template for template in state.templates
         }
         self.session: Optional[TemplateEditSession] = None
+        # 表示中ページのカーソルと、それ以前のページのカーソル履歴。
+        self._page_cursor: Optional[str] = None
+        self._previous_cursors: List[Optional[str]] = []
 
         self.template_select = _TemplateSelect(self)
         self.option_select = _TemplateOptionSelect(self)
@@ -111,6 +117,8 @@ class TemplateManagementView(discord.ui.View):
         self.discard_button = _DiscardButton(self)
         self.delete_template_button = _DeleteTemplateButton(self)
         self.close_button = _CloseButton(self)
+        self.previous_page_button = _PageButton(self, forward=False)
+        self.next_page_button = _PageButton(self, forward=True)
 
         self.add_item(self.template_select)
         self.add_item(self.option_select)
@@ -122,6 +130,8 @@ class TemplateManagementView(discord.ui.View):
         self.add_item(self.discard_button)
         self.add_item(self.delete_template_button)
         self.add_item(self.close_button)
+        self.add_item(self.previous_page_button)
+        self.add_item(self.next_page_button)
 
         self._refresh_template_options()
         self._update_component_states()
@@ -153,6 +163,8 @@ class TemplateManagementView(discord.ui.View):
         self.save_button.disabled = not (has_template and self.session and self.session.changed)
         self.discard_button.disabled = not (has_template and self.session and self.session.changed)
         self.delete_template_button.disabled = not has_template
+        self.previous_page_button.disabled = not self._previous_cursors
+        self.next_page_button.disabled = self.state.next_cursor is None
 
     def _build_embed(self) -> discord.Embed:
         embed = discord.Embed(title="テンプレート管理", color=discord.Color.blurple())
@@ -217,12 +229,48 @@ class TemplateManagementView(discord.ui.View):
 
         return notice
 
+    async def load_page(self, *, forward: bool) -> str | None:
+        """前後のページを読み込み、表示中のテンプレートを差し替える。"""
+
+        if forward:
+            if self.state.next_cursor is None:
+                return None
+            cursor: Optional[str] = self.state.next_cursor
+        else:
+            if not self._previous_cursors:
+                return None
+            cursor = self._previous_cursors[-1]
+
+        page = await self._template_service.list_private_templates(
+            user_id=self.state.user_id,
+            guild_id=None,
+            limit=PRIVATE_TEMPLATE_PAGE_SIZE,
+            cursor=cursor,
+        )
+
+        notice: Optional[str] = None
+        if self.session and self.session.changed:
+            notice = "ページを切り替えたため、未保存の変更を破棄しました。"
+
+        if forward:
+            self._previous_cursors.append(self._page_cursor)
+        else:
+            self._previous_cursors.pop()
+        self._page_cursor = cursor
+        self.state.templates = list(page.templates)
+        self.state.next_cursor = page.next_cursor
+        self.templates = {
+            template.template_id: template for template in page.templates
+        }
+        self.session = None
+        return notice
+
     async def save_changes(self, interaction: discord.Interaction) -> str:
         if self.session is None:
             return "テンプレートが選択されていません。"
 
         template = self.session.to_template(self.state.user_id)
-        self._template_service.update_user_template(
+        await self._template_service.update_user_template(
             user_id=self.state.user_id,
             template=template,
         )
@@ -239,7 +287,7 @@ class TemplateManagementView(discord.ui.View):
         if template is None:
             return "テンプレートが見つかりません。"
 
-        self._template_service.delete_user_template_by_id(
+        await self._template_service.delete_user_template_by_id(
             user_id=self.state.user_id,
             template_id=template_id,
         )
@@ -457,6 +505,20 @@ class _CloseButton(discord.ui.Button):
         self.view.stop()
 
 
+class _PageButton(discord.ui.Button):
+    def __init__(self, view: TemplateManagementView, *, forward: bool) -> None:
+        super().__init__(
+            style=discord.ButtonStyle.secondary,
+            label="次のページ" if forward else "前のページ",
+            row=3,
+        )
+        self._forward = forward
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        notice = await self.view.load_page(forward=self._forward)
+        await self.view.render(interaction, status_message=notice)
+
+
 class _RenameTitleModal(discord.ui.Modal):
     def __init__(self, view: TemplateManagementView) -> None:
         super().__init__(title="テンプレート名の編集", timeout=300)
@@ -204,9 +204,11 @@ class TemplateSharingView(discord.ui.View):
         if template is None:
             return "テンプレートが見つかりません。"
 
-        existing = self._template_service.list_shared_templates_by_scope(
-            scope=TemplateScope.GUILD,
-            guild_id=self.state.guild_id,
+        existing = (
+            await self._template_service.list_shared_templates_by_scope(
+                scope=TemplateScope.GUILD,
+                guild_id=self.state.guild_id,
+            )
         ).templates
         if self._has_duplicate_shared_template(
             template=template,
@@ -224,7 +226,9 @@ class TemplateSharingView(discord.ui.View):
             guild_id=self.state.guild_id,
             template_id=generate_template_id(),
         )
-        shared_template = self._template_service.create_shared_template(shared_template)
+        shared_template = await self._template_service.create_shared_template(
+            shared_template
+        )
         self.guild_templates[shared_template.template_id] = shared_template
         if renamed:
             return f"テンプレートを共有しました（名称を「{new_title}」に変更しました）。"
@@ -235,8 +239,10 @@ class TemplateSharingView(discord.ui.View):
         if template is None:
             return "テンプレートが見つかりません。"
 
-        existing = self._template_service.list_shared_templates_by_scope(
-            scope=TemplateScope.PUBLIC
+        existing = (
+            await self._template_service.list_shared_templates_by_scope(
+                scope=TemplateScope.PUBLIC
+            )
         ).templates
         if self._has_duplicate_shared_template(
             template=template,
@@ -254,7 +260,9 @@ class TemplateSharingView(discord.ui.View):
             guild_id=None,
             template_id=generate_template_id(),
         )
-        shared_template = self._template_service.create_shared_template(shared_template)
+        shared_template = await self._template_service.create_shared_template(
+            shared_template
+        )
         self.public_templates[shared_template.template_id] = shared_template
         if renamed:
             return f"テンプレートを公開しました（名称を「{new_title}」に変更しました）。"
@@ -265,7 +273,7 @@ class TemplateSharingView(discord.ui.View):
         if template is None:
             return "共有テンプレートが見つかりません。"
 
-        self._template_service.delete_shared_template(template_id)
+        await self._template_service.delete_shared_template(template_id)
         del self.guild_templates[template_id]
         return "共有を解除しました。"
 
@@ -274,7 +282,7 @@ class TemplateSharingView(discord.ui.View):
         if template is None:
             return "公開テンプレートが見つかりません。"
 
-        self._template_service.delete_shared_template(template_id)
+        await self._template_service.delete_shared_template(template_id)
         del self.public_templates[template_id]
         return "公開を解除しました。"
 
@@ -9,6 +9,7 @@ from components.button import (
     OptionMoveDownButton,
     OptionMoveUpButton,
     NeedMoreOptionsButton,
+    TemplatePageButton,
     UseExistingButton,
     UseHistoryButton,
     UsePublicTemplatesButton,
@@ -30,6 +31,7 @@ from components.select import (
 )
 from domain import Template
 from models.context_model import CommandContext
+from models.state_model import AmidakujiState
 
 
 class MemberSelectView(discord.ui.View):
@@ -38,16 +40,58 @@ class MemberSelectView(discord.ui.View):
         self.add_item(MemberSelect(context))
 
 
+def _add_page_button(
+    view: discord.ui.View,
+    context: CommandContext,
+    state: AmidakujiState,
+    *,
+    next_cursor: str | None,
+    has_previous: bool,
+) -> None:
+    if next_cursor is not None:
+        view.add_item(TemplatePageButton(context, state=state, cursor=next_cursor))
+    elif has_previous:
+        view.add_item(TemplatePageButton(context, state=state, cursor=None))
+
+
 class SelectTemplateView(discord.ui.View):
-    def __init__(self, context: CommandContext, templates: list[Template]):
+    def __init__(
+        self,
+        context: CommandContext,
+        templates: list[Template],
+        *,
+        next_cursor: str | None = None,
+        has_previous: bool = False,
+    ):
         super().__init__(timeout=300)
         self.add_item(TemplateSelect(context, templates))
+        _add_page_button(
+            self,
+            context,
+            AmidakujiState.MODE_USE_EXISTING,
+            next_cursor=next_cursor,
+            has_previous=has_previous,
+        )
 
 
 class DeleteTemplateView(discord.ui.View):
-    def __init__(self, context: CommandContext, templates: list[Template]):
+    def __init__(
+        self,
+        context: CommandContext,
+        templates: list[Template],
+        *,
+        next_cursor: str | None = None,
+        has_previous: bool = False,
+    ):
         super().__init__(timeout=300)
         self.add_item(TemplateDeleteSelect(context, templates))
+        _add_page_button(
+            self,
+            context,
+            AmidakujiState.MODE_DELETE_TEMPLATE,
+            next_cursor=next_cursor,
+            has_previous=has_previous,
+        )
         self.add_item(BackToTemplateSelectButton(context))
 
 
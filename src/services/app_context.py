@@ -5,9 +5,16 @@ from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
-from domain.interfaces.repositories import TemplateRepository
+from domain.interfaces.repositories import AsyncTemplateRepository, TemplateRepository
 from infrastructure.config.firebase_credentials import resolve_firebase_credentials
+from infrastructure.firestore.async_template_repository import (
+    AsyncFirestoreTemplateRepository,
+)
 from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.user_templates import (
+    UserTemplateLayout,
+    coerce_user_template_layout,
+)
 
 _template_repository: FirestoreTemplateRepository | None = None
 
@@ -23,19 +30,65 @@ def create_template_repository(
     credentials_reference: str | Path | None = None,
     *,
     resolver: Callable[[str | Path | None], Any] | None = None,
+    realtime_shared_templates: bool = False,
+    template_layout: UserTemplateLayout | str | None = None,
 ) -> TemplateRepository:
-    """FirestoreTemplateRepository を初期化し、シングルトンとして返す。"""
+    """FirestoreTemplateRepository を初期化し、シングルトンとして返す。
+
+    `realtime_shared_templates` を有効にすると、共有テンプレートを
+    スナップショットリスナーで維持する索引から返す。`template_layout` は
+    ユーザーテンプレートの保存先を切り替える (省略時は現在の設定を維持)。
+    """
 
     repository = _get_repository_instance()
-    if repository.is_configured:
-        return repository
+    if not repository.is_configured:
+        resolve = resolver or resolve_firebase_credentials
+        credentials_source = resolve(credentials_reference)
+        repository.initialize(credentials_source)
 
-    resolve = resolver or resolve_firebase_credentials
-    credentials_source = resolve(credentials_reference)
-    repository.initialize(credentials_source)
+    if realtime_shared_templates:
+        repository.unit_of_work.enable_shared_template_index()
+    if template_layout is not None:
+        repository.unit_of_work.template_layout = coerce_user_template_layout(
+            template_layout
+        )
     return repository
 
 
+def create_async_template_repository(
+    credentials_reference: str | Path | None = None,
+    *,
+    resolver: Callable[[str | Path | None], Any] | None = None,
+    realtime_shared_templates: bool = False,
+    template_layout: UserTemplateLayout | str | None = None,
+    history_write_behind: bool = False,
+) -> AsyncTemplateRepository:
+    """同期版と Firebase アプリを共有する AsyncFirestoreTemplateRepository を返す。
+
+    `history_write_behind` を有効にすると、抽選履歴をバッファに溜めて
+    `WriteBatch` でまとめて書き込む。
+    """
+
+    repository = create_template_repository(
+        credentials_reference,
+        resolver=resolver,
+        realtime_shared_templates=realtime_shared_templates,
+        template_layout=template_layout,
+    )
+    assert isinstance(repository, FirestoreTemplateRepository)
+    if history_write_behind:
+        repository.unit_of_work.enable_history_write_buffer()
+    return AsyncFirestoreTemplateRepository(repository.unit_of_work)
+
+
+async def flush_pending_writes() -> None:
+    """終了時に書き込み待ちの履歴を Firestore へ書き込む。"""
+
+    if _template_repository is None:
+        return
+    await _template_repository.unit_of_work.close_history_write_buffer()
+
+
 def reset_template_repository() -> None:
     """テスト向けに保持中のリポジトリインスタンスをリセットする。"""
 
@@ -43,4 +96,9 @@ def reset_template_repository() -> None:
     _template_repository = None
 
 
-__all__ = ["create_template_repository", "reset_template_repository"]
+__all__ = [
+    "create_async_template_repository",
+    "create_template_repository",
+    "flush_pending_writes",
+    "reset_template_repository",
+]
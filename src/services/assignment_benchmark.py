@@ -0,0 +1,183 @@
+"""重み付き割当の従来実装と NumPy 実装 (逐次抽出・指数キー) の実行時間を比較するコマンド。
+
+`python -m services.assignment_benchmark [--sizes 50 100 200 500] [--repeats 5]` で
+実行する。参加者数と選択肢数を同じにした正方行列で、1 回の抽選にかかる時間の
+中央値を表示する。公平性最適化モードの最小コスト割当と、同じ人数を定員付きの
+4 チームへ振り分ける時間も併せて測る。
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import statistics
+import time
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any
+
+import numpy as np
+
+from domain.services.assignment_engine import (
+    allocate_capacity_quotas,
+    draw_capacity_assignment,
+    draw_exponential_key_assignment,
+    draw_weighted_assignment,
+    solve_min_cost_assignment,
+)
+from utils import INFO
+
+DEFAULT_SIZES = (50, 100, 200, 500)
+
+
+@dataclass(frozen=True, slots=True)
+class AssignmentBenchmarkResult:
+    participants: int
+    choices: int
+    legacy_seconds: float
+    vectorized_seconds: float
+    exponential_key_seconds: float
+    optimal_fairness_seconds: float
+    capacity_seconds: float
+
+    @property
+    def speedup(self) -> float:
+        return self._speedup(self.vectorized_seconds)
+
+    @property
+    def exponential_key_speedup(self) -> float:
+        return self._speedup(self.exponential_key_seconds)
+
+    def _speedup(self, seconds: float) -> float:
+        if seconds <= 0:
+            return float("inf")
+        return self.legacy_seconds / seconds
+
+
+def legacy_weighted_assignment(
+    users: Sequence[Any],
+    groupes: Sequence[str],
+    weight_matrix: Mapping[int, Mapping[str, float]],
+    *,
+    rng: random.Random,
+) -> list[Any]:
+    """NumPy 化する前の `create_pair_from_list` (偏り軽減モード) と同じ割当。"""
+
+    available_users = list(users)
+    assigned: list[Any] = []
+    for group in groupes[: min(len(users), len(groupes))]:
+        user_weights = [weight_matrix[user.id][group] for user in available_users]
+        if sum(user_weights) <= 0:
+            selected_user = rng.choice(available_users)
+        else:
+            selected_user = rng.choices(available_users, weights=user_weights, k=1)[0]
+        assigned.append(selected_user)
+        available_users.remove(selected_user)
+    return assigned
+
+
+def _median_seconds(run: Callable[[], object], repeats: int) -> float:
+    samples: list[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def run_benchmark(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    *,
+    repeats: int = 5,
+    seed: int = 0,
+) -> list[AssignmentBenchmarkResult]:
+    generator = np.random.default_rng(seed)
+    legacy_rng = random.Random(seed)
+    results: list[AssignmentBenchmarkResult] = []
+    for size in sizes:
+        # 偏り軽減の重み (1 / (連続回数 + 1)) に近い値を散らばらせる。
+        matrix = 1.0 / generator.integers(1, 5, size=(size, size))
+        users = [SimpleNamespace(id=index) for index in range(size)]
+        groupes = [f"choice-{index}" for index in range(size)]
+        weight_matrix = {
+            user.id: dict(zip(groupes, row))
+            for user, row in zip(users, matrix.tolist())
+        }
+        legacy_seconds = _median_seconds(
+            lambda: legacy_weighted_assignment(
+                users, groupes, weight_matrix, rng=legacy_rng
+            ),
+            repeats,
+        )
+        vectorized_seconds = _median_seconds(
+            lambda: draw_weighted_assignment(matrix, rng=generator), repeats
+        )
+        exponential_key_seconds = _median_seconds(
+            lambda: draw_exponential_key_assignment(matrix, rng=generator), repeats
+        )
+        # 連続担当の回数をコストにした、同点の多い行列を解く。
+        costs = 1.0 / matrix - 1.0
+        optimal_fairness_seconds = _median_seconds(
+            lambda: solve_min_cost_assignment(costs, rng=generator, jitter=1e-3),
+            repeats,
+        )
+        quotas = allocate_capacity_quotas(np.full(4, -(-size // 4)), size)
+        capacity_seconds = _median_seconds(
+            lambda: draw_capacity_assignment(matrix[:, :4], quotas, rng=generator),
+            repeats,
+        )
+        results.append(
+            AssignmentBenchmarkResult(
+                participants=size,
+                choices=size,
+                legacy_seconds=legacy_seconds,
+                vectorized_seconds=vectorized_seconds,
+                exponential_key_seconds=exponential_key_seconds,
+                optimal_fairness_seconds=optimal_fairness_seconds,
+                capacity_seconds=capacity_seconds,
+            )
+        )
+    return results
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare the legacy and vectorized weighted assignment, "
+            "and time the optimal fairness solver and the capacity split."
+        )
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="参加者数 (= 選択肢数) の一覧",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="各サイズの試行回数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = _build_parser().parse_args(argv)
+
+    for result in run_benchmark(args.sizes, repeats=args.repeats, seed=args.seed):
+        logging.info(
+            INFO
+            + f"{result.participants}x{result.choices}: "
+            f"legacy {result.legacy_seconds * 1000:.2f}ms / "
+            f"vectorized {result.vectorized_seconds * 1000:.2f}ms "
+            f"(x{result.speedup:.1f}) / "
+            f"exponential keys {result.exponential_key_seconds * 1000:.2f}ms "
+            f"(x{result.exponential_key_speedup:.1f}) / "
+            f"optimal fairness {result.optimal_fairness_seconds * 1000:.2f}ms / "
+            f"4 teams {result.capacity_seconds * 1000:.2f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,356 @@
+"""抽選モードの公平性と処理速度をモンテカルロ法で見積もるコマンド。
+
+`python -m services.fairness_simulator [--members 5 10] [--choices 5] [--rounds 200]
+[--trials 10000] [--thresholds 3] [--lookbacks 10 none] [--workers 4]` で実行する。
+同じメンバーで `rounds` 回続けて抽選するギルドを `trials` 個、NumPy で束ねて
+並行に進め、連続担当の長さの分布・役割ごとの担当回数の分散・偏り警告の割合・
+1 秒あたりの抽選回数をモードとパラメータの組ごとに表示する。
+
+偏り軽減モードの重みは `MemberSelectedHandler._build_weight_map` と同じく、直前と
+同じ選択肢を `1 / (連続回数 + 1)` にする。`lookback` を指定すると、集計ドキュメントが
+無く直近 `lookback` 件の履歴から連続回数を数える場合を `min(連続回数, lookback)` で
+近似する (全員が毎回割り当てられる人数なら厳密)。指数キー方式は偏り軽減と同じ分布の
+ため、ここでは扱わない。
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import time
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from domain import SelectionMode
+from domain.services.selection_mode_service import coerce_selection_mode
+from flow.handlers.members import MemberSelectedHandler
+from utils import INFO
+
+SIMULATED_MODES = (SelectionMode.RANDOM, SelectionMode.BIAS_REDUCTION)
+DEFAULT_BATCH_SIZE = 2_000
+
+
+@dataclass(frozen=True, slots=True)
+class FairnessSimulationParams:
+    mode: SelectionMode
+    members: int
+    choices: int
+    rounds: int
+    trials: int
+    threshold: int = MemberSelectedHandler.CONSECUTIVE_THRESHOLD
+    lookback: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class FairnessSimulationResult:
+    params: FairnessSimulationParams
+    seconds: float
+    # streak_counts[L] は長さ L の連続担当の数 (シミュレーション終了時点のものを含む)。
+    streak_counts: tuple[int, ...]
+    frequency_variance: float
+    warning_rate: float
+
+    @property
+    def draws(self) -> int:
+        return self.params.trials * self.params.rounds
+
+    @property
+    def draws_per_second(self) -> float:
+        if self.seconds <= 0:
+            return float("inf")
+        return self.draws / self.seconds
+
+    @property
+    def streak_distribution(self) -> dict[int, float]:
+        total = sum(self.streak_counts)
+        if total == 0:
+            return {}
+        return {
+            length: count / total
+            for length, count in enumerate(self.streak_counts)
+            if count
+        }
+
+    @property
+    def mean_streak(self) -> float:
+        total = sum(self.streak_counts)
+        if total == 0:
+            return 0.0
+        return sum(
+            length * count for length, count in enumerate(self.streak_counts)
+        ) / total
+
+    def streak_share_over(self, length: int) -> float:
+        """長さが `length` を超えた連続担当の割合。"""
+
+        total = sum(self.streak_counts)
+        if total == 0:
+            return 0.0
+        return sum(self.streak_counts[length + 1 :]) / total
+
+
+@dataclass(slots=True)
+class _BatchTotals:
+    streak_counts: np.ndarray
+    variance_sum: float
+    warning_draws: int
+
+
+def build_streak_weights(
+    last_choice: np.ndarray,
+    streak: np.ndarray,
+    choices: int,
+    *,
+    lookback: int | None = None,
+) -> np.ndarray:
+    """直前の選択肢と連続回数から、試行 × メンバー × 選択肢の重みを作る。
+
+    `last_choice` が -1 のメンバーはまだ担当が無い。
+    """
+
+    visible = streak if lookback is None else np.minimum(streak, lookback)
+    weights = np.ones(last_choice.shape + (choices,), dtype=np.float64)
+    trials, members = np.nonzero((last_choice >= 0) & (visible > 0))
+    weights[trials, members, last_choice[trials, members]] = 1.0 / (
+        visible[trials, members] + 1
+    )
+    return weights
+
+
+def _draw_batch(
+    weights: np.ndarray | None,
+    *,
+    trials: int,
+    members: int,
+    choices: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """試行ごとに 1 回抽選し、メンバーごとの選択肢番号 (休みは -1) を返す。
+
+    `weights` が `None` なら完全ランダム。重みがある場合は選択肢をシャッフルした
+    順に `draw_weighted_assignment` と同じ逐次抽出を全試行まとめて行う。
+    """
+
+    steps = min(members, choices)
+    rows = np.arange(trials)
+    order = np.argsort(rng.random((trials, choices)), axis=1)[:, :steps]
+    assigned = np.full((trials, members), -1, dtype=np.intp)
+
+    if weights is None:
+        users = np.argsort(rng.random((trials, members)), axis=1)[:, :steps]
+        assigned[rows[:, np.newaxis], users] = order
+        return assigned
+
+    available = np.ones((trials, members), dtype=np.float64)
+    uniforms = rng.random((trials, steps))
+    for step in range(steps):
+        column = order[:, step]
+        masked = weights[rows, :, column] * available
+        cumulative = np.cumsum(masked, axis=1)
+        total = cumulative[:, -1]
+        empty = total <= 0
+        if empty.any():
+            cumulative[empty] = np.cumsum(available[empty], axis=1)
+            total = cumulative[:, -1]
+        # 末尾を除いた累積和に searchsorted(side="right") を行うのと同じ。
+        target = uniforms[:, step] * total
+        users = (cumulative[:, :-1] <= target[:, np.newaxis]).sum(axis=1)
+        assigned[rows, users] = column
+        available[rows, users] = 0.0
+    return assigned
+
+
+def _simulate_batch(
+    params: FairnessSimulationParams,
+    trials: int,
+    seed: np.random.SeedSequence,
+) -> _BatchTotals:
+    rng = np.random.default_rng(seed)
+    members, choices = params.members, params.choices
+    weighted = params.mode is not SelectionMode.RANDOM
+    longest = params.rounds + 1
+
+    last_choice = np.full((trials, members), -1, dtype=np.intp)
+    streak = np.zeros((trials, members), dtype=np.int64)
+    counts = np.zeros((trials, members, choices), dtype=np.int64)
+    streak_counts = np.zeros(longest + 1, dtype=np.int64)
+    warning_draws = 0
+
+    for _ in range(params.rounds):
+        weights = (
+            build_streak_weights(
+                last_choice, streak, choices, lookback=params.lookback
+            )
+            if weighted
+            else None
+        )
+        assigned = _draw_batch(
+            weights, trials=trials, members=members, choices=choices, rng=rng
+        )
+
+        # 休みのメンバーは集計を更新しない (`apply_assignments` と同じ)。
+        drawn = assigned >= 0
+        repeated = drawn & (assigned == last_choice)
+        ended = drawn & ~repeated & (streak > 0)
+        streak_counts += np.bincount(streak[ended], minlength=longest + 1)
+        streak = np.where(repeated, streak + 1, np.where(drawn, 1, streak))
+        last_choice = np.where(drawn, assigned, last_choice)
+        trial_index, member_index = np.nonzero(drawn)
+        counts[trial_index, member_index, assigned[trial_index, member_index]] += 1
+
+        visible = streak if params.lookback is None else np.minimum(
+            streak, params.lookback
+        )
+        warning_draws += int(np.any(visible > params.threshold, axis=1).sum())
+
+    # 最後まで続いていた連続担当も長さとして数える。
+    streak_counts += np.bincount(streak[streak > 0], minlength=longest + 1)
+    # 役割ごとに、メンバー間での担当回数の分散を取り、役割と試行で平均する。
+    variance_sum = float(counts.var(axis=1).mean(axis=1).sum())
+    return _BatchTotals(
+        streak_counts=streak_counts,
+        variance_sum=variance_sum,
+        warning_draws=warning_draws,
+    )
+
+
+def run_simulation(
+    params: FairnessSimulationParams,
+    *,
+    seed: int = 0,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+) -> FairnessSimulationResult:
+    """`params` の条件で抽選を繰り返し、公平性の指標と処理速度を返す。
+
+    試行は `batch_size` ずつのバッチに分け、バッチごとに `SeedSequence` から
+    独立した乱数を作る。`workers` が 2 以上ならバッチをプロセスに分散するが、
+    同じ `seed` なら結果はプロセス数に依存しない。
+    """
+
+    if params.mode not in SIMULATED_MODES:
+        raise ValueError(f"{params.mode.value} はシミュレーションに対応していません")
+    if min(params.members, params.choices, params.rounds, params.trials) < 1:
+        raise ValueError("人数・選択肢数・ラウンド数・試行回数は 1 以上である必要があります")
+
+    sizes = [
+        min(batch_size, params.trials - start)
+        for start in range(0, params.trials, batch_size)
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    started = time.perf_counter()
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = list(
+                executor.map(_simulate_batch, itertools.repeat(params), sizes, seeds)
+            )
+    else:
+        batches = [
+            _simulate_batch(params, size, batch_seed)
+            for size, batch_seed in zip(sizes, seeds)
+        ]
+    seconds = time.perf_counter() - started
+
+    streak_counts = np.sum([batch.streak_counts for batch in batches], axis=0)
+    return FairnessSimulationResult(
+        params=params,
+        seconds=seconds,
+        streak_counts=tuple(int(count) for count in streak_counts),
+        frequency_variance=sum(batch.variance_sum for batch in batches)
+        / params.trials,
+        warning_rate=sum(batch.warning_draws for batch in batches)
+        / (params.trials * params.rounds),
+    )
+
+
+def _parse_lookback(value: str) -> int | None:
+    if value.lower() == "none":
+        return None
+    return int(value)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Simulate repeated draws per selection mode and report streak "
+            "lengths, per-role frequency variance, bias warnings, and throughput."
+        )
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=[mode.value for mode in SIMULATED_MODES],
+        help="抽選モード (random / bias_reduction)",
+    )
+    parser.add_argument("--members", type=int, nargs="+", default=[5], help="参加者数の一覧")
+    parser.add_argument("--choices", type=int, nargs="+", default=[5], help="選択肢数の一覧")
+    parser.add_argument("--rounds", type=int, default=200, help="1 試行あたりの抽選回数")
+    parser.add_argument("--trials", type=int, default=10_000, help="試行回数")
+    parser.add_argument(
+        "--thresholds",
+        type=int,
+        nargs="+",
+        default=[MemberSelectedHandler.CONSECUTIVE_THRESHOLD],
+        help="偏り警告を出す連続回数の閾値 (CONSECUTIVE_THRESHOLD)",
+    )
+    parser.add_argument(
+        "--lookbacks",
+        type=_parse_lookback,
+        nargs="+",
+        default=[None],
+        help="連続回数を数える履歴の件数 (HISTORY_LOOKBACK)。none は集計ドキュメント",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1 バッチの試行数")
+    parser.add_argument("--workers", type=int, default=1, help="プロセス数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = _build_parser().parse_args(argv)
+
+    for mode, members, choices, threshold, lookback in itertools.product(
+        [coerce_selection_mode(mode) for mode in args.modes],
+        args.members,
+        args.choices,
+        args.thresholds,
+        args.lookbacks,
+    ):
+        params = FairnessSimulationParams(
+            mode=mode,
+            members=members,
+            choices=choices,
+            rounds=args.rounds,
+            trials=args.trials,
+            threshold=threshold,
+            lookback=lookback,
+        )
+        result = run_simulation(
+            params, seed=args.seed, batch_size=args.batch_size, workers=args.workers
+        )
+        distribution = ", ".join(
+            f"{length}:{share:.3f}"
+            for length, share in list(result.streak_distribution.items())[:6]
+        )
+        logging.info(
+            INFO
+            + f"{mode.value} {members}x{choices} "
+            f"threshold={threshold} lookback={lookback}: "
+            f"{result.draws} draws in {result.seconds:.2f}s "
+            f"({result.draws_per_second:,.0f}/s) / "
+            f"mean streak {result.mean_streak:.2f} "
+            f"(>{threshold}: {result.streak_share_over(threshold):.4f}) / "
+            f"streaks {distribution} / "
+            f"role variance {result.frequency_variance:.2f} / "
+            f"warnings {result.warning_rate:.4f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,46 @@
+"""Firestore の複合インデックス定義を `firestore.indexes.json` へ書き出すコマンド。
+
+`python -m services.firestore_indexes [--output firestore.indexes.json]` で実行し、
+`firebase deploy --only firestore:indexes` でデプロイする。
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+from collections.abc import Sequence
+from pathlib import Path
+
+from infrastructure.firestore.indexes import (
+    INDEX_MANIFEST_FILENAME,
+    REQUIRED_INDEXES,
+    write_index_manifest,
+)
+from utils import INFO
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Write the composite indexes required by the bot."
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path(INDEX_MANIFEST_FILENAME),
+        help="書き出し先のファイル",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = _build_parser().parse_args(argv)
+
+    write_index_manifest(args.output)
+    logging.info(
+        INFO + f"Wrote {len(REQUIRED_INDEXES)} composite indexes to {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
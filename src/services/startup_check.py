@@ -1,19 +1,33 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
-from typing import Iterable, List
+from typing import Any, Iterable, List, TypeVar
 
 import discord
+from google.api_core import exceptions as google_exceptions
 
 from db.constants import (
     COLLECTION_SENTINEL_DOCUMENT_ID,
     REQUIRED_COLLECTIONS as FIRESTORE_REQUIRED_COLLECTIONS,
 )
 from domain.interfaces.repositories import TemplateRepository
+from infrastructure.firestore.indexes import (
+    REQUIRED_INDEXES,
+    USER_TEMPLATES_INDEX,
+    CompositeIndex,
+    build_index_probe,
+)
 from utils import ERROR, INFO, SUCCESS, WARN, green, red, yellow
 
+_T = TypeVar("_T")
+
+# Upper bound on concurrent Firestore probes during startup.
+MAX_PROBE_WORKERS = 8
+
 
 class CheckStatus(Enum):
     """Represents the outcome of a startup self-check."""
@@ -49,6 +63,7 @@ class StartupSelfCheck:
         results.append(self._check_discord(discord_client))
         results.append(self._check_firebase())
         results.extend(self._check_collections(self.REQUIRED_COLLECTIONS))
+        results.extend(self._check_indexes(self._required_indexes()))
 
         for result in results:
             if result.status is CheckStatus.OK:
@@ -134,6 +149,7 @@ class StartupSelfCheck:
             ]
 
         try:
+            # Normally a no-op: the collections were bootstrapped when the client attached.
             self._db_manager.ensure_required_collections()
         except Exception as exc:  # pragma: no cover - defensive logging
             return [
@@ -144,39 +160,109 @@ class StartupSelfCheck:
                 )
             ]
 
-        results: list[CheckResult] = []
-        for collection_name in collections:
-            try:
-                has_document = None
-                documents = db.collection(collection_name).limit(5).stream()
-                for document in documents:
-                    if getattr(document, "id", None) == COLLECTION_SENTINEL_DOCUMENT_ID:
-                        continue
-                    has_document = document
-                    break
-                if has_document is None:
-                    results.append(
-                        CheckResult(
-                            name=f"collection:{collection_name}",
-                            status=CheckStatus.WARNING,
-                            message="No documents found. Collection is accessible but currently empty.",
-                        )
-                    )
-                else:
-                    results.append(
-                        CheckResult(
-                            name=f"collection:{collection_name}",
-                            status=CheckStatus.OK,
-                            message="Collection is accessible and contains documents.",
-                        )
-                    )
-            except Exception as exc:  # pragma: no cover - defensive logging
-                results.append(
-                    CheckResult(
-                        name=f"collection:{collection_name}",
-                        status=CheckStatus.ERROR,
-                        message=f"Failed to access collection: {exc}",
-                    )
+        collection_names = list(collections)
+        return _run_concurrently(
+            lambda collection_name: self._probe_collection(db, collection_name),
+            collection_names,
+        )
+
+    def _probe_collection(self, db: Any, collection_name: str) -> CheckResult:
+        """Check that a collection is readable and report whether it holds data."""
+
+        try:
+            has_document = None
+            # The sentinel is the only system document, so two reads are enough.
+            documents = db.collection(collection_name).limit(2).stream()
+            for document in documents:
+                if getattr(document, "id", None) == COLLECTION_SENTINEL_DOCUMENT_ID:
+                    continue
+                has_document = document
+                break
+        except Exception as exc:  # pragma: no cover - defensive logging
+            return CheckResult(
+                name=f"collection:{collection_name}",
+                status=CheckStatus.ERROR,
+                message=f"Failed to access collection: {exc}",
+            )
+
+        if has_document is None:
+            return CheckResult(
+                name=f"collection:{collection_name}",
+                status=CheckStatus.WARNING,
+                message="No documents found. Collection is accessible but currently empty.",
+            )
+        return CheckResult(
+            name=f"collection:{collection_name}",
+            status=CheckStatus.OK,
+            message="Collection is accessible and contains documents.",
+        )
+
+    def _required_indexes(self) -> tuple[CompositeIndex, ...]:
+        """Return the composite indexes used by the configured storage layout."""
+
+        unit_of_work = getattr(self._db_manager, "unit_of_work", None)
+        uses_subcollection = bool(
+            getattr(unit_of_work, "uses_template_subcollection", False)
+        )
+        return tuple(
+            index
+            for index in REQUIRED_INDEXES
+            if index is not USER_TEMPLATES_INDEX or uses_subcollection
+        )
+
+    def _check_indexes(self, indexes: Iterable[CompositeIndex]) -> list[CheckResult]:
+        """Probe each composite index so that a missing one fails startup."""
+
+        db = getattr(self._db_manager, "db", None)
+        if db is None:
+            return [
+                CheckResult(
+                    name="firestore_indexes",
+                    status=CheckStatus.ERROR,
+                    message="Firestore client is not initialized.",
                 )
+            ]
+
+        return _run_concurrently(lambda index: self._probe_index(db, index), list(indexes))
+
+    def _probe_index(self, db: Any, index: CompositeIndex) -> CheckResult:
+        """Run a one-document query that only succeeds when the index exists."""
+
+        name = f"index:{index.describe()}"
+        try:
+            for _ in build_index_probe(db, index).stream():
+                break
+        except google_exceptions.FailedPrecondition as exc:
+            return CheckResult(
+                name=name,
+                status=CheckStatus.ERROR,
+                message=(
+                    "Composite index is missing. Deploy firestore.indexes.json "
+                    f"before starting the bot: {exc}"
+                ),
+            )
+        except Exception as exc:  # pragma: no cover - defensive logging
+            return CheckResult(
+                name=name,
+                status=CheckStatus.ERROR,
+                message=f"Failed to query index: {exc}",
+            )
+        return CheckResult(
+            name=name,
+            status=CheckStatus.OK,
+            message="Composite index is ready.",
+        )
+
+
+def _run_concurrently(
+    probe: Callable[[_T], CheckResult], items: Sequence[_T]
+) -> list[CheckResult]:
+    """Run blocking probes in parallel threads, keeping the input order."""
 
-        return results
+    if len(items) <= 1:
+        return [probe(item) for item in items]
+    with ThreadPoolExecutor(
+        max_workers=min(len(items), MAX_PROBE_WORKERS),
+        thread_name_prefix="startup-check",
+    ) as executor:
+        return list(executor.map(probe, items))
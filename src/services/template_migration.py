@@ -0,0 +1,139 @@
+"""ユーザーテンプレートを `users/{id}/templates` サブコレクションへ移行するコマンド。
+
+`python -m services.template_migration [--dry-run] [--env-file .env]` で実行する。
+移行後に `FIREBASE_USER_TEMPLATE_LAYOUT=subcollection` へ切り替える。
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from domain import Template
+from infrastructure.firestore.repositories import UserTemplateRepository
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.user_templates import (
+    build_user_template_documents,
+    deserialize_user_templates,
+)
+from services.app_context import create_template_repository
+from utils import ERROR, INFO
+
+
+@dataclass(slots=True)
+class TemplateMigrationReport:
+    """移行結果の集計。"""
+
+    users_scanned: int = 0
+    users_migrated: int = 0
+    users_partially_migrated: int = 0
+    templates_migrated: int = 0
+    invalid_templates: int = 0
+    dry_run: bool = False
+
+
+def migrate_user_templates(
+    repository: UserTemplateRepository,
+    *,
+    dry_run: bool = False,
+    base_time: datetime | None = None,
+) -> TemplateMigrationReport:
+    """`custom_templates` 配列を持つ全ユーザーのテンプレートを移行する。
+
+    配列の並び順は `created_at` の昇順として保たれる。読み込めない要素は
+    移行せずに `custom_templates` へ残し、そのユーザーを部分移行として集計する。
+    """
+
+    report = TemplateMigrationReport(dry_run=dry_run)
+    for user_id, raw_templates in repository.list_embedded_users():
+        report.users_scanned += 1
+        items = raw_templates if isinstance(raw_templates, list) else []
+        templates, invalid_items = _partition_templates(items)
+        report.invalid_templates += len(invalid_items)
+
+        if not dry_run:
+            repository.import_embedded(
+                user_id,
+                build_user_template_documents(templates, base_time=base_time),
+                remaining=invalid_items,
+            )
+        if invalid_items:
+            report.users_partially_migrated += 1
+        else:
+            report.users_migrated += 1
+        report.templates_migrated += len(templates)
+    return report
+
+
+def _partition_templates(items: list[object]) -> tuple[list[Template], list[object]]:
+    """配列を読み込めるテンプレートと、読み込めない元の要素に分ける。"""
+
+    templates: list[Template] = []
+    invalid_items: list[object] = []
+    for item in items:
+        deserialized = deserialize_user_templates([item])
+        if deserialized:
+            templates.extend(deserialized)
+        else:
+            invalid_items.append(item)
+    return templates, invalid_items
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Move users/{id}.custom_templates into users/{id}/templates."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="書き込みを行わず、移行対象の件数だけを表示する",
+    )
+    parser.add_argument(
+        "--env-file",
+        type=Path,
+        default=Path(".env"),
+        help="FIREBASE_CREDENTIALS を読み込む .env ファイル",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    args = _build_parser().parse_args(argv)
+
+    if args.env_file.exists():
+        load_dotenv(args.env_file)
+    credentials_reference = (os.getenv("FIREBASE_CREDENTIALS") or "").strip()
+    if not credentials_reference:
+        logging.error(ERROR + "FIREBASE_CREDENTIALS is not set")
+        return 1
+
+    repository = create_template_repository(credentials_reference)
+    assert isinstance(repository, FirestoreTemplateRepository)
+    repository.unit_of_work.ensure_configured()
+    user_template_repository = repository.unit_of_work.user_template_repository
+    assert user_template_repository is not None
+
+    report = migrate_user_templates(user_template_repository, dry_run=args.dry_run)
+    logging.info(
+        INFO
+        + ("[dry-run] " if report.dry_run else "")
+        + f"users={report.users_migrated}/{report.users_scanned} "
+        + f"partial={report.users_partially_migrated} "
+        + f"templates={report.templates_migrated} "
+        + f"invalid={report.invalid_templates}"
+    )
+    return 0
+
+
+__all__ = ["TemplateMigrationReport", "main", "migrate_user_templates"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
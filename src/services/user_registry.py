@@ -0,0 +1,165 @@
+"""コマンドを実行したユーザーの登録をバックグラウンドで行う仕組み。
+
+一度確認したユーザー ID はメモリ上の集合に保持し、以降のコマンドでは
+Firestore を読まずに済ませる。未確認のユーザーはキューに積み、専用タスクで
+存在確認と初期化を行う。集合は任意でファイルへ書き出し、次回起動時に読み込む。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from array import array
+from collections.abc import Iterable
+from pathlib import Path
+
+from application.services.template_service import TemplateApplicationService
+from utils import ERROR, INFO
+
+# Discord のユーザー ID (Snowflake) は符号なし 64 ビット整数に収まる。
+_SNAPSHOT_TYPECODE = "Q"
+
+
+class KnownUserSet:
+    """存在を確認済みのユーザー ID の集合。
+
+    スナップショットは ID を 8 バイトずつ並べたバイナリファイルで、
+    10 万人でも 800KB 程度に収まる。
+    """
+
+    def __init__(
+        self,
+        user_ids: Iterable[int] = (),
+        *,
+        snapshot_path: Path | None = None,
+    ) -> None:
+        self._user_ids: set[int] = set(user_ids)
+        self._snapshot_path = snapshot_path
+        self._dirty = False
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._user_ids
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+    @property
+    def snapshot_path(self) -> Path | None:
+        return self._snapshot_path
+
+    def add(self, user_id: int) -> None:
+        if user_id not in self._user_ids:
+            self._user_ids.add(user_id)
+            self._dirty = True
+
+    def discard(self, user_id: int) -> None:
+        if user_id in self._user_ids:
+            self._user_ids.discard(user_id)
+            self._dirty = True
+
+    def load(self) -> int:
+        """スナップショットを読み込み、読み込んだ件数を返す。壊れていれば無視する。"""
+
+        path = self._snapshot_path
+        if path is None or not path.exists():
+            return 0
+
+        data = path.read_bytes()
+        user_ids = array(_SNAPSHOT_TYPECODE)
+        if len(data) % user_ids.itemsize:
+            logging.warning(ERROR + f"Ignoring corrupted known-user snapshot: {path}")
+            return 0
+        user_ids.frombytes(data)
+        self._user_ids.update(user_ids)
+        return len(user_ids)
+
+    def save(self) -> None:
+        """変更があればスナップショットを書き出す。途中で失敗しても元のファイルは残る。"""
+
+        path = self._snapshot_path
+        if path is None or not self._dirty:
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        user_ids = array(_SNAPSHOT_TYPECODE, sorted(self._user_ids))
+        temporary.write_bytes(user_ids.tobytes())
+        os.replace(temporary, path)
+        self._dirty = False
+
+
+class UserRegistrationQueue:
+    """未確認ユーザーの存在確認と初期化を 1 つのタスクで順に処理するキュー。"""
+
+    def __init__(
+        self,
+        template_service: TemplateApplicationService,
+        *,
+        known_users: KnownUserSet | None = None,
+    ) -> None:
+        self._template_service = template_service
+        # 空の集合も偽になるため `or` では判定しない。
+        if known_users is None:
+            known_users = KnownUserSet()
+        self.known_users = known_users
+        self._queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue()
+        self._pending: set[int] = set()
+        self._worker: asyncio.Task[None] | None = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        """スナップショットを読み込み、登録タスクを起動する。"""
+
+        if self._worker is not None:
+            return
+        loaded = self.known_users.load()
+        if loaded:
+            logging.info(INFO + f"Loaded {loaded} known users from snapshot.")
+        self._worker = asyncio.create_task(self._run(), name="user-registration")
+
+    def observe(self, user_id: int, name: str) -> bool:
+        """ユーザーを記録する。新たにキューへ積んだ場合は `True` を返す。"""
+
+        if user_id in self.known_users or user_id in self._pending:
+            return False
+        self._pending.add(user_id)
+        self._queue.put_nowait((user_id, name))
+        return True
+
+    async def join(self) -> None:
+        """キューに積まれた登録が全て終わるまで待つ。"""
+
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """残りの登録を処理してからタスクを止め、スナップショットを書き出す。"""
+
+        if self._worker is not None:
+            await self._queue.join()
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.known_users.save()
+
+    async def _run(self) -> None:
+        while True:
+            user_id, name = await self._queue.get()
+            try:
+                await self._template_service.ensure_user(user_id=user_id, name=name)
+            except Exception:
+                # 失敗したユーザーは次回のコマンド実行時に改めて確認する。
+                logging.exception(ERROR + f"Failed to register user {user_id}.")
+            else:
+                self.known_users.add(user_id)
+            finally:
+                self._pending.discard(user_id)
+                self._queue.task_done()
+
+
+__all__ = ["KnownUserSet", "UserRegistrationQueue"]
@@ -1,4 +1,6 @@
+import inspect
 import uuid
+from typing import Any, TypeVar
 
 import discord
 from colorama import Fore, Style
@@ -52,6 +54,15 @@ class CommandsTranslator(discord.app_commands.Translator):
             "ja": "抽選履歴",
             "en-us": "history",
         },
+        # command parameters
+        "rounds": {
+            "ja": "ラウンド数",
+            "en-us": "rounds",
+        },
+        "amidakuji.rounds.description": {
+            "ja": "複数ラウンドを一度に抽選し、全員の担当を順番に入れ替えます。",
+            "en-us": "Draw several rounds at once, rotating every member through the roles.",
+        },
         # command descriptions
         "ping.description": {
             "ja": "Botの応答速度を確認します。🏓",
@@ -185,5 +196,19 @@ def generate_template_id() -> str:
     return uuid.uuid4().hex
 
 
+_T = TypeVar("_T")
+
+
+async def resolve_awaitable(value: _T | Any) -> _T:
+    """Await ``value`` if it is awaitable, otherwise return it unchanged.
+
+    Lets callers treat sync and async repository implementations uniformly.
+    """
+
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
 if __name__ == "__main__":
     pass
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import threading
+
+import pytest
+
+from app.config import load_config
 from bootstrap.testing import InMemoryTemplateRepository, create_test_application
 from presentation.discord.client import BotClient
 from presentation.discord.services import DiscordCommandUseCases
+from services.startup_check import StartupSelfCheck
 
 
 def test_build_discord_application_uses_di_container() -> None:
@@ -26,3 +32,45 @@ def test_build_discord_application_uses_di_container() -> None:
     assert {"ping", "amidakuji"}.issubset(command_names)
 
     assert bundle.context.config.discord.token == "test-token"
+
+
+@pytest.mark.asyncio
+async def test_on_ready_runs_blocking_startup_work_off_the_event_loop(monkeypatch) -> None:
+    repository = InMemoryTemplateRepository()
+    client = create_test_application(repository_factory=lambda _: repository).application.client
+    threads: dict[str, int] = {}
+
+    def ensure_default_templates():
+        threads["ensure_default_templates"] = threading.get_ident()
+        return []
+
+    def run(self, *, discord_client):
+        threads["self_check"] = threading.get_ident()
+        return False
+
+    async def close() -> None:
+        threads["close"] = threading.get_ident()
+
+    monkeypatch.setattr(repository, "ensure_default_templates", ensure_default_templates)
+    monkeypatch.setattr(StartupSelfCheck, "run", run)
+    monkeypatch.setattr(client, "close", close)
+
+    await client.on_ready()
+    loop_thread = threading.get_ident()
+
+    assert threads["ensure_default_templates"] != loop_thread
+    assert threads["self_check"] != loop_thread
+    assert threads["close"] == loop_thread
+
+
+def test_load_config_rejects_write_behind_with_executor_workers(monkeypatch) -> None:
+    monkeypatch.setenv("CLIENT_TOKEN", "a.b.c")
+    monkeypatch.setenv("FIREBASE_CREDENTIALS", "credentials.json")
+    monkeypatch.setenv("FIREBASE_EXECUTOR_WORKERS", "4")
+    monkeypatch.setenv("FIREBASE_HISTORY_WRITE_BEHIND", "true")
+
+    with pytest.raises(RuntimeError, match="FIREBASE_HISTORY_WRITE_BEHIND"):
+        load_config(env_file=None)
+
+    monkeypatch.delenv("FIREBASE_EXECUTOR_WORKERS")
+    assert load_config(env_file=None).firebase.history_write_behind is True
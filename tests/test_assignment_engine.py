@@ -0,0 +1,250 @@
+import itertools
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from domain.services.assignment_engine import (
+    allocate_capacity_quotas,
+    draw_capacity_assignment,
+    draw_exponential_key_assignment,
+    draw_weighted_assignment,
+    solve_min_cost_assignment,
+)
+from services.assignment_benchmark import run_benchmark
+
+
+def _sequential_probabilities(weights: list[list[float]]) -> dict[tuple[int, ...], float]:
+    """列ごとに重み比例で非復元抽出する従来の手順の厳密な分布。"""
+
+    user_count = len(weights)
+    steps = min(user_count, len(weights[0]))
+    probabilities: dict[tuple[int, ...], float] = {}
+    for assignment in itertools.permutations(range(user_count), steps):
+        probability = 1.0
+        available = set(range(user_count))
+        for column, user in enumerate(assignment):
+            total = sum(weights[row][column] for row in available)
+            if total <= 0:
+                probability /= len(available)
+            else:
+                probability *= weights[user][column] / total
+            available.remove(user)
+        if probability > 0:
+            probabilities[assignment] = probability
+    return probabilities
+
+
+def _chi_square_critical_value(degrees: int, *, z: float = 3.09) -> float:
+    """有意水準 0.1% (片側 z=3.09) の χ² 臨界値の Wilson–Hilferty 近似。"""
+
+    term = 2 / (9 * degrees)
+    return degrees * (1 - term + z * term**0.5) ** 3
+
+
+def _sample(engine, weights, *, seed: int, trials: int) -> Counter:
+    rng = np.random.default_rng(seed)
+    return Counter(
+        tuple(int(index) for index in engine(weights, rng=rng)) for _ in range(trials)
+    )
+
+
+WEIGHTS = [
+    [1.0, 0.5, 1.0],
+    [0.25, 1.0, 1.0],
+    [1.0, 1.0, 0.0],
+    [0.5, 0.0, 0.0],
+]
+
+
+@pytest.mark.parametrize(
+    "engine", [draw_weighted_assignment, draw_exponential_key_assignment]
+)
+def test_draws_follow_the_sequential_weighted_distribution(engine):
+    expected = _sequential_probabilities(WEIGHTS)
+    trials = 40_000
+
+    counts = _sample(engine, WEIGHTS, seed=1234, trials=trials)
+
+    assert set(counts) <= set(expected)
+    for assignment, probability in expected.items():
+        observed = counts[assignment] / trials
+        # 二項分布の標準偏差の 5 倍以内に収まることを確認する。
+        tolerance = 5 * (probability * (1 - probability) / trials) ** 0.5
+        assert abs(observed - probability) <= tolerance, assignment
+
+
+def test_exponential_keys_match_the_sequential_sampler():
+    # 2 つの実装の標本が同じ分布から来ているかを χ² 同質性検定で確かめる。
+    trials = 30_000
+    sequential = _sample(draw_weighted_assignment, WEIGHTS, seed=1, trials=trials)
+    exponential = _sample(
+        draw_exponential_key_assignment, WEIGHTS, seed=2, trials=trials
+    )
+
+    outcomes = set(sequential) | set(exponential)
+    statistic = 0.0
+    for outcome in outcomes:
+        total = sequential[outcome] + exponential[outcome]
+        expected = total / 2
+        statistic += (sequential[outcome] - expected) ** 2 / expected
+        statistic += (exponential[outcome] - expected) ** 2 / expected
+
+    assert statistic < _chi_square_critical_value(len(outcomes) - 1)
+
+
+@pytest.mark.parametrize(
+    "engine", [draw_weighted_assignment, draw_exponential_key_assignment]
+)
+def test_zero_weight_column_falls_back_to_remaining_users(engine):
+    weights = np.array([[1.0, 0.0], [0.0, 0.0], [0.0, 0.0]])
+    rng = np.random.default_rng(0)
+
+    seconds = Counter(int(engine(weights, rng=rng)[1]) for _ in range(3000))
+
+    assert set(seconds) == {1, 2}
+    assert abs(seconds[1] - seconds[2]) < 300
+
+
+@pytest.mark.parametrize(
+    "engine", [draw_weighted_assignment, draw_exponential_key_assignment]
+)
+def test_assigns_one_distinct_user_per_choice(engine):
+    rng = np.random.default_rng(7)
+    weights = rng.random((300, 120))
+
+    assigned = engine(weights, rng=rng)
+
+    assert assigned.shape == (120,)
+    assert len(set(assigned.tolist())) == 120
+    assert engine(weights.T, rng=rng).shape == (120,)
+
+
+@pytest.mark.parametrize("weights", [[[1.0, -0.5]], [[float("nan"), 1.0]], [1.0, 2.0]])
+def test_rejects_invalid_weights(weights):
+    with pytest.raises(ValueError):
+        draw_weighted_assignment(np.array(weights))
+    with pytest.raises(ValueError):
+        draw_exponential_key_assignment(np.array(weights))
+
+
+def _brute_force_min_cost(costs: np.ndarray) -> float:
+    row_count, column_count = costs.shape
+    if row_count > column_count:
+        return _brute_force_min_cost(costs.T)
+    return min(
+        sum(costs[row, column] for row, column in enumerate(columns))
+        for columns in itertools.permutations(range(column_count), row_count)
+    )
+
+
+def test_min_cost_assignment_matches_brute_force():
+    rng = np.random.default_rng(21)
+    for _ in range(200):
+        row_count, column_count = (int(size) for size in rng.integers(1, 6, size=2))
+        # 同点を多く含むよう、小さな整数のコストにする。
+        costs = rng.integers(-2, 4, size=(row_count, column_count)).astype(float)
+
+        rows, columns = solve_min_cost_assignment(costs)
+
+        pairs = min(row_count, column_count)
+        assert len(set(rows.tolist())) == len(set(columns.tolist())) == pairs
+        assert columns.tolist() == sorted(columns.tolist())
+        assert costs[rows, columns].sum() == pytest.approx(_brute_force_min_cost(costs))
+
+
+def test_min_cost_assignment_jitter_breaks_ties_uniformly():
+    rng = np.random.default_rng(3)
+    costs = np.zeros((3, 3))
+
+    counts = Counter(
+        tuple(solve_min_cost_assignment(costs, rng=rng, jitter=1e-3)[0].tolist())
+        for _ in range(6000)
+    )
+
+    # 全て同点なら 3! 通りの割当がほぼ同じ割合で選ばれる。
+    assert len(counts) == 6
+    assert all(abs(count - 1000) < 150 for count in counts.values())
+
+
+def test_min_cost_assignment_handles_large_matrices():
+    rng = np.random.default_rng(5)
+    costs = rng.integers(0, 4, size=(300, 200)).astype(float)
+
+    rows, columns = solve_min_cost_assignment(costs, rng=rng, jitter=1e-3)
+
+    assert columns.tolist() == list(range(200))
+    assert len(set(rows.tolist())) == 200
+    # 各列に 0 のセルがある程度あるので、最適解はほぼ 0 になる。
+    assert costs[rows, columns].sum() == 0
+
+
+@pytest.mark.parametrize("costs", [[[float("inf"), 1.0]], [[float("nan")]], [1.0, 2.0]])
+def test_min_cost_assignment_rejects_invalid_costs(costs):
+    with pytest.raises(ValueError):
+        solve_min_cost_assignment(np.array(costs))
+
+
+@pytest.mark.parametrize(
+    ("capacities", "participants", "expected"),
+    [
+        ([5, 5], 12, [5, 5]),
+        ([5, 5], 7, [4, 3]),
+        ([10, 5, 1], 8, [5, 3, 0]),
+        ([3, 3, 3], 0, [0, 0, 0]),
+    ],
+)
+def test_capacity_quotas_are_proportional_and_capped(capacities, participants, expected):
+    quotas = allocate_capacity_quotas(np.array(capacities), participants)
+
+    assert quotas.tolist() == expected
+
+
+def test_capacity_assignment_fills_every_quota():
+    rng = np.random.default_rng(11)
+    weights = rng.random((10_000, 4))
+    quotas = allocate_capacity_quotas(np.array([3000, 3000, 2000, 2000]), 10_000)
+
+    assigned = draw_capacity_assignment(weights, quotas, rng=rng)
+
+    assert np.bincount(assigned, minlength=4).tolist() == quotas.tolist()
+
+
+def test_capacity_assignment_honors_zero_weights():
+    # ユーザー 0 だけが選択肢 1 を担当でき、他のユーザーは選択肢 0 にしか入れない。
+    weights = np.array([[0.0, 1.0], [1.0, 0.0], [1.0, 0.0], [1.0, 0.0]])
+    rng = np.random.default_rng(4)
+
+    for _ in range(200):
+        assigned = draw_capacity_assignment(weights, np.array([3, 1]), rng=rng)
+        assert assigned.tolist() == [1, 0, 0, 0]
+
+
+def test_capacity_assignment_leaves_extra_users_unassigned():
+    rng = np.random.default_rng(6)
+
+    assigned = draw_capacity_assignment(np.ones((7, 2)), np.array([2, 3]), rng=rng)
+
+    assert sorted(assigned.tolist()) == [-1, -1, 0, 0, 1, 1, 1]
+
+
+def test_capacity_assignment_is_uniform_without_weights():
+    rng = np.random.default_rng(8)
+    counts = Counter(
+        tuple(draw_capacity_assignment(np.ones((3, 2)), np.array([1, 2]), rng=rng).tolist())
+        for _ in range(6000)
+    )
+
+    # 3 人を 1 人と 2 人に分ける 3 通りが同じ割合で現れる。
+    assert set(counts) == {(0, 1, 1), (1, 0, 1), (1, 1, 0)}
+    assert all(abs(count - 2000) < 200 for count in counts.values())
+
+
+def test_benchmark_reports_each_size():
+    results = run_benchmark([5, 20], repeats=1)
+
+    assert [result.participants for result in results] == [5, 20]
+    assert all(result.vectorized_seconds > 0 for result in results)
+    assert all(result.exponential_key_seconds > 0 for result in results)
+    assert all(result.optimal_fairness_seconds > 0 for result in results)
+    assert all(result.capacity_seconds > 0 for result in results)
@@ -0,0 +1,289 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from application.services.history_service import HistoryApplicationService
+from application.services.template_service import TemplateApplicationService
+from bootstrap.testing import InMemoryTemplateRepository
+from domain import (
+    Pair,
+    PairList,
+    ResultEmbedMode,
+    SelectionMode,
+    Template,
+    TemplateScope,
+)
+from infrastructure.firestore.async_template_repository import (
+    AsyncFirestoreTemplateRepository,
+)
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+
+
+def make_repository() -> AsyncFirestoreTemplateRepository:
+    unit_of_work = FirestoreUnitOfWork()
+    unit_of_work._async_client = object()  # type: ignore[attr-defined]
+    unit_of_work.async_user_repository = MagicMock()
+    unit_of_work.async_info_repository = MagicMock()
+    unit_of_work.async_shared_template_repository = MagicMock()
+    unit_of_work.async_history_repository = MagicMock()
+    return AsyncFirestoreTemplateRepository(unit_of_work)
+
+
+@pytest.mark.asyncio
+async def test_get_embed_mode_initializes_missing_document():
+    repository = make_repository()
+    info_repository = repository.unit_of_work.async_info_repository
+    info_repository.read_document = AsyncMock(return_value=None)
+    info_repository.create_document = AsyncMock()
+
+    mode = await repository.get_embed_mode()
+
+    assert mode == "compact"
+    info_repository.create_document.assert_awaited_once_with(
+        "embed_mode", {"embed_mode": "compact"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_user_includes_shared_and_public_templates():
+    repository = make_repository()
+    unit_of_work = repository.unit_of_work
+    unit_of_work.async_user_repository.read_document = AsyncMock(
+        return_value={
+            "id": 1,
+            "name": "Tester",
+            "least_template": None,
+            "custom_templates": [
+                {"title": "My Template", "choices": ["A"], "scope": "private"}
+            ],
+        }
+    )
+    unit_of_work.async_info_repository.read_document = AsyncMock(
+        return_value={
+            "default_templates": [
+                {"title": "Default", "choices": ["D"], "scope": "public"}
+            ]
+        }
+    )
+
+    guild_doc = SimpleNamespace(
+        id="guild1",
+        to_dict=lambda: {"title": "Guild Shared", "choices": ["G"], "scope": "guild"},
+    )
+
+    async def list_templates(*, scope=None, guild_id=None, created_by=None):
+        if scope == TemplateScope.GUILD.value and guild_id == 999:
+            return [guild_doc]
+        return []
+
+    unit_of_work.async_shared_template_repository.list_templates = list_templates
+
+    user = await repository.get_user(1, guild_id=999)
+
+    assert user is not None
+    assert [template.title for template in user.custom_templates] == ["My Template"]
+    assert [template.title for template in user.shared_templates] == ["Guild Shared"]
+    assert [template.title for template in user.public_templates] == ["Default"]
+
+
+@pytest.mark.asyncio
+async def test_save_history_awaits_history_repository():
+    repository = make_repository()
+    history_repository = repository.unit_of_work.async_history_repository
+    history_repository.add_entry = AsyncMock()
+
+    user = SimpleNamespace(id=1, display_name="Tester", name="Tester")
+    await repository.save_history(
+        guild_id=42,
+        template=Template(title="League", choices=["Top"]),
+        pairs=PairList(pairs=[Pair(user=user, choice="Top")]),
+        selection_mode=SelectionMode.BIAS_REDUCTION,
+    )
+
+    history_repository.add_entry.assert_awaited_once()
+    saved = history_repository.add_entry.await_args.args[0]
+    assert saved["guild_id"] == 42
+    assert saved["selection_mode"] == SelectionMode.BIAS_REDUCTION.value
+    assert saved["entries"][0]["choice"] == "Top"
+
+
+@pytest.mark.asyncio
+async def test_save_history_rounds_submits_every_round_together():
+    repository = make_repository()
+    history_repository = repository.unit_of_work.async_history_repository
+    history_repository.submit_entries = AsyncMock()
+
+    user = SimpleNamespace(id=1, display_name="Tester", name="Tester")
+    await repository.save_history_rounds(
+        guild_id=42,
+        template=Template(title="League", choices=["Top", "Mid"]),
+        rounds=[
+            PairList(pairs=[Pair(user=user, choice="Top")]),
+            PairList(pairs=[Pair(user=user, choice="Mid")]),
+        ],
+        selection_mode=SelectionMode.RANDOM,
+    )
+
+    history_repository.submit_entries.assert_awaited_once()
+    saved = history_repository.submit_entries.await_args.args[0]
+    assert [data["entries"][0]["choice"] for data in saved] == ["Top", "Mid"]
+    assert saved[0]["created_at"] < saved[1]["created_at"]
+
+
+@pytest.mark.asyncio
+async def test_repository_requires_async_client():
+    repository = AsyncFirestoreTemplateRepository(FirestoreUnitOfWork())
+
+    with pytest.raises(RuntimeError):
+        await repository.get_selection_mode()
+    assert await repository.user_is_exist(1) is False
+
+
+@pytest.mark.asyncio
+async def test_application_services_accept_sync_and_async_repositories():
+    sync_repository = InMemoryTemplateRepository()
+    sync_repository.set_selection_mode(SelectionMode.BIAS_REDUCTION)
+
+    async_repository = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.RANDOM.value),
+        create_shared_template=AsyncMock(side_effect=lambda template: template),
+    )
+
+    assert (
+        await HistoryApplicationService(sync_repository).get_selection_mode()
+        is SelectionMode.BIAS_REDUCTION
+    )
+    assert (
+        await HistoryApplicationService(async_repository).get_selection_mode()
+        is SelectionMode.RANDOM
+    )
+
+    template = Template(title="Shared", choices=["A"], scope=TemplateScope.GUILD)
+    created = await TemplateApplicationService(async_repository).create_shared_template(
+        template
+    )
+    assert created is template
+    async_repository.create_shared_template.assert_awaited_once_with(template)
+
+
+@pytest.mark.asyncio
+async def test_private_and_recent_template_lookups_read_only_the_user_document():
+    repository = make_repository()
+    unit_of_work = repository.unit_of_work
+    unit_of_work.async_user_repository.read_document = AsyncMock(
+        return_value={
+            "id": 1,
+            "name": "Tester",
+            "least_template": {"title": "Recent", "choices": ["R"], "scope": "private"},
+            "custom_templates": [
+                {"title": "My Template", "choices": ["A"], "scope": "private"}
+            ],
+        }
+    )
+    unit_of_work.async_info_repository.read_document = AsyncMock()
+    unit_of_work.async_shared_template_repository.list_templates = AsyncMock()
+    service = TemplateApplicationService(repository)
+
+    private = await service.list_private_templates(user_id=1, guild_id=999)
+    recent = await service.get_recent_template(user_id=1, guild_id=999)
+
+    assert [template.title for template in private.templates] == ["My Template"]
+    assert recent is not None and recent.title == "Recent"
+    assert unit_of_work.async_user_repository.read_document.await_count == 2
+    unit_of_work.async_info_repository.read_document.assert_not_awaited()
+    unit_of_work.async_shared_template_repository.list_templates.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_template_overview_reads_user_and_settings_with_single_get_all():
+    documents = {
+        "users/1": {
+            "id": 1,
+            "name": "Tester",
+            "least_template": None,
+            "custom_templates": [
+                {"title": "My Template", "choices": ["A"], "scope": "private"}
+            ],
+        },
+        "info/embed_mode": {"embed_mode": "compact"},
+        "info/selection_mode": {"selection_mode": "random"},
+        "info/default_templates": {
+            "default_templates": [
+                {"title": "Default", "choices": ["D"], "scope": "public"}
+            ]
+        },
+    }
+    requested: list[list[str]] = []
+
+    async def get_all(references):
+        requested.append([reference.path for reference in references])
+        for reference in references:
+            yield SimpleNamespace(
+                reference=reference,
+                exists=reference.path in documents,
+                to_dict=lambda path=reference.path: dict(documents[path]),
+            )
+
+    def document_factory(collection_name: str):
+        return lambda doc_id: SimpleNamespace(path=f"{collection_name}/{doc_id}")
+
+    repository = make_repository()
+    unit_of_work = repository.unit_of_work
+    unit_of_work._async_client = SimpleNamespace(get_all=get_all)  # type: ignore[attr-defined]
+    unit_of_work.async_user_repository.document.side_effect = document_factory("users")
+    unit_of_work.async_info_repository.document.side_effect = document_factory("info")
+    unit_of_work.async_user_repository.read_document = AsyncMock()
+    unit_of_work.async_info_repository.read_document = AsyncMock()
+    unit_of_work.async_shared_template_repository.list_templates = AsyncMock(
+        return_value=[]
+    )
+
+    context = await repository.load_draw_context(user_id=1, guild_id=999)
+    private, guild, public = await TemplateApplicationService(
+        repository
+    ).get_template_overview(user_id=1, guild_id=999)
+
+    assert context.embed_mode is ResultEmbedMode.COMPACT
+    assert context.selection_mode is SelectionMode.RANDOM
+    assert [template.title for template in private.templates] == ["My Template"]
+    assert guild.templates == []
+    assert [template.title for template in public.templates] == ["Default"]
+    assert len(requested) == 2
+    assert len(requested[0]) == 4
+    unit_of_work.async_user_repository.read_document.assert_not_awaited()
+    unit_of_work.async_info_repository.read_document.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_custom_template_mutations_use_field_updates():
+    repository = make_repository()
+    user_repository = repository.unit_of_work.async_user_repository
+    user_repository.update_fields = AsyncMock()
+    stored = {
+        "id": 1,
+        "name": "Tester",
+        "custom_templates": [
+            {"title": "Mine", "choices": ["A"], "scope": "private", "template_id": "t1"}
+        ],
+    }
+    written: list[dict] = []
+
+    async def run_transaction(user_id, mutation):
+        fields, result = mutation(stored)
+        written.append(fields)
+        return result
+
+    user_repository.run_transaction = run_transaction
+
+    await repository.add_custom_template(1, Template(title="New", choices=["B"]))
+    await repository.delete_custom_template(1, template_title="Mine")
+
+    user_repository.update_fields.assert_awaited_once()
+    assert list(user_repository.update_fields.await_args.args[1]) == ["custom_templates"]
+    assert written[0]["custom_templates"].values == stored["custom_templates"]
+
+    with pytest.raises(ValueError):
+        await repository.update_custom_template(
+            1, Template(title="Missing", choices=["A"], template_id="unknown")
+        )
@@ -0,0 +1,227 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from domain import (
+    DrawContext,
+    ResultEmbedMode,
+    SelectionMode,
+    Template,
+    TemplateScope,
+    UserInfo,
+)
+from infrastructure.wrappers import CachingTemplateRepository, TTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_inner() -> AsyncMock:
+    inner = AsyncMock()
+    inner.get_default_templates.return_value = [
+        Template(title="Default", choices=["D"], scope=TemplateScope.PUBLIC)
+    ]
+    inner.get_embed_mode.return_value = "compact"
+
+    async def list_shared_templates(*, scope=None, guild_id=None, created_by=None):
+        if scope is TemplateScope.GUILD:
+            return [Template(title=f"Guild {guild_id}", choices=["G"], scope=scope)]
+        return [Template(title="Public", choices=["P"], scope=TemplateScope.PUBLIC)]
+
+    inner.list_shared_templates.side_effect = list_shared_templates
+    return inner
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_cache_until_ttl_expires():
+    clock = _Clock()
+    inner = make_inner()
+    repository = CachingTemplateRepository(
+        inner, ttl_seconds={"embed_mode": 10.0}, clock=clock
+    )
+
+    assert await repository.get_embed_mode() == "compact"
+    assert await repository.get_embed_mode() == "compact"
+    assert inner.get_embed_mode.await_count == 1
+
+    clock.now = 10.0
+    await repository.get_embed_mode()
+    assert inner.get_embed_mode.await_count == 2
+
+    stats = repository.stats()["embed_mode"]
+    assert (stats.hits, stats.misses) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_mutators_invalidate_their_key_family():
+    inner = make_inner()
+    repository = CachingTemplateRepository(inner)
+
+    await repository.get_embed_mode()
+    await repository.set_embed_mode(ResultEmbedMode.DETAILED)
+    await repository.get_embed_mode()
+    assert inner.get_embed_mode.await_count == 2
+
+    await repository.list_shared_templates(scope=TemplateScope.PUBLIC)
+    template = Template(title="New", choices=["A"], scope=TemplateScope.PUBLIC)
+    inner.create_shared_template.return_value = template
+    assert await repository.create_shared_template(template) is template
+    await repository.list_shared_templates(scope=TemplateScope.PUBLIC)
+    assert inner.list_shared_templates.await_count == 2
+
+    await repository.delete_shared_template(template.template_id)
+    await repository.list_shared_templates(scope=TemplateScope.PUBLIC)
+    assert inner.list_shared_templates.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_user_reads_shared_templates_through_cache():
+    inner = make_inner()
+    inner.get_user.side_effect = lambda user_id, **_: UserInfo(
+        id=user_id, name="Tester"
+    )
+    repository = CachingTemplateRepository(inner)
+
+    for _ in range(3):
+        user = await repository.get_user(1, guild_id=42)
+
+    assert [template.title for template in user.shared_templates] == ["Guild 42"]
+    assert [template.title for template in user.public_templates] == [
+        "Public",
+        "Default",
+    ]
+    assert inner.get_user.await_count == 3
+    for call in inner.get_user.await_args_list:
+        assert call.kwargs["include_shared"] is False
+    assert inner.get_default_templates.await_count == 1
+    assert inner.list_shared_templates.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_load_draw_context_warms_settings_and_then_reads_only_the_user():
+    inner = make_inner()
+    inner.load_draw_context.side_effect = lambda *, user_id, guild_id: DrawContext(
+        guild_id=guild_id,
+        user=UserInfo(id=user_id, name="Tester"),
+        selection_mode=SelectionMode.BIAS_REDUCTION,
+        embed_mode=ResultEmbedMode.DETAILED,
+        default_templates=[
+            Template(title="Default", choices=["D"], scope=TemplateScope.PUBLIC)
+        ],
+    )
+    inner.get_user.side_effect = lambda user_id, **_: UserInfo(
+        id=user_id, name="Tester"
+    )
+    repository = CachingTemplateRepository(inner)
+
+    first = await repository.load_draw_context(user_id=1, guild_id=42)
+    second = await repository.load_draw_context(user_id=2, guild_id=42)
+
+    assert inner.load_draw_context.await_count == 1
+    assert inner.get_user.await_args.kwargs["include_shared"] is False
+    assert second.user.id == 2
+    assert second.selection_mode is first.selection_mode
+    assert second.embed_mode is ResultEmbedMode.DETAILED
+    assert [template.title for template in second.default_templates] == ["Default"]
+    assert await repository.get_selection_mode() == "bias_reduction"
+    inner.get_selection_mode.assert_not_awaited()
+
+
+def test_ttl_cache_evicts_least_recently_used_entry():
+    cache = TTLCache(ttl_seconds={"family": 60.0}, max_items=2, clock=_Clock())
+
+    cache.set("family", "a", key="a")
+    cache.set("family", "b", key="b")
+    assert cache.get("family", "a") == "a"
+    cache.set("family", "c", key="c")
+
+    assert len(cache) == 2
+    assert cache.get("family", "a") == "a"
+    assert cache.get("family", "c") == "c"
+    assert cache.get("family", "b") != "b"
+    assert cache.stats()["family"].evictions == 1
+
+
+def test_ttl_cache_caps_by_number_of_items_not_entries():
+    cache = TTLCache(ttl_seconds={"family": 60.0}, max_items=4, clock=_Clock())
+
+    cache.set("family", ["a", "b", "c"], key="list")
+    cache.set("family", "x", key="x")
+    cache.set("family", ["d", "e"], key="pair")
+    cache.set("family", list(range(5)), key="too_large")
+
+    # 要素数 2 の一覧を足すと上限を超えるため、最も古い要素数 3 の一覧を追い出す。
+    assert cache.size == 3
+    assert cache.peek("family", "list") != ["a", "b", "c"]
+    assert cache.stats()["family"].evictions == 1
+    assert cache.get("family", "x") == "x"
+    assert cache.get("family", "pair") == ["d", "e"]
+    assert cache.get("family", "too_large") != list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_stale_load_is_not_stored_after_invalidation():
+    inner = make_inner()
+    loading = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_get_embed_mode():
+        loading.set()
+        await release.wait()
+        return "compact"
+
+    inner.get_embed_mode.side_effect = slow_get_embed_mode
+    repository = CachingTemplateRepository(inner)
+
+    stale_read = asyncio.create_task(repository.get_embed_mode())
+    await loading.wait()
+    await repository.set_embed_mode(ResultEmbedMode.DETAILED)
+    release.set()
+    assert await stale_read == "compact"
+
+    inner.get_embed_mode.side_effect = None
+    inner.get_embed_mode.return_value = "detailed"
+    assert await repository.get_embed_mode() == "detailed"
+
+
+@pytest.mark.asyncio
+async def test_load_draw_context_counts_one_miss_per_cold_family():
+    inner = make_inner()
+    inner.load_draw_context.side_effect = lambda *, user_id, guild_id: DrawContext(
+        guild_id=guild_id,
+        user=UserInfo(id=user_id, name="Tester"),
+        selection_mode=SelectionMode.RANDOM,
+        embed_mode=ResultEmbedMode.COMPACT,
+        default_templates=[],
+    )
+    inner.get_user.side_effect = lambda user_id, **_: UserInfo(id=user_id, name="Tester")
+    repository = CachingTemplateRepository(inner)
+
+    await repository.load_draw_context(user_id=1)
+    await repository.load_draw_context(user_id=1)
+
+    stats = repository.stats()
+    assert (stats["embed_mode"].hits, stats["embed_mode"].misses) == (1, 1)
+    assert (stats["selection_mode"].hits, stats["selection_mode"].misses) == (1, 1)
+    assert (stats["default_templates"].hits, stats["default_templates"].misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_mode_write_still_invalidates_the_cache():
+    inner = make_inner()
+    inner.set_embed_mode.side_effect = TimeoutError("deadline exceeded")
+    repository = CachingTemplateRepository(inner)
+    await repository.get_embed_mode()
+
+    inner.get_embed_mode.return_value = "detailed"
+    with pytest.raises(TimeoutError):
+        await repository.set_embed_mode(ResultEmbedMode.DETAILED)
+
+    assert await repository.get_embed_mode() == "detailed"
+    assert inner.get_embed_mode.await_count == 2
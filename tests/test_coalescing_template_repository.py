@@ -0,0 +1,115 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from domain import ResultEmbedMode, Template, TemplateScope
+from infrastructure.wrappers import CoalescingTemplateRepository
+
+
+def make_inner(gate: asyncio.Event) -> AsyncMock:
+    inner = AsyncMock()
+
+    async def get_embed_mode():
+        await gate.wait()
+        return "compact"
+
+    async def list_shared_templates(*, scope=None, guild_id=None, created_by=None):
+        await gate.wait()
+        return [Template(title=f"Guild {guild_id}", choices=["G"], scope=scope)]
+
+    inner.get_embed_mode.side_effect = get_embed_mode
+    inner.list_shared_templates.side_effect = list_shared_templates
+    return inner
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_reads_share_one_call():
+    gate = asyncio.Event()
+    inner = make_inner(gate)
+    repository = CoalescingTemplateRepository(inner)
+
+    tasks = [asyncio.create_task(repository.get_embed_mode()) for _ in range(5)]
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await asyncio.gather(*tasks) == ["compact"] * 5
+    assert inner.get_embed_mode.await_count == 1
+    assert repository.inflight_count == 0
+
+    stats = repository.stats()["embed_mode"]
+    assert (stats.calls, stats.coalesced) == (5, 4)
+    assert repository.coalesced_ratio() == pytest.approx(0.8)
+
+    # 完了した読み取りは保持せず、次の呼び出しで読み直す。
+    await repository.get_embed_mode()
+    assert inner.get_embed_mode.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_different_arguments_are_not_coalesced_and_results_are_copied():
+    gate = asyncio.Event()
+    inner = make_inner(gate)
+    repository = CoalescingTemplateRepository(inner)
+
+    first = asyncio.create_task(
+        repository.list_shared_templates(scope=TemplateScope.GUILD, guild_id=1)
+    )
+    second = asyncio.create_task(
+        repository.list_shared_templates(scope=TemplateScope.GUILD, guild_id=1)
+    )
+    other = asyncio.create_task(
+        repository.list_shared_templates(scope=TemplateScope.GUILD, guild_id=2)
+    )
+    await asyncio.sleep(0)
+    gate.set()
+
+    first_result, second_result, other_result = await asyncio.gather(
+        first, second, other
+    )
+
+    assert inner.list_shared_templates.await_count == 2
+    assert first_result == second_result
+    assert first_result is not second_result
+    assert other_result[0].title == "Guild 2"
+
+
+@pytest.mark.asyncio
+async def test_mutation_detaches_inflight_reads():
+    gate = asyncio.Event()
+    inner = make_inner(gate)
+    repository = CoalescingTemplateRepository(inner)
+
+    stale = asyncio.create_task(repository.get_embed_mode())
+    await asyncio.sleep(0)
+    await repository.set_embed_mode(ResultEmbedMode.DETAILED)
+    fresh = asyncio.create_task(repository.get_embed_mode())
+    await asyncio.sleep(0)
+    gate.set()
+
+    await asyncio.gather(stale, fresh)
+
+    assert inner.get_embed_mode.await_count == 2
+    assert repository.stats()["embed_mode"].coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_propagate_to_every_waiter():
+    gate = asyncio.Event()
+    inner = AsyncMock()
+
+    async def get_selection_mode():
+        await gate.wait()
+        raise RuntimeError("unavailable")
+
+    inner.get_selection_mode.side_effect = get_selection_mode
+    repository = CoalescingTemplateRepository(inner)
+
+    tasks = [asyncio.create_task(repository.get_selection_mode()) for _ in range(3)]
+    await asyncio.sleep(0)
+    gate.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert inner.get_selection_mode.await_count == 1
@@ -1,9 +1,24 @@
+import datetime
 import logging
+import random
+from collections import Counter
+from dataclasses import replace
 from types import SimpleNamespace
 
-import data_process
-from data_process import create_embeds_from_pairs, create_pair_from_list
-from domain import Pair, PairList, ResultEmbedMode, SelectionMode
+import pytest
+
+from data_process import (
+    create_embeds_from_pairs,
+    create_pair_from_list,
+    create_schedule_from_list,
+    create_team_embeds_from_pairs,
+    replay_assignment,
+)
+from db.serializers import (
+    deserialize_assignment_history,
+    serialize_assignment_history,
+)
+from domain import Pair, PairList, ResultEmbedMode, SelectionMode, Template
 
 
 class DummyAsset:
@@ -60,40 +75,34 @@ def test_create_embeds_detailed_mode_handles_missing_custom_avatar() -> None:
     assert embed.author.name == "Default Avatar User"
 
 
-def test_create_pair_from_list_bias_reduction_respects_weights(monkeypatch) -> None:
+def test_create_pair_from_list_bias_reduction_respects_weights() -> None:
     user_a = SimpleNamespace(id=1, display_name="UserA")
     user_b = SimpleNamespace(id=2, display_name="UserB")
 
     groupes = ["Top", "Jungle"]
 
-    def fake_shuffle(sequence):
-        # Keep order stable for deterministic testing
-        return None
-
-    def fake_choices(population, weights, k):
-        assert k == 1
-        if weights[0] == 0.0:
-            return [population[1]]
-        return [population[0]]
-
-    monkeypatch.setattr(data_process.random, "shuffle", fake_shuffle)
-    monkeypatch.setattr(data_process.random, "choices", fake_choices)
+    top_first = 0
+    for seed in range(20):
+        pairs = create_pair_from_list(
+            [user_a, user_b],
+            groupes,
+            selection_mode=SelectionMode.BIAS_REDUCTION,
+            weights={
+                user_a.id: {"Top": 0.0, "Jungle": 1.0},
+                user_b.id: {"Top": 1.0, "Jungle": 1.0},
+            },
+            seed=seed,
+        )
 
-    pairs = create_pair_from_list(
-        [user_a, user_b],
-        groupes,
-        selection_mode=SelectionMode.BIAS_REDUCTION,
-        weights={
-            user_a.id: {"Top": 0.0, "Jungle": 1.0},
-            user_b.id: {"Top": 1.0, "Jungle": 1.0},
-        },
-    )
+        assert len(pairs.pairs) == 2
+        # Top を先に引いた場合、Top の重みが 0 の UserA は選ばれない。
+        if pairs.pairs[0].choice == "Top":
+            top_first += 1
+            assert pairs.pairs[0].user is user_b
+            assert pairs.pairs[1].user is user_a
+            assert pairs.pairs[1].choice == "Jungle"
 
-    assert len(pairs.pairs) == 2
-    assert pairs.pairs[0].user is user_b
-    assert pairs.pairs[0].choice == "Top"
-    assert pairs.pairs[1].user is user_a
-    assert pairs.pairs[1].choice == "Jungle"
+    assert top_first > 0
 
 
 def test_create_pair_logs_warning_for_missing_weights(caplog) -> None:
@@ -110,3 +119,349 @@ def test_create_pair_logs_warning_for_missing_weights(caplog) -> None:
         )
 
     assert "重みテーブルの欠損" in caplog.text
+
+
+def test_create_pair_from_list_exponential_keys_skips_zero_weights() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(3)]
+    groupes = ["Top", "Jungle"]
+    weights = {
+        0: {"Top": 0.0, "Jungle": 0.0},
+        1: {"Top": 1.0, "Jungle": 0.0},
+        2: {"Top": 0.0, "Jungle": 1.0},
+    }
+
+    for _ in range(20):
+        pairs = create_pair_from_list(
+            users,
+            groupes,
+            selection_mode=SelectionMode.EXPONENTIAL_KEYS,
+            weights=weights,
+        )
+        assignment = {pair.choice: pair.user.id for pair in pairs.pairs}
+        assert assignment == {"Top": 1, "Jungle": 2}
+
+
+def test_create_pair_from_list_optimal_fairness_minimizes_costs() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(3)]
+    groupes = ["Top", "Jungle", "Mid"]
+    costs = {
+        0: {"Top": 3.0, "Jungle": 0.0, "Mid": 0.5},
+        1: {"Top": 0.0, "Jungle": 2.0, "Mid": 2.0},
+        2: {"Top": 1.0, "Jungle": 1.0, "Mid": 0.0},
+    }
+
+    for _ in range(20):
+        pairs = create_pair_from_list(
+            users,
+            groupes,
+            selection_mode=SelectionMode.OPTIMAL_FAIRNESS,
+            costs=costs,
+        )
+        assignment = {pair.choice: pair.user.id for pair in pairs.pairs}
+        assert assignment == {"Top": 1, "Jungle": 0, "Mid": 2}
+
+
+def test_create_pair_from_list_optimal_fairness_picks_cheapest_users() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(4)]
+    costs = {
+        0: {"Top": 1.0},
+        1: {"Top": 0.0},
+        2: {"Top": 2.0},
+    }
+
+    pairs = create_pair_from_list(
+        users,
+        ["Top"],
+        selection_mode=SelectionMode.OPTIMAL_FAIRNESS,
+        costs=costs,
+    )
+
+    # 欠損したユーザー 3 のコストは 0 で補完され、ユーザー 1 と同点になる。
+    assert [pair.choice for pair in pairs.pairs] == ["Top"]
+    assert pairs.pairs[0].user.id in {1, 3}
+
+
+def test_create_schedule_from_list_rotates_every_choice() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(4)]
+    groupes = ["Top", "Jungle", "Mid", "Bot"]
+
+    schedule = create_schedule_from_list(users, groupes, rounds=4)
+
+    assert len(schedule) == 4
+    for pairs in schedule:
+        assert sorted(pair.choice for pair in pairs.pairs) == sorted(groupes)
+        assert len({pair.user.id for pair in pairs.pairs}) == 4
+    for user in users:
+        choices = [
+            pair.choice for pairs in schedule for pair in pairs.pairs if pair.user is user
+        ]
+        assert sorted(choices) == sorted(groupes)
+
+
+def test_create_schedule_from_list_rotates_sitting_out_members() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(5)]
+    groupes = ["Top", "Mid"]
+
+    schedule = create_schedule_from_list(users, groupes, rounds=5)
+
+    assert all(len(pairs.pairs) == 2 for pairs in schedule)
+    for user in users:
+        choices = [
+            pair.choice for pairs in schedule for pair in pairs.pairs if pair.user is user
+        ]
+        # 5 ラウンドで各選択肢を 1 回ずつ担当し、残りの 3 ラウンドは休む。
+        assert sorted(choices) == ["Mid", "Top"]
+
+
+def test_create_schedule_from_list_avoids_back_to_back_repeats() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(3)]
+    groupes = ["Top", "Jungle", "Mid"]
+
+    for _ in range(50):
+        schedule = create_schedule_from_list(users, groupes, rounds=10)
+        for previous, current in zip(schedule, schedule[1:]):
+            before = {pair.user.id: pair.choice for pair in previous.pairs}
+            assert all(before[pair.user.id] != pair.choice for pair in current.pairs)
+
+
+def test_create_schedule_from_list_rejects_invalid_rounds() -> None:
+    users = [SimpleNamespace(id=1, display_name="User1")]
+
+    with pytest.raises(ValueError):
+        create_schedule_from_list(users, ["Top"], rounds=0)
+
+
+@pytest.mark.parametrize(
+    ("choice", "expected"),
+    [
+        ("Team A ×5", ("Team A", 5)),
+        ("Team A×5", ("Team A", 5)),
+        ("Bench x 12", ("Bench", 12)),
+        ("Mid", ("Mid", 1)),
+        ("Boxx5", ("Boxx5", 1)),
+        ("Team ×0", ("Team ×0", 1)),
+    ],
+)
+def test_template_parses_choice_capacities(choice, expected) -> None:
+    template = Template(title="Event", choices=[choice])
+
+    assert template.choice_capacities == [expected]
+    assert template.has_capacities is (expected[1] > 1)
+
+
+@pytest.mark.parametrize(
+    "mode",
+    [
+        SelectionMode.RANDOM,
+        SelectionMode.BIAS_REDUCTION,
+        SelectionMode.EXPONENTIAL_KEYS,
+        SelectionMode.OPTIMAL_FAIRNESS,
+    ],
+)
+def test_create_pair_from_list_splits_everyone_into_capacity_buckets(mode) -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(9)]
+
+    pairs = create_pair_from_list(
+        users,
+        ["Team A", "Team B"],
+        selection_mode=mode,
+        capacities=[5, 5],
+    )
+
+    sizes = Counter(pair.choice for pair in pairs.pairs)
+    assert sorted(sizes.values()) == [4, 5]
+    assert sorted(pair.user.id for pair in pairs.pairs) == list(range(9))
+
+
+def test_create_pair_from_list_capacity_honors_fairness_costs() -> None:
+    users = [SimpleNamespace(id=index, display_name=f"User{index}") for index in range(4)]
+    costs = {
+        0: {"Team A": 2.0, "Team B": 0.0},
+        1: {"Team A": 2.0, "Team B": 0.0},
+        2: {"Team A": 0.0, "Team B": 2.0},
+        3: {"Team A": 0.0, "Team B": 2.0},
+    }
+
+    pairs = create_pair_from_list(
+        users,
+        ["Team A", "Team B"],
+        selection_mode=SelectionMode.OPTIMAL_FAIRNESS,
+        costs=costs,
+        capacities=[2, 2],
+    )
+
+    assignment = {pair.user.id: pair.choice for pair in pairs.pairs}
+    assert assignment == {0: "Team B", 1: "Team B", 2: "Team A", 3: "Team A"}
+
+
+def test_create_team_embeds_from_pairs_groups_members() -> None:
+    alice = SimpleNamespace(id=1, display_name="Alice")
+    bob = SimpleNamespace(id=2, display_name="Bob")
+    carol = SimpleNamespace(id=3, display_name="Carol")
+    pairs = PairList(
+        pairs=[
+            Pair(user=alice, choice="Team A"),
+            Pair(user=bob, choice="Team A"),
+            Pair(user=carol, choice="Team B"),
+        ]
+    )
+
+    embeds = create_team_embeds_from_pairs(pairs)
+
+    assert [embed.title for embed in embeds] == ["> Team A (2人)", "> Team B (1人)"]
+    assert embeds[0].description == "Alice\nBob"
+
+
+ALL_MODES = [
+    SelectionMode.RANDOM,
+    SelectionMode.BIAS_REDUCTION,
+    SelectionMode.EXPONENTIAL_KEYS,
+    SelectionMode.OPTIMAL_FAIRNESS,
+]
+
+
+def _record(template: Template, pairs: PairList, mode: SelectionMode):
+    # Firestore に保存して読み戻したのと同じ履歴を作る。
+    return deserialize_assignment_history(
+        serialize_assignment_history(
+            guild_id=1,
+            template=template,
+            pairs=pairs,
+            selection_mode=mode,
+            created_at=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+    )
+
+
+@pytest.mark.parametrize("mode", ALL_MODES)
+@pytest.mark.parametrize(
+    "choices", [["Top", "Jungle", "Mid"], ["Team A ×3", "Team B ×2"]]
+)
+def test_replay_assignment_reproduces_recorded_draw(mode, choices) -> None:
+    users = [SimpleNamespace(id=100 + index, name=f"user{index}", display_name=f"User{index}") for index in range(5)]
+    template = Template(title="League", choices=choices)
+    names = [name for name, _ in template.choice_capacities]
+    weights = {user.id: {names[0]: 1 / (index + 1)} for index, user in enumerate(users)}
+    costs = {user.id: {names[-1]: float(index % 2)} for index, user in enumerate(users)}
+
+    pairs = create_pair_from_list(
+        users,
+        names,
+        selection_mode=mode,
+        weights=weights,
+        costs=costs,
+        capacities=(
+            [capacity for _, capacity in template.choice_capacities]
+            if template.has_capacities
+            else None
+        ),
+    )
+    history = _record(template, pairs, mode)
+
+    # 参加者の並び順が変わっても、記録した順序で抽選し直す。
+    shuffled = random.Random(0).sample(users, len(users))
+    assert replay_assignment(history, shuffled) == history
+
+
+def test_create_pair_from_list_records_seed_and_inputs() -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(3)]
+
+    first = create_pair_from_list(
+        users,
+        ["Top", "Jungle"],
+        selection_mode=SelectionMode.BIAS_REDUCTION,
+        weights={0: {"Top": 0.5, "Jungle": 1.0}},
+        seed=42,
+    )
+    second = create_pair_from_list(
+        users,
+        ["Top", "Jungle"],
+        selection_mode=SelectionMode.BIAS_REDUCTION,
+        weights={0: {"Top": 0.5, "Jungle": 1.0}},
+        seed=42,
+    )
+
+    assert first == second
+    assert first.seed.value == 42
+    assert first.seed.participant_ids == (0, 1, 2)
+    # 既定値の重み 1 は記録しない。
+    assert first.seed.weights == {0: {"Top": 0.5}}
+    assert first.seed.costs == {}
+
+
+def test_replay_assignment_reproduces_schedule_rounds() -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(5)]
+    template = Template(title="Rotation", choices=["Tank", "Healer ×2"])
+
+    schedule = create_schedule_from_list(
+        users,
+        [name for name, _ in template.choice_capacities],
+        rounds=4,
+        seed=7,
+        capacities=[capacity for _, capacity in template.choice_capacities],
+    )
+
+    for round_index, pairs in enumerate(schedule):
+        assert pairs.seed.round_index == round_index
+        history = _record(template, pairs, SelectionMode.RANDOM)
+        assert replay_assignment(history, users) == history
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_capacity_schedule_rotates_teams_instead_of_seats(seed) -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(6)]
+
+    schedule = create_schedule_from_list(
+        users, ["Red", "Blue"], rounds=4, seed=seed, capacities=[3, 3]
+    )
+
+    teams = [{pair.user.id: pair.choice for pair in pairs.pairs} for pairs in schedule]
+    for pairs in schedule:
+        assert sorted(Counter(pair.choice for pair in pairs.pairs).values()) == [3, 3]
+    # 2 チームなら毎ラウンド全員が相手チームへ移る。
+    for before, after in zip(teams, teams[1:]):
+        assert all(before[user.id] != after[user.id] for user in users)
+
+
+def test_capacity_schedule_rotates_members_who_do_not_fit() -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(4)]
+
+    schedule = create_schedule_from_list(
+        users, ["Red", "Blue"], rounds=4, seed=3, capacities=[1, 1]
+    )
+
+    resting = Counter(
+        user.id
+        for pairs in schedule
+        for user in users
+        if user.id not in {pair.user.id for pair in pairs.pairs}
+    )
+    assert all(len(pairs.pairs) == 2 for pairs in schedule)
+    assert resting == {user.id: 2 for user in users}
+
+
+def test_team_embeds_list_members_without_a_seat() -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(3)]
+    pairs = PairList(pairs=[Pair(user=users[0], choice="Red"), Pair(user=users[1], choice="Red")])
+
+    embeds = create_team_embeds_from_pairs(pairs, members=users)
+
+    assert [embed.title for embed in embeds] == ["> Red (2人)", "> 割り当てなし (1人)"]
+    assert embeds[-1].description == "User2"
+
+
+def test_replay_assignment_rejects_unreplayable_histories() -> None:
+    users = [SimpleNamespace(id=index, name=f"user{index}", display_name=f"User{index}") for index in range(3)]
+    template = Template(title="League", choices=["Top", "Jungle"])
+    history = _record(
+        template, create_pair_from_list(users, ["Top", "Jungle"]), SelectionMode.RANDOM
+    )
+
+    with pytest.raises(ValueError, match="参加者"):
+        replay_assignment(history, users[:2])
+    with pytest.raises(ValueError, match="版"):
+        replay_assignment(
+            replace(history, seed=replace(history.seed, algorithm=0)), users
+        )
+    with pytest.raises(ValueError, match="種"):
+        replay_assignment(replace(history, seed=None), users)
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from application.services.history_service import HistoryApplicationService
+from bootstrap.testing import InMemoryTemplateRepository
+from domain import SelectionMode, Template
+from infrastructure.wrappers import ExecutorTemplateRepository
+
+
+@pytest.mark.asyncio
+async def test_calls_run_on_executor_thread():
+    sync_repository = InMemoryTemplateRepository()
+    main_thread = threading.get_ident()
+    called_from: list[int] = []
+    original = sync_repository.get_selection_mode
+
+    def get_selection_mode() -> str:
+        called_from.append(threading.get_ident())
+        return original()
+
+    sync_repository.get_selection_mode = get_selection_mode  # type: ignore[method-assign]
+    repository = ExecutorTemplateRepository(sync_repository, max_workers=2)
+    try:
+        service = HistoryApplicationService(repository)
+        assert await service.get_selection_mode() is SelectionMode.RANDOM
+    finally:
+        repository.shutdown()
+
+    assert called_from and called_from[0] != main_thread
+    stats = repository.stats()["get_selection_mode"]
+    assert stats.calls == 1
+    assert stats.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_forwards_positional_and_keyword_arguments():
+    sync_repository = InMemoryTemplateRepository()
+    repository = ExecutorTemplateRepository(sync_repository, max_workers=1)
+    try:
+        await repository.init_user(1, "Tester")
+        template = Template(title="Mine", choices=["A"])
+        await repository.add_custom_template(1, template)
+        user = await repository.get_user(1, include_shared=False)
+    finally:
+        repository.shutdown()
+
+    assert user == {
+        "name": "Tester",
+        "custom_templates": [template],
+    }
+
+
+@pytest.mark.asyncio
+async def test_stats_report_queue_depth_when_pool_is_saturated():
+    sync_repository = InMemoryTemplateRepository()
+    release = threading.Event()
+    original = sync_repository.get_embed_mode
+
+    def blocking_get_embed_mode() -> str:
+        release.wait(timeout=5)
+        return original()
+
+    sync_repository.get_embed_mode = blocking_get_embed_mode  # type: ignore[method-assign]
+    executor = ThreadPoolExecutor(max_workers=1)
+    repository = ExecutorTemplateRepository(sync_repository, executor=executor)
+
+    tasks = [asyncio.create_task(repository.get_embed_mode()) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    in_flight = repository.stats()["get_embed_mode"]
+    release.set()
+    results = await asyncio.gather(*tasks)
+    executor.shutdown()
+
+    assert results == ["compact"] * 3
+    assert in_flight.queue_depth == 2
+    final = repository.stats()["get_embed_mode"]
+    assert final.calls == 3
+    assert final.queue_depth == 0
+    assert final.max_queue_depth == 2
+    assert final.max_wait_seconds > 0
+    assert final.average_wait_seconds <= final.max_wait_seconds
+
+
+def test_rejects_non_positive_worker_count():
+    with pytest.raises(ValueError):
+        ExecutorTemplateRepository(InMemoryTemplateRepository(), max_workers=0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_call_releases_queue_depth():
+    sync_repository = InMemoryTemplateRepository()
+    release = threading.Event()
+    original = sync_repository.get_embed_mode
+
+    def blocking_get_embed_mode() -> str:
+        release.wait(timeout=5)
+        return original()
+
+    sync_repository.get_embed_mode = blocking_get_embed_mode  # type: ignore[method-assign]
+    executor = ThreadPoolExecutor(max_workers=1)
+    repository = ExecutorTemplateRepository(sync_repository, executor=executor)
+
+    running = asyncio.create_task(repository.get_embed_mode())
+    queued = asyncio.create_task(repository.get_embed_mode())
+    await asyncio.sleep(0.05)
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    release.set()
+    await running
+    executor.shutdown()
+
+    stats = repository.stats()["get_embed_mode"]
+    assert stats.calls == 2
+    assert stats.queue_depth == 0
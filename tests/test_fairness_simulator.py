@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock
+
+import discord
+import numpy as np
+import pytest
+
+from domain import SelectionMode
+from flow.handlers import MemberSelectedHandler
+from services.fairness_simulator import (
+    FairnessSimulationParams,
+    _draw_batch,
+    build_streak_weights,
+    main,
+    run_simulation,
+)
+
+
+def test_streak_weights_match_member_selected_handler():
+    rng = np.random.default_rng(0)
+    choices = ["Top", "Jungle", "Mid", "Bot"]
+    last_choice = rng.integers(-1, len(choices), size=(1, 6))
+    streak = np.where(last_choice >= 0, rng.integers(1, 5, size=(1, 6)), 0)
+    members = []
+    for index in range(6):
+        member = MagicMock(spec=discord.User)
+        member.id = index
+        members.append(member)
+    streaks = {
+        index: (choices[choice], int(count))
+        for index, (choice, count) in enumerate(zip(last_choice[0], streak[0]))
+        if choice >= 0
+    }
+
+    expected = MemberSelectedHandler._build_weight_map(
+        members=members, choices=choices, streaks=streaks
+    )
+    weights = build_streak_weights(last_choice, streak, len(choices))
+
+    for index in range(6):
+        assert weights[0, index].tolist() == [expected[index][c] for c in choices]
+
+
+def test_batched_draw_assigns_distinct_members_and_skips_zero_weights():
+    rng = np.random.default_rng(1)
+    weights = np.ones((5_000, 4, 3))
+    weights[:, 0, :] = 0.0
+
+    assigned = _draw_batch(weights, trials=5_000, members=4, choices=3, rng=rng)
+
+    # 重み 0 のメンバーは、他のメンバーが残っている限り選ばれない。
+    assert (assigned[:, 0] == -1).all()
+    assert all(sorted(row) == [-1, 0, 1, 2] for row in assigned.tolist())
+
+
+def test_bias_reduction_shortens_streaks_compared_with_random():
+    results = {
+        mode: run_simulation(
+            FairnessSimulationParams(
+                mode=mode, members=4, choices=4, rounds=50, trials=2_000
+            ),
+            seed=3,
+        )
+        for mode in (SelectionMode.RANDOM, SelectionMode.BIAS_REDUCTION)
+    }
+    random_result = results[SelectionMode.RANDOM]
+    biased_result = results[SelectionMode.BIAS_REDUCTION]
+
+    assert random_result.draws == 100_000
+    assert sum(random_result.streak_distribution.values()) == pytest.approx(1.0)
+    # 完全ランダムでは同じ役割が続く確率が 1/4 なので、平均の連続長は 4/3 に近い。
+    assert random_result.mean_streak == pytest.approx(4 / 3, abs=0.02)
+    assert biased_result.mean_streak < random_result.mean_streak
+    assert biased_result.streak_share_over(3) < random_result.streak_share_over(3)
+    assert biased_result.warning_rate < random_result.warning_rate
+    assert biased_result.frequency_variance < random_result.frequency_variance
+
+
+def test_simulation_results_do_not_depend_on_worker_count():
+    params = FairnessSimulationParams(
+        mode=SelectionMode.BIAS_REDUCTION,
+        members=5,
+        choices=3,
+        rounds=20,
+        trials=600,
+        lookback=10,
+    )
+
+    serial = run_simulation(params, seed=9, batch_size=200)
+    parallel = run_simulation(params, seed=9, batch_size=200, workers=2)
+
+    assert serial.streak_counts == parallel.streak_counts
+    assert serial.frequency_variance == parallel.frequency_variance
+    assert serial.warning_rate == parallel.warning_rate
+
+
+def test_simulation_rejects_unsupported_modes():
+    with pytest.raises(ValueError):
+        run_simulation(
+            FairnessSimulationParams(
+                mode=SelectionMode.OPTIMAL_FAIRNESS,
+                members=3,
+                choices=3,
+                rounds=1,
+                trials=1,
+            )
+        )
+
+
+def test_main_runs_each_parameter_set(caplog):
+    with caplog.at_level("INFO"):
+        assert (
+            main(
+                [
+                    "--members", "3",
+                    "--choices", "3",
+                    "--rounds", "5",
+                    "--trials", "10",
+                    "--lookbacks", "none", "2",
+                ]
+            )
+            == 0
+        )
+
+    assert caplog.text.count("draws in") == 4
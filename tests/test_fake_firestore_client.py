@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import ArrayUnion
+
+from db.constants import REQUIRED_COLLECTIONS
+from domain import Template, TemplateScope
+from infrastructure.firestore import FakeFirestoreClient, MissingIndexError
+from infrastructure.firestore.fake_client import document_size
+from infrastructure.firestore.indexes import REQUIRED_INDEXES
+from infrastructure.firestore.repositories import HistoryRepository, UserTemplateRepository
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def history(minutes: int, *, guild_id: int = 1, title: str = "League") -> dict:
+    return {
+        "guild_id": guild_id,
+        "template_title": title,
+        "created_at": BASE_TIME + timedelta(minutes=minutes),
+        "selection_mode": "random",
+        "entries": [{"user_id": 1, "user_name": "Alice", "choice": "A"}],
+        "choices": ["A"],
+    }
+
+
+def make_template_repository(client: FakeFirestoreClient) -> FirestoreTemplateRepository:
+    unit_of_work = FirestoreUnitOfWork()
+    unit_of_work.with_client(client)
+    return FirestoreTemplateRepository(unit_of_work)
+
+
+def test_fetch_recent_filters_orders_and_pages_on_the_fake_client():
+    client = FakeFirestoreClient(indexes=REQUIRED_INDEXES)
+    repository = HistoryRepository(client)
+    repository.add_entries(
+        [history(minute) for minute in range(5)]
+        + [history(10, title="Other"), history(11, guild_id=2)]
+    )
+
+    client.reset_stats()
+    first_page = repository.fetch_recent(guild_id=1, template_title="League", limit=2)
+    cursor = (first_page[-1]["created_at"], first_page[-1]["history_id"])
+    second_page = repository.fetch_recent(
+        guild_id=1, template_title="League", limit=2, start_after=cursor
+    )
+
+    assert [data["created_at"].minute for data in first_page] == [4, 3]
+    assert [data["created_at"].minute for data in second_page] == [2, 1]
+    stats = client.stats()
+    assert stats.reads == 4
+    assert stats.round_trips == 2
+    assert stats.writes == 0
+
+
+def test_query_without_a_declared_index_fails_like_production():
+    client = FakeFirestoreClient(indexes=())
+    repository = HistoryRepository(client)
+
+    with pytest.raises(MissingIndexError):
+        repository.fetch_recent(guild_id=1)
+
+
+def test_history_transaction_counts_every_document_write():
+    client = FakeFirestoreClient()
+    repository = HistoryRepository(client)
+
+    repository.add_entries([history(0), history(1)])
+
+    stats = client.stats()
+    # 履歴 2 件と、テンプレートごとの集計ドキュメント 1 件。
+    assert stats.writes == 3
+    assert stats.round_trips_by_operation["begin_transaction"] == 1
+    assert stats.round_trips_by_operation["commit"] == 1
+    assert stats.bytes_written == sum(
+        document_size(path, data) for path, data in client.dump().items()
+    )
+
+
+def test_missing_aggregate_is_seeded_inside_the_history_transaction(monkeypatch):
+    client = FakeFirestoreClient(indexes=REQUIRED_INDEXES)
+    repository = HistoryRepository(client)
+    repository.add_entries([history(0), history(1)])
+    repository.aggregate_document(1, "League").delete()
+    seed_transactions = []
+    fetch_recent = repository.fetch_recent
+
+    def spy(**kwargs):
+        seed_transactions.append(kwargs.get("transaction"))
+        return fetch_recent(**kwargs)
+
+    monkeypatch.setattr(repository, "fetch_recent", spy)
+
+    repository.add_entries([history(2)])
+
+    assert len(seed_transactions) == 1
+    assert seed_transactions[0] is not None
+    aggregate = repository.read_aggregate(1, "League")
+    assert aggregate["streaks"]["1"]["count"] == 3
+
+
+def test_history_with_assigned_ids_is_written_once():
+    client = FakeFirestoreClient()
+    repository = HistoryRepository(client)
+    entries = [
+        {**history(0), "history_id": "history-0"},
+        {**history(1), "history_id": "history-1"},
+    ]
+
+    repository.add_entries(entries)
+    repository.add_entries(entries)
+
+    stored = client.collection("history").document("history-0").get().to_dict()
+    assert "history_id" not in stored
+    assert len(client.collection("history").list_documents()) == 2
+    aggregate = repository.read_aggregate(1, "League")
+    assert aggregate["streaks"]["1"]["count"] == 2
+
+
+def test_batch_is_atomic_when_a_write_fails():
+    client = FakeFirestoreClient()
+    repository = UserTemplateRepository(client)
+
+    with pytest.raises(NotFound):
+        repository.add_template(
+            1, {"template_id": "t1", "title": "A", "created_at": BASE_TIME}
+        )
+
+    assert client.dump() == {}
+    assert client.stats().writes == 0
+
+
+def test_template_mutations_are_accounted_per_document():
+    client = FakeFirestoreClient()
+    repository = make_template_repository(client)
+    assert {path.split("/")[0] for path in client.dump()} == set(REQUIRED_COLLECTIONS)
+
+    repository.init_user(1, "Alice")
+    client.reset_stats()
+    repository.add_custom_template(
+        1, Template(title="Team", choices=["A", "B"], scope=TemplateScope.PRIVATE)
+    )
+
+    stats = client.stats()
+    assert (stats.reads, stats.writes, stats.round_trips) == (0, 1, 1)
+    user = repository.get_user(1, include_shared=False)
+    assert user is not None
+    assert "Team" in [template.title for template in user.custom_templates]
+
+
+def test_transforms_and_unsupported_values():
+    client = FakeFirestoreClient()
+    reference = client.collection("users").document("1")
+    reference.set({"tags": ["a"], "profile": {"name": "Alice"}})
+
+    reference.update({"tags": ArrayUnion(["a", "b"]), "profile.level": 2})
+
+    assert reference.get().to_dict() == {
+        "tags": ["a", "b"],
+        "profile": {"name": "Alice", "level": 2},
+    }
+    with pytest.raises(TypeError):
+        reference.set({"value": object()})
+
+
+def test_latency_is_injected_per_round_trip():
+    delays: list[float] = []
+    client = FakeFirestoreClient(
+        latency={"get": 0.05, "commit": 0.2}, sleep=delays.append
+    )
+    reference = client.collection("info").document("embed_mode")
+
+    reference.set({"embed_mode": "compact"})
+    reference.get()
+    client.collection("info").stream()
+
+    assert delays == [0.2, 0.05]
+    assert client.stats().round_trips == 3
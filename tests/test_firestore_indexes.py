@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+
+from infrastructure.firestore.indexes import (
+    HISTORY_BY_GUILD_INDEX,
+    HISTORY_BY_TEMPLATE_INDEX,
+    INDEX_MANIFEST_FILENAME,
+    USER_TEMPLATES_INDEX,
+    HistoryQueryPlan,
+    MissingIndexError,
+    build_index_manifest,
+)
+from infrastructure.firestore.repositories import HistoryRepository
+from services.startup_check import CheckStatus, StartupSelfCheck
+
+REPOSITORY_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_committed_index_manifest_is_up_to_date():
+    manifest_path = REPOSITORY_ROOT / INDEX_MANIFEST_FILENAME
+
+    committed = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    assert committed == build_index_manifest()
+
+
+def test_history_plan_pushes_template_filter_and_limit_to_server():
+    collection = MagicMock()
+
+    plan = HistoryQueryPlan(guild_id=1, template_title="League", limit=5)
+    query = plan.build(collection)
+
+    assert plan.index is HISTORY_BY_TEMPLATE_INDEX
+    filtered = collection.where.return_value.where.return_value
+    ordered = filtered.order_by.return_value.order_by.return_value
+    ordered.limit.assert_called_once_with(5)
+    assert query is ordered.limit.return_value
+    template_filter = collection.where.return_value.where.call_args.kwargs["filter"]
+    assert template_filter.field_path == "template_title"
+    assert template_filter.value == "League"
+
+
+def test_history_plan_projection_keeps_query_fields():
+    collection = MagicMock()
+
+    plan = HistoryQueryPlan(guild_id=1, limit=10, fields=("entries",))
+    plan.build(collection)
+
+    ordered = collection.where.return_value.order_by.return_value.order_by.return_value
+    ordered.select.assert_called_once_with(
+        ["guild_id", "template_title", "created_at", "entries"]
+    )
+    ordered.select.return_value.limit.assert_called_once_with(10)
+
+
+def test_history_plan_without_template_uses_guild_index():
+    plan = HistoryQueryPlan(guild_id=1, limit=10)
+
+    assert plan.index is HISTORY_BY_GUILD_INDEX
+
+
+def test_fetch_recent_raises_missing_index_instead_of_scanning():
+    client = MagicMock()
+    repository = HistoryRepository(client)
+    collection = client.collection.return_value
+    filtered = collection.where.return_value.where.return_value
+    ordered = filtered.order_by.return_value.order_by.return_value
+    ordered.limit.return_value.stream.side_effect = FailedPrecondition("index")
+
+    with pytest.raises(MissingIndexError) as exc_info:
+        repository.fetch_recent(guild_id=1, template_title="League", limit=5)
+
+    assert exc_info.value.index is HISTORY_BY_TEMPLATE_INDEX
+    collection.where.return_value.stream.assert_not_called()
+
+
+def test_startup_check_reports_missing_index_as_error():
+    db = MagicMock()
+    db.collection.return_value.where.return_value.where.return_value.order_by.return_value.order_by.return_value.limit.return_value.stream.side_effect = FailedPrecondition(
+        "index"
+    )
+    manager = SimpleNamespace(
+        db=db,
+        unit_of_work=SimpleNamespace(uses_template_subcollection=False),
+    )
+    checker = StartupSelfCheck(manager)
+
+    indexes = checker._required_indexes()
+    results = checker._check_indexes(indexes)
+
+    assert USER_TEMPLATES_INDEX not in indexes
+    statuses = {result.name: result.status for result in results}
+    assert statuses[f"index:{HISTORY_BY_GUILD_INDEX.describe()}"] is CheckStatus.OK
+    assert (
+        statuses[f"index:{HISTORY_BY_TEMPLATE_INDEX.describe()}"] is CheckStatus.ERROR
+    )
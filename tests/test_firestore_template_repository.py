@@ -2,11 +2,18 @@ import datetime
 from types import SimpleNamespace
 from unittest.mock import MagicMock
 
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion
+
 from db.constants import (
     COLLECTION_SENTINEL_DOCUMENT_ID,
     REQUIRED_COLLECTIONS,
 )
+from db.serializers import serialize_template
 from domain import (
+    HISTORY_STREAK_FIELDS,
+    DrawContext,
     Pair,
     PairList,
     ResultEmbedMode,
@@ -15,7 +22,12 @@ from domain import (
     TemplateScope,
     UserInfo,
 )
-from infrastructure.firestore.repositories import SharedTemplateRepository
+from infrastructure.firestore.repositories import (
+    InfoRepository,
+    SharedTemplateRepository,
+    UserRepository,
+    filter_recent_history,
+)
 from infrastructure.firestore.template_repository import FirestoreTemplateRepository
 
 
@@ -81,66 +93,73 @@ def _make_doc(data: dict, *, doc_id: str) -> SimpleNamespace:
     return SimpleNamespace(id=doc_id, to_dict=lambda: data)
 
 
-def _make_document_ref(*, exists: bool) -> MagicMock:
-    document_ref = MagicMock()
-    document_ref.get.return_value = SimpleNamespace(exists=exists)
-    return document_ref
-
-
-def test_ensure_required_collections_creates_sentinel_documents():
-    manager = make_repository()
-
-    collection_refs: dict[str, MagicMock] = {}
+def _make_bootstrap_client(*, existing: set[str]) -> MagicMock:
+    db_mock = MagicMock()
     document_refs: dict[str, MagicMock] = {}
 
     def collection_side_effect(name: str) -> MagicMock:
         collection_ref = MagicMock()
-        document_ref = _make_document_ref(exists=False)
+        document_ref = MagicMock()
+        document_ref.path = f"{name}/{COLLECTION_SENTINEL_DOCUMENT_ID}"
         collection_ref.document.return_value = document_ref
-        collection_refs[name] = collection_ref
         document_refs[name] = document_ref
         return collection_ref
 
-    db_mock = MagicMock()
+    def get_all(references):
+        # 実際の get_all と同様に、要求とは異なる順序で返す。
+        return [
+            SimpleNamespace(
+                reference=reference,
+                exists=reference.path.split("/")[0] in existing,
+            )
+            for reference in reversed(list(references))
+        ]
+
     db_mock.collection.side_effect = collection_side_effect
+    db_mock.get_all.side_effect = get_all
+    db_mock.document_refs = document_refs
+    return db_mock
+
+
+def test_ensure_required_collections_creates_sentinel_documents():
+    manager = make_repository()
+    db_mock = _make_bootstrap_client(existing={"users"})
 
     manager.db = db_mock
     manager.info_repository = MagicMock()
     manager.user_repository = MagicMock()
     manager.history_repository = MagicMock()
 
-    manager.ensure_required_collections()
+    created = manager.ensure_required_collections()
 
-    assert set(collection_refs) == set(REQUIRED_COLLECTIONS)
-    for document_ref in document_refs.values():
-        document_ref.set.assert_called_once()
+    missing = [name for name in REQUIRED_COLLECTIONS if name != "users"]
+    assert created == missing
+    db_mock.get_all.assert_called_once()
+    batch = db_mock.batch.return_value
+    assert [call.args[0] for call in batch.set.call_args_list] == [
+        db_mock.document_refs[name] for name in missing
+    ]
+    batch.commit.assert_called_once()
 
 
 def test_ensure_required_collections_skips_existing_sentinel():
     manager = make_repository()
-
-    document_refs: dict[str, MagicMock] = {}
-
-    def collection_side_effect(name: str) -> MagicMock:
-        collection_ref = MagicMock()
-        document_ref = _make_document_ref(exists=True)
-        collection_ref.document.return_value = document_ref
-        document_refs[name] = document_ref
-        return collection_ref
-
-    db_mock = MagicMock()
-    db_mock.collection.side_effect = collection_side_effect
+    db_mock = _make_bootstrap_client(existing=set(REQUIRED_COLLECTIONS))
 
     manager.db = db_mock
     manager.info_repository = MagicMock()
     manager.user_repository = MagicMock()
     manager.history_repository = MagicMock()
 
+    assert manager.ensure_required_collections() == []
+    db_mock.batch.assert_not_called()
+
+    # 確認済みのクライアントでは再確認しない。
     manager.ensure_required_collections()
+    db_mock.get_all.assert_called_once()
 
-    assert set(document_refs) == set(REQUIRED_COLLECTIONS)
-    for document_ref in document_refs.values():
-        document_ref.set.assert_not_called()
+    manager.ensure_required_collections(force=True)
+    assert db_mock.get_all.call_count == 2
 
 
 def test_shared_template_repository_list_skips_sentinel():
@@ -221,18 +240,138 @@ def test_get_user_includes_shared_and_public_templates():
     assert titles == {"Public Shared", "Default"}
 
 
-def test_copy_shared_template_to_user_generates_unique_title():
+def _make_document_client(documents: dict[str, dict]) -> MagicMock:
+    db_mock = MagicMock()
+
+    def collection_side_effect(name: str) -> MagicMock:
+        collection_ref = MagicMock()
+
+        def document(doc_id: str) -> MagicMock:
+            document_ref = MagicMock()
+            document_ref.path = f"{name}/{doc_id}"
+            return document_ref
+
+        collection_ref.document.side_effect = document
+        return collection_ref
+
+    def get_all(references):
+        return [
+            SimpleNamespace(
+                reference=reference,
+                exists=reference.path in documents,
+                to_dict=lambda path=reference.path: dict(documents[path]),
+            )
+            for reference in reversed(list(references))
+        ]
+
+    db_mock.collection.side_effect = collection_side_effect
+    db_mock.get_all.side_effect = get_all
+    return db_mock
+
+
+def test_read_many_returns_documents_keyed_by_id_in_one_round_trip():
+    db_mock = _make_document_client({"users/1": {"name": "Tester"}})
+    repository = UserRepository(db_mock)
+
+    documents = repository.read_many([1, "2", 1])
+
+    assert documents == {"1": {"name": "Tester"}, "2": None}
+    db_mock.get_all.assert_called_once()
+    assert len(db_mock.get_all.call_args.args[0]) == 2
+
+
+def test_load_draw_context_reads_user_and_settings_with_single_get_all():
     manager = make_repository()
+    db_mock = _make_document_client(
+        {
+            "users/1": {
+                "id": 1,
+                "name": "Tester",
+                "least_template": None,
+                "custom_templates": [
+                    {"title": "Mine", "choices": ["A"], "scope": "private"}
+                ],
+            },
+            "info/embed_mode": {"embed_mode": "detailed"},
+            "info/selection_mode": {"selection_mode": "bias_reduction"},
+            "info/default_templates": {
+                "default_templates": [
+                    {"title": "Default", "choices": ["D"], "scope": "public"}
+                ]
+            },
+        }
+    )
+    manager.db = db_mock
+    manager.user_repository = UserRepository(db_mock)
+    manager.info_repository = InfoRepository(db_mock)
+    manager.history_repository = MagicMock()
 
-    existing_template = Template(
-        title="Guild Shared",
-        choices=["A"],
-        scope=TemplateScope.PRIVATE,
+    context = manager.load_draw_context(user_id=1, guild_id=42)
+
+    assert isinstance(context, DrawContext)
+    assert context.guild_id == 42
+    assert context.user is not None
+    assert [template.title for template in context.user.custom_templates] == ["Mine"]
+    assert context.user.shared_templates == []
+    assert context.embed_mode is ResultEmbedMode.DETAILED
+    assert context.selection_mode is SelectionMode.BIAS_REDUCTION
+    assert [template.title for template in context.default_templates] == ["Default"]
+    db_mock.get_all.assert_called_once()
+
+
+def test_load_draw_context_initializes_missing_settings():
+    manager = make_repository()
+    db_mock = _make_document_client(
+        {
+            "info/embed_mode": {"embed_mode": "compact"},
+            "info/default_templates": {"default_templates": []},
+        }
     )
-    user = UserInfo(id=1, name="Tester", custom_templates=[existing_template])
+    mock_info_repository = MagicMock()
+    mock_info_repository.document.side_effect = InfoRepository(db_mock).document
+    mock_info_repository.read_document.return_value = None
 
-    manager.get_user = MagicMock(return_value=user)
-    manager.set_user = MagicMock()
+    manager.db = db_mock
+    manager.user_repository = UserRepository(db_mock)
+    manager.info_repository = mock_info_repository
+    manager.history_repository = MagicMock()
+
+    context = manager.load_draw_context(user_id=1)
+
+    assert context.user is None
+    assert context.selection_mode is SelectionMode.RANDOM
+    mock_info_repository.create_document.assert_called_once_with(
+        "selection_mode", {"selection_mode": SelectionMode.RANDOM.value}
+    )
+
+
+class _RecordingTransaction:
+    """`UserRepository.run_transaction` の代わりに更新内容を記録する。"""
+
+    def __init__(self, stored: dict) -> None:
+        self.stored = stored
+        self.fields: dict = {}
+
+    def __call__(self, user_id, mutation):
+        self.fields, result = mutation(self.stored)
+        return result
+
+
+def test_copy_shared_template_to_user_generates_unique_title():
+    manager = make_repository()
+
+    stored = {
+        "id": 1,
+        "name": "Tester",
+        "least_template": None,
+        "custom_templates": [
+            {"title": "Guild Shared", "choices": ["A"], "scope": "private"}
+        ],
+    }
+    transaction = _RecordingTransaction(stored)
+    mock_user_repository = MagicMock()
+    mock_user_repository.run_transaction.side_effect = transaction
+    manager.user_repository = mock_user_repository
     manager.history_repository = MagicMock()
 
     shared_template = Template(
@@ -243,10 +382,46 @@ def test_copy_shared_template_to_user_generates_unique_title():
 
     copied = manager.copy_shared_template_to_user(1, shared_template)
 
-    manager.set_user.assert_called_once_with(user)
-    appended_template = user.custom_templates[-1]
-    assert appended_template.title == "Guild Shared (2)"
+    mock_user_repository.run_transaction.assert_called_once()
+    mock_user_repository.create_document.assert_not_called()
     assert copied.title == "Guild Shared (2)"
+    assert copied.scope is TemplateScope.PRIVATE
+    assert copied.created_by == 1
+    assert transaction.fields["custom_templates"].values == [serialize_template(copied)]
+
+
+def test_template_mutations_write_only_the_changed_fields():
+    manager = make_repository()
+
+    existing = {"title": "Old", "choices": ["A"], "scope": "private", "template_id": "t1"}
+    stored = {"id": 1, "name": "Tester", "custom_templates": [existing]}
+    transaction = _RecordingTransaction(stored)
+    mock_user_repository = MagicMock()
+    mock_user_repository.run_transaction.side_effect = transaction
+    manager.user_repository = mock_user_repository
+    manager.history_repository = MagicMock()
+
+    manager.add_custom_template(1, Template(title="New", choices=["B"]))
+    fields = mock_user_repository.update_fields.call_args.args[1]
+    assert isinstance(fields["custom_templates"], ArrayUnion)
+
+    manager.set_least_template(1, Template(title="Recent", choices=["C"]))
+    fields = mock_user_repository.update_fields.call_args.args[1]
+    assert set(fields) == {"least_template"}
+
+    manager.delete_custom_template(1, template_id="t1")
+    assert isinstance(transaction.fields["custom_templates"], ArrayRemove)
+    assert transaction.fields["custom_templates"].values == [existing]
+
+    manager.update_custom_template(
+        1, Template(title="Renamed", choices=["A"], template_id="t1")
+    )
+    assert transaction.fields["custom_templates"][0]["title"] == "Renamed"
+    mock_user_repository.create_document.assert_not_called()
+
+    mock_user_repository.update_fields.side_effect = NotFound("missing")
+    with pytest.raises(ValueError):
+        manager.add_custom_template(2, Template(title="X", choices=["A"]))
 
 
 def test_get_selection_mode_initializes_missing_document():
@@ -328,3 +503,77 @@ def test_get_recent_history_converts_documents():
     assert history.template_title == "League"
     assert history.entries[0].choice == "Top"
     assert history.created_at == timestamp
+
+
+def test_get_recent_history_builds_partial_history_from_projection():
+    manager = make_repository()
+
+    timestamp = datetime.datetime.now(datetime.timezone.utc)
+    mock_history_repository = MagicMock()
+    mock_history_repository.fetch_recent.return_value = [
+        {
+            "guild_id": 1,
+            "template_title": "League",
+            "created_at": timestamp,
+            "entries": [{"user_id": 1, "user_name": "Tester", "choice": "Top"}],
+        }
+    ]
+
+    manager.history_repository = mock_history_repository
+    manager.info_repository = MagicMock()
+    manager.user_repository = object()
+    manager.db = object()
+
+    histories = manager.get_recent_history(
+        guild_id=1, fields=HISTORY_STREAK_FIELDS
+    )
+
+    kwargs = mock_history_repository.fetch_recent.call_args.kwargs
+    assert kwargs["fields"] == HISTORY_STREAK_FIELDS
+    assert histories[0].choices == []
+    assert histories[0].selection_mode is SelectionMode.RANDOM
+    assert histories[0].entries[0].choice == "Top"
+
+
+def test_filter_recent_history_resumes_after_cursor_on_ties():
+    timestamp = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    snapshots = [
+        SimpleNamespace(
+            id=document_id,
+            to_dict=lambda: {"guild_id": 1, "template_title": "League", "created_at": timestamp},
+        )
+        for document_id in ("a", "b", "c")
+    ]
+
+    first = filter_recent_history(
+        snapshots, template_title=None, limit=2, since=None
+    )
+    rest = filter_recent_history(
+        snapshots,
+        template_title=None,
+        limit=2,
+        since=None,
+        start_after=(timestamp, first[-1]["history_id"]),
+    )
+
+    assert [item["history_id"] for item in first] == ["c", "b"]
+    assert [item["history_id"] for item in rest] == ["a"]
+
+
+def test_get_recent_history_passes_decoded_cursor():
+    manager = make_repository()
+    manager.history_repository = MagicMock()
+    manager.history_repository.fetch_recent.return_value = []
+    manager.info_repository = MagicMock()
+    manager.user_repository = object()
+    manager.db = object()
+
+    manager.get_recent_history(
+        guild_id=1, limit=5, start_after="2024-01-01T00:00:00+00:00|abc"
+    )
+
+    kwargs = manager.history_repository.fetch_recent.call_args.kwargs
+    assert kwargs["start_after"] == (
+        datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+        "abc",
+    )
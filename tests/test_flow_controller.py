@@ -123,7 +123,7 @@ async def test_dispatch_template_deleted_transitions_to_use_existing():
         interaction=interaction,
     )
     flow_service = MagicMock(
-        remove_template=MagicMock(
+        remove_template=AsyncMock(
             return_value=TemplateDeletionResultDTO(
                 title="Obsolete Template",
                 transition=transition,
@@ -131,7 +131,7 @@ async def test_dispatch_template_deleted_transitions_to_use_existing():
         )
     )
     template_service = SimpleNamespace(
-        list_private_templates=MagicMock(
+        list_private_templates=AsyncMock(
             return_value=TemplateListDTO(templates=[], scope=None)
         )
     )
@@ -148,7 +148,7 @@ async def test_dispatch_template_deleted_transitions_to_use_existing():
         interaction,
     )
 
-    flow_service.remove_template.assert_called_once_with(
+    flow_service.remove_template.assert_awaited_once_with(
         user_id=42,
         template_title="Obsolete Template",
         interaction=interaction,
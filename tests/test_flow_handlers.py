@@ -1,6 +1,7 @@
 import datetime
+from collections import Counter
 from types import SimpleNamespace
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import discord
 import pytest
@@ -19,6 +20,7 @@ from domain import (
     Pair,
     PairList,
     SelectionMode,
+    StreakAggregate,
     Template,
     TemplateScope,
 )
@@ -43,6 +45,7 @@ from flow.handlers import (
 )
 from models.context_model import CommandContext
 from models.state_model import AmidakujiState
+from presentation.discord.views.schedule_result import ScheduleResultView
 from presentation.discord.views.view import (
     ApplyOptionsView,
     DeleteTemplateView,
@@ -76,7 +79,7 @@ async def test_use_existing_handler_returns_select_view(base_interaction):
     template = Template(title="League", choices=["Top"])
 
     template_service = SimpleNamespace(
-        list_private_templates=MagicMock(
+        list_private_templates=AsyncMock(
             return_value=TemplateListDTO(
                 templates=[template],
                 scope=TemplateScope.PRIVATE,
@@ -126,7 +129,7 @@ async def test_use_shared_templates_handler_returns_select_view(base_interaction
     )
 
     template_service = SimpleNamespace(
-        list_shared_templates=MagicMock(
+        list_shared_templates=AsyncMock(
             return_value=TemplateListDTO(
                 templates=[template],
                 scope=TemplateScope.GUILD,
@@ -157,7 +160,7 @@ async def test_use_public_templates_handler_returns_select_view(base_interaction
     )
 
     template_service = SimpleNamespace(
-        list_public_templates=MagicMock(
+        list_public_templates=AsyncMock(
             return_value=TemplateListDTO(
                 templates=[template],
                 scope=TemplateScope.PUBLIC,
@@ -290,7 +293,7 @@ async def test_template_created_handler_updates_context_in_main_flow(base_intera
         interaction=base_interaction,
     )
     flow_service = SimpleNamespace(
-        complete_template_creation=MagicMock(
+        complete_template_creation=AsyncMock(
             return_value=TemplateCreationResultDTO(
                 template=template,
                 transition=transition,
@@ -305,7 +308,7 @@ async def test_template_created_handler_updates_context_in_main_flow(base_intera
     assert isinstance(actions, list)
     assert isinstance(actions[0], DeferResponseAction)
     assert isinstance(actions[1], SendMessageAction)
-    flow_service.complete_template_creation.assert_called_once()
+    flow_service.complete_template_creation.assert_awaited_once()
     assert context.state is AmidakujiState.TEMPLATE_DETERMINED
     assert context.result is template
 
@@ -320,7 +323,7 @@ async def test_template_created_handler_standalone_creation_stops_flow(base_inte
     context.result = template
 
     flow_service = SimpleNamespace(
-        complete_template_creation=MagicMock(
+        complete_template_creation=AsyncMock(
             return_value=TemplateCreationResultDTO(
                 template=template,
                 transition=None,
@@ -335,7 +338,7 @@ async def test_template_created_handler_standalone_creation_stops_flow(base_inte
     assert isinstance(actions, list)
     assert isinstance(actions[0], DeferResponseAction)
     assert isinstance(actions[1], SendMessageAction)
-    flow_service.complete_template_creation.assert_called_once()
+    flow_service.complete_template_creation.assert_awaited_once()
     assert context.state is AmidakujiState.TEMPLATE_CREATED
     assert context.result is template
 
@@ -350,7 +353,7 @@ async def test_template_created_handler_rejects_single_option(base_interaction):
     context.result = template
 
     flow_service = SimpleNamespace(
-        complete_template_creation=MagicMock()
+        complete_template_creation=AsyncMock()
     )
     services = SimpleNamespace(amidakuji_flow_service=flow_service)
 
@@ -374,7 +377,7 @@ async def test_delete_template_mode_handler_returns_delete_view(base_interaction
     template = Template(title="League", choices=["Top"])
 
     template_service = SimpleNamespace(
-        list_private_templates=MagicMock(
+        list_private_templates=AsyncMock(
             return_value=TemplateListDTO(
                 templates=[template],
                 scope=TemplateScope.PRIVATE,
@@ -399,7 +402,7 @@ async def test_delete_template_mode_handler_returns_error_when_no_templates(base
     context.result = base_interaction
 
     template_service = SimpleNamespace(
-        list_private_templates=MagicMock(
+        list_private_templates=AsyncMock(
             return_value=TemplateListDTO(
                 templates=[],
                 scope=TemplateScope.PRIVATE,
@@ -430,7 +433,7 @@ async def test_template_deleted_handler_deletes_template(base_interaction):
         interaction=base_interaction,
     )
     flow_service = SimpleNamespace(
-        remove_template=MagicMock(
+        remove_template=AsyncMock(
             return_value=TemplateDeletionResultDTO(
                 title="League",
                 transition=transition,
@@ -442,7 +445,7 @@ async def test_template_deleted_handler_deletes_template(base_interaction):
     handler = TemplateDeletedHandler()
     actions = await handler.handle(context, services)
 
-    flow_service.remove_template.assert_called_once_with(
+    flow_service.remove_template.assert_awaited_once_with(
         user_id=42,
         template_title="League",
         interaction=base_interaction,
@@ -463,7 +466,7 @@ async def test_use_history_handler_returns_error_when_missing_history(base_inter
     context.result = base_interaction
 
     flow_service = SimpleNamespace(
-        use_recent_template=MagicMock(side_effect=LookupError())
+        use_recent_template=AsyncMock(side_effect=LookupError())
     )
     services = SimpleNamespace(amidakuji_flow_service=flow_service)
 
@@ -495,7 +498,7 @@ async def test_use_history_handler_returns_followup_when_history_exists(base_int
         interaction=base_interaction,
     )
     flow_service = SimpleNamespace(
-        use_recent_template=MagicMock(
+        use_recent_template=AsyncMock(
             return_value=HistoryUsageResultDTO(
                 template=template,
                 transition=transition,
@@ -512,7 +515,7 @@ async def test_use_history_handler_returns_followup_when_history_exists(base_int
     assert action.interaction is context.history[AmidakujiState.COMMAND_EXECUTED]
     assert context.state is AmidakujiState.TEMPLATE_DETERMINED
     assert context.result is template
-    flow_service.use_recent_template.assert_called_once()
+    flow_service.use_recent_template.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -551,7 +554,7 @@ async def test_shared_template_copy_handler_invokes_copy(base_interaction):
 
     copied = Template(title="Guild Shared (2)", choices=["A"])
     template_service = SimpleNamespace(
-        copy_shared_template=MagicMock(
+        copy_shared_template=AsyncMock(
             return_value=SimpleNamespace(template=copied)
         )
     )
@@ -560,7 +563,7 @@ async def test_shared_template_copy_handler_invokes_copy(base_interaction):
     handler = SharedTemplateCopyHandler()
     action = await handler.handle(context, services)
 
-    template_service.copy_shared_template.assert_called_once_with(
+    template_service.copy_shared_template.assert_awaited_once_with(
         user_id=42,
         template=template,
     )
@@ -578,14 +581,14 @@ async def test_template_determined_handler_returns_member_select_view(base_inter
     context.result = template
 
     template_service = SimpleNamespace(
-        mark_recent_template=MagicMock()
+        mark_recent_template=AsyncMock()
     )
     services = SimpleNamespace(template_service=template_service)
 
     handler = TemplateDeterminedHandler()
     action = await handler.handle(context, services)
 
-    template_service.mark_recent_template.assert_called_once_with(
+    template_service.mark_recent_template.assert_awaited_once_with(
         user_id=42,
         template=template,
     )
@@ -610,11 +613,15 @@ async def test_member_selected_handler_builds_embeds(monkeypatch, base_interacti
 
     pair_list = MagicMock()
 
-    def fake_create_pair_from_list(users, choices, *, selection_mode, weights):
+    def fake_create_pair_from_list(
+        users, choices, *, selection_mode, weights, costs, capacities
+    ):
         assert users == selected_members
         assert choices == template.choices
         assert selection_mode is SelectionMode.RANDOM
         assert weights is None
+        assert costs is None
+        assert capacities is None
         return pair_list
 
     embeds = [discord.Embed(title="Result")]
@@ -628,20 +635,21 @@ async def test_member_selected_handler_builds_embeds(monkeypatch, base_interacti
     monkeypatch.setattr(data_process, "create_embeds_from_pairs", fake_create_embeds_from_pairs)
 
     history_service = SimpleNamespace(
-        get_selection_mode=MagicMock(return_value=SelectionMode.RANDOM),
-        get_recent_history=MagicMock(return_value=[]),
-        get_embed_mode=MagicMock(return_value="compact"),
-        save_history=MagicMock(),
+        get_selection_mode=AsyncMock(return_value=SelectionMode.RANDOM),
+        get_streak_aggregate=AsyncMock(return_value=None),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
     )
     services = SimpleNamespace(history_service=history_service)
 
     handler = MemberSelectedHandler()
     action = await handler.handle(context, services)
 
-    history_service.get_embed_mode.assert_called_once()
-    history_service.get_selection_mode.assert_called_once()
-    history_service.get_recent_history.assert_called_once()
-    history_service.save_history.assert_called_once()
+    history_service.get_embed_mode.assert_awaited_once()
+    history_service.get_selection_mode.assert_awaited_once()
+    history_service.get_recent_history.assert_awaited_once()
+    history_service.save_history.assert_awaited_once()
     assert isinstance(action, SendMessageAction)
     assert action.embeds is embeds
     assert action.ephemeral is False
@@ -694,10 +702,11 @@ async def test_member_selected_handler_detects_bias(monkeypatch, base_interactio
     ]
 
     history_service = SimpleNamespace(
-        get_selection_mode=MagicMock(return_value=SelectionMode.BIAS_REDUCTION),
-        get_recent_history=MagicMock(return_value=histories),
-        get_embed_mode=MagicMock(return_value="compact"),
-        save_history=MagicMock(),
+        get_selection_mode=AsyncMock(return_value=SelectionMode.BIAS_REDUCTION),
+        get_streak_aggregate=AsyncMock(return_value=None),
+        get_recent_history=AsyncMock(return_value=histories),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
     )
     services = SimpleNamespace(history_service=history_service)
 
@@ -712,3 +721,285 @@ async def test_member_selected_handler_detects_bias(monkeypatch, base_interactio
     assert warning_action.ephemeral is True
     assert warning_action.embed is not None
     assert "偏り" in warning_action.embed.title
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_uses_streak_aggregate(monkeypatch, base_interaction):
+    user = MagicMock(spec=discord.User)
+    user.id = 123
+    user.display_name = "Tester"
+    template = Template(title="League", choices=["Top", "Jungle"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+    )
+    context.result = [user]
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    pair_list = PairList(pairs=[Pair(user=user, choice="Top")])
+
+    def fake_create_pair_from_list(*args, **kwargs):
+        assert kwargs["weights"][user.id]["Top"] == pytest.approx(1 / 5)
+        assert kwargs["weights"][user.id]["Jungle"] == 1.0
+        return pair_list
+
+    monkeypatch.setattr(data_process, "create_pair_from_list", fake_create_pair_from_list)
+    monkeypatch.setattr(
+        data_process,
+        "create_embeds_from_pairs",
+        lambda *, pairs, mode: [discord.Embed(title="Result")],
+    )
+
+    aggregate = StreakAggregate(
+        guild_id=base_interaction.guild_id or 0,
+        template_title=template.title,
+        streaks={user.id: ("Top", 4)},
+    )
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.BIAS_REDUCTION),
+        get_streak_aggregate=AsyncMock(return_value=aggregate),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    actions = await MemberSelectedHandler().handle(context, services)
+
+    history_service.get_recent_history.assert_not_awaited()
+    assert isinstance(actions, list)
+    assert "5 回連続" in actions[1].embed.description
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_ignores_streaks_of_absent_users(
+    monkeypatch, base_interaction
+):
+    user = MagicMock(spec=discord.User)
+    user.id = 123
+    user.display_name = "Tester"
+    template = Template(title="League", choices=["Top", "Jungle"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+    )
+    context.result = [user]
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    monkeypatch.setattr(
+        data_process,
+        "create_pair_from_list",
+        lambda *args, **kwargs: PairList(pairs=[Pair(user=user, choice="Jungle")]),
+    )
+    monkeypatch.setattr(
+        data_process,
+        "create_embeds_from_pairs",
+        lambda *, pairs, mode: [discord.Embed(title="Result")],
+    )
+
+    # 今回の抽選に参加していないユーザー 999 が閾値を超えて連続担当している。
+    aggregate = StreakAggregate(
+        guild_id=base_interaction.guild_id or 0,
+        template_title=template.title,
+        streaks={999: ("Top", 8)},
+    )
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.BIAS_REDUCTION),
+        get_streak_aggregate=AsyncMock(return_value=aggregate),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    action = await MemberSelectedHandler().handle(context, services)
+
+    assert isinstance(action, SendMessageAction)
+    assert action.ephemeral is False
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_builds_fairness_costs(monkeypatch, base_interaction):
+    user = MagicMock(spec=discord.User)
+    user.id = 123
+    user.display_name = "Tester"
+    newcomer = MagicMock(spec=discord.User)
+    newcomer.id = 456
+    newcomer.display_name = "Newcomer"
+    template = Template(title="League", choices=["Top", "Jungle"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+    )
+    context.result = [user, newcomer]
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    pair_list = PairList(pairs=[Pair(user=user, choice="Jungle")])
+
+    def fake_create_pair_from_list(*args, **kwargs):
+        assert kwargs["selection_mode"] is SelectionMode.OPTIMAL_FAIRNESS
+        assert kwargs["weights"] is None
+        costs = kwargs["costs"]
+        # 連続 2 回のコストと、均等な割合 (1/2) を超えた 3/4 - 1/2 の分。
+        assert costs[user.id]["Top"] == pytest.approx(2.25)
+        assert costs[user.id]["Jungle"] == 0.0
+        assert costs[newcomer.id] == {"Top": 0.0, "Jungle": 0.0}
+        return pair_list
+
+    monkeypatch.setattr(data_process, "create_pair_from_list", fake_create_pair_from_list)
+    monkeypatch.setattr(
+        data_process,
+        "create_embeds_from_pairs",
+        lambda *, pairs, mode: [discord.Embed(title="Result")],
+    )
+
+    aggregate = StreakAggregate(
+        guild_id=base_interaction.guild_id or 0,
+        template_title=template.title,
+        streaks={user.id: ("Top", 2)},
+        frequencies={user.id: {"Top": 3, "Jungle": 1}},
+    )
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.OPTIMAL_FAIRNESS),
+        get_streak_aggregate=AsyncMock(return_value=aggregate),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    action = await MemberSelectedHandler().handle(context, services)
+
+    assert isinstance(action, SendMessageAction)
+    history_service.save_history.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_draws_a_schedule(base_interaction):
+    members = []
+    for index in range(3):
+        member = MagicMock(spec=discord.User)
+        member.id = 100 + index
+        member.display_name = f"Member{index}"
+        members.append(member)
+    template = Template(title="League", choices=["Top", "Jungle", "Mid"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+        schedule_rounds=3,
+    )
+    context.result = members
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.RANDOM),
+        get_streak_aggregate=AsyncMock(return_value=None),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="detailed"),
+        save_history=AsyncMock(),
+        save_history_rounds=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    action = await MemberSelectedHandler().handle(context, services)
+
+    history_service.get_streak_aggregate.assert_not_awaited()
+    history_service.save_history.assert_not_awaited()
+    history_service.save_history_rounds.assert_awaited_once()
+    saved_rounds = history_service.save_history_rounds.await_args.kwargs["rounds"]
+    assert len(saved_rounds) == 3
+
+    assert isinstance(action, SendMessageAction)
+    assert action.ephemeral is False
+    view = action.view
+    assert isinstance(view, ScheduleResultView)
+    assert "ラウンド 1 / 3" in action.content
+    assert [embed.title for embed in action.embeds] == [
+        f"> {pair.choice}" for pair in saved_rounds[0].pairs
+    ]
+    assert view.prev_button.disabled is True
+
+    view.turn_page(1)
+    view.turn_page(1)
+    view.turn_page(1)
+    assert view.current_round == 2
+    assert view.next_button.disabled is True
+    assert "ラウンド 3 / 3" in view.create_content()
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_splits_members_into_teams(base_interaction):
+    members = []
+    for index in range(7):
+        member = MagicMock(spec=discord.User)
+        member.id = 200 + index
+        member.display_name = f"Member{index}"
+        members.append(member)
+    template = Template(title="Event", choices=["Team A ×5", "Team B ×5"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+    )
+    context.result = members
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.RANDOM),
+        get_streak_aggregate=AsyncMock(return_value=None),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    action = await MemberSelectedHandler().handle(context, services)
+
+    assert isinstance(action, SendMessageAction)
+    # 定員 5 人ずつのチームに 7 人を比例配分すると 4 人と 3 人になる。
+    saved_pairs = history_service.save_history.await_args.kwargs["pairs"]
+    sizes = Counter(pair.choice for pair in saved_pairs.pairs)
+    assert sorted(sizes.values()) == [3, 4]
+    assert sorted(embed.title for embed in action.embeds) == sorted(
+        f"> {choice} ({count}人)" for choice, count in sizes.items()
+    )
+
+
+@pytest.mark.asyncio
+async def test_member_selected_handler_lists_members_beyond_the_capacity(base_interaction):
+    members = []
+    for index in range(5):
+        member = MagicMock(spec=discord.User)
+        member.id = 300 + index
+        member.display_name = f"Member{index}"
+        members.append(member)
+    template = Template(title="Event", choices=["Team A ×2", "Team B ×2"])
+
+    context = CommandContext(
+        interaction=base_interaction,
+        state=AmidakujiState.MEMBER_SELECTED,
+    )
+    context.result = members
+    context.history[AmidakujiState.TEMPLATE_DETERMINED] = template
+
+    history_service = SimpleNamespace(
+        get_selection_mode=AsyncMock(return_value=SelectionMode.RANDOM),
+        get_streak_aggregate=AsyncMock(return_value=None),
+        get_recent_history=AsyncMock(return_value=[]),
+        get_embed_mode=AsyncMock(return_value="compact"),
+        save_history=AsyncMock(),
+    )
+    services = SimpleNamespace(history_service=history_service)
+
+    action = await MemberSelectedHandler().handle(context, services)
+
+    saved_pairs = history_service.save_history.await_args.kwargs["pairs"]
+    assigned = {pair.user.id for pair in saved_pairs.pairs}
+    [left_out] = [member for member in members if member.id not in assigned]
+    assert action.embeds[-1].title == "> 割り当てなし (1人)"
+    assert action.embeds[-1].description == left_out.display_name
+
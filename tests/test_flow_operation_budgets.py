@@ -0,0 +1,349 @@
+"""フローごとの Firestore 操作回数の上限を検証する回帰テスト。
+
+本番と同じキャッシュ・相乗りラッパーを `FakeFirestoreClient` 上に組み立て、
+`FlowController` へ実際の遷移順でステートを流し込む。上限は計測値に余裕を
+持たせず設定しているため、読み取りが増える変更はここで失敗する。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+import pytest
+
+from application.dto import SharedTemplateSetDTO
+from data_interface import FlowController
+from domain import ResultEmbedMode, SelectionMode, Template, TemplateScope
+from infrastructure.firestore import FakeFirestoreClient, FirestoreOperationStats
+from infrastructure.firestore.indexes import REQUIRED_INDEXES
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+from infrastructure.wrappers import CachingTemplateRepository, CoalescingTemplateRepository
+from models.context_model import CommandContext
+from models.state_model import AmidakujiState
+from presentation.discord.services import CommandRuntimeServices, DiscordCommandUseCases
+from presentation.discord.views.history_list import HistoryListView
+from presentation.discord.views.state import TemplateSharingState
+from presentation.discord.views.template_sharing import TemplateSharingView
+
+USER_ID = 1
+GUILD_ID = 100
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True, slots=True)
+class OperationBudget:
+    reads: int
+    writes: int
+    round_trips: int
+
+    def assert_within(self, stats: FirestoreOperationStats) -> None:
+        assert stats.reads <= self.reads, stats
+        assert stats.writes <= self.writes, stats
+        assert stats.round_trips <= self.round_trips, stats
+
+
+@dataclass(slots=True)
+class FlowHarness:
+    client: FakeFirestoreClient
+    firestore: FirestoreTemplateRepository
+    services: CommandRuntimeServices
+
+    @classmethod
+    def create(cls) -> "FlowHarness":
+        client = FakeFirestoreClient(indexes=REQUIRED_INDEXES)
+        unit_of_work = FirestoreUnitOfWork()
+        unit_of_work.with_client(client)
+        firestore = FirestoreTemplateRepository(unit_of_work)
+        # 稼働中の Bot と同じく、設定ドキュメントは作成済みの状態から計測する。
+        firestore.set_embed_mode(ResultEmbedMode.COMPACT)
+        firestore.set_selection_mode(SelectionMode.RANDOM)
+        repository = CachingTemplateRepository(CoalescingTemplateRepository(firestore))
+        services = CommandRuntimeServices.from_client(
+            repository=repository,
+            usecases=DiscordCommandUseCases.from_repository(repository),
+        )
+        return cls(client=client, firestore=firestore, services=services)
+
+    def start(
+        self, interaction: discord.Interaction, *, rounds: int = 1
+    ) -> FlowController:
+        """`/amidakuji` と同じ手順でフローを開始し、計測をリセットする。"""
+
+        context = CommandContext(
+            interaction=interaction,
+            state=AmidakujiState.COMMAND_EXECUTED,
+            services=self.services,
+            schedule_rounds=rounds,
+        )
+        flow = FlowController(context=context, services=self.services)
+        self.services.flow = flow
+        context.result = interaction
+        self.client.reset_stats()
+        return flow
+
+
+def make_interaction() -> discord.Interaction:
+    interaction = MagicMock(spec=discord.Interaction)
+    interaction.user = SimpleNamespace(id=USER_ID, name="alice", display_name="Alice")
+    interaction.guild_id = GUILD_ID
+    interaction.guild = SimpleNamespace(id=GUILD_ID)
+    interaction.response = MagicMock()
+    interaction.response.is_done.return_value = False
+    interaction.response.defer = AsyncMock()
+    interaction.response.send_message = AsyncMock()
+    interaction.response.send_modal = AsyncMock()
+    interaction.response.edit_message = AsyncMock()
+    interaction.edit_original_response = AsyncMock()
+    interaction.followup = MagicMock()
+    interaction.followup.send = AsyncMock()
+    return interaction
+
+
+def make_members(count: int = 4) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=1000 + index,
+            name=f"member-{index}",
+            display_name=f"Member {index}",
+            mention=f"<@{1000 + index}>",
+            bot=False,
+        )
+        for index in range(count)
+    ]
+
+
+def seed_user(harness: FlowHarness, *, templates: int = 3) -> list[Template]:
+    harness.firestore.init_user(USER_ID, "Alice")
+    created = [
+        Template(title=f"Team {index}", choices=["A", "B", "C", "D"], created_by=USER_ID)
+        for index in range(templates)
+    ]
+    for template in created:
+        harness.firestore.add_custom_template(USER_ID, template)
+    return created
+
+
+def seed_history(harness: FlowHarness, *, count: int, title: str = "Team 0") -> None:
+    history_repository = harness.firestore.history_repository
+    assert history_repository is not None
+    history_repository.add_entries(
+        [
+            {
+                "guild_id": GUILD_ID,
+                "template_title": title,
+                "created_at": BASE_TIME + timedelta(minutes=minute),
+                "selection_mode": "random",
+                "entries": [{"user_id": 1000, "user_name": "Member 0", "choice": "A"}],
+                "choices": ["A", "B", "C", "D"],
+            }
+            for minute in range(count)
+        ]
+    )
+
+
+# 計測値そのものを上限にしている。意図して増やす場合は理由を添えて更新すること。
+EXISTING_TEMPLATE_DRAW = OperationBudget(reads=5, writes=3, round_trips=8)
+REPEATED_DRAW = OperationBudget(reads=3, writes=3, round_trips=6)
+CREATE_NEW_DRAW = OperationBudget(reads=6, writes=4, round_trips=10)
+USE_HISTORY_DRAW = OperationBudget(reads=5, writes=3, round_trips=8)
+SHARED_TEMPLATE_COPY = OperationBudget(reads=3, writes=1, round_trips=5)
+HISTORY_PAGING = OperationBudget(reads=32, writes=0, round_trips=5)
+TEMPLATE_SHARE = OperationBudget(reads=4, writes=1, round_trips=5)
+# 4 ラウンド分。1 ラウンドずつ実行すると EXISTING_TEMPLATE_DRAW の 4 倍かかる。
+SCHEDULE_DRAW = OperationBudget(reads=4, writes=6, round_trips=7)
+
+
+@pytest.mark.asyncio
+async def test_existing_template_draw_stays_within_budget():
+    harness = FlowHarness.create()
+    template = seed_user(harness)[0]
+    seed_history(harness, count=5, title=template.title)
+    interaction = make_interaction()
+    flow = harness.start(interaction)
+
+    await flow.dispatch(AmidakujiState.MODE_USE_EXISTING, interaction, interaction)
+    await flow.dispatch(AmidakujiState.TEMPLATE_DETERMINED, template, interaction)
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(), interaction)
+
+    EXISTING_TEMPLATE_DRAW.assert_within(harness.client.stats())
+    assert len(harness.firestore.get_recent_history(guild_id=GUILD_ID)) == 6
+
+
+@pytest.mark.asyncio
+async def test_schedule_draw_writes_every_round_at_once():
+    harness = FlowHarness.create()
+    template = seed_user(harness)[0]
+    seed_history(harness, count=5, title=template.title)
+    interaction = make_interaction()
+    flow = harness.start(interaction, rounds=4)
+
+    await flow.dispatch(AmidakujiState.MODE_USE_EXISTING, interaction, interaction)
+    await flow.dispatch(AmidakujiState.TEMPLATE_DETERMINED, template, interaction)
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(), interaction)
+
+    stats = harness.client.stats()
+    SCHEDULE_DRAW.assert_within(stats)
+    # 4 ラウンド分の履歴と集計が 1 回のトランザクションで書き込まれる。
+    assert stats.round_trips_by_operation["begin_transaction"] == 1
+    histories = harness.firestore.get_recent_history(guild_id=GUILD_ID, limit=4)
+    assert [history.created_at for history in histories] == sorted(
+        (history.created_at for history in histories), reverse=True
+    )
+    aggregate = harness.firestore.get_streak_aggregate(
+        guild_id=GUILD_ID, template_title=template.title
+    )
+    assert aggregate is not None
+    for member in make_members():
+        counts = dict(aggregate.frequencies[member.id])
+        if member.id == 1000:
+            counts["A"] -= 5
+        assert counts == {"A": 1, "B": 1, "C": 1, "D": 1}
+
+
+@pytest.mark.asyncio
+async def test_repeated_draw_reuses_cached_settings():
+    harness = FlowHarness.create()
+    template = seed_user(harness)[0]
+    seed_history(harness, count=5, title=template.title)
+    interaction = make_interaction()
+    # 1 回目でキャッシュを温め、2 回目の抽選だけを計測する。
+    flow = harness.start(interaction)
+    await flow.dispatch(AmidakujiState.TEMPLATE_DETERMINED, template, interaction)
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(), interaction)
+
+    flow = harness.start(interaction)
+    await flow.dispatch(AmidakujiState.MODE_USE_EXISTING, interaction, interaction)
+    await flow.dispatch(AmidakujiState.TEMPLATE_DETERMINED, template, interaction)
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(), interaction)
+
+    REPEATED_DRAW.assert_within(harness.client.stats())
+
+
+@pytest.mark.asyncio
+async def test_create_new_draw_stays_within_budget():
+    harness = FlowHarness.create()
+    seed_user(harness, templates=0)
+    interaction = make_interaction()
+    flow = harness.start(interaction)
+
+    await flow.dispatch(AmidakujiState.MODE_CREATE_NEW, interaction, interaction)
+    await flow.dispatch(AmidakujiState.TEMPLATE_TITLE_ENTERED, "Cleaning", interaction)
+    await flow.dispatch(
+        AmidakujiState.OPTION_NAME_ENTERED, ["Kitchen", "Bath"], interaction
+    )
+    template = Template(title="Cleaning", choices=["Kitchen", "Bath"], created_by=USER_ID)
+    await flow.dispatch(AmidakujiState.TEMPLATE_CREATED, template, interaction)
+    assert flow.context.state is AmidakujiState.TEMPLATE_DETERMINED
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(2), interaction)
+
+    CREATE_NEW_DRAW.assert_within(harness.client.stats())
+    user = harness.firestore.get_user(USER_ID, include_shared=False)
+    assert user is not None
+    assert "Cleaning" in [item.title for item in user.custom_templates]
+
+
+@pytest.mark.asyncio
+async def test_use_history_draw_stays_within_budget():
+    harness = FlowHarness.create()
+    template = seed_user(harness)[0]
+    harness.firestore.set_least_template(USER_ID, template)
+    seed_history(harness, count=20)
+    interaction = make_interaction()
+    flow = harness.start(interaction)
+
+    await flow.dispatch(AmidakujiState.MODE_USE_HISTORY, interaction, interaction)
+    assert flow.context.state is AmidakujiState.TEMPLATE_DETERMINED
+    await flow.dispatch(AmidakujiState.MEMBER_SELECTED, make_members(), interaction)
+
+    USE_HISTORY_DRAW.assert_within(harness.client.stats())
+
+
+@pytest.mark.asyncio
+async def test_shared_template_copy_stays_within_budget():
+    harness = FlowHarness.create()
+    seed_user(harness)
+    shared = harness.firestore.create_shared_template(
+        Template(
+            title="Guild roles",
+            choices=["Tank", "Healer"],
+            scope=TemplateScope.GUILD,
+            created_by=2,
+            guild_id=GUILD_ID,
+        )
+    )
+    interaction = make_interaction()
+    flow = harness.start(interaction)
+
+    await flow.dispatch(AmidakujiState.MODE_USE_SHARED, interaction, interaction)
+    await flow.dispatch(AmidakujiState.SHARED_TEMPLATE_SELECTED, shared, interaction)
+    await flow.dispatch(AmidakujiState.SHARED_TEMPLATE_COPY_REQUESTED, shared, interaction)
+
+    SHARED_TEMPLATE_COPY.assert_within(harness.client.stats())
+    user = harness.firestore.get_user(USER_ID, include_shared=False)
+    assert user is not None
+    assert "Guild roles" in [item.title for item in user.custom_templates]
+
+
+@pytest.mark.asyncio
+async def test_history_paging_stays_within_budget():
+    harness = FlowHarness.create()
+    seed_history(harness, count=12)
+    harness.client.reset_stats()
+
+    # `/amidakuji_history` と同じ引数でビューを生成し、2 ページ進めて 1 ページ戻る。
+    view = await HistoryListView.create(
+        history_service=harness.services.history_service,
+        guild_id=GUILD_ID,
+        page_size=5,
+        template_title=None,
+    )
+    await view.turn_page(1)
+    await view.turn_page(1)
+    await view.turn_page(-1)
+
+    HISTORY_PAGING.assert_within(harness.client.stats())
+    assert view.current_page == 1
+
+
+@pytest.mark.asyncio
+async def test_template_share_stays_within_budget():
+    harness = FlowHarness.create()
+    seed_user(harness)
+    harness.client.reset_stats()
+    template_service = harness.services.template_service
+
+    # `/amidakuji_template_share` と同じ読み込みでビューを生成し、1 件を共有する。
+    private = await template_service.list_private_templates(
+        user_id=USER_ID, guild_id=GUILD_ID
+    )
+    guild_templates = await template_service.list_shared_templates_by_scope(
+        scope=TemplateScope.GUILD, guild_id=GUILD_ID, created_by=USER_ID
+    )
+    public_templates = await template_service.list_shared_templates_by_scope(
+        scope=TemplateScope.PUBLIC, created_by=USER_ID
+    )
+    view = TemplateSharingView(
+        state=TemplateSharingState.from_dtos(
+            user_id=USER_ID,
+            display_name="Alice",
+            guild_id=GUILD_ID,
+            private=private,
+            shared=SharedTemplateSetDTO(
+                shared_templates=list(guild_templates.templates),
+                public_templates=list(public_templates.templates),
+            ),
+        ),
+        template_service=template_service,
+    )
+    interaction = make_interaction()
+    await view.handle_selection(
+        interaction, TemplateScope.PRIVATE, private.templates[0].template_id
+    )
+    await view.share_to_guild(interaction)
+
+    TEMPLATE_SHARE.assert_within(harness.client.stats())
+    assert [item.title for item in view.guild_templates.values()] == ["Team 0"]
@@ -1,28 +1,37 @@
 from __future__ import annotations
 
 import datetime
-from dataclasses import dataclass
+from collections.abc import Sequence
+from dataclasses import dataclass, field
 from typing import List
 
 import pytest
 
-from domain import AssignmentEntry, AssignmentHistory, SelectionMode
+from application.services.history_service import HistoryApplicationService
+from domain import HISTORY_LIST_FIELDS, AssignmentEntry, AssignmentHistory, SelectionMode
+from domain.services.history_cursor import decode_history_cursor
 from presentation.discord.views.history_list import HistoryListView
 
 
 @dataclass
-class _DummyHistoryService:
+class _DummyHistoryRepository:
     histories: List[AssignmentHistory]
+    calls: int = 0
+    requested_fields: list[Sequence[str] | None] = field(default_factory=list)
 
-    def get_recent_history(
+    async def get_recent_history(
         self,
         *,
         guild_id: int,
         template_title: str | None = None,
         limit: int = 10,
         since: datetime.datetime | None = None,
+        start_after: str | None = None,
+        fields: Sequence[str] | None = None,
     ) -> List[AssignmentHistory]:
         del guild_id, since
+        self.calls += 1
+        self.requested_fields.append(fields)
         if template_title is None:
             candidates = list(self.histories)
         else:
@@ -32,17 +41,31 @@ class _DummyHistoryService:
                 if history.template_title == template_title
             ]
         sorted_candidates = sorted(
-            candidates, key=lambda item: item.created_at, reverse=True
+            candidates,
+            key=lambda item: (item.created_at, item.history_id),
+            reverse=True,
         )
+        if start_after is not None:
+            cursor = decode_history_cursor(start_after)
+            sorted_candidates = [
+                item
+                for item in sorted_candidates
+                if (item.created_at, item.history_id) < cursor
+            ]
         return sorted_candidates[:limit]
 
 
+def _make_service(histories: List[AssignmentHistory]) -> HistoryApplicationService:
+    return HistoryApplicationService(_DummyHistoryRepository(histories))
+
+
 def _make_history(
     *,
     template_title: str,
     created_at: datetime.datetime,
     entries: list[AssignmentEntry],
     selection_mode: SelectionMode = SelectionMode.RANDOM,
+    history_id: str | None = None,
 ) -> AssignmentHistory:
     return AssignmentHistory(
         guild_id=123,
@@ -51,6 +74,7 @@ def _make_history(
         entries=entries,
         choices=["A", "B"],
         selection_mode=selection_mode,
+        history_id=history_id or f"{template_title}-{created_at.isoformat()}",
     )
 
 
@@ -82,9 +106,10 @@ async def test_history_list_view_initial_state() -> None:
             entries=_build_entries(10),
         ),
     ]
-    history_service = _DummyHistoryService(histories)
+    repository = _DummyHistoryRepository(histories)
+    history_service = HistoryApplicationService(repository)
 
-    view = HistoryListView(
+    view = await HistoryListView.create(
         history_service=history_service,
         guild_id=123,
         page_size=2,
@@ -92,11 +117,18 @@ async def test_history_list_view_initial_state() -> None:
 
     embed = view.create_embed()
 
+    assert repository.requested_fields == [
+        HistoryListView.TEMPLATE_OPTION_FIELDS,
+        HISTORY_LIST_FIELDS,
+    ]
     assert embed.title == "🎲 最近の抽選履歴"
     assert len(embed.fields) == 2
     assert embed.fields[0].name.startswith("テンプレート1")
     assert "user-10" in embed.fields[0].value
-    assert "ページ 1/2" in (embed.footer.text or "")
+    assert "ページ 1" in (embed.footer.text or "")
+    assert "(最終)" not in (embed.footer.text or "")
+    assert view.next_button.disabled is False
+    assert view.prev_button.disabled is True
 
     assert view.available_templates == [
         "テンプレート1",
@@ -121,22 +153,22 @@ async def test_history_list_view_filtering() -> None:
         )
         for idx, title in enumerate(titles)
     ]
-    history_service = _DummyHistoryService(histories)
+    history_service = _make_service(histories)
 
-    view = HistoryListView(
+    view = await HistoryListView.create(
         history_service=history_service,
         guild_id=123,
         page_size=3,
     )
 
-    view.apply_template_filter("テンプレートB", strict=True)
+    await view.apply_template_filter("テンプレートB", strict=True)
 
     embed = view.create_embed()
     assert len(embed.fields) == 1
     assert embed.description == "テンプレート: テンプレートB"
     assert embed.fields[0].name.startswith("テンプレートB")
 
-    view.apply_template_filter("テンプレ", strict=False)
+    await view.apply_template_filter("テンプレ", strict=False)
 
     search_embed = view.create_embed()
     assert "検索キーワード: テンプレ" in (search_embed.description or "")
@@ -145,6 +177,43 @@ async def test_history_list_view_filtering() -> None:
         assert title in (search_embed.description or "")
     assert len(search_embed.fields) == 3
 
-    view.reset_template_filter()
+    await view.reset_template_filter()
     embed_after_reset = view.create_embed()
     assert "最新の抽選結果" in (embed_after_reset.description or "")
+
+
+@pytest.mark.asyncio
+async def test_history_list_view_pages_with_cursor_stack() -> None:
+    base_time = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    histories = [
+        _make_history(
+            template_title="テンプレート",
+            # 同時刻の履歴もページ境界で欠けないことを確認する。
+            created_at=base_time + datetime.timedelta(minutes=idx // 2),
+            entries=_build_entries(idx),
+            history_id=f"history-{idx:03d}",
+        )
+        for idx in range(120)
+    ]
+    repository = _DummyHistoryRepository(histories)
+    view = await HistoryListView.create(
+        history_service=HistoryApplicationService(repository),
+        guild_id=123,
+        page_size=10,
+    )
+
+    seen: list[str | None] = []
+    while True:
+        assert len(view.histories) <= view.page_size
+        seen.extend(history.history_id for history in view.histories)
+        if view.next_cursor is None:
+            break
+        await view.turn_page(1)
+
+    assert view.current_page == 11
+    assert "(最終)" in (view.create_embed().footer.text or "")
+    assert len(seen) == len(set(seen)) == 120
+
+    await view.turn_page(-1)
+    assert view.current_page == 10
+    assert view.histories[0].history_id == seen[100]
@@ -0,0 +1,145 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from db.serializers import deserialize_streak_aggregate, serialize_streak_aggregate
+from domain import StreakAggregate
+from domain.services.streak_service import STREAK_LOOKBACK, apply_assignments
+from infrastructure.firestore.async_template_repository import (
+    AsyncFirestoreTemplateRepository,
+)
+from infrastructure.firestore.history_aggregates import (
+    plan_streak_aggregate_writes,
+    restore_streak_aggregate,
+    streak_aggregate_document_id,
+)
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+
+
+def history(created_at: str, *entries: tuple[int, str], title: str = "League") -> dict:
+    return {
+        "guild_id": 1,
+        "template_title": title,
+        "created_at": created_at,
+        "entries": [
+            {"user_id": user_id, "user_name": str(user_id), "choice": choice}
+            for user_id, choice in entries
+        ],
+    }
+
+
+def test_document_id_is_stable_and_path_safe():
+    document_id = streak_aggregate_document_id(1, "A/B Team")
+
+    assert "/" not in document_id
+    assert document_id == streak_aggregate_document_id(1, "A/B Team")
+    assert document_id != streak_aggregate_document_id(2, "A/B Team")
+
+
+def test_restore_seeds_missing_aggregate_from_history():
+    aggregate = restore_streak_aggregate(
+        None,
+        key=(1, "League"),
+        seed_documents=[
+            history("2024-01-02T00:00:00+00:00", (10, "Top"), (20, "Mid")),
+            history("2024-01-01T00:00:00+00:00", (10, "Top"), (20, "Top")),
+        ],
+    )
+
+    assert aggregate.streaks == {10: ("Top", 2), 20: ("Mid", 1)}
+    assert aggregate.frequencies == {10: {"Top": 2}, 20: {"Top": 1, "Mid": 1}}
+
+
+def test_plan_updates_each_template_independently():
+    aggregates = {
+        (1, "League"): StreakAggregate(
+            guild_id=1, template_title="League", streaks={10: ("Top", 3)}
+        ),
+        (1, "Valorant"): StreakAggregate(guild_id=1, template_title="Valorant"),
+    }
+
+    payloads = plan_streak_aggregate_writes(
+        aggregates,
+        [
+            history("2024-01-01T00:00:00+00:00", (10, "Top")),
+            history("2024-01-01T00:00:00+00:00", (10, "Duelist"), title="Valorant"),
+        ],
+    )
+
+    league = deserialize_streak_aggregate(payloads[(1, "League")])
+    valorant = deserialize_streak_aggregate(payloads[(1, "Valorant")])
+    assert league.streaks[10] == ("Top", 4)
+    assert valorant.streaks[10] == ("Duelist", 1)
+
+
+def test_serialized_aggregate_uses_string_map_keys():
+    aggregate = StreakAggregate(
+        guild_id=1,
+        template_title="League",
+        streaks={10: ("Top", 2)},
+        frequencies={10: {"Top": 2}},
+        draw_count=4,
+        last_drawn={10: 4},
+    )
+
+    data = serialize_streak_aggregate(aggregate)
+
+    assert data["streaks"] == {"10": {"choice": "Top", "count": 2, "draw": 4}}
+    assert deserialize_streak_aggregate(data) == aggregate
+
+
+def test_streaks_are_bounded_by_the_lookback():
+    aggregate = StreakAggregate(guild_id=1, template_title="League")
+
+    for _ in range(STREAK_LOOKBACK + 5):
+        apply_assignments(aggregate, [(10, "Top")])
+    assert aggregate.streaks[10] == ("Top", STREAK_LOOKBACK)
+
+    # 直近 STREAK_LOOKBACK 回の抽選に出ていないユーザーの連続担当は消える。
+    for _ in range(STREAK_LOOKBACK - 1):
+        apply_assignments(aggregate, [(20, "Mid")])
+    assert 10 in aggregate.streaks
+    apply_assignments(aggregate, [(20, "Mid")])
+    assert 10 not in aggregate.streaks
+    assert aggregate.frequencies[10] == {"Top": STREAK_LOOKBACK + 5}
+
+
+def test_legacy_aggregate_without_draw_numbers_keeps_streaks():
+    aggregate = deserialize_streak_aggregate(
+        {
+            "guild_id": 1,
+            "template_title": "League",
+            "streaks": {"10": {"choice": "Top", "count": 3}},
+        }
+    )
+
+    apply_assignments(aggregate, [(10, "Top")])
+
+    assert aggregate.streaks[10] == ("Top", 4)
+
+
+@pytest.mark.asyncio
+async def test_async_repository_overlays_pending_history():
+    unit_of_work = FirestoreUnitOfWork()
+    unit_of_work._async_client = object()  # type: ignore[attr-defined]
+    unit_of_work.async_user_repository = MagicMock()
+    unit_of_work.async_info_repository = MagicMock()
+    unit_of_work.async_shared_template_repository = MagicMock()
+    history_repository = MagicMock()
+    unit_of_work.async_history_repository = history_repository
+    repository = AsyncFirestoreTemplateRepository(unit_of_work)
+
+    history_repository.read_aggregate = AsyncMock(
+        return_value=serialize_streak_aggregate(
+            StreakAggregate(guild_id=1, template_title="League", streaks={10: ("Top", 1)})
+        )
+    )
+    history_repository.pending_entries.return_value = [
+        history("2024-01-01T00:00:00+00:00", (10, "Top"))
+    ]
+
+    aggregate = await repository.get_streak_aggregate(guild_id=1, template_title="League")
+
+    assert aggregate is not None
+    assert aggregate.streaks[10] == ("Top", 2)
+    history_repository.read_aggregate.assert_awaited_once_with(1, "League")
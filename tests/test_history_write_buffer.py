@@ -0,0 +1,194 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from infrastructure.firestore.async_repositories import AsyncHistoryRepository
+from infrastructure.firestore.history_buffer import HistoryWriteBuffer
+from infrastructure.firestore.repositories import MAX_HISTORY_ENTRIES_PER_COMMIT
+
+
+class RecordingSink:
+    def __init__(self, *, failures: int = 0) -> None:
+        self.batches: list[list[dict]] = []
+        self._failures = failures
+
+    async def __call__(self, entries: list[dict]) -> None:
+        if self._failures:
+            self._failures -= 1
+            raise RuntimeError("unavailable")
+        self.batches.append(list(entries))
+
+
+def entry(index: int, *, guild_id: int = 1) -> dict:
+    return {"guild_id": guild_id, "template_title": "League", "index": index}
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_when_batch_size_is_reached():
+    sink = RecordingSink()
+    buffer = HistoryWriteBuffer(sink, max_batch_size=3, flush_interval=60)
+
+    for index in range(3):
+        buffer.enqueue(entry(index))
+    await asyncio.sleep(0)
+
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[0, 1, 2]]
+    stats = buffer.stats()
+    assert stats.enqueued == 3
+    assert stats.flushed == 3
+    assert stats.batches == 1
+    assert stats.backlog == 0
+    assert stats.max_backlog == 3
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_after_interval():
+    sink = RecordingSink()
+    buffer = HistoryWriteBuffer(sink, max_batch_size=10, flush_interval=0.01)
+
+    buffer.enqueue(entry(0))
+    assert buffer.backlog == 1
+    assert sink.batches == []
+
+    await asyncio.sleep(0.05)
+
+    assert len(sink.batches) == 1
+    assert buffer.backlog == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_entries_and_close_retries():
+    sink = RecordingSink(failures=1)
+    buffer = HistoryWriteBuffer(sink, max_batch_size=10, flush_interval=60)
+    buffer.enqueue(entry(0))
+    buffer.enqueue(entry(1, guild_id=2))
+
+    assert await buffer.flush() == 0
+    assert buffer.stats().failed_flushes == 1
+    assert [item["index"] for item in buffer.pending(guild_id=2)] == [1]
+
+    await buffer.close()
+
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[0, 1]]
+    with pytest.raises(RuntimeError):
+        buffer.enqueue(entry(2))
+
+
+@pytest.mark.asyncio
+async def test_retry_resends_the_same_batch_with_the_same_history_ids():
+    sink = RecordingSink(failures=1)
+    buffer = HistoryWriteBuffer(sink, max_batch_size=10, flush_interval=60)
+    buffer.enqueue(entry(0))
+    await buffer.flush()
+    [failed] = buffer.pending()
+    buffer.enqueue(entry(1))
+
+    await buffer.flush()
+
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[0], [1]]
+    assert sink.batches[0][0]["history_id"] == failed["history_id"]
+    assert len(failed["history_id"]) == 20
+
+
+@pytest.mark.asyncio
+async def test_batch_is_dead_lettered_after_max_attempts(caplog):
+    sink = RecordingSink(failures=2)
+    buffer = HistoryWriteBuffer(sink, max_batch_size=10, flush_interval=60, max_attempts=2)
+    buffer.enqueue(entry(0))
+
+    await buffer.flush()
+    await buffer.flush()
+    buffer.enqueue(entry(1))
+    await buffer.close()
+
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[1]]
+    assert buffer.stats().dead_lettered == 1
+    assert "Dead-lettered history entry" in caplog.text
+
+
+def test_buffer_limits_batch_size_and_backlog():
+    with pytest.raises(ValueError):
+        HistoryWriteBuffer(RecordingSink(), max_batch_size=MAX_HISTORY_ENTRIES_PER_COMMIT + 1)
+
+    buffer = HistoryWriteBuffer(
+        RecordingSink(), max_batch_size=2, flush_interval=60, max_backlog=2
+    )
+    buffer._arm_timer = lambda: None
+    buffer._schedule_flush = lambda: None
+    buffer.enqueue(entry(0))
+    buffer.enqueue(entry(1))
+
+    assert not buffer.has_capacity()
+    with pytest.raises(RuntimeError):
+        buffer.enqueue(entry(2))
+
+
+@pytest.mark.asyncio
+async def test_history_repository_enqueues_and_reads_pending_entries():
+    client = MagicMock()
+    repository = AsyncHistoryRepository(client)
+    repository._commit_entries = AsyncMock()
+    repository.buffer = HistoryWriteBuffer(
+        repository.add_entries, max_batch_size=10, flush_interval=60
+    )
+
+    created_at = "2024-01-01T00:00:00+00:00"
+    await repository.add_entry(
+        {"guild_id": 1, "template_title": "League", "created_at": created_at}
+    )
+
+    client.collection.return_value.document.return_value.set.assert_not_called()
+
+    async def empty_stream(transaction=None):
+        if False:
+            yield None
+
+    query = client.collection.return_value.where.return_value
+    ordered = query.order_by.return_value.order_by.return_value
+    ordered.limit.return_value.stream = empty_stream
+    recent = await repository.fetch_recent(guild_id=1, limit=5)
+    assert [item["created_at"] for item in recent] == [created_at]
+
+    await repository.buffer.close()
+
+    repository._commit_entries.assert_awaited_once()
+    assert len(repository._commit_entries.await_args.args[0]) == 1
+
+
+@pytest.mark.asyncio
+async def test_overflow_write_commits_after_queued_entries():
+    repository = AsyncHistoryRepository(MagicMock())
+    sink = RecordingSink(failures=1)
+    repository.buffer = HistoryWriteBuffer(
+        sink, max_batch_size=2, flush_interval=60, max_backlog=2
+    )
+    await repository.submit_entries([entry(0), entry(1)])
+    # 最初の書き込みに失敗し、古い 2 件が再送待ちで残っている。
+    assert await repository.buffer.flush() == 0
+    assert not repository.buffer.has_capacity()
+
+    await repository.submit_entries([entry(2)])
+
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[0, 1], [2]]
+    assert repository.buffer.backlog == 0
+    assert "history_id" in sink.batches[1][0]
+
+
+@pytest.mark.asyncio
+async def test_overflow_write_is_refused_while_queued_entries_cannot_be_written():
+    repository = AsyncHistoryRepository(MagicMock())
+    sink = RecordingSink(failures=2)
+    repository.buffer = HistoryWriteBuffer(
+        sink, max_batch_size=2, flush_interval=60, max_backlog=2
+    )
+    await repository.submit_entries([entry(0), entry(1)])
+    await repository.buffer.flush()
+
+    with pytest.raises(RuntimeError):
+        await repository.submit_entries([entry(2)])
+
+    assert sink.batches == []
+    assert [item["index"] for item in repository.buffer.pending()] == [0, 1]
+    await repository.buffer.close()
+    assert [[item["index"] for item in batch] for batch in sink.batches] == [[0, 1]]
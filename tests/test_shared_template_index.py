@@ -0,0 +1,188 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from domain import Template, TemplateScope
+from infrastructure.firestore.shared_template_index import (
+    FakeListenerSource,
+    SharedTemplateIndex,
+)
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+
+
+def make_repository(source: FakeListenerSource) -> FirestoreTemplateRepository:
+    unit_of_work = FirestoreUnitOfWork()
+    client = MagicMock()
+    unit_of_work.with_client(client)
+    unit_of_work.enable_shared_template_index(source)
+    return FirestoreTemplateRepository(unit_of_work)
+
+
+def test_list_shared_templates_is_served_from_listener_index():
+    source = FakeListenerSource(
+        {
+            "public-1": {"title": "Public", "choices": ["A"], "scope": "public"},
+            "guild-1": {
+                "title": "Guild",
+                "choices": ["B"],
+                "scope": "guild",
+                "guild_id": 10,
+            },
+            "guild-2": {
+                "title": "Other Guild",
+                "choices": ["C"],
+                "scope": "guild",
+                "guild_id": 20,
+            },
+        }
+    )
+    repository = make_repository(source)
+    collection = repository.unit_of_work.shared_template_repository.ref
+
+    guild_templates, public_templates = repository.get_shared_templates_for_user(
+        guild_id=10
+    )
+
+    assert [template.title for template in guild_templates] == ["Guild"]
+    assert [template.title for template in public_templates] == ["Public"]
+    assert guild_templates[0].template_id == "guild-1"
+    collection.where.assert_not_called()
+    assert source.listener_count == 2
+
+
+def test_listener_updates_and_local_writes_refresh_the_index():
+    source = FakeListenerSource()
+    repository = make_repository(source)
+
+    assert repository.list_shared_templates(scope=TemplateScope.PUBLIC) == []
+
+    source.set_document(
+        "remote", {"title": "Remote", "choices": ["A"], "scope": "public"}
+    )
+    assert [
+        template.title
+        for template in repository.list_shared_templates(scope=TemplateScope.PUBLIC)
+    ] == ["Remote"]
+
+    shared_repository = repository.unit_of_work.shared_template_repository
+    shared_repository.ref.document.return_value.id = "local"
+    created = repository.create_shared_template(
+        Template(title="Local", choices=["B"], scope=TemplateScope.PUBLIC)
+    )
+    titles = {
+        template.title
+        for template in repository.list_shared_templates(scope=TemplateScope.PUBLIC)
+    }
+    assert titles == {"Remote", "Local"}
+
+    repository.delete_shared_template(created.template_id)
+    source.delete_document("remote")
+    assert repository.list_shared_templates(scope=TemplateScope.PUBLIC) == []
+
+
+def test_unready_or_unsupported_queries_fall_back_and_close_unsubscribes():
+    pending: list = []
+
+    class _DeferredSource:
+        def listen(self, *, scope, guild_id, callback):
+            pending.append(callback)
+            return lambda: pending.remove(callback)
+
+    index = SharedTemplateIndex(_DeferredSource())
+
+    assert index.lookup(scope="public") is None
+    assert index.lookup(scope=None) is None
+    assert index.is_watching("public")
+
+    pending[0]([])
+    assert index.lookup(scope="public") == []
+
+    index.close()
+    assert pending == []
+    assert not index.is_watching("public")
+
+
+def test_failed_listen_is_retried_on_the_next_lookup():
+    class _FlakySource(FakeListenerSource):
+        failures = 1
+
+        def listen(self, *, scope, guild_id, callback):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("listen failed")
+            return super().listen(scope=scope, guild_id=guild_id, callback=callback)
+
+    source = _FlakySource()
+    index = SharedTemplateIndex(source)
+
+    with pytest.raises(RuntimeError):
+        index.watch_public()
+    assert not index.is_watching("public")
+
+    assert index.lookup(scope="public") == []
+    assert source.listener_count == 1
+
+
+def test_guild_listeners_are_evicted_by_count_and_idle_time():
+    class _Clock:
+        now = 0.0
+
+        def __call__(self) -> float:
+            return self.now
+
+    clock = _Clock()
+    source = FakeListenerSource()
+    index = SharedTemplateIndex(source, max_guilds=2, idle_seconds=60, clock=clock)
+
+    index.lookup(scope="public")
+    for guild_id in (1, 2, 1, 3):
+        index.lookup(scope="guild", guild_id=guild_id)
+
+    # 最も長く参照されていないギルド 2 の購読を解除する。
+    assert index.is_watching("guild", 1)
+    assert not index.is_watching("guild", 2)
+    assert index.is_watching("guild", 3)
+    assert source.listener_count == 3
+
+    clock.now = 30
+    index.lookup(scope="guild", guild_id=3)
+    clock.now = 70
+    index.lookup(scope="guild", guild_id=3)
+
+    assert not index.is_watching("guild", 1)
+    assert index.is_watching("guild", 3)
+    assert index.is_watching("public")
+    assert source.listener_count == 2
+    index.close()
+
+
+def test_idle_guild_listeners_expire_without_further_lookups():
+    class _Clock:
+        now = 0.0
+
+        def __call__(self) -> float:
+            return self.now
+
+    clock = _Clock()
+    source = FakeListenerSource()
+    index = SharedTemplateIndex(
+        source, idle_seconds=60, sweep_interval=0.01, clock=clock
+    )
+    index.lookup(scope="public")
+    index.lookup(scope="guild", guild_id=1)
+    index.lookup(scope="guild", guild_id=2)
+    assert index.expire_idle_guilds() == 0
+
+    # 以降の参照が無くても、タイマーが期限切れのギルドの購読を解除する。
+    clock.now = 120
+    deadline = time.monotonic() + 2.0
+    while source.listener_count > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not index.is_watching("guild", 1)
+    assert not index.is_watching("guild", 2)
+    assert index.is_watching("public")
+    assert source.listener_count == 1
+    index.close()
@@ -0,0 +1,38 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from db.constants import COLLECTION_SENTINEL_DOCUMENT_ID, REQUIRED_COLLECTIONS
+from services.startup_check import CheckStatus, StartupSelfCheck
+
+
+def test_collection_probes_run_concurrently_and_skip_sentinel():
+    barrier = threading.Barrier(len(REQUIRED_COLLECTIONS), timeout=5)
+
+    def collection(name):
+        def stream():
+            # 全てのプローブが同時に実行されていなければタイムアウトする。
+            barrier.wait()
+            documents = [SimpleNamespace(id=COLLECTION_SENTINEL_DOCUMENT_ID)]
+            if name != "history":
+                documents.append(SimpleNamespace(id="doc"))
+            return iter(documents)
+
+        collection_ref = MagicMock()
+        collection_ref.limit.return_value.stream.side_effect = stream
+        return collection_ref
+
+    db = MagicMock()
+    db.collection.side_effect = collection
+    manager = MagicMock(db=db)
+    checker = StartupSelfCheck(manager)
+
+    results = checker._check_collections(REQUIRED_COLLECTIONS)
+
+    manager.ensure_required_collections.assert_called_once_with()
+    assert [result.name for result in results] == [
+        f"collection:{name}" for name in REQUIRED_COLLECTIONS
+    ]
+    statuses = {result.name: result.status for result in results}
+    assert statuses["collection:history"] is CheckStatus.WARNING
+    assert statuses["collection:users"] is CheckStatus.OK
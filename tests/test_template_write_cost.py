@@ -0,0 +1,97 @@
+"""ユーザーのテンプレート数に対する書き込みバイト数のベンチマーク。"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from google.cloud.firestore_v1 import ArrayRemove, ArrayUnion
+
+from db.serializers import serialize_template, serialize_user
+from domain import Template, TemplateScope, UserInfo
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+
+TEMPLATE_COUNTS = (1, 10, 100, 500)
+
+
+def _payload_bytes(fields: dict) -> int:
+    def encode(value):
+        if isinstance(value, (ArrayUnion, ArrayRemove)):
+            return {type(value).__name__: value.values}
+        raise TypeError(type(value))
+
+    return len(json.dumps(fields, default=encode, ensure_ascii=False).encode("utf-8"))
+
+
+def _make_stored_user(template_count: int) -> dict:
+    templates = [
+        Template(
+            title=f"Template {index}",
+            choices=["A", "B", "C"],
+            template_id=f"t{index}",
+        )
+        for index in range(template_count)
+    ]
+    return serialize_user(UserInfo(id=1, name="Tester", custom_templates=templates))
+
+
+def _measure_write_bytes(template_count: int) -> dict[str, int]:
+    stored = _make_stored_user(template_count)
+    written: list[dict] = []
+
+    def run_transaction(user_id, mutation):
+        fields, result = mutation(stored)
+        written.append(fields)
+        return result
+
+    user_repository = MagicMock()
+    user_repository.update_fields.side_effect = (
+        lambda user_id, fields: written.append(fields)
+    )
+    user_repository.run_transaction.side_effect = run_transaction
+    repository = FirestoreTemplateRepository()
+    repository.user_repository = user_repository
+
+    new_template = Template(title="New", choices=["A", "B", "C"])
+    shared_template = Template(
+        title="Template 0", choices=["A", "B", "C"], scope=TemplateScope.GUILD
+    )
+    operations = {
+        "add_custom_template": lambda: repository.add_custom_template(1, new_template),
+        "set_least_template": lambda: repository.set_least_template(1, new_template),
+        "copy_shared_template_to_user": lambda: repository.copy_shared_template_to_user(
+            1, shared_template
+        ),
+        "delete_custom_template": lambda: repository.delete_custom_template(
+            1, template_id="t0"
+        ),
+    }
+
+    sizes: dict[str, int] = {}
+    for name, operation in operations.items():
+        written.clear()
+        operation()
+        sizes[name] = sum(_payload_bytes(fields) for fields in written)
+    sizes["full_document_rewrite"] = _payload_bytes(stored)
+    return sizes
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        "add_custom_template",
+        "set_least_template",
+        "copy_shared_template_to_user",
+        "delete_custom_template",
+    ],
+)
+def test_write_bytes_stay_flat_as_templates_accumulate(operation):
+    measurements = {count: _measure_write_bytes(count) for count in TEMPLATE_COUNTS}
+
+    sizes = [measurements[count][operation] for count in TEMPLATE_COUNTS]
+    rewrites = [
+        measurements[count]["full_document_rewrite"] for count in TEMPLATE_COUNTS
+    ]
+
+    # updated_at の桁数差程度の揺らぎのみ許容する。
+    assert max(sizes) - min(sizes) < 64
+    assert rewrites[-1] > 100 * sizes[-1]
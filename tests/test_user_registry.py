@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from application.services.template_service import TemplateApplicationService
+from services.user_registry import KnownUserSet, UserRegistrationQueue
+
+
+def make_repository(existing: set[int]) -> AsyncMock:
+    repository = AsyncMock()
+
+    async def user_is_exist(user_id):
+        return user_id in existing
+
+    async def init_user(*, user_id, name):
+        existing.add(user_id)
+
+    repository.user_is_exist.side_effect = user_is_exist
+    repository.init_user.side_effect = init_user
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_unknown_users_are_registered_once_in_background():
+    existing = {2}
+    repository = make_repository(existing)
+    registry = UserRegistrationQueue(TemplateApplicationService(repository))
+    registry.start()
+
+    assert registry.observe(1, "new") is True
+    assert registry.observe(1, "new") is False
+    assert registry.observe(2, "old") is True
+    await registry.join()
+
+    repository.init_user.assert_awaited_once_with(user_id=1, name="new")
+    assert 1 in registry.known_users and 2 in registry.known_users
+
+    # 確認済みのユーザーは Firestore を読まない。
+    assert registry.observe(1, "new") is False
+    assert repository.user_is_exist.await_count == 2
+
+    await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_registration_is_retried_on_next_sight():
+    repository = AsyncMock()
+    repository.user_is_exist.side_effect = [RuntimeError("unavailable"), True]
+    registry = UserRegistrationQueue(TemplateApplicationService(repository))
+    registry.start()
+
+    registry.observe(1, "user")
+    await registry.join()
+    assert 1 not in registry.known_users
+
+    assert registry.observe(1, "user") is True
+    await registry.join()
+    assert 1 in registry.known_users
+
+    await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip(tmp_path):
+    snapshot = tmp_path / "known_users.bin"
+    repository = make_repository(set())
+    registry = UserRegistrationQueue(
+        TemplateApplicationService(repository),
+        known_users=KnownUserSet(snapshot_path=snapshot),
+    )
+    registry.start()
+    registry.observe(2**63 + 5, "large-id")
+    registry.observe(42, "user")
+    await registry.close()
+
+    assert snapshot.stat().st_size == 16
+
+    restored = KnownUserSet(snapshot_path=snapshot)
+    assert restored.load() == 2
+    assert 42 in restored and 2**63 + 5 in restored
+
+
+def test_corrupted_snapshot_is_ignored(tmp_path):
+    snapshot = tmp_path / "known_users.bin"
+    snapshot.write_bytes(b"\x00\x01\x02")
+
+    known_users = KnownUserSet(snapshot_path=snapshot)
+
+    assert known_users.load() == 0
+    assert len(known_users) == 0
@@ -0,0 +1,302 @@
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from application.services.template_service import TemplateApplicationService
+from db.serializers import serialize_template
+from domain import Template, TemplateScope
+from infrastructure.firestore import FakeFirestoreClient
+from infrastructure.firestore.async_template_repository import (
+    AsyncFirestoreTemplateRepository,
+)
+from infrastructure.firestore.repositories import UserTemplateRepository
+from infrastructure.firestore.template_repository import FirestoreTemplateRepository
+from infrastructure.firestore.unit_of_work import FirestoreUnitOfWork
+from infrastructure.firestore.user_templates import (
+    UserTemplateLayout,
+    build_subcollection_page,
+    build_user_template_documents,
+    decode_template_cursor,
+    encode_template_cursor,
+    paginate_embedded_templates,
+)
+from services.template_migration import migrate_user_templates
+
+BASE_TIME = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_templates(count: int) -> list[Template]:
+    return [
+        Template(
+            title=f"Template {index}",
+            choices=["A", "B"],
+            scope=TemplateScope.PRIVATE,
+            created_by=1,
+            template_id=f"tpl-{index}",
+        )
+        for index in range(count)
+    ]
+
+
+def make_subcollection_repository() -> FirestoreTemplateRepository:
+    manager = FirestoreTemplateRepository()
+    manager.unit_of_work.template_layout = UserTemplateLayout.SUBCOLLECTION
+    manager.unit_of_work.user_template_repository = MagicMock()
+    manager.user_repository = MagicMock()
+    manager.info_repository = MagicMock()
+    manager.history_repository = MagicMock()
+    manager.db = object()
+    return manager
+
+
+def test_subcollection_page_cursor_round_trips_in_insertion_order():
+    documents = build_user_template_documents(make_templates(3), base_time=BASE_TIME)
+
+    assert [doc["created_at"] for doc in documents] == sorted(
+        doc["created_at"] for doc in documents
+    )
+
+    page = build_subcollection_page(documents, limit=2)
+
+    assert [template.template_id for template in page.templates] == ["tpl-0", "tpl-1"]
+    assert page.next_cursor == encode_template_cursor(documents[1])
+    assert decode_template_cursor(page.next_cursor) == (
+        documents[1]["created_at"],
+        "tpl-1",
+    )
+    assert build_subcollection_page(documents[2:], limit=2).next_cursor is None
+
+
+def test_embedded_templates_are_paginated_by_offset():
+    templates = make_templates(5)
+
+    first = paginate_embedded_templates(templates, limit=2, cursor=None)
+    last = paginate_embedded_templates(templates, limit=2, cursor="4")
+
+    assert [template.title for template in first.templates] == [
+        "Template 0",
+        "Template 1",
+    ]
+    assert first.next_cursor == "2"
+    assert [template.title for template in last.templates] == ["Template 4"]
+    assert last.next_cursor is None
+
+    with pytest.raises(ValueError):
+        paginate_embedded_templates(templates, limit=2, cursor="not-a-number")
+
+
+def test_list_custom_templates_reads_one_page_from_subcollection():
+    manager = make_subcollection_repository()
+    documents = build_user_template_documents(make_templates(3), base_time=BASE_TIME)
+    template_repository = manager.unit_of_work.user_template_repository
+    template_repository.list_page.return_value = documents
+
+    cursor = encode_template_cursor(documents[0])
+    page = manager.list_custom_templates(1, limit=2, cursor=cursor)
+
+    template_repository.list_page.assert_called_once_with(
+        1, limit=3, start_after=(documents[0]["created_at"], "tpl-0")
+    )
+    manager.user_repository.read_document.assert_not_called()
+    assert len(page.templates) == 2
+    assert page.next_cursor == encode_template_cursor(documents[1])
+
+
+def test_subcollection_mutations_touch_only_the_template_document():
+    manager = make_subcollection_repository()
+    template_repository = manager.unit_of_work.user_template_repository
+    template = make_templates(1)[0]
+
+    manager.add_custom_template(1, template)
+    manager.update_custom_template(1, template)
+    manager.delete_custom_template(1, template_id="tpl-0")
+
+    manager.user_repository.read_document.assert_not_called()
+    manager.user_repository.create_document.assert_not_called()
+    (user_id, added), _ = template_repository.add_template.call_args
+    assert user_id == 1
+    assert added["title"] == "Template 0"
+    assert isinstance(added["created_at"], datetime.datetime)
+    (_, updated_id, updated), _ = template_repository.update_template.call_args
+    assert updated_id == "tpl-0"
+    assert updated["choices"] == ["A", "B"]
+    template_repository.delete_templates.assert_called_once_with(
+        1, template_id="tpl-0", template_title=None
+    )
+
+    template_repository.add_template.side_effect = NotFound("missing")
+    with pytest.raises(ValueError, match="User not found"):
+        manager.add_custom_template(2, template)
+
+
+def test_subcollection_copy_resolves_title_inside_one_transaction():
+    client = FakeFirestoreClient()
+    unit_of_work = FirestoreUnitOfWork()
+    unit_of_work.with_client(client)
+    unit_of_work.template_layout = UserTemplateLayout.SUBCOLLECTION
+    manager = FirestoreTemplateRepository(unit_of_work)
+    client.collection("users").document("1").set({"id": 1, "name": "alice"})
+    for title in ("Shared", "Shared (2)"):
+        manager.add_custom_template(1, Template(title=title, choices=["A"]))
+    shared = Template(
+        title="Shared",
+        choices=["A"],
+        scope=TemplateScope.GUILD,
+        created_by=5,
+        guild_id=10,
+        template_id="shared-1",
+    )
+
+    client.reset_stats()
+    copied = manager.copy_shared_template_to_user(1, shared)
+
+    assert copied.title == "Shared (3)"
+    assert copied.scope is TemplateScope.PRIVATE
+    assert copied.template_id != "shared-1"
+    stored = client.collection("users").document("1").collection("templates")
+    assert stored.document(copied.template_id).get().to_dict()["title"] == "Shared (3)"
+    stats = client.stats()
+    assert stats.round_trips_by_operation["begin_transaction"] == 1
+    assert stats.round_trips_by_operation["commit"] == 1
+
+    with pytest.raises(ValueError, match="User not found"):
+        manager.copy_shared_template_to_user(2, shared)
+    assert client.collection("users").document("2").get().exists is False
+
+
+def test_get_user_assembles_templates_from_subcollection():
+    manager = make_subcollection_repository()
+    manager.user_repository.read_document.return_value = {"id": 1, "name": "alice"}
+    manager.unit_of_work.user_template_repository.list_all.return_value = (
+        build_user_template_documents(make_templates(2), base_time=BASE_TIME)
+    )
+
+    user = manager.get_user(1, include_shared=False)
+
+    assert user is not None
+    assert [template.template_id for template in user.custom_templates] == [
+        "tpl-0",
+        "tpl-1",
+    ]
+
+
+def test_get_user_without_templates_skips_the_subcollection():
+    manager = make_subcollection_repository()
+    manager.user_repository.read_document.return_value = {"id": 1, "name": "alice"}
+
+    user = manager.get_user(1, include_shared=False, include_templates=False)
+
+    assert user is not None
+    assert user.custom_templates == []
+    manager.unit_of_work.user_template_repository.list_all.assert_not_called()
+
+
+def test_user_template_repository_add_checks_user_in_same_batch():
+    client = MagicMock()
+    repository = UserTemplateRepository(client)
+    data = build_user_template_documents(make_templates(1), base_time=BASE_TIME)[0]
+
+    repository.add_template(1, data)
+
+    batch = client.batch.return_value
+    batch.update.assert_called_once()
+    batch.set.assert_called_once()
+    _, written = batch.set.call_args.args
+    assert written == data
+    batch.commit.assert_called_once_with()
+
+
+def test_migration_moves_embedded_templates_and_counts_invalid_items():
+    repository = MagicMock()
+    templates = make_templates(2)
+    repository.list_embedded_users.return_value = iter(
+        [
+            ("1", [serialize_template(template) for template in templates]),
+            ("2", ["broken", {"title": "Only title"}]),
+        ]
+    )
+
+    report = migrate_user_templates(repository, base_time=BASE_TIME)
+
+    assert report.users_scanned == 2
+    assert report.users_migrated == 1
+    assert report.users_partially_migrated == 1
+    assert report.templates_migrated == 2
+    assert report.invalid_templates == 2
+    first_call, second_call = repository.import_embedded.call_args_list
+    user_id, documents = first_call.args
+    assert user_id == "1"
+    assert [document["template_id"] for document in documents] == ["tpl-0", "tpl-1"]
+    assert documents[0]["created_at"] < documents[1]["created_at"]
+    assert first_call.kwargs["remaining"] == []
+    assert second_call.kwargs["remaining"] == ["broken", {"title": "Only title"}]
+
+
+def test_migration_keeps_invalid_items_in_the_embedded_array():
+    client = FakeFirestoreClient()
+    repository = UserTemplateRepository(client)
+    valid = make_templates(1)[0]
+    broken = {"title": "Only title"}
+    users = client.collection("users")
+    users.document("1").set(
+        {"id": 1, "name": "alice", "custom_templates": [serialize_template(valid), broken]}
+    )
+    users.document("2").set(
+        {"id": 2, "name": "bob", "custom_templates": [serialize_template(valid)]}
+    )
+
+    report = migrate_user_templates(repository, base_time=BASE_TIME)
+
+    assert report.users_migrated == 1
+    assert report.users_partially_migrated == 1
+    assert users.document("1").get().to_dict()["custom_templates"] == [broken]
+    assert "custom_templates" not in users.document("2").get().to_dict()
+    for user_id in ("1", "2"):
+        stored = users.document(user_id).collection("templates").document("tpl-0")
+        assert stored.get().to_dict()["title"] == valid.title
+
+    rerun = migrate_user_templates(repository, base_time=BASE_TIME)
+
+    assert rerun.users_scanned == 1
+    assert rerun.templates_migrated == 0
+    assert users.document("1").get().to_dict()["custom_templates"] == [broken]
+
+
+def test_migration_dry_run_does_not_write():
+    repository = MagicMock()
+    repository.list_embedded_users.return_value = iter(
+        [("1", [serialize_template(make_templates(1)[0])])]
+    )
+
+    report = migrate_user_templates(repository, dry_run=True)
+
+    assert report.dry_run is True
+    assert report.templates_migrated == 1
+    repository.import_embedded.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_private_template_page_from_async_subcollection_repository():
+    unit_of_work = FirestoreUnitOfWork()
+    unit_of_work._async_client = object()  # type: ignore[attr-defined]
+    unit_of_work.async_user_repository = MagicMock()
+    unit_of_work.async_info_repository = MagicMock()
+    unit_of_work.async_shared_template_repository = MagicMock()
+    unit_of_work.async_history_repository = MagicMock()
+    unit_of_work.async_user_template_repository = MagicMock()
+    unit_of_work.template_layout = UserTemplateLayout.SUBCOLLECTION
+    documents = build_user_template_documents(make_templates(3), base_time=BASE_TIME)
+    unit_of_work.async_user_template_repository.list_page = AsyncMock(
+        return_value=documents
+    )
+    service = TemplateApplicationService(AsyncFirestoreTemplateRepository(unit_of_work))
+
+    page = await service.list_private_templates(user_id=1, guild_id=None, limit=2)
+
+    assert [template.template_id for template in page.templates] == ["tpl-0", "tpl-1"]
+    assert page.next_cursor == encode_template_cursor(documents[1])
+    unit_of_work.async_user_template_repository.list_page.assert_awaited_once_with(
+        1, limit=3, start_after=None
+    )